@@ -0,0 +1,142 @@
+from datetime import datetime, timedelta
+from sqlalchemy import event, select
+from sqlalchemy.orm import object_session, selectinload
+from models import db, Alert, AlertTombstone, ChangeSequence
+from utils import increment_counter
+
+# ----------------- Alert Feed Settings -----------------
+ALERT_SEQUENCE = 'alerts'
+PRUNED_SEQUENCE = 'alerts_pruned'   # highest tombstone version that has been pruned
+TOMBSTONE_RETENTION = timedelta(days=7)
+LIVE_STATUSES = ('Active', 'Critical')
+PUBLIC_STATUSES = LIVE_STATUSES + ('Resolved',)   # what /live and /resolved expose
+
+_listeners_registered = False
+
+
+def next_version(connection, name=ALERT_SEQUENCE):
+    """Bump and return the named change sequence inside the current transaction"""
+    increment_counter(connection, ChangeSequence.__table__, {'name': name}, 1, count_column='value')
+    return connection.execute(
+        select(ChangeSequence.value).where(ChangeSequence.name == name)
+    ).scalar_one()
+
+
+def current_version(name=ALERT_SEQUENCE):
+    return db.session.query(ChangeSequence.value).filter_by(name=name).scalar() or 0
+
+
+# ----------------- Version Maintenance -----------------
+def _before_insert(mapper, connection, target):
+    target.version = next_version(connection)
+
+
+def _before_update(mapper, connection, target):
+    session = object_session(target)
+    if session is not None and not session.is_modified(target, include_collections=False):
+        return
+    target.version = next_version(connection)
+
+
+def _after_delete(mapper, connection, target):
+    expired = target.end_date is not None and target.end_date <= datetime.utcnow()
+    connection.execute(AlertTombstone.__table__.insert().values(
+        alert_id=target.id,
+        version=next_version(connection),
+        reason='expired' if expired else 'deleted',
+        created_at=datetime.utcnow()
+    ))
+
+
+def register_alert_feed_listeners():
+    """Stamp every alert insert/update with a new version and tombstone every delete"""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(Alert, 'before_insert', _before_insert)
+    event.listen(Alert, 'before_update', _before_update)
+    event.listen(Alert, 'after_delete', _after_delete)
+    _listeners_registered = True
+
+
+def init_alert_feed(app):
+    register_alert_feed_listeners()
+
+
+def prune_tombstones(now=None):
+    """Delete tombstones older than the retention window and raise the resync watermark"""
+    cutoff = (now or datetime.utcnow()) - TOMBSTONE_RETENTION
+    pruned_up_to = db.session.query(db.func.max(AlertTombstone.version))\
+        .filter(AlertTombstone.created_at < cutoff).scalar()
+    if not pruned_up_to:
+        return 0
+    watermark = db.session.get(ChangeSequence, PRUNED_SEQUENCE)
+    if watermark is None:
+        watermark = ChangeSequence(name=PRUNED_SEQUENCE, value=0)
+        db.session.add(watermark)
+    watermark.value = max(watermark.value or 0, pruned_up_to)
+    return AlertTombstone.query.filter(AlertTombstone.version <= pruned_up_to).delete()
+
+
+# ----------------- Delta Queries -----------------
+def is_live(alert, now):
+    return alert.status in LIVE_STATUSES and (alert.end_date is None or alert.end_date > now)
+
+
+def is_public(alert, now):
+    return alert.status == 'Resolved' or is_live(alert, now)
+
+
+SCOPES = {'all': None, 'public': is_public, 'live': is_live}
+
+
+def next_expiry(scope, now=None):
+    """Earliest future end_date among the alerts ``scope`` can return, or None"""
+    now = now or datetime.utcnow()
+    statuses = LIVE_STATUSES if scope == 'live' else PUBLIC_STATUSES if scope == 'public' else None
+    query = db.session.query(db.func.min(Alert.end_date)).filter(Alert.end_date > now)
+    if statuses:
+        query = query.filter(Alert.status.in_(statuses))
+    return query.scalar()
+
+
+def get_changes(since, scope='all'):
+    """Alerts inserted/updated and removed after version ``since``.
+
+    A ``since`` of 0, one older than the pruned tombstones or one ahead of the
+    server (database restored) gets a full snapshot with ``full: true``; the
+    client should replace its copy instead of merging. With scope='live' or
+    'public' (live plus resolved), alerts that left that set (resolved, inactive,
+    past end_date) are reported as removals rather than updates.
+    """
+    now = datetime.utcnow()
+    version = current_version()
+    full = since <= 0 or since > version or since < current_version(PRUNED_SEQUENCE)
+
+    query = Alert.query.options(selectinload(Alert.creator))
+    if not full:
+        query = query.filter(Alert.version > since)
+    alerts = query.order_by(Alert.version).all()
+
+    visible = SCOPES[scope]
+    updated, removed = [], []
+    for alert in alerts:
+        if visible and not visible(alert, now):
+            if not full:
+                reason = 'expired' if alert.end_date and alert.end_date <= now else alert.status.lower()
+                removed.append({'id': alert.id, 'version': alert.version, 'reason': reason, 'removed_at': None})
+            continue
+        updated.append(alert.to_dict())
+
+    if not full:
+        tombstones = AlertTombstone.query.filter(AlertTombstone.version > since)\
+            .order_by(AlertTombstone.version).all()
+        removed.extend(t.to_dict() for t in tombstones)
+
+    return {
+        'version': version,
+        'since': since,
+        'full': full,
+        'updated': updated,
+        'removed': removed
+    }
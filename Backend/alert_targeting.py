@@ -0,0 +1,126 @@
+import re
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import event, exists, func, inspect, or_
+from models import db, User, UserLocation, Area, Ward
+
+# ----------------- Targeting Settings -----------------
+# affected_area values that mean "everyone"
+BROADCAST_AREAS = {'', 'all', 'all areas', 'everywhere', 'countywide', 'county-wide', 'garissa county', 'multiple areas'}
+AREA_SEPARATORS = re.compile(r'[,;/]')
+LOCATION_SOURCES = ('city', 'state')
+
+targeting_cli = AppGroup('targeting', help='Alert recipient index commands.')
+
+_listeners_registered = False
+
+
+def location_key(name):
+    return ' '.join((name or '').split()).lower()
+
+
+def user_location_keys(user):
+    """(key, source) pairs a user is reachable under"""
+    keys = {}
+    for source in LOCATION_SOURCES:
+        key = location_key(getattr(user, source))
+        if key and key not in keys:
+            keys[key] = source
+    return list(keys.items())
+
+
+# ----------------- Index Maintenance -----------------
+def _write_user_locations(connection, user):
+    table = UserLocation.__table__
+    connection.execute(table.delete().where(table.c.user_id == user.id))
+    rows = [{'user_id': user.id, 'location_key': key, 'source': source} for key, source in user_location_keys(user)]
+    if rows:
+        connection.execute(table.insert(), rows)
+
+
+def _after_insert(mapper, connection, target):
+    _write_user_locations(connection, target)
+
+
+def _after_update(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[source].history.has_changes() for source in LOCATION_SOURCES):
+        _write_user_locations(connection, target)
+
+
+def register_targeting_listeners():
+    """Keep user_locations in step with User.city/User.state"""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(User, 'after_insert', _after_insert)
+    event.listen(User, 'after_update', _after_update)
+    _listeners_registered = True
+
+
+def init_targeting(app):
+    register_targeting_listeners()
+    app.cli.add_command(targeting_cli)
+
+
+def rebuild_user_locations():
+    """Rebuild the whole user_locations index from the users table"""
+    UserLocation.query.delete()
+    rows = []
+    for user in User.query.with_entities(User.id, User.city, User.state).yield_per(1000):
+        rows.extend({'user_id': user.id, 'location_key': key, 'source': source}
+                    for key, source in user_location_keys(user))
+    if rows:
+        db.session.execute(UserLocation.__table__.insert(), rows)
+    db.session.commit()
+    return len(rows)
+
+
+@targeting_cli.command('reindex')
+def reindex_command():
+    """Rebuild the user location index used for alert targeting."""
+    click.echo(f"Indexed {rebuild_user_locations()} user locations.")
+
+
+# ----------------- Recipient Resolution -----------------
+def alert_location_keys(affected_area):
+    """Location keys an alert targets, or None when it goes to every area.
+
+    "Dadaab, Fafi" targets both areas. An area also targets its wards, and a
+    ward also targets its parent area so users who only gave the area still hear.
+    """
+    tokens = {location_key(part) for part in AREA_SEPARATORS.split(affected_area or '')}
+    tokens.discard('')
+    if not tokens or tokens & BROADCAST_AREAS:
+        return None
+
+    keys = set(tokens)
+    areas = Area.query.filter(func.lower(Area.name).in_(tokens)).all()
+    if areas:
+        wards = Ward.query.filter(Ward.area_id.in_([a.id for a in areas])).all()
+        keys.update(location_key(w.name) for w in wards)
+    wards = Ward.query.filter(func.lower(Ward.name).in_(tokens)).all()
+    if wards:
+        parents = Area.query.filter(Area.id.in_({w.area_id for w in wards})).all()
+        keys.update(location_key(a.name) for a in parents)
+    return keys
+
+
+def alert_recipients_query(alert):
+    """Non-admin users who should receive ``alert``.
+
+    Users in the affected area come from the user_locations index; users who
+    opted in to all areas always match. Users who have not set a city or state
+    yet keep receiving every alert unless ALERT_TARGET_UNLOCATED_USERS is off.
+    """
+    query = User.query.filter_by(is_admin=False)
+    keys = alert_location_keys(alert.affected_area)
+    if keys is None:
+        return query
+
+    in_area = db.session.query(UserLocation.user_id).filter(UserLocation.location_key.in_(keys))
+    conditions = [User.id.in_(in_area), User.alert_all_areas.is_(True)]
+    if current_app.config.get('ALERT_TARGET_UNLOCATED_USERS', True):
+        conditions.append(~exists().where(UserLocation.user_id == User.id))
+    return query.filter(or_(*conditions))
@@ -1,11 +1,10 @@
 from flask import Flask
 from flask_cors import CORS
 from flask_session import Session
-from flask_migrate import Migrate
-from flask_mail import Mail
 import os
 
 from models import db, AdminUser  
+from extensions import mail
 from blueprints.auth import auth_bp
 from blueprints.reports import reports_bp
 from blueprints.email import email_bp
@@ -16,9 +15,22 @@ from blueprints.notification import notifications_bp
 from blueprints.messages import messages_bp
 from blueprints.contact import contact_bp
 from blueprints.feedback import feedback_bp
-
-# Initialize Flask-Mail
-mail = Mail()
+from search import init_search
+from locations import init_locations, GARISSA_LOCATIONS
+from rollups import init_rollups
+from alert_feed import init_alert_feed
+from alert_targeting import init_targeting
+from digests import init_digests
+from mail_transport import SENDER_EMAIL, init_mail
+from delivery_log import init_delivery_log
+from instrumentation import init_instrumentation
+from metrics import init_metrics
+from query_audit import init_query_audit
+from profiler import init_profiler
+from slow_queries import init_slow_queries
+from lifecycle import init_lifecycle
+from startup import (startup_mode, is_cli, init_migrate, schema_fingerprint, schema_is_current,
+                     stamp_schema, upgrade_schema)
 
 def create_default_admin_user():
     """Create default admin if it does not exist."""
@@ -33,13 +45,13 @@ def create_default_admin_user():
     db.session.commit()
     print("Default admin user created.")
 
-def create_app():
+def create_app(test_config=None):
     app = Flask(__name__)
 
     # ---------------- CONFIG ----------------
     class Config:
         SECRET_KEY = os.getenv('SECRET_KEY', 'supersecretkey')
-        SQLALCHEMY_DATABASE_URI = 'sqlite:///database.db'
+        SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///database.db')
         SQLALCHEMY_TRACK_MODIFICATIONS = False
 
         # Flask-Session
@@ -48,27 +60,37 @@ def create_app():
         SESSION_COOKIE_SAMESITE = None
         SESSION_COOKIE_SECURE = False
 
-        # Flask-Mail (Gmail SMTP)
-        MAIL_SERVER = "smtp.gmail.com"
-        MAIL_PORT = 587
-        MAIL_USE_TLS = True
-        MAIL_USERNAME = "Abdiaziznoor20@gmail.com"  # Your Gmail
-        MAIL_PASSWORD = "tywlsprxunkzljml"         # Your App Password (without spaces)
-        MAIL_DEFAULT_SENDER = "Abdiaziznoor20@gmail.com"
+        # Flask-Mail only builds messages; delivery (SMTP host, credentials,
+        # pooling, rate limits) is configured through MAIL_TRANSPORT/MAIL_SMTP_*
+        # in mail_transport.py
+        MAIL_DEFAULT_SENDER = SENDER_EMAIL
 
     app.config.from_object(Config)
+    if test_config:
+        app.config.update(test_config)
+    lazy = startup_mode(app) == 'lazy'
 
     # Initialize extensions
     Session(app)
     db.init_app(app)
     mail.init_app(app)
-    migrate = Migrate(app, db)
+    if not lazy or is_cli():
+        # alembic is the slowest import in the app; lazy boots only need it for `flask db`
+        # commands or when the schema step below has to run
+        init_migrate(app, db)
     CORS(app, supports_credentials=True, origins=[
         "http://localhost:3000",
         "http://localhost:5173",
         "http://127.0.0.1:5173"
     ])
 
+    # ---------------- REQUEST INSTRUMENTATION, METRICS & PROFILING ----------------
+    init_instrumentation(app)
+    init_metrics(app)
+    init_query_audit(app)
+    init_profiler(app)
+    init_slow_queries(app)
+
     # ---------------- BLUEPRINTS ----------------
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(reports_bp, url_prefix='/api/reports')
@@ -82,9 +104,38 @@ def create_app():
     app.register_blueprint(feedback_bp, url_prefix='/api/feedback')
 
     # ---------------- CREATE DATABASE & DEFAULT ADMIN ----------------
+    # Lazy startup skips this and the location seed when the schema marker shows a
+    # previous boot already did it for these models and migrations (see startup.py)
     with app.app_context():
-        db.create_all()
-        create_default_admin_user()
+        fingerprint = schema_fingerprint(db.metadata, seeds=[GARISSA_LOCATIONS])
+        marker_current = schema_is_current(db.engine, fingerprint)
+        schema_ready = lazy and marker_current
+        if not schema_ready:
+            db.create_all()
+            upgrade_schema(app, db)
+            create_default_admin_user()
+
+    # ---------------- LOCATIONS & HOTSPOTS ----------------
+    init_locations(app, seed=not schema_ready)
+    init_rollups(app)
+    if not marker_current:
+        with app.app_context():
+            stamp_schema(db.engine, fingerprint)
+
+    # ---------------- ALERT FEED & TARGETING ----------------
+    init_alert_feed(app)
+    init_targeting(app)
+
+    # ---------------- MAIL TRANSPORT & DIGESTS ----------------
+    init_mail(app)
+    init_delivery_log(app)
+    init_digests(app)
+
+    # ---------------- FULL-TEXT SEARCH ----------------
+    init_search(app)
+
+    # ---------------- LIFECYCLE & READINESS ----------------
+    init_lifecycle(app)
 
     return app
 
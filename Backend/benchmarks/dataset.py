@@ -0,0 +1,195 @@
+"""Deterministic seeded dataset for the benchmarks.
+
+The same ``--seed`` and sizes always produce the same rows (ids, names,
+timestamps, who-owns-what), so runs on different commits measure the same
+data. Rows go in through Core inserts in chunks; the indexes that ORM
+listeners normally keep up to date (alert targeting) are rebuilt afterwards.
+
+    from dataset import DEFAULT_SIZES, seed_database
+    dataset = seed_database(db, dict(DEFAULT_SIZES, users=2000), seed=7)
+"""
+import random
+import uuid
+from datetime import datetime, timedelta
+
+DEFAULT_SIZES = {
+    'users': 500,
+    'admins': 5,
+    'reports': 2000,
+    'media_per_report': 2,       # up to; each report gets 0..n
+    'alerts': 50,
+    'chats': 200,
+    'messages_per_chat': 12,     # up to; each chat gets 1..n
+    'notifications': 5000,
+    'tickets': 300,
+    'feedback': 200,
+}
+# Fixed clock so timestamps (and everything ordered by them) repeat exactly
+BASE_TIME = datetime(2025, 1, 1, 12, 0, 0)
+CHUNK = 1000
+
+WORDS = (
+    "theft robbery fire flood accident assault vandalism burglary market school "
+    "hospital mosque road bridge river police night morning livestock water "
+    "electricity protest traffic motorbike shop bus station border camp well"
+).split()
+REPORT_TYPES = ['Crime', 'Fire', 'Flood', 'Accident', 'Health', 'Conflict']
+URGENCIES = ['low', 'medium', 'high', 'urgent']
+STATUSES = ['Pending', 'In Progress', 'Resolved', 'Rejected', 'Closed']
+SEVERITIES = ['Low', 'Medium', 'High', 'Critical']
+FIRST_NAMES = ['Amina', 'Hassan', 'Fatuma', 'Abdi', 'Halima', 'Omar', 'Sahra', 'Yusuf', 'Khadija', 'Ali']
+LAST_NAMES = ['Mohamed', 'Abdullahi', 'Hussein', 'Ahmed', 'Osman', 'Farah', 'Noor', 'Ibrahim']
+
+
+class Dataset:
+    """Ids the scenarios need to pick realistic actors and targets"""
+
+    def __init__(self, seed, sizes):
+        self.seed = seed
+        self.sizes = sizes
+        self.user_ids = []
+        self.admin_ids = []
+        self.chats = []          # (chat_id, owner user_id)
+        self.report_ids = []
+        self.areas = []          # (area, [wards])
+        self.counts = {}
+
+
+def _uuid(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def _sentence(rng, n):
+    return ' '.join(rng.choice(WORDS) for _ in range(n))
+
+
+def _insert(db, table, rows, counts, name):
+    for start in range(0, len(rows), CHUNK):
+        db.session.execute(table.insert(), rows[start:start + CHUNK])
+    counts[name] = counts.get(name, 0) + len(rows)
+
+
+def seed_database(db, sizes=None, seed=42):
+    """Seed an empty (freshly created) database and return a Dataset"""
+    from models import (User, Report, ReportMedia, Alert, Chat, ChatMessage, Notification,
+                        NotificationType, ContactMessage, Feedback)
+    from locations import GARISSA_LOCATIONS
+    from alert_targeting import rebuild_user_locations
+
+    sizes = dict(DEFAULT_SIZES, **(sizes or {}))
+    rng = random.Random(seed)
+    dataset = Dataset(seed, sizes)
+    dataset.areas = [(area, wards or [area]) for area, wards in GARISSA_LOCATIONS.items()]
+    counts = dataset.counts
+
+    # Users: ids are assigned in insert order, starting after any existing rows
+    first_id = (db.session.query(db.func.max(User.id)).scalar() or 0) + 1
+    users = []
+    for i in range(sizes['users'] + sizes['admins']):
+        is_admin = i >= sizes['users']
+        area, wards = rng.choice(dataset.areas)
+        created = BASE_TIME - timedelta(days=rng.randint(0, 365))
+        users.append({
+            'id': first_id + i,
+            'first_name': rng.choice(FIRST_NAMES), 'last_name': rng.choice(LAST_NAMES),
+            'email': f'{"admin" if is_admin else "user"}{i}-s{seed}@bench.example.com',
+            'role': 'admin' if is_admin else 'user', 'password_hash': 'x',
+            'is_admin': is_admin, 'is_verified': True,
+            'city': rng.choice(wards), 'state': area,
+            'alert_all_areas': rng.random() < 0.05,
+            'created_at': created,
+        })
+        (dataset.admin_ids if is_admin else dataset.user_ids).append(first_id + i)
+    _insert(db, User.__table__, users, counts, 'users')
+
+    reports, media = [], []
+    for i in range(sizes['reports']):
+        area, wards = rng.choice(dataset.areas)
+        created = BASE_TIME - timedelta(minutes=i * 7)
+        report_id = _uuid(rng)
+        reports.append({
+            'id': report_id, 'user_id': rng.choice(dataset.user_ids), 'report_type': rng.choice(REPORT_TYPES),
+            'title': _sentence(rng, 5).capitalize(), 'description': _sentence(rng, 40),
+            'landmark': _sentence(rng, 3), 'date': created, 'time': created,
+            'urgency': rng.choice(URGENCIES), 'status': rng.choice(STATUSES),
+            'area': area, 'ward': rng.choice(wards), 'location_type': 'public',
+            'created_at': created, 'updated_at': created,
+        })
+        dataset.report_ids.append(report_id)
+        for j in range(rng.randint(0, sizes['media_per_report'])):
+            media.append({
+                'id': _uuid(rng), 'report_id': report_id, 'url': f'/uploads/bench-{i}-{j}.jpg',
+                'type': 'image', 'name': f'photo-{j}.jpg', 'size': rng.randint(50_000, 5_000_000),
+                'created_at': created,
+            })
+    _insert(db, Report.__table__, reports, counts, 'reports')
+    _insert(db, ReportMedia.__table__, media, counts, 'media')
+
+    alerts = []
+    for i in range(sizes['alerts']):
+        area, _ = rng.choice(dataset.areas)
+        created = BASE_TIME - timedelta(hours=i * 5)
+        alerts.append({
+            'id': _uuid(rng), 'title': _sentence(rng, 4).capitalize(), 'message': _sentence(rng, 25),
+            'type': rng.choice(REPORT_TYPES), 'status': 'Active', 'severity': rng.choice(SEVERITIES),
+            'affected_area': area, 'start_date': created, 'end_date': None,
+            'created_by': rng.choice(dataset.admin_ids), 'created_at': created, 'updated_at': created,
+            'version': i + 1,
+        })
+    _insert(db, Alert.__table__, alerts, counts, 'alerts')
+
+    chats, messages = [], []
+    for i in range(sizes['chats']):
+        chat_id, owner = _uuid(rng), rng.choice(dataset.user_ids)
+        admin = rng.choice(dataset.admin_ids)
+        created = BASE_TIME - timedelta(hours=i)
+        chats.append({
+            'id': chat_id, 'user_id': owner, 'admin_id': admin, 'title': 'Support Chat',
+            'status': 'open', 'is_active': True, 'created_at': created, 'updated_at': created,
+        })
+        dataset.chats.append((chat_id, owner))
+        for j in range(rng.randint(1, sizes['messages_per_chat'])):
+            from_admin = j % 2 == 1
+            messages.append({
+                'id': _uuid(rng), 'chat_id': chat_id, 'sender_id': admin if from_admin else owner,
+                'content': _sentence(rng, 12), 'is_read': rng.random() < 0.7, 'is_admin': from_admin,
+                'message_type': 'text', 'created_at': created + timedelta(minutes=j),
+            })
+    _insert(db, Chat.__table__, chats, counts, 'chats')
+    _insert(db, ChatMessage.__table__, messages, counts, 'chat_messages')
+
+    types = [NotificationType.ADMIN_ALERT, NotificationType.REPORT_STATUS_UPDATE, NotificationType.CHAT_MESSAGE]
+    notifications = []
+    for i in range(sizes['notifications']):
+        created = BASE_TIME - timedelta(minutes=i * 3)
+        notifications.append({
+            'id': _uuid(rng), 'user_id': rng.choice(dataset.user_ids), 'type': rng.choice(types),
+            'title': _sentence(rng, 4).capitalize(), 'message': _sentence(rng, 15),
+            'is_read': rng.random() < 0.6, 'is_urgent': rng.random() < 0.1, 'role': 'user',
+            'created_at': created, 'expires_at': created + timedelta(days=3650),
+        })
+    _insert(db, Notification.__table__, notifications, counts, 'notifications')
+
+    tickets = []
+    for i in range(sizes['tickets']):
+        created = BASE_TIME - timedelta(hours=i * 2)
+        user_id = rng.choice(dataset.user_ids)
+        tickets.append({
+            'id': _uuid(rng), 'name': rng.choice(FIRST_NAMES), 'email': f'user-{user_id}@bench.example.com',
+            'subject': _sentence(rng, 5).capitalize(), 'message': _sentence(rng, 30),
+            'ticket_number': f'TKT-S{seed}-{i:06d}', 'status': rng.choice(['new', 'in_progress', 'resolved']),
+            'priority': rng.choice(['low', 'normal', 'high']), 'user_id': user_id,
+            'created_at': created, 'updated_at': created,
+        })
+    _insert(db, ContactMessage.__table__, tickets, counts, 'tickets')
+
+    feedback = [{
+        'id': _uuid(rng), 'name': rng.choice(FIRST_NAMES), 'email': f'fb{i}@bench.example.com',
+        'rating': rng.randint(1, 5), 'message': _sentence(rng, 20),
+        'created_at': BASE_TIME - timedelta(hours=i),
+    } for i in range(sizes['feedback'])]
+    _insert(db, Feedback.__table__, feedback, counts, 'feedback')
+
+    db.session.commit()
+    counts['user_locations'] = rebuild_user_locations()
+    return dataset
@@ -0,0 +1,306 @@
+"""Load benchmark for the hot API endpoints.
+
+Seeds a throwaway SQLite database with the deterministic dataset from
+``dataset.py``, then drives each scenario through the Flask test client or a
+local threaded WSGI server (real sockets, keep-alive connections, several
+concurrent clients). Mail goes to the in-memory transport. Prints one JSON
+document with throughput and latency percentiles per scenario, so runs can be
+stored and diffed over time; stdout carries nothing else (progress and the
+app's own output go to stderr), so it can be piped straight into a file.
+
+Scenarios: alert_fanout, notifications_list, chat_list, chat_poll,
+report_list, report_create.
+
+    python benchmarks/endpoint_benchmark.py --requests 200
+    python benchmarks/endpoint_benchmark.py --driver server --concurrency 8 --output run.json
+    python benchmarks/endpoint_benchmark.py --scenario chat_list --scenario chat_poll --users 5000
+"""
+import argparse
+import http.client
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import redirect_stdout
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from dataset import DEFAULT_SIZES, seed_database  # noqa: E402
+
+PERCENTILES = (50, 90, 95, 99)
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+# ----------------- Scenarios -----------------
+# Each returns (method, path, json body or None, (role, id) to authenticate as)
+def alert_fanout(rng, dataset):
+    area, _ = rng.choice(dataset.areas)
+    return 'POST', '/api/alerts/admin/alerts', {
+        'title': f'Bench alert {rng.randrange(10 ** 6)}', 'message': 'Move to higher ground immediately.',
+        'type': 'Flood', 'status': 'Active', 'severity': rng.choice(['Medium', 'High']), 'affected_area': area,
+    }, ('admin', rng.choice(dataset.admin_ids))
+
+
+def notifications_list(rng, dataset):
+    return 'GET', '/api/notifications/?page=1&per_page=20', None, ('user', rng.choice(dataset.user_ids))
+
+
+def chat_list(rng, dataset):
+    _, owner = rng.choice(dataset.chats)
+    return 'GET', '/api/chat/', None, ('user', owner)
+
+
+def chat_poll(rng, dataset):
+    chat_id, owner = rng.choice(dataset.chats)
+    return 'GET', f'/api/chat/{chat_id}', None, ('user', owner)
+
+
+def report_list(rng, dataset):
+    return 'GET', '/api/reports/', None, ('user', rng.choice(dataset.user_ids))
+
+
+def report_create(rng, dataset):
+    area, wards = rng.choice(dataset.areas)
+    return 'POST', '/api/reports/', {
+        'report_type': 'Crime', 'title': 'Bench report', 'description': 'Generated by the endpoint benchmark.',
+        'area': area, 'ward': rng.choice(wards), 'urgency': 'medium',
+    }, ('user', rng.choice(dataset.user_ids))
+
+
+SCENARIOS = {
+    'alert_fanout': alert_fanout,
+    'notifications_list': notifications_list,
+    'chat_list': chat_list,
+    'chat_poll': chat_poll,
+    'report_list': report_list,
+    'report_create': report_create,
+}
+
+
+# ----------------- Drivers -----------------
+class Sessions:
+    """Session cookies minted once per actor through the real session store"""
+
+    def __init__(self, app):
+        self.app = app
+        self.cookie_name = app.config['SESSION_COOKIE_NAME']
+        self._cookies = {}
+        self._lock = threading.Lock()
+
+    def cookie(self, actor):
+        with self._lock:
+            if actor not in self._cookies:
+                role, user_id = actor
+                client = self.app.test_client()
+                with client.session_transaction() as session:
+                    session['user_id'] = user_id
+                    if role == 'admin':
+                        session['admin_user_id'] = user_id
+                self._cookies[actor] = client.get_cookie(self.cookie_name).value
+            return self._cookies[actor]
+
+
+class ClientDriver:
+    """In-process: no sockets, measures the app itself"""
+
+    def __init__(self, app, sessions):
+        self.app = app
+        self.sessions = sessions
+
+    def worker(self):
+        client = self.app.test_client()
+
+        def request(method, path, body, actor):
+            client.set_cookie(self.sessions.cookie_name, self.sessions.cookie(actor))
+            response = client.open(path, method=method, json=body)
+            response.get_data()
+            return response.status_code
+        return request
+
+    def close(self):
+        pass
+
+
+class ServerDriver:
+    """A threaded werkzeug server on a free local port; one keep-alive connection per worker"""
+
+    def __init__(self, app, sessions):
+        from werkzeug.serving import WSGIRequestHandler, make_server
+        WSGIRequestHandler.protocol_version = 'HTTP/1.1'
+        self.sessions = sessions
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+
+    def worker(self):
+        connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+
+        def request(method, path, body, actor):
+            headers = {'Cookie': f'{self.sessions.cookie_name}={self.sessions.cookie(actor)}'}
+            payload = None
+            if body is not None:
+                payload = json.dumps(body)
+                headers['Content-Type'] = 'application/json'
+            connection.request(method, path, body=payload, headers=headers)
+            response = connection.getresponse()
+            response.read()
+            return response.status
+        return request
+
+    def close(self):
+        self.server.shutdown()
+
+
+def run_scenario(driver, name, dataset, requests, concurrency, warmup, seed):
+    make = SCENARIOS[name]
+    # One generator per worker, derived from the run seed, so request mixes repeat too
+    plans = []
+    for worker in range(concurrency):
+        rng = random.Random(f'{seed}:{name}:{worker}')
+        count = requests // concurrency + (1 if worker < requests % concurrency else 0)
+        plans.append([make(rng, dataset) for _ in range(count)])
+
+    warm = driver.worker()
+    for plan in plans:
+        for call in plan[:max(0, warmup // concurrency)]:
+            warm(*call)
+
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+
+    def work(plan):
+        request = driver.worker()
+        mine, codes = [], {}
+        for call in plan:
+            started = time.perf_counter()
+            status = request(*call)
+            mine.append((time.perf_counter() - started) * 1000)
+            codes[status] = codes.get(status, 0) + 1
+        with lock:
+            latencies.extend(mine)
+            for status, count in codes.items():
+                statuses[status] = statuses.get(status, 0) + count
+
+    threads = [threading.Thread(target=work, args=(plan,)) for plan in plans]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    result = {
+        'requests': len(latencies),
+        'errors': sum(count for status, count in statuses.items() if status >= 400),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'concurrency': concurrency,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_rps': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'latency_ms': {f'p{pct}': round(percentile(latencies, pct), 2) for pct in PERCENTILES},
+    }
+    result['latency_ms']['mean'] = round(sum(latencies) / len(latencies), 2) if latencies else 0.0
+    result['latency_ms']['max'] = round(max(latencies), 2) if latencies else 0.0
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scenario', action='append', choices=sorted(SCENARIOS),
+                        help='scenario to run (repeatable); default: all')
+    parser.add_argument('--driver', choices=['client', 'server'], default='client')
+    parser.add_argument('--requests', type=int, default=200, help='timed requests per scenario')
+    parser.add_argument('--concurrency', type=int, default=1, help='concurrent clients')
+    parser.add_argument('--warmup', type=int, default=10, help='untimed requests per scenario')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='write the JSON here as well as to stdout')
+    for key, default in DEFAULT_SIZES.items():
+        parser.add_argument(f'--{key.replace("_", "-")}', type=int, default=default, dest=key,
+                            help=f'dataset size (default {default})')
+    args = parser.parse_args()
+    sizes = {key: getattr(args, key) for key in DEFAULT_SIZES}
+    output_path = os.path.abspath(args.output) if args.output else None
+
+    workdir = tempfile.mkdtemp(prefix='endpoint-bench-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.chdir(workdir)
+
+    import logging
+    from app import create_app
+    from models import db
+    from mail_transport import MemoryTransport, set_transport
+
+    # The app print()s as it goes (default admin created, emails sent); stdout
+    # carries only the JSON report, so all of that goes to stderr
+    with redirect_stdout(sys.stderr):
+        set_transport(MemoryTransport())
+        app = create_app({
+            'TESTING': True,
+            'QUERY_AUDIT': 'off',
+            'INSTRUMENTATION_REQUEST_LOG': False,
+            'ALERT_CLEANUP_INTERVAL': float('inf'),
+        })
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+
+        with app.app_context():
+            started = time.perf_counter()
+            dataset = seed_database(db, sizes, seed=args.seed)
+            seed_seconds = time.perf_counter() - started
+
+        sessions = Sessions(app)
+        driver = (ServerDriver if args.driver == 'server' else ClientDriver)(app, sessions)
+        results = {}
+        try:
+            for name in args.scenario or list(SCENARIOS):
+                results[name] = run_scenario(driver, name, dataset, args.requests, args.concurrency,
+                                             args.warmup, args.seed)
+                print(f"{name}: {results[name]['throughput_rps']} req/s "
+                      f"p50={results[name]['latency_ms']['p50']}ms p99={results[name]['latency_ms']['p99']}ms "
+                      f"errors={results[name]['errors']}", file=sys.stderr)
+        finally:
+            driver.close()
+
+    report = {
+        'meta': {
+            'started_at': datetime.utcnow().isoformat() + 'Z',
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'driver': args.driver,
+            'seed': args.seed,
+            'sizes': sizes,
+            'rows': dataset.counts,
+            'seed_seconds': round(seed_seconds, 2),
+        },
+        'scenarios': results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if output_path:
+        with open(output_path, 'w') as f:
+            f.write(output + '\n')
+    return 0 if all(result['errors'] == 0 for result in results.values()) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,112 @@
+"""Throughput benchmark for alert emails.
+
+Seeds a throwaway SQLite database with M users, then fires N alerts at them
+through ``utils.send_alert_notification_email``. Mail goes to a local SMTP sink
+(real sockets, optional per-message latency) or to the in-memory transport.
+Reports messages/sec, p50/p99 enqueue latency (alert fired -> message handed to
+the transport), p50/p99 delivery latency (alert fired -> server accepted it)
+and how many messages each pooled SMTP connection carried.
+
+    python benchmarks/mail_benchmark.py --alerts 20 --users 500 --transport sink
+    python benchmarks/mail_benchmark.py --alerts 20 --users 500 --batch
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def seed_users(db, User, count):
+    now = datetime.utcnow()
+    db.session.execute(User.__table__.insert(), [{
+        'first_name': f'User{i}', 'last_name': 'Bench', 'email': f'user{i}-{uuid.uuid4().hex[:6]}@example.com',
+        'role': 'user', 'password_hash': 'x', 'is_admin': False, 'alert_all_areas': False,
+        'created_at': now, 'updated_at': now,
+    } for i in range(count)])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--alerts', type=int, default=20, help='number of alerts to fire')
+    parser.add_argument('--users', type=int, default=500, help='number of simulated users')
+    parser.add_argument('--transport', choices=['sink', 'memory'], default='sink')
+    parser.add_argument('--latency-ms', type=float, default=0.0, help='per-message delay in the SMTP sink')
+    parser.add_argument('--batch', action='store_true', help='turn off personalization (batched envelopes)')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='mail-bench-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.chdir(workdir)
+
+    from app import create_app
+    from models import db, Alert, User
+    from mail_transport import MemoryTransport, SMTPSink, set_transport
+    import utils
+
+    sink = None
+    if args.transport == 'sink':
+        sink = SMTPSink(latency=args.latency_ms / 1000).start()
+        transport = sink.transport()
+    else:
+        transport = MemoryTransport(max_messages=args.alerts * args.users)
+    set_transport(transport)
+
+    app = create_app()
+    app.config['ALERT_EMAIL_PERSONALIZED'] = not args.batch
+    with app.app_context():
+        seed_users(db, User, args.users)
+        creator = User.query.first()
+
+        transport.stats.start_trace()
+        enqueue, delivery = [], []
+        started = time.perf_counter()
+        for i in range(args.alerts):
+            alert = Alert(title=f'Bench alert {i}', message='Move to higher ground immediately.',
+                          type='Flood', status='Active', severity='High', affected_area='All areas',
+                          created_by=creator.id)
+            db.session.add(alert)
+            db.session.commit()
+
+            first = len(transport.stats.trace)
+            fired = time.perf_counter()
+            result = utils.send_alert_notification_email(alert)
+            if result['failed']:
+                print(f"alert {i}: {result['failed']} failed, e.g. {result['failed_emails'][0]['error']}")
+            for recipients, handed_off, accepted in transport.stats.trace[first:]:
+                enqueue.extend([(handed_off - fired) * 1000] * len(recipients))
+                delivery.extend([(accepted - fired) * 1000] * len(recipients))
+        elapsed = time.perf_counter() - started
+
+    stats = transport.stats.snapshot()
+    if sink:
+        sink.stop()
+        stats['accepted_by_sink'] = sink.message_count
+        stats['sink_sessions'] = sink.sessions
+
+    print(f"transport={args.transport} alerts={args.alerts} users={args.users} "
+          f"mode={'batch' if args.batch else 'personalized'} elapsed={elapsed:.2f}s")
+    print(f"messages={stats['messages']} transactions={stats['transactions']} "
+          f"throughput={stats['messages'] / elapsed:.0f} msgs/s")
+    print(f"enqueue  p50={percentile(enqueue, 50):.2f}ms p99={percentile(enqueue, 99):.2f}ms")
+    print(f"delivery p50={percentile(delivery, 50):.2f}ms p99={percentile(delivery, 99):.2f}ms")
+    print(f"connections={stats['connections']} reused={stats['reused_connections']} retries={stats['retries']} "
+          f"messages_per_connection={stats['messages_per_connection']}"
+          + (f" sink_sessions={stats['sink_sessions']} accepted_by_sink={stats['accepted_by_sink']}" if sink else ''))
+    return 0 if stats['failures'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""Latency benchmark for the admin full-text search.
+
+Seeds a throwaway SQLite database with N reports, messages and contact tickets,
+rebuilds the index and times a mix of queries through ``search.search``.
+Exits non-zero when the p95 latency is above the target.
+
+    python benchmarks/search_benchmark.py --docs 20000 --target-p95-ms 50
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = (
+    "theft robbery fire flood accident assault vandalism burglary market school "
+    "hospital mosque road bridge river police night morning livestock water "
+    "electricity protest traffic motorbike shop bus station border camp well"
+).split()
+AREAS = ['Garissa Town', 'Dadaab', 'Fafi', 'Ijara', 'Lagdera', 'Balambala', 'Hulugho']
+QUERIES = ['theft', 'fire market', 'flood river', 'police station night', 'burg', 'water well camp']
+
+
+def sentence(rng, n):
+    return ' '.join(rng.choice(WORDS) for _ in range(n))
+
+
+def seed(db, models, count, rng):
+    Report, Message, ContactMessage, User = models
+    user = User(first_name='Bench', last_name='User', email=f'bench-{uuid.uuid4().hex}@example.com',
+                role='user', password_hash='x')
+    db.session.add(user)
+    db.session.commit()
+
+    now = datetime.utcnow()
+    reports, messages, contacts = [], [], []
+    for i in range(count):
+        created = now - timedelta(minutes=i)
+        reports.append({
+            'id': str(uuid.uuid4()), 'user_id': user.id, 'report_type': rng.choice(['Crime', 'Fire', 'Flood']),
+            'title': sentence(rng, 5), 'description': sentence(rng, 40), 'landmark': sentence(rng, 3),
+            'date': created, 'time': created, 'urgency': 'medium', 'status': 'Pending',
+            'area': rng.choice(AREAS), 'ward': 'Central', 'location_type': 'public',
+            'created_at': created, 'updated_at': created,
+        })
+        if i % 3 == 0:
+            messages.append({
+                'id': str(uuid.uuid4()), 'email': 'someone@example.com', 'title': sentence(rng, 5),
+                'message': sentence(rng, 30), 'created_at': created, 'updated_at': created,
+            })
+            contacts.append({
+                'id': str(uuid.uuid4()), 'name': 'Someone', 'email': 'someone@example.com',
+                'subject': sentence(rng, 5), 'message': sentence(rng, 30),
+                'ticket_number': f'TKT-{i}-{uuid.uuid4().hex[:5]}', 'created_at': created, 'updated_at': created,
+            })
+    # Core inserts bypass the ORM listeners; the index is rebuilt afterwards
+    db.session.execute(Report.__table__.insert(), reports)
+    db.session.execute(Message.__table__.insert(), messages)
+    db.session.execute(ContactMessage.__table__.insert(), contacts)
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--docs', type=int, default=20000, help='number of reports to seed')
+    parser.add_argument('--queries', type=int, default=300, help='number of timed queries')
+    parser.add_argument('--target-p95-ms', type=float, default=50.0)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='search-bench-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    os.chdir(workdir)
+
+    from app import create_app
+    from models import db, Report, Message, ContactMessage, User
+    from search import rebuild_index, search, get_backend
+
+    app = create_app()
+    rng = random.Random(args.seed)
+    with app.app_context():
+        seed(db, (Report, Message, ContactMessage, User), args.docs, rng)
+
+        started = time.perf_counter()
+        counts = rebuild_index()
+        rebuild_seconds = time.perf_counter() - started
+
+        timings = []
+        for i in range(args.queries):
+            query = QUERIES[i % len(QUERIES)]
+            started = time.perf_counter()
+            search(query, page=1 + (i % 3), per_page=20)
+            timings.append((time.perf_counter() - started) * 1000)
+
+        timings.sort()
+        p50 = statistics.median(timings)
+        p95 = timings[int(len(timings) * 0.95) - 1]
+        print(f"backend={get_backend()} documents={sum(counts.values())} rebuild={rebuild_seconds:.2f}s")
+        print(f"queries={len(timings)} p50={p50:.2f}ms p95={p95:.2f}ms max={timings[-1]:.2f}ms "
+              f"target_p95={args.target_p95_ms:.0f}ms")
+
+    if p95 > args.target_p95_ms:
+        print("FAIL: p95 latency above target")
+        return 1
+    print("OK")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,128 @@
+"""Cold-start benchmark: import time and create_app() time in fresh processes.
+
+Prepares a throwaway SQLite database once (a full boot, which creates the
+schema, seeds it and stamps the schema marker), then starts a new interpreter
+per run and times ``import app`` and ``create_app()`` for each startup mode.
+A final ``-X importtime`` run lists the slowest imports. Prints one JSON
+document; ``--budget-ms`` makes the run fail when a lazy boot gets slower than
+the budget, so startup regressions show up in CI.
+
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --runs 10 --budget-ms 900 --output startup.json
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import subprocess
+import sys
+import tempfile
+from datetime import datetime
+
+from endpoint_benchmark import git_revision, percentile
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = ('full', 'lazy')
+
+# Runs in the child; os._exit skips interpreter teardown (and the scheduler threads create_app starts)
+CHILD = """
+import json, os, sys, time
+started = time.perf_counter()
+sys.path.insert(0, {backend!r})
+import app
+imported = time.perf_counter()
+app.create_app({{'STARTUP_MODE': {mode!r}}})
+created = time.perf_counter()
+print(json.dumps({{'import_ms': (imported - started) * 1000, 'create_app_ms': (created - imported) * 1000,
+                  'modules': len(sys.modules), 'alembic_loaded': 'alembic' in sys.modules}}))
+sys.stdout.flush()
+os._exit(0)
+"""
+IMPORT_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+def run_child(mode, workdir, importtime=False):
+    command = [sys.executable]
+    if importtime:
+        command += ['-X', 'importtime']
+    command += ['-c', CHILD.format(backend=BACKEND, mode=mode)]
+    result = subprocess.run(command, cwd=workdir, capture_output=True, text=True, check=True)
+    lines = [line for line in result.stdout.splitlines() if line.startswith('{')]
+    return json.loads(lines[-1]), result.stderr
+
+
+def slowest_imports(stderr, limit):
+    """Top-level imports (what ``import app`` pulled in directly or via the app's own modules) by cumulative ms"""
+    imports = []
+    for match in IMPORT_LINE.finditer(stderr):
+        _, cumulative, indent, name = match.groups()
+        if len(indent) <= 3:
+            imports.append((name, int(cumulative) / 1000))
+    imports.sort(key=lambda item: item[1], reverse=True)
+    return [{'module': name, 'cumulative_ms': round(ms, 1)} for name, ms in imports[:limit]]
+
+
+def summarize(values):
+    return {
+        'p50': round(percentile(values, 50), 1),
+        'min': round(min(values), 1),
+        'max': round(max(values), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='fresh processes per startup mode')
+    parser.add_argument('--top', type=int, default=15, help='slowest imports to list')
+    parser.add_argument('--budget-ms', type=float, help='fail when the lazy p50 import + create_app exceeds this')
+    parser.add_argument('--output', help='write the JSON here as well as to stdout')
+    args = parser.parse_args()
+    output_path = os.path.abspath(args.output) if args.output else None
+
+    workdir = tempfile.mkdtemp(prefix='startup-bench-')
+    os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(workdir, 'bench.db')
+    # First boot pays for the schema; every measured run below starts from a stamped database
+    run_child('full', workdir)
+
+    results = {}
+    for mode in MODES:
+        runs = [run_child(mode, workdir)[0] for _ in range(args.runs)]
+        totals = [run['import_ms'] + run['create_app_ms'] for run in runs]
+        results[mode] = {
+            'import_ms': summarize([run['import_ms'] for run in runs]),
+            'create_app_ms': summarize([run['create_app_ms'] for run in runs]),
+            'total_ms': summarize(totals),
+            'modules': runs[-1]['modules'],
+            'alembic_loaded': runs[-1]['alembic_loaded'],
+        }
+        print(f"{mode}: import p50={results[mode]['import_ms']['p50']}ms "
+              f"create_app p50={results[mode]['create_app_ms']['p50']}ms "
+              f"total p50={results[mode]['total_ms']['p50']}ms", file=sys.stderr)
+
+    _, stderr = run_child('lazy', workdir, importtime=True)
+    report = {
+        'meta': {
+            'started_at': datetime.utcnow().isoformat() + 'Z',
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'runs': args.runs,
+            'budget_ms': args.budget_ms,
+        },
+        'modes': results,
+        'slowest_imports': slowest_imports(stderr, args.top),
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    if output_path:
+        with open(output_path, 'w') as f:
+            f.write(output + '\n')
+    if args.budget_ms is not None and results['lazy']['total_ms']['p50'] > args.budget_ms:
+        print(f"lazy startup p50 {results['lazy']['total_ms']['p50']}ms is over the {args.budget_ms}ms budget",
+              file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,6 +1,10 @@
-from flask import Blueprint, request, jsonify, session
+import json
+from flask import Blueprint, Response, request, jsonify, session
 from models import db, AdminUser
 from utils import admin_required   # import the decorator
+from search import search, SEARCH_SOURCES
+from profiler import profiler, DEFAULT_INTERVAL_MS, DEFAULT_WINDOW_SECONDS, MAX_WINDOW_SECONDS
+from slow_queries import recorder as slow_queries
 
 admin_auth_bp = Blueprint('admin_auth', __name__)
 
@@ -52,4 +56,102 @@ def admin_logout():
     response = jsonify({"message": "Logged out successfully"})
     response.set_cookie('admin_session', '', expires=0, max_age=0)
     response.set_cookie('user_role', '', expires=0, max_age=0)
-    return response
\ No newline at end of file
+    return response
+
+@admin_auth_bp.route('/search', methods=['GET'])
+@admin_required
+def admin_search():
+    """Ranked full-text search over reports, messages and contact tickets"""
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"error": "Search query is required"}), 400
+
+    types = request.args.get('types')
+    entity_types = [t.strip() for t in types.split(',')] if types else list(SEARCH_SOURCES)
+    invalid = [t for t in entity_types if t not in SEARCH_SOURCES]
+    if invalid:
+        return jsonify({"error": f"Invalid search type: {', '.join(invalid)}"}), 400
+
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 20, type=int)
+
+    try:
+        return jsonify(search(query, entity_types, page=page, per_page=per_page)), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# ----------------- Profiler -----------------
+@admin_auth_bp.route('/profiler', methods=['GET'])
+@admin_required
+def list_profiles():
+    return jsonify({'sessions': [s.to_dict() for s in reversed(profiler.list())]}), 200
+
+@admin_auth_bp.route('/profiler', methods=['POST'])
+@admin_required
+def start_profile():
+    """Sample requests for a window; optionally only those matching ``route`` (glob over
+    'blueprint:/rule', endpoint or path) or carrying the returned X-Profile token"""
+    data = request.get_json(silent=True) or {}
+    try:
+        seconds = float(data.get('seconds', DEFAULT_WINDOW_SECONDS))
+        interval_ms = float(data.get('interval_ms', DEFAULT_INTERVAL_MS))
+        max_requests = int(data['max_requests']) if data.get('max_requests') else None
+    except (TypeError, ValueError):
+        return jsonify({"error": "seconds, interval_ms and max_requests must be numbers"}), 400
+    if not 0 < seconds <= MAX_WINDOW_SECONDS:
+        return jsonify({"error": f"seconds must be between 0 and {MAX_WINDOW_SECONDS}"}), 400
+
+    profile = profiler.start(route=data.get('route') or None, header=bool(data.get('header')),
+                             seconds=seconds, interval_ms=interval_ms, max_requests=max_requests)
+    result = profile.to_dict()
+    if profile.token:
+        result['token'] = profile.token
+    return jsonify(result), 201
+
+@admin_auth_bp.route('/profiler/<session_id>', methods=['GET'])
+@admin_required
+def get_profile(session_id):
+    """Session summary, or ?format=collapsed (flamegraph.pl / speedscope import) or ?format=speedscope"""
+    profile = profiler.get(session_id)
+    if not profile:
+        return jsonify({"error": "Profile not found"}), 404
+
+    output = request.args.get('format')
+    filename = f'profile-{profile.id}'
+    if output == 'collapsed':
+        return Response(profile.collapsed(), mimetype='text/plain',
+                        headers={'Content-Disposition': f'attachment; filename={filename}.txt'})
+    if output == 'speedscope':
+        return Response(json.dumps(profile.speedscope()), mimetype='application/json',
+                        headers={'Content-Disposition': f'attachment; filename={filename}.speedscope.json'})
+    if output:
+        return jsonify({"error": "format must be collapsed or speedscope"}), 400
+    return jsonify(profile.to_dict()), 200
+
+@admin_auth_bp.route('/profiler/<session_id>', methods=['DELETE'])
+@admin_required
+def stop_profile(session_id):
+    profile = profiler.stop(session_id)
+    if not profile:
+        return jsonify({"error": "Profile not found"}), 404
+    return jsonify(profile.to_dict()), 200
+
+# ----------------- Slow Queries -----------------
+@admin_auth_bp.route('/slow-queries', methods=['GET'])
+@admin_required
+def list_slow_queries():
+    """Recent statements over SLOW_QUERY_MS in this process, newest first, plus a per-statement summary"""
+    limit = request.args.get('limit', 50, type=int)
+    route = request.args.get('route') or None
+    threshold = slow_queries.threshold
+    return jsonify({
+        'threshold_ms': threshold * 1000 if threshold is not None else None,
+        'queries': slow_queries.recent(limit=limit, route=route),
+        'statements': slow_queries.summary(),
+    }), 200
+
+@admin_auth_bp.route('/slow-queries', methods=['DELETE'])
+@admin_required
+def clear_slow_queries():
+    slow_queries.clear()
+    return jsonify({"message": "Slow query log cleared"}), 200
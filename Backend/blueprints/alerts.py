@@ -1,11 +1,24 @@
-from flask import Blueprint, request, jsonify, session, current_app
+from flask import Blueprint, request, jsonify, session, current_app, g
 from datetime import datetime
 from models import Alert, User, db
 from utils import admin_required, login_required, notify_new_alert, send_alert_notification_email
+from response_cache import cached_response, response_cache
+from alert_feed import get_changes, next_expiry, prune_tombstones
+from alert_targeting import alert_recipients_query, alert_location_keys
+from sqlalchemy.orm import selectinload
+import time
 import uuid
 
 alerts_bp = Blueprint('alerts', __name__, url_prefix='/api/alerts')
 
+ALERT_FEED_CACHE = 'alerts'
+CLEANUP_INTERVAL = 30  # seconds between expired-alert sweeps per process
+_last_cleanup = 0.0
+
+def invalidate_alert_feeds():
+    """Drop cached /live and /resolved responses after any alert write"""
+    response_cache.invalidate(ALERT_FEED_CACHE)
+
 def parse_datetime_safe(dt_str):
     """Helper: safely parse ISO datetime, even without seconds."""
     try:
@@ -21,15 +34,28 @@ def cleanup_expired_alerts():
     """
     Automatically delete expired alerts before processing any request.
     Expired alerts are those with end_date in the past.
+    Runs at most once every CLEANUP_INTERVAL seconds per process; the live
+    feed filters on end_date itself, so nothing expired is ever served.
     """
+    global _last_cleanup
+    now = time.monotonic()
+    if now - _last_cleanup < current_app.config.get('ALERT_CLEANUP_INTERVAL', CLEANUP_INTERVAL):
+        return
+    _last_cleanup = now
     try:
         current_time = datetime.utcnow()
-        expired_count = Alert.query.filter(
+        # Deleted through the ORM so each expired alert leaves a tombstone for /changes
+        expired = Alert.query.filter(
             Alert.end_date.isnot(None),
             Alert.end_date <= current_time
-        ).delete()
+        ).all()
+        for alert in expired:
+            db.session.delete(alert)
+        expired_count = len(expired)
+        prune_tombstones(current_time)
         db.session.commit()
         if expired_count > 0:
+            invalidate_alert_feeds()
             current_app.logger.info(f"Cleaned up {expired_count} expired alerts")
     except Exception as e:
         db.session.rollback()
@@ -37,36 +63,84 @@ def cleanup_expired_alerts():
 
 # Frontend Routes
 @alerts_bp.route('/live', methods=['GET'])
+@cached_response(ALERT_FEED_CACHE)
 def get_live_alerts():
     """Get all active alerts (not resolved or expired)"""
     try:
         current_time = datetime.utcnow()
-        alerts = Alert.query.filter(
+        alerts = Alert.query.options(selectinload(Alert.creator)).filter(
             (Alert.status == 'Active') | (Alert.status == 'Critical'),
             (Alert.end_date == None) | (Alert.end_date > current_time)
         ).order_by(Alert.created_at.desc()).all()
+        
+        # Don't keep serving an alert from cache past its end_date
+        end_dates = [alert.end_date for alert in alerts if alert.end_date]
+        if end_dates:
+            g.response_cache_ttl = max((min(end_dates) - current_time).total_seconds(), 0)
         return jsonify({'alerts': [alert.to_dict() for alert in alerts]}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @alerts_bp.route('/resolved', methods=['GET'])
+@cached_response(ALERT_FEED_CACHE)
 def get_resolved_alerts():
     """Get all resolved alerts"""
     try:
-        alerts = Alert.query.filter(
+        alerts = Alert.query.options(selectinload(Alert.creator)).filter(
             Alert.status == 'Resolved'
         ).order_by(Alert.created_at.desc()).all()
         return jsonify({'alerts': [alert.to_dict() for alert in alerts]}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@alerts_bp.route('/changes', methods=['GET'])
+def get_alert_changes():
+    """Delta sync: alerts changed and removed since a feed version.
+
+    Poll with ?since=<version from the previous response>. The default
+    scope=public covers what /live and /resolved show, scope=live only live
+    alerts; alerts leaving the scope are reported as removals. scope=all also
+    returns inactive alerts and is admin only.
+    """
+    try:
+        since = int(request.args.get('since', 0))
+    except ValueError:
+        return jsonify({'error': 'since must be an integer version'}), 400
+    scope = request.args.get('scope', 'public')
+    if scope not in ('public', 'live', 'all'):
+        return jsonify({'error': 'scope must be public, live or all'}), 400
+    if scope == 'all':
+        # Checked before the shared cache so an admin's entry is never served to anyone else
+        return _get_all_alert_changes(since)
+    return _get_public_alert_changes(since, scope)
+
+@admin_required
+def _get_all_alert_changes(since):
+    try:
+        return jsonify(get_changes(since, 'all')), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@cached_response(ALERT_FEED_CACHE)
+def _get_public_alert_changes(since, scope):
+    try:
+        current_time = datetime.utcnow()
+        changes = get_changes(since, scope)
+        # Don't keep serving an alert from cache past its end_date
+        expires = next_expiry(scope, current_time)
+        if expires:
+            g.response_cache_ttl = max((expires - current_time).total_seconds(), 0)
+        return jsonify(changes), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 # Admin Routes
 @alerts_bp.route('/admin/alerts', methods=['GET'])
 @admin_required
 def get_all_alerts():
     try:
         status = request.args.get('status')
-        query = Alert.query.order_by(Alert.created_at.desc())
+        query = Alert.query.options(selectinload(Alert.creator)).order_by(Alert.created_at.desc())
         
         if status and status != 'All':
             query = query.filter_by(status=status)
@@ -105,6 +179,7 @@ def create_alert():
         
         db.session.add(alert)
         db.session.commit()
+        invalidate_alert_feeds()
         
         # Notify all users about the new alert (in-app notifications + emails)
         notify_new_alert(alert)
@@ -114,6 +189,23 @@ def create_alert():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@alerts_bp.route('/admin/alerts/recipients', methods=['GET'])
+@admin_required
+def preview_alert_recipients():
+    """How many users an alert for ?affected_area= would reach"""
+    try:
+        affected_area = request.args.get('affected_area')
+        keys = alert_location_keys(affected_area)
+        count = alert_recipients_query(Alert(affected_area=affected_area)).count()
+        return jsonify({
+            'affected_area': affected_area,
+            'broadcast': keys is None,
+            'location_keys': sorted(keys) if keys else [],
+            'recipients': count
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @alerts_bp.route('/admin/alerts/<alert_id>', methods=['GET'])
 @admin_required
 def get_alert(alert_id):
@@ -151,6 +243,7 @@ def update_alert(alert_id):
             alert.end_date = parse_datetime_safe(data['end_date']) if data['end_date'] else None
         
         db.session.commit()
+        invalidate_alert_feeds()
         
         # Notify users if alert status changed to Active or Critical
         if 'status' in data and data['status'] != old_status and data['status'] in ['Active', 'Critical']:
@@ -180,6 +273,7 @@ def update_alert_status(alert_id):
         old_status = alert.status  # Store old status    
         alert.status = new_status
         db.session.commit()
+        invalidate_alert_feeds()
         
         # Notify users if alert status changed to Active or Critical
         if new_status != old_status and new_status in ['Active', 'Critical']:
@@ -200,6 +294,7 @@ def delete_alert(alert_id):
             
         db.session.delete(alert)
         db.session.commit()
+        invalidate_alert_feeds()
         return jsonify({'message': 'Alert deleted successfully'}), 200
     except Exception as e:
         db.session.rollback()
@@ -244,6 +244,7 @@ def profile():
             "language": user.language,
             "timeZone": user.time_zone,
             "theme": user.theme,
+            "alertsAllAreas": user.alert_all_areas,
         }), 200
 
     if request.method == 'PUT':
@@ -265,6 +266,8 @@ def profile():
             user.language = data.get('language', user.language)
             user.time_zone = data.get('timeZone', user.time_zone)
             user.theme = data.get('theme', user.theme)
+            if 'alertsAllAreas' in data:
+                user.alert_all_areas = bool(data['alertsAllAreas'])
 
             if 'password' in data and data['password']:
                 if 'currentPassword' not in data or not data['currentPassword']:
@@ -1,9 +1,12 @@
 from flask import Blueprint, request, jsonify, current_app
-from extensions import db, mail
+from extensions import db
 from models import ContactMessage, User, Notification, NotificationType
 from datetime import datetime
 import uuid
 from flask_mail import Message
+from utils import admin_required
+from mail_transport import send_flask_message
+from exports import stream_export, export_columns, EXPORT_FORMATS
 import os
 
 contact_bp = Blueprint('contact', __name__)
@@ -17,7 +20,7 @@ def send_email_notification(to_email, subject, html_content):
             recipients=[to_email],
             html=html_content
         )
-        mail.send(msg)
+        send_flask_message(msg)
         current_app.logger.info(f"Email sent to {to_email}: {subject}")
         return True
     except Exception as e:
@@ -106,6 +109,30 @@ def get_contact_messages():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@contact_bp.route('/messages/export', methods=['GET'])
+@admin_required
+def export_contact_messages():
+    """Stream contact tickets as CSV or NDJSON"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    
+    columns, fieldnames = export_columns(ContactMessage, [
+        'id', 'ticket_number', 'name', 'email', 'subject', 'message', 'status', 'priority',
+        'user_id', 'assigned_admin_id', 'response', 'response_date', 'response_admin_id',
+        'reopen_count', 'reopen_notes', 'created_at', 'updated_at'
+    ])
+    query = db.session.query(*columns).order_by(ContactMessage.created_at.desc())
+    
+    status = request.args.get('status')
+    if status and status != 'All':
+        query = query.filter(ContactMessage.status == status)
+    priority = request.args.get('priority')
+    if priority and priority != 'All':
+        query = query.filter(ContactMessage.priority == priority)
+    
+    return stream_export(query, fieldnames, fmt, 'contact-tickets')
+
 @contact_bp.route('/messages/<int:message_id>', methods=['GET'])
 def get_contact_message(message_id):
     try:
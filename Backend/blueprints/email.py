@@ -1,7 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_mail import Message
-from extensions import mail
+from mail_transport import get_mail_service, send_flask_message
 from models import db, SentEmail
+from utils import admin_required
+from delivery_log import STATUSES, list_deliveries, delivery_summary, redrive
 
 email_bp = Blueprint("email", __name__)
 
@@ -19,7 +21,7 @@ def send_email():
     try:
         msg = Message(subject, recipients=[recipient])
         msg.body = message
-        mail.send(msg)
+        send_flask_message(msg)
 
         email_record = SentEmail(
             recipient=recipient,
@@ -35,3 +37,68 @@ def send_email():
         import traceback
         traceback.print_exc()  # log full error to terminal
         return jsonify({"error": f"Email send failed: {str(e)}"}), 500
+
+
+# ----------------- Delivery Log (admin) -----------------
+@email_bp.route("/deliveries", methods=["GET"])
+@admin_required
+def get_deliveries():
+    """Delivery log, newest first; filter by status (comma-separated), category, recipient or related item"""
+    statuses = [s for s in request.args.get('status', '').split(',') if s]
+    unknown = set(statuses) - set(STATUSES)
+    if unknown:
+        return jsonify({"error": f"Unknown status: {', '.join(sorted(unknown))}"}), 400
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 50, type=int), 200)
+
+    deliveries = list_deliveries(
+        status=statuses,
+        category=request.args.get('category'),
+        recipient=request.args.get('recipient'),
+        related_type=request.args.get('related_type'),
+        related_id=request.args.get('related_id'),
+        page=page,
+        per_page=per_page
+    )
+    return jsonify({
+        'deliveries': [d.to_dict() for d in deliveries.items],
+        'total': deliveries.total,
+        'pages': deliveries.pages,
+        'current_page': page
+    })
+
+
+@email_bp.route("/deliveries/summary", methods=["GET"])
+@admin_required
+def get_delivery_summary():
+    summary = delivery_summary(
+        category=request.args.get('category'),
+        related_type=request.args.get('related_type'),
+        related_id=request.args.get('related_id')
+    )
+    # Token levels and per-priority grants/limits in this worker process
+    summary['governor'] = get_mail_service().governor.snapshot()
+    return jsonify(summary)
+
+
+@email_bp.route("/deliveries/redrive", methods=["POST"])
+@admin_required
+def redrive_deliveries():
+    """Re-send failed deliveries in bulk, e.g. {"related_type": "alert", "related_id": "12"}"""
+    data = request.get_json() or {}
+    try:
+        result = redrive(
+            ids=data.get('ids'),
+            statuses=data.get('statuses', ['failed']),
+            category=data.get('category'),
+            related_type=data.get('related_type'),
+            related_id=data.get('related_id'),
+            limit=int(data.get('limit', 5000)),
+            send_now=bool(data.get('send_now', True))
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+    return jsonify(result)
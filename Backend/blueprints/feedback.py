@@ -1,6 +1,8 @@
 from flask import Blueprint, request, jsonify, session
 from extensions import db
 from models import Feedback, AdminUser
+from utils import admin_required
+from exports import stream_export, export_columns, EXPORT_FORMATS
 from datetime import datetime, timedelta
 import uuid
 
@@ -70,6 +72,23 @@ def get_all_feedback():
     except Exception as e:
         return jsonify({'error': 'Failed to retrieve feedback.'}), 500
 
+# Stream all feedback as CSV/NDJSON (admin only)
+@feedback_bp.route('/export', methods=['GET'])
+@admin_required
+def export_feedback():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    
+    columns, fieldnames = export_columns(Feedback, ['id', 'name', 'email', 'rating', 'message', 'created_at'])
+    query = db.session.query(*columns).order_by(Feedback.created_at.desc())
+    
+    min_rating = request.args.get('min_rating', type=int)
+    if min_rating:
+        query = query.filter(Feedback.rating >= min_rating)
+    
+    return stream_export(query, fieldnames, fmt, 'feedback')
+
 # Approve feedback
 @feedback_bp.route('/<feedback_id>/approve', methods=['PATCH'])
 def approve_feedback(feedback_id):
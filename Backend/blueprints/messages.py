@@ -3,6 +3,7 @@ from models import db, Message, User, Notification, NotificationType, SentEmail
 from datetime import datetime
 import uuid
 from utils import admin_required, send_message_confirmation_email, send_admin_reply_email, get_current_user_id, is_admin
+from exports import stream_export, export_columns, EXPORT_FORMATS
 
 messages_bp = Blueprint('messages', __name__)
 
@@ -35,6 +36,30 @@ def get_messages():
         'current_page': page
     })
 
+# Stream all messages as CSV/NDJSON (admin only)
+@messages_bp.route('/messages/export', methods=['GET'])
+@admin_required
+def export_messages():
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'error': f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+
+    columns, fieldnames = export_columns(Message, [
+        'id', 'email', 'title', 'message', 'status', 'priority', 'user_id',
+        'assigned_admin_id', 'response', 'response_date', 'response_admin_id',
+        'created_at', 'updated_at'
+    ])
+    query = db.session.query(*columns).order_by(Message.created_at.desc())
+
+    status = request.args.get('status')
+    priority = request.args.get('priority')
+    if status:
+        query = query.filter(Message.status == status)
+    if priority:
+        query = query.filter(Message.priority == priority)
+
+    return stream_export(query, fieldnames, fmt, 'messages')
+
 # Get single message (admin or message owner)
 @messages_bp.route('/messages/<message_id>', methods=['GET'])
 def get_message(message_id):
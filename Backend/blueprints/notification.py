@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
-from models import db, Notification, NotificationType
+from models import db, Notification, NotificationType, DigestItem
+from digests import list_preferences, update_preferences, FREQUENCIES
 from utils import (
     login_required,
     admin_required,
@@ -48,26 +49,21 @@ def get_notifications():
 def get_notification_stats():
     user_id = get_current_user_id()
     
+    by_type = dict(
+        db.session.query(Notification.type, db.func.count(Notification.id))
+        .filter_by(user_id=user_id).group_by(Notification.type).all()
+    )
+
     stats = {
-        'total': Notification.query.filter_by(user_id=user_id).count(),
+        'total': sum(by_type.values()),
         'unread': get_unread_count(user_id),
         'urgent': Notification.query.filter_by(user_id=user_id, is_urgent=True, is_read=False).count(),
         'by_type': {
-            'report_status_update': Notification.query.filter_by(
-                user_id=user_id, type=NotificationType.REPORT_STATUS_UPDATE
-            ).count(),
-            'admin_alert': Notification.query.filter_by(
-                user_id=user_id, type=NotificationType.ADMIN_ALERT
-            ).count(),
-            'new_report': Notification.query.filter_by(
-                user_id=user_id, type=NotificationType.NEW_REPORT
-            ).count(),
-            'new_message': Notification.query.filter_by(
-                user_id=user_id, type=NotificationType.NEW_MESSAGE
-            ).count(),
-            'emergency': Notification.query.filter_by(
-                user_id=user_id, type=NotificationType.EMERGENCY
-            ).count()
+            'report_status_update': by_type.get(NotificationType.REPORT_STATUS_UPDATE, 0),
+            'admin_alert': by_type.get(NotificationType.ADMIN_ALERT, 0),
+            'new_report': by_type.get(NotificationType.NEW_REPORT, 0),
+            'new_message': by_type.get(NotificationType.NEW_MESSAGE, 0),
+            'emergency': by_type.get(NotificationType.EMERGENCY, 0)
         }
     }
     
@@ -137,6 +133,40 @@ def delete_all_read():
     return jsonify({'message': 'All read notifications deleted'})
 
 
+# Get notification channel preferences
+@notifications_bp.route('/preferences', methods=['GET'])
+@login_required
+def get_preferences():
+    user_id = get_current_user_id()
+    return jsonify({'preferences': list_preferences(user_id), 'frequencies': list(FREQUENCIES)})
+
+
+# Update notification channel preferences
+@notifications_bp.route('/preferences', methods=['PUT'])
+@login_required
+def update_preferences_route():
+    user_id = get_current_user_id()
+    data = request.get_json() or {}
+    changes = data.get('preferences')
+    if not isinstance(changes, list):
+        return jsonify({'error': 'preferences must be a list'}), 400
+    try:
+        update_preferences(user_id, changes)
+    except ValueError as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'preferences': list_preferences(user_id)})
+
+
+# Get events waiting for the next digest email
+@notifications_bp.route('/digest/pending', methods=['GET'])
+@login_required
+def get_pending_digest():
+    user_id = get_current_user_id()
+    items = DigestItem.query.filter_by(user_id=user_id, sent_at=None).order_by(DigestItem.created_at).all()
+    return jsonify({'items': [item.to_dict() for item in items]})
+
+
 # ---------------- ADMIN ROUTES ---------------- #
 
 # Get ALL system notifications (admin only)
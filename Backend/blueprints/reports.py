@@ -1,7 +1,18 @@
 from flask import Blueprint, request, jsonify, session, current_app
 from datetime import datetime
-from models import Report, ReportMedia, User, db
+from models import Report, ReportMedia, ReportMediaDerivative, User, Area, db
 from utils import admin_required, login_required, notify_new_report, notify_report_status_update, send_report_confirmation_email, send_admin_report_notification
+from utils import notify_bulk_reports_imported, notify_report_status_digest, send_report_confirmation_digest_email, send_report_status_digest_email
+from media import enqueue_derivatives, derive_media, get_upload_dir
+from metrics import record_upload
+from locations import parse_coordinates, get_hotspots, BUCKETS
+from rollups import query_rollups, default_range, GRANULARITIES, DIMENSIONS
+from exports import stream_export, export_columns, EXPORT_FORMATS
+from report_query import apply_filters, list_reports
+from sqlalchemy.orm import aliased
+from sqlalchemy.orm import selectinload
+import click
+import time
 import uuid
 import os
 from werkzeug.utils import secure_filename
@@ -45,7 +56,7 @@ def upload_media():
             return jsonify({"error": "No selected files"}), 400
         
         media_urls = []
-        upload_dir = os.path.join(current_app.root_path, 'uploads')
+        upload_dir = get_upload_dir()
         os.makedirs(upload_dir, exist_ok=True)
         
         for file in files:
@@ -67,7 +78,9 @@ def upload_media():
             filepath = os.path.join(upload_dir, unique_filename)
             
             # Save file
+            started = time.perf_counter()
             file.save(filepath)
+            record_upload('upload_media', file_size, time.perf_counter() - started)
             
             # Determine file type
             file_type = get_file_type(filename)
@@ -87,6 +100,79 @@ def upload_media():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+REQUIRED_REPORT_FIELDS = ['report_type', 'title', 'description', 'area', 'ward']
+REPORT_STATUSES = ['Pending', 'In Progress', 'Resolved', 'Rejected', 'Closed']
+BULK_CHUNK_SIZE = 200
+MAX_BULK_REPORTS = 5000
+
+def parse_user_id(value):
+    """User ids arrive as ints or numeric strings ("5") in JSON payloads; None if neither"""
+    if isinstance(value, bool):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def build_report(data, user_id, latitude=None, longitude=None):
+    """Build (but don't add or commit) a Report and its ReportMedia rows from a request payload"""
+    report = Report(
+        id=str(uuid.uuid4()),
+        user_id=user_id,
+        report_type=data['report_type'],
+        title=data['title'],
+        description=data['description'],
+        date=datetime.fromisoformat(data.get('date', datetime.utcnow().isoformat())),
+        time=datetime.fromisoformat(data.get('time', datetime.utcnow().isoformat())),
+        urgency=data.get('urgency', 'medium'),
+        
+        # Garissa County Location Fields
+        area=data['area'],
+        ward=data['ward'],
+        landmark=data.get('landmark'),
+        location_type=data.get('location_type', 'public'),
+        location_details=data.get('location_details'),
+        latitude=latitude,
+        longitude=longitude,
+        
+        # Personal Information
+        anonymous=data.get('anonymous', False),
+        full_name=data.get('full_name'),
+        email=data.get('email'),
+        phone=data.get('phone'),
+        address=data.get('address'),
+        
+        # Incident Details
+        witnesses=data.get('witnesses', False),
+        witness_details=data.get('witness_details'),
+        evidence_available=data.get('evidence_available', False),
+        evidence_details=data.get('evidence_details'),
+        police_involved=data.get('police_involved', False),
+        police_details=data.get('police_details'),
+        
+        # Additional Information
+        category=data.get('category'),
+        subcategory=data.get('subcategory'),
+        tags=data.get('tags', []),
+        custom_fields=data.get('custom_fields', {})
+    )
+    
+    # Handle media if provided in the request
+    media_urls = data.get('media', [])
+    media_items = []
+    for media_info in media_urls:
+        media = ReportMedia(
+            id=str(uuid.uuid4()),
+            report_id=report.id,
+            url=media_info['url'],
+            type=media_info.get('type', 'unknown'),
+            name=media_info.get('name', ''),
+            size=media_info.get('size', 0)
+        )
+        media_items.append(media)
+    
+    return report, media_items
+
 # User Routes
 @reports_bp.route('/', methods=['POST'])
 @login_required
@@ -100,66 +186,26 @@ def create_report():
     if not all(field in data for field in required_fields):
         return jsonify({"error": "Missing required fields"}), 400
     
+    try:
+        latitude, longitude = parse_coordinates(data)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
     try:
         user = User.query.get(session['user_id'])
         if not user:
             return jsonify({"error": "User not found"}), 404
             
-        report = Report(
-            id=str(uuid.uuid4()),
-            user_id=session['user_id'],
-            report_type=data['report_type'],
-            title=data['title'],
-            description=data['description'],
-            date=datetime.fromisoformat(data.get('date', datetime.utcnow().isoformat())),
-            time=datetime.fromisoformat(data.get('time', datetime.utcnow().isoformat())),
-            urgency=data.get('urgency', 'medium'),
-            
-            # Garissa County Location Fields
-            area=data['area'],
-            ward=data['ward'],
-            landmark=data.get('landmark'),
-            location_type=data.get('location_type', 'public'),
-            location_details=data.get('location_details'),
-            
-            # Personal Information
-            anonymous=data.get('anonymous', False),
-            full_name=data.get('full_name'),
-            email=data.get('email'),
-            phone=data.get('phone'),
-            address=data.get('address'),
-            
-            # Incident Details
-            witnesses=data.get('witnesses', False),
-            witness_details=data.get('witness_details'),
-            evidence_available=data.get('evidence_available', False),
-            evidence_details=data.get('evidence_details'),
-            police_involved=data.get('police_involved', False),
-            police_details=data.get('police_details'),
-            
-            # Additional Information
-            category=data.get('category'),
-            subcategory=data.get('subcategory'),
-            tags=data.get('tags', []),
-            custom_fields=data.get('custom_fields', {})
-        )
-        
-        # Handle media if provided in the request
-        media_urls = data.get('media', [])
-        for media_info in media_urls:
-            media = ReportMedia(
-                id=str(uuid.uuid4()),
-                report_id=report.id,
-                url=media_info['url'],
-                type=media_info.get('type', 'unknown'),
-                name=media_info.get('name', ''),
-                size=media_info.get('size', 0)
-            )
-            db.session.add(media)
+        report, media_items = build_report(data, session['user_id'], latitude, longitude)
+        media_ids = [media.id for media in media_items]
         
         db.session.add(report)
+        db.session.add_all(media_items)
         db.session.commit()
         
+        # Generate thumbnails / poster frames in the background
+        enqueue_derivatives(media_ids)
+        
         # Notify admins about new report
         notify_new_report(report)
         
@@ -186,8 +232,9 @@ def get_user_reports():
         return jsonify({"error": "Not authenticated"}), 401
         
     try:
-        reports = Report.query.filter_by(user_id=session['user_id']).order_by(Report.created_at.desc()).all()
-        return jsonify({'reports': [report.to_dict() for report in reports]}), 200
+        return jsonify(list_reports(request.args, Report.user_id == session['user_id'])), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -239,6 +286,12 @@ def update_user_report(report_id):
             'tags', 'custom_fields', 'report_type'
         ]
         
+        if 'latitude' in data or 'longitude' in data:
+            try:
+                report.latitude, report.longitude = parse_coordinates(data)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+        
         for field in allowed_fields:
             if field in data:
                 # Handle date field specially if needed
@@ -264,26 +317,44 @@ def update_user_report(report_id):
 @admin_required
 def get_all_reports():
     try:
-        status = request.args.get('status')
-        area = request.args.get('area')
-        urgency = request.args.get('urgency')
-        
-        query = Report.query.order_by(Report.created_at.desc())
-        
-        if status and status != 'All':
-            query = query.filter_by(status=status)
-        
-        if area and area != 'All':
-            query = query.filter_by(area=area)
-            
-        if urgency and urgency != 'All':
-            query = query.filter_by(urgency=urgency)
-        
-        reports = query.all()
-        return jsonify({'reports': [report.to_dict() for report in reports]}), 200
+        return jsonify(list_reports(request.args)), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+REPORT_EXPORT_FIELDS = [
+    'id', 'report_type', 'title', 'description', 'status', 'urgency', 'date', 'time',
+    'area', 'ward', 'landmark', 'location_type', 'location_details', 'latitude', 'longitude',
+    'anonymous', 'full_name', 'email', 'phone', 'address',
+    'witnesses', 'witness_details', 'evidence_available', 'evidence_details',
+    'police_involved', 'police_details', 'category', 'subcategory', 'tags',
+    'admin_notes', 'user_id', 'admin_id', 'created_at', 'updated_at'
+]
+
+@reports_bp.route('/admin/reports/export', methods=['GET'])
+@admin_required
+def export_reports():
+    """Stream all reports (same filters as get_all_reports) as CSV or NDJSON"""
+    fmt = request.args.get('format', 'csv')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"format must be one of {', '.join(EXPORT_FORMATS)}"}), 400
+    
+    author = aliased(User)
+    admin_user = aliased(User)
+    columns, fieldnames = export_columns(Report, REPORT_EXPORT_FIELDS)
+    query = db.session.query(
+        *columns, author.email, admin_user.email
+    ).outerjoin(author, Report.user_id == author.id)\
+     .outerjoin(admin_user, Report.admin_id == admin_user.id)\
+     .order_by(Report.created_at.desc())
+    try:
+        query = apply_filters(query, request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return stream_export(query, fieldnames + ['author_email', 'admin_email'], fmt, 'reports')
+
 @reports_bp.route('/admin/reports/<report_id>', methods=['GET'])
 @admin_required
 def get_admin_report(report_id):
@@ -330,6 +401,13 @@ def update_report(report_id):
             if field in data:
                 setattr(report, field, data[field])
         
+        if 'latitude' in data or 'longitude' in data:
+            try:
+                report.latitude, report.longitude = parse_coordinates(data)
+            except ValueError as e:
+                db.session.rollback()
+                return jsonify({"error": str(e)}), 400
+        
         report.updated_at = datetime.utcnow()
         db.session.commit()
         
@@ -387,6 +465,169 @@ def update_report_status(report_id):
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
+# Bulk Routes
+@reports_bp.route('/admin/reports/bulk', methods=['POST'])
+@admin_required
+def bulk_import_reports():
+    """Validate and insert a batch of reports in chunks.
+
+    Body: {"reports": [...], "source": "Partner name", "notify_reporters": true}
+    Each item takes the same fields as POST / plus the user_id of the reporter.
+    Invalid items are skipped and reported by index.
+    """
+    data = request.get_json() or {}
+    items = data.get('reports')
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "reports must be a non-empty list"}), 400
+    if len(items) > MAX_BULK_REPORTS:
+        return jsonify({"error": f"At most {MAX_BULK_REPORTS} reports per request"}), 400
+
+    requested_users = {parse_user_id(item.get('user_id')) for item in items if isinstance(item, dict)}
+    requested_users.discard(None)
+    known_users = {u.id for u in User.query.filter(User.id.in_(requested_users)).all()} if requested_users else set()
+
+    errors = []
+    valid = []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": index, "error": "Report must be an object"})
+            continue
+        missing = [field for field in REQUIRED_REPORT_FIELDS if not item.get(field)]
+        if missing:
+            errors.append({"index": index, "error": f"Missing required fields: {', '.join(missing)}"})
+            continue
+        user_id = parse_user_id(item.get('user_id'))
+        if user_id not in known_users:
+            errors.append({"index": index, "error": "User not found"})
+            continue
+        try:
+            latitude, longitude = parse_coordinates(item)
+            report, media_items = build_report(item, user_id, latitude, longitude)
+        except (ValueError, TypeError, KeyError) as e:
+            errors.append({"index": index, "error": str(e)})
+            continue
+        valid.append((report, media_items))
+
+    created_ids = []
+    media_ids = []
+    failure = None
+    try:
+        for start in range(0, len(valid), BULK_CHUNK_SIZE):
+            chunk = valid[start:start + BULK_CHUNK_SIZE]
+            # Read before the commit expires them
+            chunk_ids = [report.id for report, _ in chunk]
+            chunk_media_ids = [media.id for _, media_items in chunk for media in media_items]
+            for report, media_items in chunk:
+                db.session.add(report)
+                db.session.add_all(media_items)
+            db.session.commit()
+            created_ids.extend(chunk_ids)
+            media_ids.extend(chunk_media_ids)
+    except Exception as e:
+        db.session.rollback()
+        failure = str(e)
+
+    # Chunks committed before a failure stay imported, so they are still
+    # derived and announced; the 500 below only covers the rest.
+    # One query reloads them all instead of one refresh per expired report.
+    created = Report.query.filter(Report.id.in_(created_ids)).all() if created_ids else []
+    enqueue_derivatives(media_ids)
+
+    # One admin notification for the whole batch, one digest email per reporter
+    notify_bulk_reports_imported(created, source=data.get('source'))
+    if data.get('notify_reporters', True):
+        by_user = {}
+        for report in created:
+            by_user.setdefault(report.user_id, []).append(report)
+        for user in User.query.filter(User.id.in_(list(by_user))).all() if by_user else []:
+            send_report_confirmation_digest_email(
+                user_email=user.email,
+                user_name=f"{user.first_name} {user.last_name}",
+                reports=by_user[user.id]
+            )
+
+    if failure:
+        return jsonify({"error": failure, "created": created_ids, "errors": errors}), 500
+
+    status_code = 201 if created else 400
+    return jsonify({
+        "created": created_ids,
+        "created_count": len(created_ids),
+        "errors": errors
+    }), status_code
+
+@reports_bp.route('/admin/reports/status', methods=['PATCH'])
+@admin_required
+def bulk_update_report_status():
+    """Apply one status to many reports in a single transaction.
+
+    Body: {"report_ids": [...], "status": "Resolved"}
+    Each affected user gets one notification and one email covering all their reports,
+    sent after the status changes are committed.
+    """
+    data = request.get_json() or {}
+    report_ids = data.get('report_ids')
+    new_status = data.get('status')
+    if not isinstance(report_ids, list) or not report_ids:
+        return jsonify({"error": "report_ids must be a non-empty list"}), 400
+    if len(report_ids) > MAX_BULK_REPORTS:
+        return jsonify({"error": f"At most {MAX_BULK_REPORTS} reports per request"}), 400
+    if new_status not in REPORT_STATUSES:
+        return jsonify({"error": "Invalid status"}), 400
+    invalid = [index for index, report_id in enumerate(report_ids)
+               if not isinstance(report_id, str) or not report_id.strip()]
+    if invalid:
+        return jsonify({"error": "report_ids must be report id strings", "invalid": invalid}), 400
+
+    try:
+        reports = Report.query.filter(Report.id.in_(report_ids)).all()
+        found = {report.id for report in reports}
+        now = datetime.utcnow()
+        changes_by_user = {}
+        unchanged = []
+        for report in reports:
+            if report.status == new_status:
+                unchanged.append(report.id)
+                continue
+            changes_by_user.setdefault(report.user_id, []).append({
+                "report_id": report.id,
+                "title": report.title,
+                "old_status": report.status,
+                "new_status": new_status
+            })
+            report.status = new_status
+            report.admin_id = session.get('user_id')
+            report.updated_at = now
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+    # Only once the new statuses are committed; users on hourly/daily digests
+    # get the changes in their next digest instead of an email now
+    try:
+        email_now = [user_id for user_id, changes in changes_by_user.items()
+                     if notify_report_status_digest(user_id, changes)]
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        email_now = []
+        current_app.logger.error(f"Status change notifications failed: {str(e)}")
+
+    users = User.query.filter(User.id.in_(email_now)).all() if email_now else []
+    for user in users:
+        send_report_status_digest_email(
+            user_email=user.email,
+            user_name=f"{user.first_name} {user.last_name}",
+            changes=changes_by_user[user.id]
+        )
+
+    return jsonify({
+        "updated": [c["report_id"] for changes in changes_by_user.values() for c in changes],
+        "unchanged": unchanged,
+        "not_found": [report_id for report_id in report_ids if report_id not in found]
+    }), 200
+
 # Media Upload Route
 @reports_bp.route('/<report_id>/media', methods=['POST'])
 @login_required
@@ -413,9 +654,12 @@ def upload_media_to_report(report_id):
         
         # In a real app, you would upload to S3 or similar
         filename = secure_filename(file.filename)
-        filepath = os.path.join('uploads', filename)
-        os.makedirs('uploads', exist_ok=True)
+        upload_dir = get_upload_dir()
+        filepath = os.path.join(upload_dir, filename)
+        os.makedirs(upload_dir, exist_ok=True)
+        started = time.perf_counter()
         file.save(filepath)
+        record_upload('upload_media_to_report', os.path.getsize(filepath), time.perf_counter() - started)
         
         media = ReportMedia(
             id=str(uuid.uuid4()),
@@ -429,6 +673,8 @@ def upload_media_to_report(report_id):
         db.session.add(media)
         db.session.commit()
         
+        enqueue_derivatives([media.id])
+        
         return jsonify(media.to_dict()), 201
     except Exception as e:
         db.session.rollback()
@@ -439,8 +685,138 @@ def upload_media_to_report(report_id):
 @admin_required
 def get_report_areas():
     try:
-        areas = db.session.query(Report.area).distinct().all()
+        # The report filter matches Report.area, so list the values reports actually carry
+        areas = db.session.query(Report.area).distinct().order_by(Report.area).all()
         area_list = [area[0] for area in areas if area[0]]
         return jsonify({'areas': area_list}), 200
     except Exception as e:
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+# Media derivatives (thumbnails / video posters)
+@reports_bp.route('/admin/media/<media_id>/derivatives', methods=['GET'])
+@admin_required
+def get_media_derivatives(media_id):
+    try:
+        media = ReportMedia.query.get(media_id)
+        if not media:
+            return jsonify({"error": "Media not found"}), 404
+        return jsonify({'derivatives': [d.to_dict() for d in media.derivatives]}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@reports_bp.route('/admin/media/<media_id>/derivatives', methods=['POST'])
+@admin_required
+def regenerate_media_derivatives(media_id):
+    try:
+        media = ReportMedia.query.get(media_id)
+        if not media:
+            return jsonify({"error": "Media not found"}), 404
+        
+        ReportMediaDerivative.query.filter_by(media_id=media.id).delete()
+        db.session.commit()
+        
+        derivatives = derive_media(media.id)
+        return jsonify({'derivatives': [d.to_dict() for d in derivatives]}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+# Normalized Garissa County areas and wards
+@reports_bp.route('/locations', methods=['GET'])
+@login_required
+def get_locations():
+    try:
+        areas = Area.query.options(selectinload(Area.wards)).order_by(Area.name).all()
+        return jsonify({'areas': [area.to_dict(include_wards=True) for area in areas]}), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Incident hotspots (served from the report_hotspots aggregate table)
+@reports_bp.route('/admin/hotspots', methods=['GET'])
+@admin_required
+def get_report_hotspots():
+    try:
+        bucket = request.args.get('bucket', 'day')
+        if bucket not in BUCKETS:
+            return jsonify({"error": f"bucket must be one of {', '.join(BUCKETS)}"}), 400
+        
+        group_by = [g.strip() for g in request.args.get('group_by', 'ward').split(',') if g.strip()]
+        invalid = [g for g in group_by if g not in ('area', 'ward', 'report_type', 'bucket', 'cell')]
+        if invalid:
+            return jsonify({"error": f"Invalid group_by: {', '.join(invalid)}"}), 400
+        
+        start = request.args.get('start')
+        end = request.args.get('end')
+        start = datetime.fromisoformat(start).date() if start else None
+        end = datetime.fromisoformat(end).date() if end else None
+        
+        bbox = request.args.get('bbox')  # min_lat,min_lon,max_lat,max_lon
+        if bbox:
+            bbox = tuple(float(v) for v in bbox.split(','))
+            if len(bbox) != 4:
+                return jsonify({"error": "bbox must be min_lat,min_lon,max_lat,max_lon"}), 400
+        
+        hotspots = get_hotspots(
+            start=start, end=end, bucket=bucket, group_by=tuple(group_by),
+            area_id=request.args.get('area_id', type=int),
+            ward_id=request.args.get('ward_id', type=int),
+            report_type=request.args.get('report_type'),
+            bbox=bbox
+        )
+        return jsonify({'hotspots': hotspots, 'bucket': bucket, 'group_by': group_by}), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+# Report trend analytics (served from the report_rollups aggregate table)
+@reports_bp.route('/admin/analytics', methods=['GET'])
+@admin_required
+def get_report_analytics():
+    try:
+        granularity = request.args.get('granularity', 'day')
+        if granularity not in GRANULARITIES:
+            return jsonify({"error": f"granularity must be one of {', '.join(GRANULARITIES)}"}), 400
+        
+        group_by = [g.strip() for g in request.args.get('group_by', '').split(',') if g.strip()]
+        invalid = [g for g in group_by if g not in DIMENSIONS]
+        if invalid:
+            return jsonify({"error": f"Invalid group_by: {', '.join(invalid)}"}), 400
+        
+        start, end = default_range(granularity)
+        if request.args.get('start'):
+            start = datetime.fromisoformat(request.args['start'])
+        if request.args.get('end'):
+            end = datetime.fromisoformat(request.args['end'])
+        
+        # Filters accept comma-separated values, e.g. status=Pending,In Progress
+        filters = {}
+        for dimension in DIMENSIONS:
+            arg = f'{dimension}_id' if dimension in ('area', 'ward') else dimension
+            value = request.args.get(arg)
+            if value and value != 'All':
+                values = [v.strip() for v in value.split(',') if v.strip()]
+                filters[dimension] = [int(v) for v in values] if arg.endswith('_id') else values
+        
+        series = request.args.get('series', 'true').lower() == 'true'
+        data = query_rollups(start, end, granularity=granularity, group_by=group_by,
+                             filters=filters, series=series)
+        return jsonify({
+            'granularity': granularity,
+            'start': start.isoformat(),
+            'end': end.isoformat(),
+            'group_by': group_by,
+            'data': data
+        }), 200
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@reports_bp.cli.command('derive-media')
+@click.option('--limit', type=int, default=None, help='Maximum number of media items to process')
+def derive_media_command(limit):
+    """Generate missing thumbnails and poster frames for report media."""
+    from media import derive_missing
+    processed = derive_missing(limit=limit)
+    click.echo(f"Processed {processed} media items.")
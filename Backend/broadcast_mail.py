@@ -0,0 +1,147 @@
+import html
+import smtplib
+import uuid
+from functools import partial
+from email import quoprimime
+from email.header import Header
+from email_templates import bind_email
+from mail_transport import RateLimited, is_transient
+
+# ----------------- Broadcast Mail Settings -----------------
+# A broadcast is encoded once: headers, MIME boundaries and the quoted-printable
+# body are built up front as bytes, with gaps left for the per-recipient fields.
+# Each recipient costs a join over that list plus encoding a few short values.
+# Every encoded piece ends on a soft line break ("=\r\n"), which decodes to
+# nothing, so independently encoded chunks can be concatenated safely.
+CRLF = '\r\n'
+BATCH_SIZE = 50                     # envelope recipients per message in batch mode
+UNDISCLOSED_RECIPIENTS = 'undisclosed-recipients:;'
+# Headers are written as ASCII and the relay is not asked for SMTPUTF8
+UNENCODABLE_ADDRESS = 'Address cannot be encoded as ASCII'
+
+
+def _qp(text):
+    """Quoted-printable encode one chunk of UTF-8 text for concatenation"""
+    if not text:
+        return b''
+    encoded = quoprimime.body_encode(text.encode('utf-8').decode('latin-1'), eol=CRLF)
+    if not encoded.endswith(CRLF):
+        encoded += '=' + CRLF
+    return encoded.encode('ascii')
+
+
+def _encode_parts(parts):
+    """Encode literal chunks now; slots stay as (name, needs_escape)"""
+    return [_qp(part) if part.__class__ is str else part for part in parts]
+
+
+class BroadcastMessage:
+    """A multipart/alternative email whose shared body is encoded only once.
+
+    ``rendered`` is the result of ``bind_email``: a subject plus html/text lists
+    of literal chunks and per-recipient slots. ``as_bytes`` stamps in the To
+    header and the recipient's fields; nothing else is re-encoded.
+    """
+
+    def __init__(self, rendered, sender):
+        boundary = f"==============={uuid.uuid4().hex}=="
+        self.subject = rendered.subject
+        self.head = CRLF.join([
+            f"Subject: {Header(rendered.subject, 'utf-8').encode()}",
+            f"From: {sender}",
+            "To: ",
+        ]).encode('ascii')
+        self.chunks = [CRLF.join([
+            '',
+            'MIME-Version: 1.0',
+            f'Content-Type: multipart/alternative; boundary="{boundary}"',
+            '',
+            f'--{boundary}',
+            'Content-Type: text/plain; charset="utf-8"',
+            'Content-Transfer-Encoding: quoted-printable',
+            '', '',
+        ]).encode('ascii')]
+        self.chunks.extend(_encode_parts(rendered.text))
+        self.chunks.append(CRLF.join([
+            '',
+            f'--{boundary}',
+            'Content-Type: text/html; charset="utf-8"',
+            'Content-Transfer-Encoding: quoted-printable',
+            '', '',
+        ]).encode('ascii'))
+        self.chunks.extend(_encode_parts(rendered.html))
+        self.chunks.append(f"{CRLF}--{boundary}--{CRLF}".encode('ascii'))
+
+    @classmethod
+    def from_template(cls, name, sender, personal_fields=(), **context):
+        return cls(bind_email(name, personal_fields, **context), sender)
+
+    def as_bytes(self, to, fields=None):
+        """The full message for one recipient (or UNDISCLOSED_RECIPIENTS in batch mode)"""
+        fields = fields or {}
+        encoded = {}
+        out = [self.head, to.encode('ascii')]
+        for chunk in self.chunks:
+            if chunk.__class__ is bytes:
+                out.append(chunk)
+                continue
+            if chunk not in encoded:
+                value = fields.get(chunk[0], '')
+                value = '' if value is None else str(value)
+                encoded[chunk] = _qp(html.escape(value, quote=True) if chunk[1] else value)
+            out.append(encoded[chunk])
+        return b''.join(out)
+
+
+# ----------------- Delivery -----------------
+def send_broadcast(message, recipients, send, sender, personalize=True, impersonal_fields=None,
+                   batch_size=BATCH_SIZE):
+    """Deliver ``message`` to every recipient.
+
+    ``recipients`` is a list of (email, fields) pairs and ``send`` is the mail
+    service's send (pooled connection, rate limit and retries). With
+    ``personalize`` each recipient gets their own message; without it the same
+    bytes (filled from ``impersonal_fields``) go to up to ``batch_size``
+    envelope recipients per transaction, none of whom can see the others.
+
+    Returns (sent_emails, [(email, error, transient), ...]); ``transient``
+    failures (dropped connection, 4xx replies) are worth retrying later. Once
+    ``send`` is rate limited the remaining recipients are not tried: they all
+    come back as transient failures. An address that cannot be encoded (e.g.
+    non-ASCII) is a permanent failure for that recipient only.
+    """
+    sent, failed = [], []
+    if not recipients:
+        return sent, failed
+
+    if personalize:
+        jobs = (([email], partial(message.as_bytes, email, fields)) for email, fields in recipients)
+    else:
+        shared = message.as_bytes(UNDISCLOSED_RECIPIENTS, impersonal_fields)
+        emails = []
+        for email, _ in recipients:
+            if email.isascii():
+                emails.append(email)
+            else:
+                failed.append((email, UNENCODABLE_ADDRESS, False))
+        jobs = ((emails[i:i + batch_size], lambda: shared) for i in range(0, len(emails), batch_size))
+
+    for envelope, build in jobs:
+        try:
+            # Built here so one recipient whose message cannot be encoded fails alone
+            refused = send(sender, envelope, build())
+        except RateLimited as e:
+            done = set(sent) | {email for email, _, _ in failed}
+            failed.extend((email, str(e), True) for email, _ in recipients if email not in done)
+            break
+        except smtplib.SMTPRecipientsRefused as e:
+            refused = e.recipients
+        except UnicodeError:
+            failed.extend((email, UNENCODABLE_ADDRESS, False) for email in envelope)
+            continue
+        except Exception as e:
+            failed.extend((email, str(e), is_transient(e)) for email in envelope)
+            continue
+        sent.extend(email for email in envelope if email not in refused)
+        failed.extend((email, str(error), 400 <= error[0] < 500) for email, error in refused.items())
+    return sent, failed
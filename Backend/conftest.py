@@ -0,0 +1,98 @@
+"""Shared pytest fixtures.
+
+Every request made through ``client`` runs with QUERY_AUDIT='raise': an N+1
+pattern or a route going over its entry in QUERY_BUDGETS fails the test with
+the offending statements and their call sites. ``query_budget`` checks an
+explicit block:
+
+    def test_report_list(client, query_budget):
+        with query_budget(4):
+            client.get('/api/reports/')
+
+``dataset`` seeds a small copy of the benchmark dataset (benchmarks/dataset.py)
+and ``login`` puts a user or admin id in the test client's session.
+"""
+import os
+import sys
+from contextlib import contextmanager
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks'))
+
+# Statements per request on the list endpoints; none of these may grow with the page size
+QUERY_BUDGETS = {
+    'notifications:/api/notifications/': 4,
+    'notifications:/api/notifications/stats': 3,
+    'reports:/api/reports/': 4,
+    'reports:/api/reports/admin/reports': 4,
+    'alerts:/api/alerts/live': 2,
+    'alerts:/api/alerts/admin/alerts': 2,
+}
+# Big enough that every list endpoint pages and every N+1 shows up
+DATASET_SIZES = {
+    'users': 30, 'admins': 3, 'reports': 60, 'media_per_report': 2, 'alerts': 12,
+    'chats': 6, 'messages_per_chat': 4, 'notifications': 300, 'tickets': 6, 'feedback': 4,
+}
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', 'sqlite:///' + str(tmp_path / 'test.db'))
+    from app import create_app
+    from mail_transport import MemoryTransport, set_transport
+    from response_cache import response_cache
+    set_transport(MemoryTransport())
+    # Process-wide, keyed by path: a body cached by an earlier test's database must not be served
+    response_cache.invalidate()
+    app = create_app({
+        'TESTING': True,
+        'QUERY_AUDIT': 'raise',
+        'QUERY_BUDGETS': QUERY_BUDGETS,
+        'SESSION_FILE_DIR': str(tmp_path / 'sessions'),
+        # The expired-alert sweep would land its queries on whichever request comes first
+        'ALERT_CLEANUP_INTERVAL': float('inf'),
+    })
+    yield app
+    from models import db
+    with app.app_context():
+        db.session.remove()
+        db.engine.dispose()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def dataset(app):
+    from dataset import seed_database
+    from models import db
+    with app.app_context():
+        return seed_database(db, DATASET_SIZES, seed=7)
+
+
+@pytest.fixture
+def login(client):
+    """``login(user_id)`` or ``login(user_id, admin=True)`` for the test client"""
+    def log_in(user_id, admin=False):
+        with client.session_transaction() as session:
+            session.clear()
+            session['user_id'] = user_id
+            if admin:
+                session['admin_user_id'] = user_id
+    return log_in
+
+
+@pytest.fixture
+def query_budget():
+    """``with query_budget(n):`` fails the test if the block runs more than n statements"""
+    from query_audit import capture_queries
+
+    @contextmanager
+    def budget(max_queries):
+        with capture_queries() as audit:
+            yield audit
+        if len(audit) > max_queries:
+            pytest.fail(f'Query budget exceeded: {len(audit)} > {max_queries}\n{audit.report()}', pytrace=False)
+    return budget
@@ -0,0 +1,502 @@
+import smtplib
+import threading
+import time
+import click
+from datetime import datetime, timedelta
+from flask import has_app_context
+from flask.cli import AppGroup
+from sqlalchemy import func
+from models import db, EmailDelivery
+from mail_transport import PRIORITIES, RateLimited, is_transient, send_message
+from metrics import record_smtp_send
+from startup import background_jobs_autostart
+
+# ----------------- Delivery Log Settings -----------------
+# Every outgoing email gets an EmailDelivery row per recipient:
+#
+#   queued -> sent                       accepted by the SMTP server
+#   queued -> deferred -> queued ...     transient failure, retried later
+#   queued -> failed                     permanent failure or out of attempts
+#   failed/deferred -> deferred          re-driven by an admin
+#
+# Rows carry the encoded message until it is sent. Broadcast rows carry none
+# and are rebuilt by the rebuilder registered for their related_type.
+STATUSES = ('queued', 'sent', 'deferred', 'failed')
+TRANSITIONS = {
+    'queued': {'sent', 'deferred', 'failed'},
+    'deferred': {'queued', 'deferred', 'failed'},
+    'failed': {'deferred'},
+    'sent': set(),
+}
+RETRY_DELAYS = (60, 300, 900, 3600)       # seconds to wait after the 1st, 2nd, ... failure
+MAX_ATTEMPTS = len(RETRY_DELAYS) + 1
+RETRY_BATCH_SIZE = 100
+RETRY_MAX_WAIT = 10.0                     # the retry worker runs in the background and may wait longer
+# Send priority per category; anything else is 'transactional' (see mail_transport.PRIORITIES)
+CATEGORY_PRIORITIES = {
+    'otp': 'auth',
+    'verification': 'auth',
+    'alert': 'alert',
+    'report_confirmation_digest': 'digest',
+    'report_status_digest': 'digest',
+    'notification_digest': 'digest',
+}
+MAX_REDRIVE = 5000
+STALE_QUEUED = timedelta(minutes=15)      # queued this long means the sender died mid-send
+# Rows this process is sending are also tracked in memory, so an exiting worker
+# can hand the ones it never resolved to the retry queue (hand_off_in_flight)
+# instead of leaving them for requeue_stale.
+RETENTION = timedelta(days=30)
+SCHEDULER_POLL_SECONDS = 30
+BULK_CHUNK = 500
+
+deliveries_cli = AppGroup('deliveries', help='Email delivery log commands.')
+
+_rebuilders = {}
+_scheduler = None
+_scheduler_lock = threading.Lock()
+_scheduler_stop = threading.Event()
+_in_flight = {'ids': set(), 'broadcasts': set()}
+_in_flight_lock = threading.Lock()
+
+
+def register_rebuilder(related_type, rebuild):
+    """``rebuild(related_id, recipient)`` returns (sender, data) for a payload-less row, or None"""
+    _rebuilders[related_type] = rebuild
+
+
+def transition(delivery, status, error=None, now=None):
+    """Move a delivery to ``status``; raises ValueError for a transition the state machine forbids"""
+    if status not in TRANSITIONS.get(delivery.status, ()):
+        raise ValueError(f"Cannot move a {delivery.status} delivery to {status}")
+    now = now or datetime.utcnow()
+    delivery.status = status
+    delivery.updated_at = now
+    if status == 'sent':
+        delivery.sent_at = now
+        delivery.payload = None
+        delivery.last_error = None
+        delivery.next_attempt_at = None
+    elif status == 'deferred':
+        delivery.next_attempt_at = now + timedelta(seconds=retry_delay(delivery.attempts))
+    elif status == 'failed':
+        delivery.next_attempt_at = None
+    if error is not None:
+        delivery.last_error = str(error)[:2000]
+
+
+def _track(ids=(), broadcasts=()):
+    with _in_flight_lock:
+        _in_flight['ids'].update(ids)
+        _in_flight['broadcasts'].update(broadcasts)
+
+
+def _untrack(ids=(), broadcasts=()):
+    with _in_flight_lock:
+        _in_flight['ids'].difference_update(ids)
+        _in_flight['broadcasts'].difference_update(broadcasts)
+
+
+def priority_for(category):
+    return CATEGORY_PRIORITIES.get(category, 'transactional')
+
+
+def retry_delay(attempts):
+    return RETRY_DELAYS[min(max(attempts, 1), len(RETRY_DELAYS)) - 1]
+
+
+def is_retryable(error):
+    """Transient per mail_transport, plus recipients refused with a 4xx code"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return any(400 <= code < 500 for code, _ in error.recipients.values())
+    return is_transient(error)
+
+
+def _subject(message):
+    subject = message['Subject']
+    return str(subject)[:255] if subject is not None else None
+
+
+# ----------------- Sending -----------------
+def _attempt(delivery, data, max_wait=None):
+    """Send one delivery and record the outcome; re-raises the send error"""
+    delivery.attempts = (delivery.attempts or 0) + 1
+    started = time.perf_counter()
+    try:
+        refused = send_message(delivery.sender, [delivery.recipient], data,
+                               priority=PRIORITIES[delivery.priority], max_wait=max_wait)
+        if refused:
+            raise smtplib.SMTPRecipientsRefused(refused)
+    except RateLimited as e:
+        record_smtp_send(delivery.category, 'rate_limited', time.perf_counter() - started)
+        # Never reached the server: not an attempt, just wait for tokens
+        delivery.attempts -= 1
+        transition(delivery, 'deferred', error=e)
+        delivery.next_attempt_at = datetime.utcnow() + timedelta(seconds=max(e.retry_after, 1))
+        db.session.commit()
+        raise
+    except Exception as e:
+        record_smtp_send(delivery.category, 'failed', time.perf_counter() - started)
+        retry = is_retryable(e) and delivery.attempts < MAX_ATTEMPTS
+        transition(delivery, 'deferred' if retry else 'failed', error=e)
+        db.session.commit()
+        raise
+    record_smtp_send(delivery.category, 'sent', time.perf_counter() - started)
+    transition(delivery, 'sent')
+    db.session.commit()
+
+
+def deliver_email(message, recipient, category, related=None):
+    """Send a built email message to one recipient and log its delivery.
+
+    A deferred delivery (rate limited or a transient error) counts as accepted:
+    the retry queue owns it from then on, so callers must not send it again.
+    A permanent failure re-raises the send error, so existing try/except
+    callers behave as before. Outside an app context the message is sent
+    without a log row.
+    """
+    data = message.as_string().encode('utf-8')
+    sender = str(message['From'])
+    if not has_app_context():
+        broadcast_sender(category)(sender, [recipient], data)
+        return True
+
+    related_type, related_id = related if related else (None, None)
+    delivery = EmailDelivery(
+        category=category,
+        recipient=recipient,
+        sender=sender,
+        subject=_subject(message),
+        status='queued',
+        attempts=0,
+        payload=data,
+        related_type=related_type,
+        related_id=str(related_id) if related_id is not None else None,
+        priority=PRIORITIES.index(priority_for(category))
+    )
+    db.session.add(delivery)
+    db.session.commit()
+    delivery_id = delivery.id
+    _track(ids=[delivery_id])
+    try:
+        _attempt(delivery, data)
+    except Exception:
+        if delivery.status != 'deferred':
+            raise
+    finally:
+        _untrack(ids=[delivery_id])
+    return True
+
+
+# ----------------- Broadcasts -----------------
+def broadcast_sender(category, max_wait=None):
+    """A ``send(sender, recipients, data)`` for send_broadcast, at the category's priority and timed per batch.
+
+    ``max_wait`` overrides how long a batch may wait for send tokens; 0 never
+    waits, so a broadcast made in a request defers what the rate limit will
+    not take right now to the retry queue instead of sleeping.
+    """
+    priority = priority_for(category)
+
+    def send(sender, recipients, data):
+        started = time.perf_counter()
+        outcome = 'failed'
+        try:
+            refused = send_message(sender, recipients, data, priority=priority, max_wait=max_wait)
+            outcome = 'sent'
+            return refused
+        except RateLimited:
+            outcome = 'rate_limited'
+            raise
+        finally:
+            record_smtp_send(category, outcome, time.perf_counter() - started, messages=len(recipients))
+    return send
+
+
+def log_broadcast(category, sender, subject, recipients, related):
+    """Insert one queued, payload-less row per recipient of a broadcast"""
+    if not recipients:
+        return
+    now = datetime.utcnow()
+    related_type, related_id = related
+    rows = [{
+        'category': category, 'recipient': email, 'sender': sender, 'subject': (subject or '')[:255],
+        'status': 'queued', 'attempts': 0, 'related_type': related_type, 'related_id': str(related_id),
+        'priority': PRIORITIES.index(priority_for(category)), 'created_at': now, 'updated_at': now,
+    } for email in recipients]
+    db.session.execute(EmailDelivery.__table__.insert(), rows)
+    db.session.commit()
+    _track(broadcasts=[(related_type, str(related_id))])
+
+
+def record_broadcast_results(related, sent, failed):
+    """Resolve a broadcast's queued rows: ``failed`` is [(email, error, transient), ...]"""
+    now = datetime.utcnow()
+    table = EmailDelivery.__table__
+    related_type, related_id = related
+    pending = table.update().where(
+        table.c.related_type == related_type,
+        table.c.related_id == str(related_id),
+        table.c.status == 'queued'
+    )
+    for i in range(0, len(sent), BULK_CHUNK):
+        db.session.execute(pending.where(table.c.recipient.in_(sent[i:i + BULK_CHUNK])).values(
+            status='sent', attempts=table.c.attempts + 1, sent_at=now, updated_at=now
+        ))
+
+    groups = {}
+    for email, error, transient in failed:
+        groups.setdefault((str(error)[:2000], transient), []).append(email)
+    for (error, transient), emails in groups.items():
+        values = {'attempts': table.c.attempts + 1, 'last_error': error, 'updated_at': now}
+        if transient:
+            values.update(status='deferred', next_attempt_at=now + timedelta(seconds=retry_delay(1)))
+        else:
+            values.update(status='failed')
+        for i in range(0, len(emails), BULK_CHUNK):
+            db.session.execute(pending.where(table.c.recipient.in_(emails[i:i + BULK_CHUNK])).values(**values))
+    db.session.commit()
+    _untrack(broadcasts=[(related_type, str(related_id))])
+
+
+# ----------------- Retry Queue -----------------
+def _rebuild(delivery):
+    rebuild = _rebuilders.get(delivery.related_type)
+    if rebuild is None:
+        return None
+    rebuilt = rebuild(delivery.related_id, delivery.recipient)
+    if rebuilt is None:
+        return None
+    delivery.sender = rebuilt[0]
+    return rebuilt[1]
+
+
+def process_retry_queue(now=None, limit=RETRY_BATCH_SIZE, ids=None):
+    """Retry deferred deliveries that are due (or exactly ``ids``, due or not).
+
+    Each row is claimed with a conditional UPDATE first, so two workers never
+    send the same delivery. Returns counts of the resulting statuses.
+    """
+    now = now or datetime.utcnow()
+    results = {'sent': 0, 'deferred': 0, 'failed': 0}
+    query = db.session.query(EmailDelivery.id).filter(EmailDelivery.status == 'deferred')
+    if ids is None:
+        query = query.filter(EmailDelivery.next_attempt_at <= now)
+    else:
+        query = query.filter(EmailDelivery.id.in_(ids))
+    candidates = [row.id for row in query.order_by(EmailDelivery.priority, EmailDelivery.next_attempt_at)
+                  .limit(limit).all()]
+
+    for delivery_id in candidates:
+        claimed = EmailDelivery.query.filter_by(id=delivery_id, status='deferred')\
+            .update({'status': 'queued', 'updated_at': datetime.utcnow()}, synchronize_session=False)
+        db.session.commit()
+        if not claimed:
+            continue
+        _track(ids=[delivery_id])
+        try:
+            outcome = _retry_claimed(delivery_id)
+        finally:
+            _untrack(ids=[delivery_id])
+        if outcome == 'rate_limited':
+            results['deferred'] += 1
+            break   # out of tokens for now; the rest stay due for the next run
+        results[outcome] += 1
+    return results
+
+
+def _retry_claimed(delivery_id):
+    """Send one claimed (queued) retry; returns its new status, or 'rate_limited'"""
+    delivery = db.session.get(EmailDelivery, delivery_id)
+    db.session.refresh(delivery)
+    try:
+        data = delivery.payload or _rebuild(delivery)
+    except Exception as e:
+        data, error = None, f"Message could not be rebuilt: {e}"
+    else:
+        error = 'Message can no longer be rebuilt'
+    if data is None:
+        transition(delivery, 'failed', error=error)
+        db.session.commit()
+        return 'failed'
+    try:
+        _attempt(delivery, data, max_wait=RETRY_MAX_WAIT)
+    except RateLimited:
+        return 'rate_limited'
+    except Exception:
+        pass
+    return delivery.status
+
+
+def requeue_stale(now=None):
+    """Defer rows left queued by a sender that died mid-send"""
+    now = now or datetime.utcnow()
+    return EmailDelivery.query.filter(
+        EmailDelivery.status == 'queued',
+        EmailDelivery.updated_at < now - STALE_QUEUED
+    ).update({'status': 'deferred', 'next_attempt_at': now, 'updated_at': now}, synchronize_session=False)
+
+
+def hand_off_in_flight(now=None):
+    """Defer the deliveries this process left queued so the next retry run sends them.
+
+    For an exiting worker: its sends cut short would otherwise wait STALE_QUEUED
+    for requeue_stale. Returns how many rows were handed off.
+    """
+    with _in_flight_lock:
+        ids = list(_in_flight['ids'])
+        broadcasts = list(_in_flight['broadcasts'])
+        _in_flight['ids'].clear()
+        _in_flight['broadcasts'].clear()
+    if not ids and not broadcasts:
+        return 0
+    now = now or datetime.utcnow()
+    table = EmailDelivery.__table__
+    values = {'status': 'deferred', 'next_attempt_at': now, 'updated_at': now}
+    handed_off = 0
+    for i in range(0, len(ids), BULK_CHUNK):
+        handed_off += db.session.execute(table.update().where(
+            table.c.id.in_(ids[i:i + BULK_CHUNK]), table.c.status == 'queued'
+        ).values(**values)).rowcount
+    for related_type, related_id in broadcasts:
+        handed_off += db.session.execute(table.update().where(
+            table.c.related_type == related_type, table.c.related_id == related_id, table.c.status == 'queued'
+        ).values(**values)).rowcount
+    db.session.commit()
+    return handed_off
+
+
+def redrive(ids=None, statuses=('failed',), category=None, related_type=None, related_id=None,
+            limit=MAX_REDRIVE, send_now=True):
+    """Put matching failed (or deferred) deliveries back on the retry queue; raises ValueError"""
+    statuses = tuple(statuses)
+    if not statuses or not set(statuses) <= {'failed', 'deferred'}:
+        raise ValueError("statuses must be failed and/or deferred")
+    query = db.session.query(EmailDelivery.id).filter(EmailDelivery.status.in_(statuses))
+    if ids:
+        query = query.filter(EmailDelivery.id.in_(ids))
+    if category:
+        query = query.filter(EmailDelivery.category == category)
+    if related_type:
+        query = query.filter(EmailDelivery.related_type == related_type)
+    if related_id is not None:
+        query = query.filter(EmailDelivery.related_id == str(related_id))
+    matched = [row.id for row in query.order_by(EmailDelivery.id).limit(min(limit, MAX_REDRIVE)).all()]
+
+    now = datetime.utcnow()
+    redriven = 0
+    for i in range(0, len(matched), BULK_CHUNK):
+        redriven += EmailDelivery.query.filter(
+            EmailDelivery.id.in_(matched[i:i + BULK_CHUNK]),
+            EmailDelivery.status.in_(statuses)
+        ).update({'status': 'deferred', 'attempts': 0, 'next_attempt_at': now, 'updated_at': now},
+                 synchronize_session=False)
+    db.session.commit()
+
+    result = {'redriven': redriven, 'sent': 0, 'deferred': 0, 'failed': 0}
+    if send_now and matched:
+        result.update(process_retry_queue(ids=matched, limit=len(matched)))
+    return result
+
+
+# ----------------- Queries -----------------
+def list_deliveries(status=None, category=None, recipient=None, related_type=None, related_id=None,
+                    page=1, per_page=50):
+    """Newest deliveries first, filtered on indexed columns"""
+    query = EmailDelivery.query
+    if status:
+        query = query.filter(EmailDelivery.status.in_(status))
+    if category:
+        query = query.filter(EmailDelivery.category == category)
+    if recipient:
+        query = query.filter(EmailDelivery.recipient == recipient)
+    if related_type:
+        query = query.filter(EmailDelivery.related_type == related_type)
+    if related_id is not None:
+        query = query.filter(EmailDelivery.related_id == str(related_id))
+    return query.order_by(EmailDelivery.created_at.desc(), EmailDelivery.id.desc())\
+        .paginate(page=page, per_page=per_page, error_out=False)
+
+
+def delivery_summary(category=None, related_type=None, related_id=None):
+    query = db.session.query(EmailDelivery.category, EmailDelivery.status, func.count(EmailDelivery.id))
+    if category:
+        query = query.filter(EmailDelivery.category == category)
+    if related_type:
+        query = query.filter(EmailDelivery.related_type == related_type)
+    if related_id is not None:
+        query = query.filter(EmailDelivery.related_id == str(related_id))
+    summary = {'total': {status: 0 for status in STATUSES}, 'by_category': {}}
+    for category_name, status, count in query.group_by(EmailDelivery.category, EmailDelivery.status).all():
+        summary['total'][status] = summary['total'].get(status, 0) + count
+        summary['by_category'].setdefault(category_name, {s: 0 for s in STATUSES})[status] = count
+    return summary
+
+
+def prune_deliveries(older_than=RETENTION):
+    return EmailDelivery.query.filter(
+        EmailDelivery.status == 'sent',
+        EmailDelivery.sent_at < datetime.utcnow() - older_than
+    ).delete(synchronize_session=False)
+
+
+# ----------------- Scheduler -----------------
+def _run_scheduler(app):
+    while not _scheduler_stop.wait(app.config.get('DELIVERY_RETRY_POLL_SECONDS', SCHEDULER_POLL_SECONDS)):
+        with app.app_context():
+            try:
+                requeue_stale()
+                db.session.commit()
+                process_retry_queue()
+                prune_deliveries()
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Email retry run failed: {str(e)}")
+            finally:
+                db.session.remove()
+
+
+def start_retry_scheduler(app):
+    """Work through the retry queue from a background thread every DELIVERY_RETRY_POLL_SECONDS"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None or not _scheduler.is_alive():
+            _scheduler_stop.clear()
+            _scheduler = threading.Thread(target=_run_scheduler, args=(app,), name='email-retry', daemon=True)
+            _scheduler.start()
+
+
+def stop_retry_scheduler(timeout=None):
+    """Stop the scheduler after its current run; True once the thread has exited"""
+    _scheduler_stop.set()
+    scheduler = _scheduler
+    if scheduler is None:
+        return True
+    scheduler.join(timeout)
+    return not scheduler.is_alive()
+
+
+def init_delivery_log(app):
+    app.cli.add_command(deliveries_cli)
+    if app.config.get('DELIVERY_RETRY_ENABLED', True) and background_jobs_autostart(app):
+        start_retry_scheduler(app)
+
+
+@deliveries_cli.command('retry')
+def retry_command():
+    """Retry the deferred deliveries that are due."""
+    requeue_stale()
+    db.session.commit()
+    click.echo(f"Retry results: {process_retry_queue(limit=MAX_REDRIVE)}")
+
+
+@deliveries_cli.command('redrive')
+@click.option('--category', default=None, help='Only this category (e.g. alert, otp).')
+@click.option('--related-type', default=None)
+@click.option('--related-id', default=None)
+@click.option('--include-deferred', is_flag=True, help='Also retry deferred deliveries now.')
+def redrive_command(category, related_type, related_id, include_deferred):
+    """Send failed deliveries again."""
+    statuses = ('failed', 'deferred') if include_deferred else ('failed',)
+    click.echo(f"Re-drive results: {redrive(statuses=statuses, category=category, related_type=related_type, related_id=related_id)}")
@@ -0,0 +1,264 @@
+import threading
+import click
+from datetime import datetime, timedelta
+from flask import current_app, g, has_app_context
+from flask.cli import AppGroup
+from sqlalchemy import func
+from models import db, NotificationType, NotificationPreference, DigestItem, User
+from startup import background_jobs_autostart
+
+# ----------------- Digest Settings -----------------
+FREQUENCIES = ('immediate', 'hourly', 'daily')
+DIGEST_INTERVALS = {
+    'hourly': timedelta(hours=1),
+    'daily': timedelta(days=1),
+}
+SCHEDULER_POLL_SECONDS = 60
+
+# Emergencies are never buffered or muted
+ALWAYS_IMMEDIATE = {NotificationType.EMERGENCY}
+DEFAULT_FREQUENCY = {
+    NotificationType.EMERGENCY: 'immediate',
+    NotificationType.ADMIN_ALERT: 'immediate',
+    NotificationType.NEW_REPORT: 'immediate',
+    NotificationType.REPORT_STATUS_UPDATE: 'hourly',
+    NotificationType.REPORT_ASSIGNED: 'hourly',
+    NotificationType.CHAT_MESSAGE: 'hourly',
+    NotificationType.MESSAGE: 'hourly',
+    NotificationType.NEW_MESSAGE: 'hourly',
+    NotificationType.NEW_USER: 'daily',
+}
+# Email for these is opt-in: users who never turned it on get the in-app notification only
+EMAIL_OPT_IN = {NotificationType.REPORT_STATUS_UPDATE, NotificationType.CHAT_MESSAGE}
+
+digests_cli = AppGroup('digests', help='Notification digest commands.')
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+_scheduler_stop = threading.Event()
+
+
+# ----------------- Preferences -----------------
+def default_preference(notification_type):
+    return {
+        'in_app': True,
+        'email': notification_type not in EMAIL_OPT_IN,
+        'frequency': DEFAULT_FREQUENCY.get(notification_type, 'immediate'),
+    }
+
+
+def _apply_overrides(preference, notification_type):
+    if notification_type in ALWAYS_IMMEDIATE:
+        return dict(preference, in_app=True, email=True, frequency='immediate')
+    return preference
+
+
+def preferences_for(user_ids, notification_type):
+    """Map each user id to its preference for a type with one query.
+
+    Only users who changed a default have rows, so the lookup stays small even
+    for an alert fanned out to the whole user base. Results are memoized on ``g``
+    for the rest of the request.
+    """
+    cache = g.setdefault('_notification_preferences', {}) if has_app_context() else {}
+    known = cache.setdefault(notification_type, {})
+    missing = [user_id for user_id in set(user_ids) if user_id not in known]
+    if missing:
+        for user_id in missing:
+            known[user_id] = default_preference(notification_type)
+        rows = NotificationPreference.query.filter(
+            NotificationPreference.notification_type == notification_type,
+            NotificationPreference.user_id.in_(missing)
+        ).all()
+        for row in rows:
+            known[row.user_id] = {'in_app': row.in_app, 'email': row.email, 'frequency': row.frequency}
+    return {user_id: _apply_overrides(known[user_id], notification_type) for user_id in user_ids}
+
+
+def get_preference(user_id, notification_type):
+    return preferences_for([user_id], notification_type)[user_id]
+
+
+def forget_cached_preferences():
+    if has_app_context():
+        g.pop('_notification_preferences', None)
+
+
+def list_preferences(user_id):
+    """Effective preference for every notification type"""
+    rows = {row.notification_type: row for row in NotificationPreference.query.filter_by(user_id=user_id).all()}
+    result = []
+    for notification_type in NotificationType:
+        row = rows.get(notification_type)
+        preference = {'in_app': row.in_app, 'email': row.email, 'frequency': row.frequency} \
+            if row else default_preference(notification_type)
+        preference = _apply_overrides(preference, notification_type)
+        result.append(dict(preference, type=notification_type.value,
+                           locked=notification_type in ALWAYS_IMMEDIATE))
+    return result
+
+
+def update_preferences(user_id, changes):
+    """Upsert preferences from [{'type': ..., 'in_app': ..., 'email': ..., 'frequency': ...}]; raises ValueError"""
+    by_value = {t.value: t for t in NotificationType}
+    for change in changes:
+        notification_type = by_value.get(change.get('type'))
+        if notification_type is None:
+            raise ValueError(f"Unknown notification type: {change.get('type')}")
+        if notification_type in ALWAYS_IMMEDIATE:
+            continue
+        frequency = change.get('frequency')
+        if frequency is not None and frequency not in FREQUENCIES:
+            raise ValueError(f"frequency must be one of {', '.join(FREQUENCIES)}")
+
+        row = NotificationPreference.query.filter_by(user_id=user_id, notification_type=notification_type).first()
+        if row is None:
+            defaults = default_preference(notification_type)
+            row = NotificationPreference(user_id=user_id, notification_type=notification_type,
+                                         in_app=defaults['in_app'], email=defaults['email'],
+                                         frequency=defaults['frequency'])
+            db.session.add(row)
+        if 'in_app' in change:
+            row.in_app = bool(change['in_app'])
+        if 'email' in change:
+            row.email = bool(change['email'])
+        if frequency is not None:
+            row.frequency = frequency
+    db.session.commit()
+    forget_cached_preferences()
+
+
+# ----------------- Email Routing -----------------
+def route_email(user_id, notification_type, subject, summary, action_url=None, urgent=False, preference=None):
+    """Decide what happens to one email-worthy event for a user.
+
+    Returns 'send' when the caller should send it now, 'queued' when it was
+    buffered for the user's next digest and 'skipped' when email is off.
+    Urgent events and emergencies always go out immediately.
+    """
+    preference = preference or get_preference(user_id, notification_type)
+    if not preference['email'] and not urgent:
+        return 'skipped'
+    if urgent or preference['frequency'] == 'immediate':
+        return 'send'
+    db.session.add(DigestItem(
+        user_id=user_id,
+        notification_type=notification_type,
+        frequency=preference['frequency'],
+        subject=subject[:200],
+        summary=summary,
+        action_url=action_url
+    ))
+    return 'queued'
+
+
+# ----------------- Flushing -----------------
+def due_batches(now=None):
+    """(user_id, frequency) pairs whose oldest pending item has waited a full interval"""
+    now = now or datetime.utcnow()
+    rows = db.session.query(DigestItem.user_id, DigestItem.frequency, func.min(DigestItem.created_at))\
+        .filter(DigestItem.sent_at.is_(None))\
+        .group_by(DigestItem.user_id, DigestItem.frequency).all()
+    return [(user_id, frequency) for user_id, frequency, oldest in rows
+            if frequency in DIGEST_INTERVALS and oldest <= now - DIGEST_INTERVALS[frequency]]
+
+
+def flush_batch(user_id, frequency, now=None):
+    """Claim a user's pending items for one frequency and send them as one email"""
+    # Imported here: utils builds the email and itself depends on this module
+    from utils import send_notification_digest_email
+
+    now = now or datetime.utcnow()
+    claimed = DigestItem.query.filter(
+        DigestItem.user_id == user_id,
+        DigestItem.frequency == frequency,
+        DigestItem.sent_at.is_(None),
+        DigestItem.created_at <= now
+    ).update({DigestItem.sent_at: now}, synchronize_session=False)
+    db.session.commit()
+    if not claimed:
+        return 0
+
+    items = DigestItem.query.filter_by(user_id=user_id, frequency=frequency, sent_at=now)\
+        .order_by(DigestItem.created_at).all()
+    user = db.session.get(User, user_id)
+    sent = bool(user and user.email) and send_notification_digest_email(
+        user_email=user.email,
+        user_name=f"{user.first_name} {user.last_name}",
+        items=items,
+        frequency=frequency
+    )
+    if not sent:
+        # Release the claim so the next run retries
+        for item in items:
+            item.sent_at = None
+        db.session.commit()
+        return 0
+    return len(items)
+
+
+def flush_due_digests(now=None, force=False):
+    """Send every digest that is due (or every pending one with force=True)"""
+    now = now or datetime.utcnow()
+    if force:
+        batches = db.session.query(DigestItem.user_id, DigestItem.frequency)\
+            .filter(DigestItem.sent_at.is_(None)).distinct().all()
+    else:
+        batches = due_batches(now)
+    emails = 0
+    for user_id, frequency in batches:
+        if flush_batch(user_id, frequency, now):
+            emails += 1
+    return emails
+
+
+def prune_sent_items(older_than=timedelta(days=14)):
+    return DigestItem.query.filter(DigestItem.sent_at.isnot(None),
+                                   DigestItem.sent_at < datetime.utcnow() - older_than).delete()
+
+
+def _run_scheduler(app):
+    while not _scheduler_stop.wait(app.config.get('DIGEST_POLL_SECONDS', SCHEDULER_POLL_SECONDS)):
+        with app.app_context():
+            try:
+                flush_due_digests()
+                prune_sent_items()
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Digest flush failed: {str(e)}")
+            finally:
+                db.session.remove()
+
+
+def start_digest_scheduler(app):
+    """Flush due digests from a background thread every DIGEST_POLL_SECONDS"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None or not _scheduler.is_alive():
+            _scheduler_stop.clear()
+            _scheduler = threading.Thread(target=_run_scheduler, args=(app,), name='digest-scheduler', daemon=True)
+            _scheduler.start()
+
+
+def stop_digest_scheduler(timeout=None):
+    """Stop the scheduler after its current run; True once the thread has exited"""
+    _scheduler_stop.set()
+    scheduler = _scheduler
+    if scheduler is None:
+        return True
+    scheduler.join(timeout)
+    return not scheduler.is_alive()
+
+
+def init_digests(app):
+    app.cli.add_command(digests_cli)
+    if app.config.get('DIGEST_SCHEDULER_ENABLED', True) and background_jobs_autostart(app):
+        start_digest_scheduler(app)
+
+
+@digests_cli.command('flush')
+@click.option('--force', is_flag=True, help='Send every pending digest now, due or not.')
+def flush_command(force):
+    """Send the hourly/daily notification digests that are due."""
+    click.echo(f"Sent {flush_due_digests(force=force)} digest emails.")
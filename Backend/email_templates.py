@@ -0,0 +1,772 @@
+import html
+import re
+from collections import namedtuple
+from datetime import datetime
+from html.parser import HTMLParser
+
+# ----------------- Email Template Engine -----------------
+# Templates are registered at import time but compiled lazily, once, on their first
+# render (the production server does it in the master before forking, see
+# lifecycle.warm_up): the content block is dropped into the SafeZone101 layout, CSS
+# is inlined onto every element, and the result is split into literal chunks and
+# {{ variable }} slots. Rendering is a single ''.join over that list. The plain-text
+# alternative is derived from the same HTML source at compile time.
+#
+#   {{ name }}      HTML-escaped in the HTML part, verbatim in the text part
+#   {{ name|raw }}  inserted as-is in the HTML part (for pre-built markup whose
+#                   values the caller escaped, e.g. a <ul> of items); the text
+#                   part gets its plain-text rendition
+
+RenderedEmail = namedtuple('RenderedEmail', ['subject', 'html', 'text'])
+
+BASE_CSS = """
+body { font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; line-height: 1.6; color: #333; margin: 0; padding: 0; background-color: #f9f9f9; }
+.container { max-width: 600px; margin: 0 auto; background-color: #ffffff; }
+.header { background: linear-gradient(135deg, #1a73e8, #4285f4); padding: 20px; text-align: center; border-radius: 5px 5px 0 0; }
+.header h1 { color: white; margin: 0; font-size: 24px; font-weight: 600; }
+.content { padding: 30px; }
+.footer { background-color: #f5f5f5; padding: 20px; text-align: center; font-size: 12px; color: #666; border-radius: 0 0 5px 5px; }
+.button { display: inline-block; padding: 12px 24px; background-color: #1a73e8; color: white; text-decoration: none; border-radius: 4px; font-weight: 600; margin: 20px 0; }
+.alert { background-color: #fff8e1; border-left: 4px solid #ffc107; padding: 15px; margin: 20px 0; }
+.success { background-color: #e8f5e9; border-left: 4px solid #4caf50; padding: 15px; margin: 20px 0; }
+.info { background-color: #e3f2fd; border-left: 4px solid #2196f3; padding: 15px; margin: 20px 0; }
+.details { background-color: #f9f9f9; border: 1px solid #e0e0e0; padding: 15px; margin: 20px 0; border-radius: 4px; }
+.congratulations { color: #1a73e8; font-size: 22px; font-weight: bold; margin: 20px 0; text-align: center; }
+.code { text-align: center; font-size: 32px; font-weight: bold; letter-spacing: 5px; margin: 20px 0; color: #1a73e8; }
+"""
+
+LAYOUT = """<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <meta http-equiv="Content-Type" content="text/html; charset=UTF-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+    <title>{{ title }}</title>
+{{ style_block|raw }}</head>
+<body>
+    <div class="container">
+        <div class="header">
+            <h1>SafeZone101</h1>
+        </div>
+        <div class="content">
+{{ content|raw }}
+{{ button|raw }}
+        </div>
+        <div class="footer">
+            <p>&copy; {{ year }} SafeZone101. All rights reserved.</p>
+            <p>This is an automated message. Please do not reply to this email.</p>
+        </div>
+    </div>
+</body>
+</html>
+"""
+
+BUTTON = '<center><a href="{url}" class="button">{text}</a></center>'
+TEXT_FOOTER = "\n\n--\nSafeZone101 - this is an automated message, please do not reply."
+
+VARIABLE = re.compile(r'\{\{\s*(\w+)(\|raw)?\s*\}\}')
+VOID_TAGS = {'br', 'hr', 'img', 'meta', 'link', 'input'}
+
+
+# ----------------- CSS Inlining -----------------
+def parse_css(css):
+    """Return [(selector parts, declarations)] for simple '.cls', 'tag' and '.cls tag' rules"""
+    rules = []
+    for selectors, body in re.findall(r'([^{}]+)\{([^}]*)\}', css):
+        declarations = '; '.join(d.strip() for d in body.split(';') if d.strip())
+        for selector in selectors.split(','):
+            rules.append((selector.split(), declarations))
+    return rules
+
+
+def _matches(part, tag, classes):
+    if part.startswith('.'):
+        return part[1:] in classes
+    return part == tag
+
+
+class _Inliner(HTMLParser):
+    def __init__(self, rules):
+        super().__init__(convert_charrefs=False)
+        self.rules = rules
+        self.out = []
+        self.stack = []
+
+    def _style_for(self, tag, classes):
+        styles = []
+        for parts, declarations in self.rules:
+            if not _matches(parts[-1], tag, classes):
+                continue
+            if len(parts) == 1 or any(_matches(parts[0], t, c) for t, c in self.stack):
+                styles.append(declarations)
+        return styles
+
+    def _emit(self, tag, attrs, closing=''):
+        classes = set()
+        for name, value in attrs:
+            if name == 'class' and value:
+                classes.update(value.split())
+        styles = self._style_for(tag, classes)
+        inline = [value for name, value in attrs if name == 'style' and value]
+        rendered = []
+        for name, value in attrs:
+            if name == 'style':
+                continue
+            rendered.append(name if value is None else f'{name}="{value}"')
+        if styles or inline:
+            # Inline style attributes win over the stylesheet
+            merged = '; '.join(s.strip().rstrip(';') for s in styles + inline)
+            rendered.append(f'style="{merged}"')
+        self.out.append(f"<{tag}{' ' if rendered else ''}{' '.join(rendered)}{closing}>")
+        return classes
+
+    def handle_starttag(self, tag, attrs):
+        classes = self._emit(tag, attrs)
+        if tag not in VOID_TAGS:
+            self.stack.append((tag, classes))
+
+    def handle_startendtag(self, tag, attrs):
+        self._emit(tag, attrs, ' /')
+
+    def handle_endtag(self, tag):
+        for index in range(len(self.stack) - 1, -1, -1):
+            if self.stack[index][0] == tag:
+                del self.stack[index:]
+                break
+        self.out.append(f'</{tag}>')
+
+    def handle_data(self, data):
+        self.out.append(data)
+
+    def handle_entityref(self, name):
+        self.out.append(f'&{name};')
+
+    def handle_charref(self, name):
+        self.out.append(f'&#{name};')
+
+    def handle_decl(self, decl):
+        self.out.append(f'<!{decl}>')
+
+    def handle_comment(self, data):
+        self.out.append(f'<!--{data}-->')
+
+
+def inline_css(markup, css=BASE_CSS):
+    """Copy stylesheet rules onto matching elements' style attributes"""
+    parser = _Inliner(parse_css(css))
+    parser.feed(markup)
+    parser.close()
+    return ''.join(parser.out)
+
+
+# ----------------- Plain Text Derivation -----------------
+def html_to_text(markup):
+    """Plain-text rendition of an email body; {{ variables }} pass through untouched"""
+    text = re.sub(r'(?is)<(head|style|script)\b.*?</\1>', '', markup)
+    text = re.sub(r'(?is)<a\b[^>]*href="([^"]*)"[^>]*>(.*?)</a>',
+                  lambda m: f"{m.group(2)} ({m.group(1)})" if m.group(1) not in m.group(2) else m.group(2), text)
+    text = re.sub(r'(?i)<br\s*/?>', '\n', text)
+    text = re.sub(r'(?i)<li\b[^>]*>', '\n- ', text)
+    text = re.sub(r'(?i)</(p|div|h[1-6]|ul|ol|li|center|tr)>', '\n\n', text)
+    text = re.sub(r'<[^>]+>', '', text)
+    text = html.unescape(text)
+    lines = [' '.join(line.split()) for line in text.splitlines()]
+    text = '\n'.join(lines)
+    text = re.sub(r'\n{3,}', '\n\n', text)
+    # List items were separated by blank lines above; keep them together
+    text = re.sub(r'\n\n(?=- )', '\n', text)
+    return text.strip()
+
+
+# ----------------- Compilation -----------------
+class CompiledTemplate:
+    """Literal chunks interleaved with (name, raw) variable slots"""
+    __slots__ = ('parts', 'variables')
+
+    def __init__(self, source):
+        self.parts = []
+        position = 0
+        for match in VARIABLE.finditer(source):
+            if match.start() > position:
+                self.parts.append(source[position:match.start()])
+            self.parts.append((match.group(1), bool(match.group(2))))
+            position = match.end()
+        if position < len(source):
+            self.parts.append(source[position:])
+        self.variables = {part[0] for part in self.parts if isinstance(part, tuple)}
+
+    def render(self, context, escape=True, raw=None):
+        """``raw`` converts |raw values (the text part passes html_to_text)"""
+        out = []
+        append = out.append
+        for part in self.parts:
+            if part.__class__ is str:
+                append(part)
+                continue
+            value = context.get(part[0], '')
+            value = '' if value is None else str(value)
+            if part[1]:
+                append(raw(value) if raw else value)
+            else:
+                append(html.escape(value, quote=True) if escape else value)
+        return ''.join(out)
+
+    def bind(self, context, keep, escape=True, raw=None):
+        """Render every variable except ``keep``, which stay as (name, needs_escape) slots"""
+        out = []
+        for part in self.parts:
+            if part.__class__ is not str:
+                if part[0] in keep:
+                    out.append((part[0], escape and not part[1]))
+                    continue
+                value = context.get(part[0], '')
+                value = '' if value is None else str(value)
+                if part[1]:
+                    part = raw(value) if raw else value
+                else:
+                    part = html.escape(value, quote=True) if escape else value
+            if out and out[-1].__class__ is str:
+                out[-1] += part
+            else:
+                out.append(part)
+        return out
+
+
+def _fill(source, **blocks):
+    """Substitute layout blocks at compile time, leaving other variables in place"""
+    return VARIABLE.sub(lambda m: blocks[m.group(1)] if m.group(1) in blocks else m.group(0), source)
+
+
+class EmailTemplate:
+    """A subject/HTML/text triple compiled from one content block"""
+
+    def __init__(self, name, subject, title, body, button_text=None, button_url=None):
+        self.name = name
+        self.source = (subject, title, body, button_text, button_url)
+        self.compiled = False
+
+    def compile(self):
+        subject, title, body, button_text, button_url = self.source
+        button = BUTTON.format(url=button_url, text=button_text) if button_text and button_url else ''
+        document = _fill(LAYOUT, style_block='', content=body, button=button, title=title)
+        self.subject = CompiledTemplate(subject)
+        self.html = CompiledTemplate(inline_css(document))
+        text_source = html_to_text(_fill(body + '\n' + button, title=title))
+        self.text = CompiledTemplate(text_source + TEXT_FOOTER)
+        self.compiled = True
+        return self
+
+    def render(self, **context):
+        if not self.compiled:
+            self.compile()
+        context.setdefault('year', _current_year())
+        return RenderedEmail(
+            self.subject.render(context, escape=False),
+            self.html.render(context),
+            self.text.render(context, escape=False, raw=html_to_text)
+        )
+
+    def bind(self, keep, **context):
+        """Render the shared parts of a broadcast, leaving the ``keep`` variables open.
+
+        Returns a RenderedEmail whose html/text are lists of literal chunks and
+        (name, needs_escape) slots. The subject must not use a kept variable.
+        """
+        if not self.compiled:
+            self.compile()
+        keep = set(keep)
+        if self.subject.variables & keep:
+            raise ValueError(f"{self.name} subject uses per-recipient fields: {', '.join(sorted(self.subject.variables & keep))}")
+        context.setdefault('year', _current_year())
+        return RenderedEmail(
+            self.subject.render(context, escape=False),
+            self.html.bind(context, keep),
+            self.text.bind(context, keep, escape=False, raw=html_to_text)
+        )
+
+
+_year = {'value': None, 'checked': None}
+
+
+def _current_year():
+    # datetime.now() per message is measurable in a 50k-recipient broadcast; check once a minute
+    now = datetime.now()
+    if _year['checked'] is None or (now - _year['checked']).total_seconds() > 60:
+        _year['value'] = now.year
+        _year['checked'] = now
+    return _year['value']
+
+
+# ----------------- Legacy Layout -----------------
+# get_email_template() callers pass pre-built HTML with class names, so that
+# layout keeps the stylesheet in a <style> block next to the inlined chrome.
+_STYLE_BLOCK = "    <style>\n" + BASE_CSS + "    </style>\n"
+_legacy_layout = []
+
+
+def legacy_layout():
+    if not _legacy_layout:
+        _legacy_layout.append(CompiledTemplate(inline_css(_fill(LAYOUT, style_block=_STYLE_BLOCK))))
+    return _legacy_layout[0]
+
+
+def render_layout(title, content, button_text=None, button_url=None):
+    button = BUTTON.format(url=button_url, text=button_text) if button_text and button_url else ''
+    return legacy_layout().render({
+        'title': title, 'content': content, 'button': button, 'year': _current_year()
+    })
+
+
+# ----------------- Templates -----------------
+TEMPLATES = {}
+
+
+def register(name, subject, title, body, button_text=None, button_url=None):
+    TEMPLATES[name] = EmailTemplate(name, subject, title, body, button_text, button_url)
+    return TEMPLATES[name]
+
+
+def render_email(template, **context):
+    """Render a registered template to (subject, html, text)"""
+    return TEMPLATES[template].render(**context)
+
+
+def bind_email(name, keep, **context):
+    """Render a registered template except for the per-recipient ``keep`` fields"""
+    return TEMPLATES[name].bind(keep, **context)
+
+
+def html_list(items):
+    """A <ul> of pre-escaped item markup, for a |raw variable"""
+    return '<ul>' + ''.join(f'<li>{item}</li>' for item in items) + '</ul>'
+
+
+register(
+    'registration',
+    subject="Welcome to SafeZone101!",
+    title="Welcome to SafeZone101!",
+    body="""
+    <div class="congratulations">Congratulations!</div>
+    <p>Dear {{ user_name }},</p>
+    <div class="success">
+        <p>You have successfully registered to SafeZone101.</p>
+    </div>
+    <p>Thank you for joining our emergency response community! We're dedicated to keeping you safe and informed.</p>
+    <p>You can now access all features of our platform, including emergency reporting, alerts, and community resources.</p>
+    <p>Regards,<br>SafeZone101 Team</p>
+    """,
+    button_text="Access Your Dashboard",
+    button_url="https://safezone101.com/dashboard",
+)
+
+register(
+    'verification',
+    subject="Verify Your SafeZone101 Account",
+    title="Verify Your Account",
+    body="""
+    <div class="congratulations">Welcome to SafeZone101!</div>
+    <p>Hi {{ user_name }},</p>
+    <div class="info">
+        <p>Please verify your email address to complete your registration and access all features.</p>
+    </div>
+    <div class="details">
+        <h3>Your Verification Code:</h3>
+        <div class="code">{{ otp }}</div>
+        <p style="text-align: center;">This code is valid for 10 minutes.</p>
+    </div>
+    <p>If you did not create an account with us, please ignore this email or contact our support team.</p>
+    <p>Regards,<br>SafeZone101 Team</p>
+    """,
+)
+
+register(
+    'password_reset_otp',
+    subject="SafeZone101 Password Reset OTP",
+    title="Password Reset OTP",
+    body="""
+    <p>Hi {{ user_name }},</p>
+    <div class="alert">
+        <p>You requested to reset your password for SafeZone101.</p>
+    </div>
+    <div class="details">
+        <h3>Your One-Time Password (OTP):</h3>
+        <div class="code">{{ otp }}</div>
+        <p style="text-align: center;">This OTP is valid for 10 minutes.</p>
+    </div>
+    <p>If you did not request this password reset, please ignore this email or contact our support team immediately.</p>
+    <p>Regards,<br>SafeZone101 Team</p>
+    """,
+)
+
+register(
+    'report_confirmation',
+    subject="Your Report Has Been Submitted - SafeZone101",
+    title="Report Submission Confirmation",
+    body="""
+    <p>Hi {{ user_name }},</p>
+    <div class="success">
+        <h2>Report Submitted Successfully</h2>
+        <p>Thank you for submitting your {{ report_type }} report to SafeZone101.</p>
+    </div>
+    <div class="details">
+        <h3>Report Details:</h3>
+        <p><strong>Report Title:</strong> {{ report_title }}</p>
+        <p><strong>Report Type:</strong> {{ report_type }}</p>
+        <p><strong>Submission Time:</strong> {{ submitted_at }}</p>
+    </div>
+    <p>We have received your report and our team will review it shortly. You can check the status of your report in your dashboard.</p>
+    <div class="alert">
+        <p><strong>Important:</strong> If this is an emergency, please contact local authorities immediately by calling <strong>911</strong> or your local emergency number.</p>
+    </div>
+    <p>Best regards,<br>SafeZone101 Team</p>
+    """,
+    button_text="View Report Status",
+    button_url="https://safezone101.com/dashboard/reports",
+)
+
+register(
+    'alert_notification',
+    subject="EMERGENCY ALERT: {{ alert_title }} - SafeZone101",
+    title="EMERGENCY ALERT: {{ alert_title }}",
+    body="""
+    <div style="background-color: #ffebee; border-left: 4px solid #d32f2f; padding: 15px; margin: 20px 0;">
+        <h2 style="color: #d32f2f; margin: 0;">EMERGENCY ALERT</h2>
+    </div>
+    <p>Dear {{ first_name }} {{ last_name }},</p>
+    <p>This is an important emergency alert from <strong>SafeZone101</strong>:</p>
+    <div class="details">
+        <h3>Alert Details:</h3>
+        <p><strong>Alert Title:</strong> {{ alert_title }}</p>
+        <p><strong>Severity Level:</strong> <span style="color: {{ severity_color }}; font-weight: bold;">{{ severity }}</span></p>
+        <p><strong>Issued At:</strong> {{ issued_at }}</p>
+        <p><strong>Location Affected:</strong> {{ affected_area }}</p>
+    </div>
+    <div class="alert">
+        <h3>Message:</h3>
+        <p>{{ alert_message }}</p>
+    </div>
+    <div class="info">
+        <h3>Instructions:</h3>
+        <p>Please follow the safety instructions provided above. Stay safe and follow local authorities' guidance.</p>
+    </div>
+    <p>This alert has been sent to all SafeZone101 registered users in the affected area.</p>
+    <p>If this is a mistake or you wish to adjust your alert preferences, please log in to your account.</p>
+    <div class="footer" style="margin-top: 30px; padding: 15px; background-color: #f5f5f5; border-radius: 4px;">
+        <p>Stay safe,<br><strong>SafeZone101 Emergency Response Team</strong></p>
+    </div>
+    """,
+    button_text="View More Details",
+    button_url="https://safezone101.com/alerts",
+)
+
+register(
+    'contact_confirmation',
+    subject="Thank you for contacting SafeZone101 - Ticket #{{ ticket_number }}",
+    title="Contact Confirmation",
+    body="""
+    <p>Hi {{ name }},</p>
+    <div class="success">
+        <h2>Thank you for contacting SafeZone101, {{ name }}!</h2>
+        <p>We have received your message and will get back to you soon.</p>
+    </div>
+    <div class="details">
+        <h3>Ticket Details:</h3>
+        <p><strong>Ticket Number:</strong> {{ ticket_number }}</p>
+        <p><strong>Subject:</strong> {{ subject }}</p>
+        <p><strong>Your Message:</strong> {{ message_content }}</p>
+    </div>
+    <div class="info">
+        <p>You can reference this ticket number for any follow-up questions. If you need to reopen this ticket or add more information, please reply to this email or use the ticket number when contacting us.</p>
+    </div>
+    <p>Best regards,<br>SafeZone101 Team</p>
+    """,
+)
+
+register(
+    'admin_contact_notification',
+    subject="New Contact Form Submission - Ticket #{{ ticket_number }}",
+    title="New Contact Submission",
+    body="""
+    <div class="info">
+        <h2>New Contact Form Submission</h2>
+        <p>A new contact form has been submitted and requires your attention.</p>
+    </div>
+    <div class="details">
+        <h3>Contact Details:</h3>
+        <p><strong>Ticket Number:</strong> {{ ticket_number }}</p>
+        <p><strong>From:</strong> {{ name }} ({{ email }})</p>
+        <p><strong>Phone:</strong> {{ phone }}</p>
+        <p><strong>Subject:</strong> {{ subject }}</p>
+        <p><strong>Submitted at:</strong> {{ submitted_at }}</p>
+    </div>
+    <div class="details">
+        <h3>Message:</h3>
+        <p>{{ message_content }}</p>
+    </div>
+    <div class="alert">
+        <p><strong>Action Required:</strong> Please respond within 24 hours.</p>
+    </div>
+    <p>Best regards,<br>SafeZone101 System</p>
+    """,
+    button_text="View in Admin Panel",
+    button_url="https://safezone101.com/admin/contacts",
+)
+
+register(
+    'ticket_reopened',
+    subject="Your Ticket #{{ ticket_number }} Has Been Reopened - SafeZone101",
+    title="Ticket Reopened",
+    body="""
+    <p>Hi {{ name }},</p>
+    <div class="info">
+        <h2>Ticket Reopened</h2>
+        <p>Your support ticket <strong>#{{ ticket_number }}</strong> has been reopened by our support team.</p>
+    </div>
+    <div class="details">
+        <h3>Reopening Details:</h3>
+        <p><strong>Reopened by:</strong> {{ admin_name }}</p>
+        <p><strong>Reopened at:</strong> {{ reopened_at }}</p>
+    </div>
+    <div class="details">
+        <h3>Notes:</h3>
+        <p>{{ notes }}</p>
+    </div>
+    <div class="info">
+        <p>You can reply to this email to add more information to your ticket.</p>
+    </div>
+    <p>Best regards,<br>SafeZone101 Support Team</p>
+    """,
+    button_text="View Ticket Status",
+    button_url="https://safezone101.com/support/ticket/{{ ticket_number }}",
+)
+
+register(
+    'ticket_update',
+    subject="Update on Your Ticket #{{ ticket_number }} - SafeZone101",
+    title="Ticket Update",
+    body="""
+    <p>Hi {{ name }},</p>
+    <div class="info">
+        <h2>Ticket Update</h2>
+        <p>There's an update on your support ticket <strong>#{{ ticket_number }}</strong>.</p>
+    </div>
+    <div class="details">
+        <h3>Update Details:</h3>
+        <p><strong>New Status:</strong> <span style="color: {{ status_color }}; font-weight: bold;">{{ status_label }}</span></p>
+        <p><strong>Updated by:</strong> {{ admin_name }}</p>
+        <p><strong>Update Time:</strong> {{ updated_at }}</p>
+    </div>
+    <div class="details">
+        <h3>Update Message:</h3>
+        <p>{{ update_message }}</p>
+    </div>
+    <div class="info">
+        <p>You can reply to this email to respond to this update or provide additional information.</p>
+    </div>
+    <p>Best regards,<br>SafeZone101 Support Team</p>
+    """,
+    button_text="View Ticket",
+    button_url="https://safezone101.com/support/ticket/{{ ticket_number }}",
+)
+
+register(
+    'admin_new_user',
+    subject="New User Registered - SafeZone101",
+    title="New User Registration",
+    body="""
+    <p>Hello Admin,</p>
+    <div class="info">
+        <h2>New User Registration</h2>
+        <p>A new user has registered on SafeZone101.</p>
+    </div>
+    <div class="details">
+        <h3>User Details:</h3>
+        <p><strong>Name:</strong> {{ first_name }} {{ last_name }}</p>
+        <p><strong>Email:</strong> {{ email }}</p>
+        <p><strong>Phone:</strong> {{ phone }}</p>
+        <p><strong>Registration Date:</strong> {{ registered_at }}</p>
+        <p><strong>User ID:</strong> {{ user_id }}</p>
+    </div>
+    <p>Total registered users: <strong>{{ total_users }}</strong></p>
+    <p>You can view this user's profile in the admin dashboard.</p>
+    <p>Best regards,<br>SafeZone101 System</p>
+    """,
+    button_text="View User Profile",
+    button_url="https://safezone101.com/admin/users",
+)
+
+register(
+    'message_confirmation',
+    subject="We've received your message - SafeZone101",
+    title="Message Received",
+    body="""
+    <p>Hi there,</p>
+    <div class="success">
+        <h2>Message Received</h2>
+        <p>Thank you for contacting SafeZone101. We've received your message and our team will get back to you within 24-48 hours.</p>
+    </div>
+    <div class="details">
+        <h3>Your Message Details:</h3>
+        <p><strong>Subject:</strong> {{ title }}</p>
+        <p><strong>Message:</strong> {{ message_content }}</p>
+    </div>
+    <div class="alert">
+        <p>If you have any urgent concerns, please call our support hotline at <strong>+1-800-SAFE-ZONE</strong>.</p>
+    </div>
+    <p>Best regards,<br>SafeZone101 Customer Care Team</p>
+    """,
+)
+
+register(
+    'admin_reply',
+    subject="Re: {{ original_title }} - SafeZone101 Response",
+    title="Response to Your Message",
+    body="""
+    <p>Dear Valued User,</p>
+    <div class="info">
+        <h2>Response to Your Inquiry</h2>
+        <p>Thank you for contacting SafeZone101. Here is our response to your inquiry regarding <strong>"{{ original_title }}"</strong>.</p>
+    </div>
+    <div class="details">
+        <h3>Our Response:</h3>
+        <p>{{ reply_text }}</p>
+    </div>
+    <p>If you have any further questions or need additional assistance, please don't hesitate to contact us.</p>
+    <div class="footer" style="margin-top: 30px; padding: 15px; background-color: #f5f5f5; border-radius: 4px;">
+        <p>Best regards,</p>
+        <p><strong>{{ admin_name }}</strong><br>
+        Customer Care Specialist<br>
+        SafeZone101</p>
+    </div>
+    """,
+    button_text="Contact Support",
+    button_url="Safezonee101@gmail.com",
+)
+
+register(
+    'admin_report_notification',
+    subject="New {{ report_type }} Report Submitted - SafeZone101",
+    title="New {{ report_type }} Report",
+    body="""
+    <p>Hello Admin,</p>
+    <div class="info">
+        <h2>New {{ report_type }} Report Submitted</h2>
+        <p>A new {{ report_type }} report has been submitted to SafeZone101.</p>
+    </div>
+    <div class="details">
+        <h3>Report Details:</h3>
+        <p><strong>Title:</strong> {{ report_title }}</p>
+        <p><strong>Submitted by:</strong> {{ user_name }} ({{ user_email }})</p>
+        <p><strong>Urgency:</strong> <span style="color: {{ urgency_color }}">{{ urgency }}</span></p>
+        <p><strong>Location:</strong> {{ location }}</p>
+        <p><strong>Date:</strong> {{ date }}</p>
+        <p><strong>Description:</strong> {{ description }}</p>
+    </div>
+    <p>Please log in to your admin dashboard to review this report.</p>
+    <p>Best regards,<br>SafeZone101 System</p>
+    """,
+    button_text="Review Report",
+    button_url="https://safezone101.com/admin/reports",
+)
+
+register(
+    'report_confirmation_digest',
+    subject="{{ count }} Reports Have Been Submitted - SafeZone101",
+    title="Reports Submitted",
+    body="""
+    <p>Hi {{ user_name }},</p>
+    <div class="success">
+        <h2>{{ count }} Reports Submitted</h2>
+        <p>The following reports have been submitted to SafeZone101 on your behalf.</p>
+    </div>
+    <div class="details">
+        <h3>Reports:</h3>
+        {{ report_list|raw }}
+    </div>
+    <p>Our team will review them shortly. You can check their status in your dashboard.</p>
+    <p>Best regards,<br>SafeZone101 Team</p>
+    """,
+    button_text="View Report Status",
+    button_url="https://safezone101.com/dashboard/reports",
+)
+
+register(
+    'report_status_digest',
+    subject="Status Updates on {{ count }} of Your Reports - SafeZone101",
+    title="Report Status Updates",
+    body="""
+    <p>Hi {{ user_name }},</p>
+    <div class="info">
+        <h2>Report Status Updates</h2>
+        <p>The status of {{ count }} of your reports has been updated.</p>
+    </div>
+    <div class="details">
+        <h3>Changes:</h3>
+        {{ change_list|raw }}
+    </div>
+    <p>You can view the details in your dashboard.</p>
+    <p>Best regards,<br>SafeZone101 Team</p>
+    """,
+    button_text="View My Reports",
+    button_url="https://safezone101.com/dashboard/myreports",
+)
+
+register(
+    'notification_digest',
+    subject="{{ heading }} - SafeZone101",
+    title="{{ heading }}",
+    body="""
+    <p>Hi {{ user_name }},</p>
+    <div class="info">
+        <h2>{{ heading }}</h2>
+        <p>{{ intro }}</p>
+    </div>
+    <div class="details">
+        {{ item_list|raw }}
+    </div>
+    <p>You can change how often you get these emails in your notification settings.</p>
+    <p>Best regards,<br>SafeZone101 Team</p>
+    """,
+    button_text="Open Dashboard",
+    button_url="https://safezone101.com/dashboard",
+)
+
+register(
+    'admin_delivery_report',
+    subject="Alert Email Delivery Issues - {{ alert_title }}",
+    title="Alert Delivery Issues",
+    body="""
+    <div class="alert">
+        <h2>Alert Email Delivery Issues</h2>
+        <p>There were issues delivering emergency alert emails to some users.</p>
+    </div>
+    <div class="details">
+        <h3>Alert Details:</h3>
+        <p><strong>Alert:</strong> {{ alert_title }}</p>
+        <p><strong>Severity:</strong> {{ severity }}</p>
+        <p><strong>Sent:</strong> {{ sent_at }}</p>
+    </div>
+    <div class="details">
+        <h3>Delivery Statistics:</h3>
+        <p><strong>Total recipients:</strong> {{ total }}</p>
+        <p><strong>Successful deliveries:</strong> <span style="color: #4caf50">{{ successful }}</span></p>
+        <p><strong>Failed deliveries:</strong> <span style="color: #d32f2f">{{ failed }}</span></p>
+    </div>
+    <div class="details">
+        <h3>Failed Deliveries (first 10):</h3>
+        {{ failure_list|raw }}
+    </div>
+    <div class="info">
+        <h3>Action Required:</h3>
+        <p>Please review the failed email addresses and consider:</p>
+        <ol>
+            <li>Checking if these users need to update their email addresses</li>
+            <li>Verifying email server configuration</li>
+            <li>Following up with users who didn't receive critical alerts</li>
+        </ol>
+    </div>
+    <p>Best regards,<br>SafeZone101 System</p>
+    """,
+    button_text="Review Alerts",
+    button_url="https://safezone101.com/admin/alerts",
+)
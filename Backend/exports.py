@@ -0,0 +1,74 @@
+import csv
+import io
+import json
+from datetime import date, datetime
+from flask import Response, stream_with_context
+
+# ----------------- Export Settings -----------------
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+YIELD_PER = 1000      # rows fetched per server-side cursor round trip
+FLUSH_EVERY = 500     # rows buffered before a chunk is sent to the client
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if hasattr(value, 'value'):  # enums
+        return value.value
+    return value
+
+
+def _csv_cell(value):
+    value = _plain(value)
+    if isinstance(value, (list, dict)):
+        return json.dumps(value)
+    return value
+
+
+def iter_rows(query, fieldnames, fmt):
+    """Yield encoded chunks for ``query`` (a column query, not ORM entities).
+
+    Rows are pulled with yield_per, which maps to a server-side cursor on
+    PostgreSQL, so memory stays flat no matter how large the table is.
+    """
+    rows = query.yield_per(YIELD_PER)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == 'csv' else None
+    if writer:
+        writer.writerow(fieldnames)
+
+    pending = 0
+    for row in rows:
+        if writer:
+            writer.writerow([_csv_cell(v) for v in row])
+        else:
+            buffer.write(json.dumps({k: _plain(v) for k, v in zip(fieldnames, row)}, default=str))
+            buffer.write('\n')
+        pending += 1
+        if pending >= FLUSH_EVERY:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate(0)
+            pending = 0
+
+    remainder = buffer.getvalue()
+    if remainder:
+        yield remainder.encode('utf-8')
+
+
+def stream_export(query, fieldnames, fmt, filename):
+    """Build a streaming download response for a column query"""
+    extension = 'csv' if fmt == 'csv' else 'ndjson'
+    stamp = datetime.utcnow().strftime('%Y%m%d%H%M%S')
+    response = Response(stream_with_context(iter_rows(query, fieldnames, fmt)), content_type=EXPORT_FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}-{stamp}.{extension}"'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def export_columns(model, names):
+    """Resolve column names on a model into (columns, fieldnames)"""
+    return [getattr(model, name) for name in names], list(names)
@@ -1,9 +1,5 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
 from flask_mail import Mail
 
-mail = Mail()
-
 db = SQLAlchemy()
-migrate = Migrate()
 mail = Mail()
@@ -0,0 +1,66 @@
+"""Gunicorn settings for the production server; run ``gunicorn`` from Backend/.
+
+Every value can be overridden from the environment (WEB_CONCURRENCY, BIND, ...)
+or the command line. Multiple workers need the shared metrics directory, which
+is created per server start unless METRICS_MULTIPROC_DIR is set.
+"""
+import os
+import tempfile
+
+wsgi_app = 'wsgi:create_app()'
+bind = os.getenv('BIND', '0.0.0.0:5000')
+
+
+def cpu_count():
+    # CPUs this process may run on (cgroup/cpuset aware), not every CPU in the machine
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+# ----------------- Workers -----------------
+# Requests spend much of their time in SQLite/Postgres and SMTP, so a few threads
+# per process on top of the usual 2 x CPUs + 1 processes
+workers = int(os.getenv('WEB_CONCURRENCY', cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', 4))
+preload_app = os.getenv('GUNICORN_PRELOAD', '1') != '0'
+
+# Recycle workers to bound slow leaks; jitter keeps them from restarting together
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 60))
+# In-flight requests get this long after SIGTERM / recycling before the worker is killed
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = 5
+
+# Request logging is done by the app (instrumentation.py)
+accesslog = None
+errorlog = '-'
+
+os.environ.setdefault('METRICS_MULTIPROC_DIR', tempfile.mkdtemp(prefix='safezone-metrics-'))
+
+
+# ----------------- Hooks -----------------
+def post_fork(server, worker):
+    # The mail rate limits are split between the workers (see mail_transport.build_buckets);
+    # set here so a -w/--workers on the command line counts too
+    os.environ['WEB_CONCURRENCY'] = str(server.cfg.workers)
+    from lifecycle import after_fork
+    after_fork(server.app.wsgi())
+
+
+def child_exit(server, worker):
+    # In the master, once the worker is gone: fold its metrics file into the archive
+    from metrics import archive_process
+    try:
+        archive_process(worker.pid, os.environ['METRICS_MULTIPROC_DIR'])
+    except OSError as e:
+        server.log.warning(f'Could not archive metrics of worker {worker.pid}: {e}')
+
+
+def worker_exit(server, worker):
+    # Runs once in-flight requests are done; keep SHUTDOWN_DRAIN_SECONDS under graceful_timeout
+    from lifecycle import drain
+    drain(server.app.wsgi())
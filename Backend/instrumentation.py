@@ -0,0 +1,185 @@
+import json
+import logging
+import re
+import time
+from collections import Counter
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# ----------------- Instrumentation Settings -----------------
+# INSTRUMENTATION_ENABLED       time every request and count its queries (request
+#                               metrics in metrics.py are fed from here too)
+# INSTRUMENTATION_SERVER_TIMING add a Server-Timing header to every response
+# INSTRUMENTATION_REQUEST_LOG   write one JSON line per request to the 'safezone.requests' logger
+DUPLICATE_QUERY_THRESHOLD = 2     # identical statement + parameters this many times is flagged
+REPORTED_DUPLICATES = 5           # duplicate statements listed in the log line
+SQL_PREVIEW_LENGTH = 200
+
+request_log = logging.getLogger('safezone.requests')
+
+_listeners_registered = False
+_query_observers = []
+_request_observers = []
+_whitespace = re.compile(r'\s+')
+
+
+class RequestProfile:
+    """Wall/CPU time and SQL statistics for one request.
+
+    Lives on ``g.request_profile`` from before_request until the response is
+    sent. The engine-level cursor hooks below add to whichever profile is
+    active in the current request context; queries run outside a request
+    (schedulers, CLI) are not recorded.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.cpu_started = time.thread_time()
+        self.wall_ms = None
+        self.cpu_ms = None
+        self.query_count = 0
+        self.db_ms = 0.0
+        self.statements = Counter()
+
+    def record_query(self, statement, parameters, elapsed):
+        self.query_count += 1
+        self.db_ms += elapsed * 1000
+        self.statements[(statement, repr(parameters))] += 1
+
+    def finish(self):
+        self.wall_ms = (time.perf_counter() - self.started) * 1000
+        self.cpu_ms = (time.thread_time() - self.cpu_started) * 1000
+        return self
+
+    def duplicates(self, threshold=DUPLICATE_QUERY_THRESHOLD):
+        """[(statement, times)] for statements re-run with identical parameters, worst first"""
+        return [(statement, count) for (statement, _), count in self.statements.most_common()
+                if count >= threshold]
+
+    def server_timing(self):
+        return ', '.join([
+            f'app;dur={self.wall_ms:.1f}',
+            f'cpu;dur={self.cpu_ms:.1f}',
+            f'db;dur={self.db_ms:.1f};desc="{self.query_count} queries"',
+        ])
+
+    def to_dict(self):
+        duplicates = self.duplicates()
+        return {
+            'wall_ms': round(self.wall_ms, 2),
+            'cpu_ms': round(self.cpu_ms, 2),
+            'db_ms': round(self.db_ms, 2),
+            'queries': self.query_count,
+            'duplicate_queries': sum(count - 1 for _, count in duplicates),
+            'duplicates': [{'sql': preview_sql(statement), 'count': count}
+                           for statement, count in duplicates[:REPORTED_DUPLICATES]],
+        }
+
+
+def preview_sql(statement):
+    statement = _whitespace.sub(' ', statement).strip()
+    if len(statement) > SQL_PREVIEW_LENGTH:
+        return statement[:SQL_PREVIEW_LENGTH] + '...'
+    return statement
+
+
+def current_profile():
+    """The active request's RequestProfile, or None outside a profiled request"""
+    if not has_request_context():
+        return None
+    return g.get('request_profile')
+
+
+def route_label():
+    """'blueprint:rule' for the matched route; unmatched paths share one label"""
+    if request.url_rule is None:
+        return '<unmatched>'
+    rule = request.url_rule.rule
+    return f'{request.blueprint}:{rule}' if request.blueprint else rule
+
+
+def on_query(observer):
+    """Call ``observer(statement, parameters, elapsed_seconds, conn, executemany)`` after every SQL statement,
+    in or out of a request; ``conn`` is still open on the statement's transaction"""
+    _query_observers.append(observer)
+    return observer
+
+
+def on_request(observer):
+    """Call ``observer(profile, response)`` once a profiled request has finished"""
+    _request_observers.append(observer)
+    return observer
+
+
+# ----------------- Query Hooks -----------------
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    profile = current_profile()
+    if profile is not None:
+        profile.record_query(statement, parameters, elapsed)
+    for observer in _query_observers:
+        observer(statement, parameters, elapsed, conn, executemany)
+
+
+def _handle_error(exception_context):
+    # A failed statement never reaches after_cursor_execute
+    conn = exception_context.connection
+    if conn is not None and conn.info.get('query_started'):
+        conn.info['query_started'].pop()
+
+
+def register_listeners():
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Engine, 'handle_error', _handle_error)
+    _listeners_registered = True
+
+
+# ----------------- Request Hooks -----------------
+def _start_request():
+    g.request_profile = RequestProfile()
+
+
+def _finish_request(response):
+    profile = current_profile()
+    if profile is None:
+        return response
+    profile.finish()
+    for observer in _request_observers:
+        observer(profile, response)
+    config = current_app.config
+    if config.get('INSTRUMENTATION_SERVER_TIMING', True):
+        response.headers['Server-Timing'] = profile.server_timing()
+    if config.get('INSTRUMENTATION_REQUEST_LOG', True):
+        record = {
+            'method': request.method,
+            'route': route_label(),
+            'path': request.path,
+            'status': response.status_code,
+        }
+        record.update(profile.to_dict())
+        level = logging.WARNING if record['duplicate_queries'] else logging.INFO
+        request_log.log(level, json.dumps(record))
+    return response
+
+
+def init_instrumentation(app):
+    if not app.config.get('INSTRUMENTATION_ENABLED', True):
+        return
+    register_listeners()
+    if not request_log.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(message)s'))
+        request_log.addHandler(handler)
+        request_log.setLevel(logging.INFO)
+        request_log.propagate = False
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
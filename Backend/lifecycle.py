@@ -0,0 +1,143 @@
+import logging
+import os
+import tempfile
+import time
+from flask import jsonify
+from sqlalchemy import text
+from sqlalchemy.orm import configure_mappers
+from models import db
+from delivery_log import hand_off_in_flight, start_retry_scheduler, stop_retry_scheduler
+from digests import start_digest_scheduler, stop_digest_scheduler
+from email_templates import TEMPLATES, legacy_layout
+from media import wait_for_derivations
+from profiler import profiler
+
+try:
+    import fcntl
+except ImportError:     # not on Windows; every process then runs its own schedulers
+    fcntl = None
+
+# ----------------- Lifecycle Settings -----------------
+# Process lifecycle under the production server (gunicorn.conf.py / wsgi.py):
+# warm the app once in the master before forking, reset per-process state after
+# each fork, start the background schedulers in exactly one worker, and drain
+# in-process work when a worker exits (recycled after max_requests, or shutdown).
+#
+# SHUTDOWN_DRAIN_SECONDS   how long an exiting worker waits for queued media
+#                          derivations and a scheduler run in progress
+# SCHEDULER_LOCK_FILE      flock()ed by the worker that owns the digest/retry
+#                          schedulers; its replacement takes over when it exits
+DEFAULT_DRAIN_SECONDS = 20
+READINESS_PATH = '/readyz'
+
+lifecycle_log = logging.getLogger('safezone.lifecycle')
+
+_state = {'draining': False, 'scheduler_lock': None}
+
+
+def warm_up(app):
+    """Do the lazily-deferred work once, in the master, so forked workers share it"""
+    configure_mappers()
+    legacy_layout()
+    for template in TEMPLATES.values():
+        if not template.compiled:
+            template.compile()
+    with app.app_context():
+        # Startup's connections; workers open their own
+        for engine in db.engines.values():
+            engine.dispose()
+
+
+def after_fork(app):
+    """Per-worker setup: drop inherited DB connections, restart the profiler's sampler, maybe own the schedulers"""
+    _state['draining'] = False
+    with app.app_context():
+        # Pooled connections opened in the master must not be shared across processes
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+    profiler.after_fork()
+    if acquire_scheduler_lock(app):
+        start_background_jobs(app)
+
+
+def acquire_scheduler_lock(app):
+    if fcntl is None:
+        return True
+    path = app.config.get('SCHEDULER_LOCK_FILE') or os.path.join(tempfile.gettempdir(), 'safezone-schedulers.lock')
+    handle = open(path, 'a')
+    try:
+        fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        handle.close()
+        return False
+    _state['scheduler_lock'] = handle     # held (open) for the life of the process
+    return True
+
+
+def start_background_jobs(app):
+    if app.testing:
+        return
+    if app.config.get('DIGEST_SCHEDULER_ENABLED', True):
+        start_digest_scheduler(app)
+    if app.config.get('DELIVERY_RETRY_ENABLED', True):
+        start_retry_scheduler(app)
+    lifecycle_log.info(f'pid {os.getpid()} runs the background schedulers')
+
+
+def drain(app, timeout=None):
+    """Finish in-process work before the process exits; returns what was left undone.
+
+    In-flight requests (including streamed exports) are the server's job: it
+    stops accepting connections and waits up to graceful_timeout before this
+    runs. Derivations still queued afterwards are picked up by
+    `flask reports derive-media`; a scheduler run cut short is retried by the
+    next owner. Email deliveries this process left queued (a send cut short)
+    are handed to the retry queue, due at once, for whichever worker owns the
+    retry scheduler; the count handed off is reported as left undone.
+    """
+    _state['draining'] = True
+    if timeout is None:
+        timeout = app.config.get('SHUTDOWN_DRAIN_SECONDS', DEFAULT_DRAIN_SECONDS)
+    deadline = time.monotonic() + timeout
+    left = {'media_derivations': wait_for_derivations(timeout)}
+    left['digest_scheduler'] = not stop_digest_scheduler(max(0, deadline - time.monotonic()))
+    left['retry_scheduler'] = not stop_retry_scheduler(max(0, deadline - time.monotonic()))
+    with app.app_context():
+        try:
+            left['email_deliveries'] = hand_off_in_flight()
+        except Exception as e:
+            db.session.rollback()
+            lifecycle_log.error(f'pid {os.getpid()} could not hand off queued emails: {e}')
+            left['email_deliveries'] = 'requeued once stale'
+        finally:
+            db.session.remove()
+    if _state['scheduler_lock'] is not None:
+        _state['scheduler_lock'].close()
+        _state['scheduler_lock'] = None
+    level = logging.WARNING if any(left.values()) else logging.INFO
+    lifecycle_log.log(level, f'pid {os.getpid()} drained, left undone: {left}')
+    return left
+
+
+# ----------------- Readiness -----------------
+def readiness_view():
+    """200 while this process can serve traffic; 503 once draining or without a database"""
+    if _state['draining']:
+        return jsonify({'status': 'draining', 'pid': os.getpid()}), 503
+    try:
+        db.session.execute(text('SELECT 1'))
+    except Exception as e:
+        return jsonify({'status': 'unavailable', 'pid': os.getpid(), 'error': str(e)}), 503
+    finally:
+        db.session.remove()
+    return jsonify({'status': 'ready', 'pid': os.getpid()}), 200
+
+
+def init_lifecycle(app):
+    if not lifecycle_log.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(message)s'))
+        lifecycle_log.addHandler(handler)
+        lifecycle_log.setLevel(logging.INFO)
+        lifecycle_log.propagate = False
+    app.add_url_rule(READINESS_PATH, 'readiness', readiness_view, methods=['GET'])
@@ -0,0 +1,397 @@
+import math
+import click
+from datetime import datetime, date, timedelta
+from flask.cli import AppGroup
+from sqlalchemy import Integer, bindparam, cast, event, func, inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+from models import db, Report, Area, Ward, ReportHotspot
+from utils import increment_counter
+
+# ----------------- Garissa County Locations -----------------
+# Same vocabulary the report forms offer, grouped by area
+GARISSA_LOCATIONS = {
+    'Garissa Town': ['Garissa Central', 'Garissa North', 'Garissa West', 'Ijara', 'Saka', 'Shantaba'],
+    'Dadaab': ['Dagahaley', 'Ifo', 'Ifo II', 'Liboi'],
+    'Fafi': ['Bura', 'Dekaharia', 'Fafi', 'Jarajila', 'Nanighi'],
+    'Balambala': ['Balambala', 'Danyere', 'Jara Jara', 'Saka'],
+    'Lagdera': ['Baramagu', 'Labisagale', 'Lagdera', 'Sala'],
+    'Ijara': ['Hulugho', 'Ijara', 'Kotile', 'Masalani', 'Sangailu'],
+    'Hulugho': [],
+    'Sankuri': [],
+    'Bulas': [],
+}
+
+# Only names from this vocabulary become areas/wards; anything else stays free text on the report
+KNOWN_AREAS = {area.lower(): area for area in GARISSA_LOCATIONS}
+KNOWN_WARDS = {(area.lower(), ward.lower()): ward
+               for area, wards in GARISSA_LOCATIONS.items() for ward in wards}
+
+GRID_SIZE_DEGREES = 0.01  # ~1.1 km cells at the equator
+BUCKETS = ('day', 'week', 'month')
+
+locations_cli = AppGroup('locations', help='Area/ward dimension and hotspot aggregate commands.')
+
+_listeners_registered = False
+# Resolved ids never change, so (area) and (area_id, ward) lookups are cached per process.
+# Ids resolved inside a transaction wait in conn.info until it commits: an area or
+# ward inserted by a transaction that rolls back must not be handed out afterwards.
+_area_ids = {}
+_ward_ids = {}
+PENDING_KEY = 'pending_location_ids'
+
+
+def normalize_name(name):
+    return ' '.join((name or '').split()).strip()
+
+
+def geo_cell_for(latitude, longitude):
+    """Return the grid cell id for a coordinate pair, or None"""
+    if latitude is None or longitude is None:
+        return None
+    row = math.floor(latitude / GRID_SIZE_DEGREES)
+    col = math.floor(longitude / GRID_SIZE_DEGREES)
+    return f"{row}:{col}"
+
+
+def cell_bounds(geo_cell):
+    """Return (min_lat, min_lon, max_lat, max_lon) of a grid cell"""
+    row, col = (int(part) for part in geo_cell.split(':'))
+    return (row * GRID_SIZE_DEGREES, col * GRID_SIZE_DEGREES,
+            (row + 1) * GRID_SIZE_DEGREES, (col + 1) * GRID_SIZE_DEGREES)
+
+
+def parse_coordinates(data):
+    """Validate optional latitude/longitude in a request payload; raises ValueError"""
+    latitude, longitude = data.get('latitude'), data.get('longitude')
+    if latitude in (None, '') and longitude in (None, ''):
+        return None, None
+    try:
+        latitude, longitude = float(latitude), float(longitude)
+    except (TypeError, ValueError):
+        raise ValueError("latitude and longitude must both be numbers")
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError("latitude/longitude out of range")
+    return latitude, longitude
+
+
+# ----------------- Dimension Resolution -----------------
+def resolve_location_ids(conn, area_name, ward_name):
+    """Map free-text area/ward names onto (area_id, ward_id).
+
+    Names are matched case- and whitespace-insensitively against GARISSA_LOCATIONS;
+    an unknown area or ward resolves to None. A known name missing from the table
+    (e.g. during the migration backfill, before the seed ran) is inserted.
+    """
+    area_key = normalize_name(area_name).lower()
+    if area_key not in KNOWN_AREAS:
+        return None, None
+
+    area_id = _area_ids.get(area_key) or _pending(conn)[0].get(area_key)
+    if area_id is None:
+        area_id = _find_or_insert(
+            conn, "SELECT id FROM areas WHERE lower(name) = :key",
+            "INSERT INTO areas (name, county, created_at) VALUES (:name, 'Garissa', :now)",
+            {'key': area_key, 'name': KNOWN_AREAS[area_key]}
+        )
+        _pending(conn)[0][area_key] = area_id
+
+    ward_key = normalize_name(ward_name).lower()
+    if (area_key, ward_key) not in KNOWN_WARDS:
+        return area_id, None
+
+    ward_id = _ward_ids.get((area_id, ward_key)) or _pending(conn)[1].get((area_id, ward_key))
+    if ward_id is None:
+        ward_id = _find_or_insert(
+            conn, "SELECT id FROM wards WHERE area_id = :area_id AND lower(name) = :key",
+            "INSERT INTO wards (area_id, name, created_at) VALUES (:area_id, :name, :now)",
+            {'area_id': area_id, 'key': ward_key, 'name': KNOWN_WARDS[(area_key, ward_key)]}
+        )
+        _pending(conn)[1][(area_id, ward_key)] = ward_id
+    return area_id, ward_id
+
+
+def _find_or_insert(conn, select, insert, params):
+    row = conn.execute(text(select), params).first()
+    if row:
+        return row[0]
+    conn.execute(text(insert), dict(params, now=datetime.utcnow()))
+    return conn.execute(text(select), params).scalar()
+
+
+def _pending(conn):
+    return conn.info.setdefault(PENDING_KEY, ({}, {}))
+
+
+def _promote_pending(conn):
+    pending = conn.info.pop(PENDING_KEY, None)
+    if pending:
+        _area_ids.update(pending[0])
+        _ward_ids.update(pending[1])
+
+
+def _discard_pending(conn, *args):
+    conn.info.pop(PENDING_KEY, None)
+
+
+def _discard_on_reset(dbapi_connection, connection_record, reset_state):
+    # Checked back in without a commit: the pool rolled the transaction back
+    connection_record.info.pop(PENDING_KEY, None)
+
+
+def seed_locations():
+    """Insert the Garissa County areas and wards if missing. Returns number of rows added."""
+    added = 0
+    for area_name, ward_names in GARISSA_LOCATIONS.items():
+        area = Area.query.filter(func.lower(Area.name) == area_name.lower()).first()
+        if not area:
+            area = Area(name=area_name, county='Garissa')
+            db.session.add(area)
+            db.session.flush()
+            added += 1
+        existing = {w.name.lower() for w in area.wards}
+        for ward_name in ward_names:
+            if ward_name.lower() not in existing:
+                db.session.add(Ward(area_id=area.id, name=ward_name))
+                added += 1
+    db.session.commit()
+    return added
+
+
+# ----------------- Hotspot Aggregation -----------------
+def hotspot_key(area_id, ward_id, report_type, geo_cell, created_at):
+    return {
+        'bucket_date': (created_at or datetime.utcnow()).date(),
+        'area_id': area_id or 0,
+        'ward_id': ward_id or 0,
+        'report_type': report_type,
+        'geo_cell': geo_cell or '',
+    }
+
+
+def _old_value(state, attr):
+    history = state.attrs[attr].history
+    if history.deleted:
+        return history.deleted[0]
+    return getattr(state.obj(), attr)
+
+
+def _before_save(mapper, connection, target):
+    target.area_id, target.ward_id = resolve_location_ids(connection, target.area, target.ward)
+    target.geo_cell = geo_cell_for(target.latitude, target.longitude)
+
+
+def _after_insert(mapper, connection, target):
+    key = hotspot_key(target.area_id, target.ward_id, target.report_type, target.geo_cell, target.created_at)
+    increment_counter(connection, ReportHotspot.__table__, key, 1)
+
+
+def _after_update(mapper, connection, target):
+    state = inspect(target)
+    attrs = ('area_id', 'ward_id', 'report_type', 'geo_cell')
+    if not any(state.attrs[attr].history.has_changes() for attr in attrs):
+        return
+    old_key = hotspot_key(*(_old_value(state, attr) for attr in attrs), target.created_at)
+    new_key = hotspot_key(target.area_id, target.ward_id, target.report_type, target.geo_cell, target.created_at)
+    increment_counter(connection, ReportHotspot.__table__, old_key, -1)
+    increment_counter(connection, ReportHotspot.__table__, new_key, 1)
+
+
+def _after_delete(mapper, connection, target):
+    key = hotspot_key(target.area_id, target.ward_id, target.report_type, target.geo_cell, target.created_at)
+    increment_counter(connection, ReportHotspot.__table__, key, -1)
+
+
+def register_location_listeners():
+    """Normalize locations and maintain report_hotspots inside the writing transaction"""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(Report, 'before_insert', _before_save)
+    event.listen(Report, 'before_update', _before_save)
+    event.listen(Report, 'after_insert', _after_insert)
+    event.listen(Report, 'after_update', _after_update)
+    event.listen(Report, 'after_delete', _after_delete)
+    event.listen(Engine, 'commit', _promote_pending)
+    event.listen(Engine, 'rollback', _discard_pending)
+    event.listen(Engine, 'rollback_savepoint', _discard_pending)
+    event.listen(Pool, 'reset', _discard_on_reset)
+    _listeners_registered = True
+
+
+def init_locations(app, seed=True):
+    register_location_listeners()
+    if seed:
+        with app.app_context():
+            seed_locations()
+    app.cli.add_command(locations_cli)
+
+
+def prune_locations(conn):
+    """Delete areas/wards outside GARISSA_LOCATIONS (left by older free-text resolution).
+
+    Returns the number of rows deleted; callers re-resolve the reports that pointed at them.
+    """
+    names = {row[0]: row[1] for row in conn.execute(text("SELECT id, name FROM areas")).all()}
+    ward_ids = [
+        ward_id for ward_id, area_id, name in conn.execute(text("SELECT id, area_id, name FROM wards")).all()
+        if (normalize_name(names.get(area_id)).lower(), normalize_name(name).lower()) not in KNOWN_WARDS
+    ]
+    area_ids = [area_id for area_id, name in names.items() if normalize_name(name).lower() not in KNOWN_AREAS]
+    for table, ids in (('wards', ward_ids), ('areas', area_ids)):
+        if ids:
+            conn.execute(text(f"DELETE FROM {table} WHERE id IN :ids").bindparams(bindparam('ids', expanding=True)),
+                         {'ids': ids})
+    _area_ids.clear()
+    _ward_ids.clear()
+    return len(ward_ids) + len(area_ids)
+
+
+def backfill_hotspots():
+    """Re-resolve every report's location and rebuild report_hotspots from scratch"""
+    with db.engine.begin() as conn:
+        prune_locations(conn)
+        rows = conn.execute(text(
+            "SELECT id, area, ward, latitude, longitude FROM reports"
+        )).all()
+        for report_id, area, ward, latitude, longitude in rows:
+            area_id, ward_id = resolve_location_ids(conn, area, ward)
+            conn.execute(
+                text("UPDATE reports SET area_id = :a, ward_id = :w, geo_cell = :c WHERE id = :id"),
+                {'a': area_id, 'w': ward_id, 'c': geo_cell_for(latitude, longitude), 'id': report_id}
+            )
+
+    bucket = func.date(Report.created_at)
+    aggregated = db.session.query(
+        bucket, func.coalesce(Report.area_id, 0), func.coalesce(Report.ward_id, 0),
+        Report.report_type, func.coalesce(Report.geo_cell, ''), func.count(Report.id)
+    ).group_by(bucket, Report.area_id, Report.ward_id, Report.report_type, Report.geo_cell).all()
+
+    ReportHotspot.query.delete()
+    db.session.bulk_insert_mappings(ReportHotspot, [
+        {
+            'bucket_date': day if isinstance(day, date) else date.fromisoformat(str(day)[:10]),
+            'area_id': area_id, 'ward_id': ward_id, 'report_type': report_type,
+            'geo_cell': geo_cell, 'count': count
+        }
+        for day, area_id, ward_id, report_type, geo_cell, count in aggregated
+    ])
+    db.session.commit()
+    return len(rows)
+
+
+@locations_cli.command('seed')
+def seed_command():
+    """Insert the Garissa County areas and wards."""
+    click.echo(f"Added {seed_locations()} areas/wards.")
+
+
+@locations_cli.command('backfill')
+def backfill_command():
+    """Normalize existing report locations and rebuild hotspot aggregates."""
+    click.echo(f"Re-aggregated {backfill_hotspots()} reports.")
+
+
+# ----------------- Hotspot Queries -----------------
+def cell_range(bbox):
+    """(min_row, min_col, max_row, max_col) of the grid cells overlapping a bounding box.
+
+    A max edge lying on a cell boundary does not pull in the cell beyond it.
+    """
+    # Rounded first: -0.46 / 0.01 is -46.00000000000001
+    min_lat, min_lon, max_lat, max_lon = (round(value / GRID_SIZE_DEGREES, 9) for value in bbox)
+    min_row, min_col = math.floor(min_lat), math.floor(min_lon)
+    return min_row, min_col, max(math.ceil(max_lat) - 1, min_row), max(math.ceil(max_lon) - 1, min_col)
+
+
+def cell_index_expressions():
+    """SQL expressions for the integer (row, col) of ReportHotspot.geo_cell"""
+    cell = ReportHotspot.geo_cell
+    if db.engine.dialect.name == 'postgresql':
+        row, col = func.split_part(cell, ':', 1), func.split_part(cell, ':', 2)
+    else:
+        separator = func.instr(cell, ':')
+        row, col = func.substr(cell, 1, separator - 1), func.substr(cell, separator + 1)
+    return cast(row, Integer), cast(col, Integer)
+
+
+def bucket_start(day, bucket):
+    if bucket == 'week':
+        return day - timedelta(days=day.weekday())
+    if bucket == 'month':
+        return day.replace(day=1)
+    return day
+
+
+def get_hotspots(start=None, end=None, bucket='day', group_by=('ward',), area_id=None,
+                 ward_id=None, report_type=None, bbox=None):
+    """Aggregate report_hotspots rows; never touches the reports table.
+
+    group_by is any combination of 'area', 'ward', 'report_type', 'bucket', 'cell'.
+    bbox is (min_lat, min_lon, max_lat, max_lon) and limits results to grid cells overlapping it.
+    """
+    columns = {
+        'area': ReportHotspot.area_id,
+        'ward': ReportHotspot.ward_id,
+        'report_type': ReportHotspot.report_type,
+        'cell': ReportHotspot.geo_cell,
+    }
+    selected = [g for g in group_by if g in columns]
+    if bbox and 'cell' not in selected:
+        selected.append('cell')
+    query_columns = [columns[g] for g in selected]
+    if 'bucket' in group_by:
+        query_columns.append(ReportHotspot.bucket_date)
+
+    query = db.session.query(*query_columns, func.sum(ReportHotspot.count))
+    if start:
+        query = query.filter(ReportHotspot.bucket_date >= start)
+    if end:
+        query = query.filter(ReportHotspot.bucket_date <= end)
+    if area_id:
+        query = query.filter(ReportHotspot.area_id == area_id)
+    if ward_id:
+        query = query.filter(ReportHotspot.ward_id == ward_id)
+    if report_type:
+        query = query.filter(ReportHotspot.report_type == report_type)
+    if 'cell' in selected:
+        query = query.filter(ReportHotspot.geo_cell != '')
+    if bbox:
+        min_row, min_col, max_row, max_col = cell_range(bbox)
+        cell_row, cell_col = cell_index_expressions()
+        query = query.filter(cell_row.between(min_row, max_row), cell_col.between(min_col, max_col))
+    rows = query.group_by(*query_columns).all()
+
+    # Fold day rows into week/month buckets
+    totals = {}
+    for row in rows:
+        values = dict(zip(selected, row[:len(selected)]))
+        if 'bucket' in group_by:
+            day = row[len(selected)]
+            if not isinstance(day, date):
+                day = date.fromisoformat(str(day)[:10])
+            values['bucket'] = bucket_start(day, bucket).isoformat()
+        key = tuple(values.get(g) for g in group_by)
+        totals[key] = totals.get(key, 0) + int(row[-1] or 0)
+
+    names = {}
+    if 'area' in group_by:
+        names['area'] = {a.id: a.name for a in Area.query.all()}
+    if 'ward' in group_by:
+        names['ward'] = {w.id: w.name for w in Ward.query.all()}
+
+    results = []
+    for key, count in totals.items():
+        if count <= 0:
+            continue
+        item = dict(zip(group_by, key))
+        for dimension in ('area', 'ward'):
+            if dimension in item:
+                item[f'{dimension}_id'] = item.pop(dimension) or None
+                item[f'{dimension}_name'] = names[dimension].get(item[f'{dimension}_id'])
+        if 'cell' in item:
+            item['bounds'] = cell_bounds(item['cell'])
+        item['count'] = count
+        results.append(item)
+    results.sort(key=lambda item: item['count'], reverse=True)
+    return results
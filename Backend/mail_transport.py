@@ -0,0 +1,797 @@
+import base64
+import heapq
+import itertools
+import os
+import smtplib
+import socketserver
+import threading
+import time
+from collections import deque, namedtuple
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+import click
+from flask import current_app, has_app_context
+from flask.cli import AppGroup
+
+# ----------------- Mail Transport Settings -----------------
+# Every outgoing email (utils helpers, alert broadcasts, Flask-Mail messages
+# from the contact and email blueprints) goes through one MailService, which
+# owns the connection pool, the rate limit, retries and the counters.
+#
+# MAIL_TRANSPORT picks where outgoing mail goes:
+#   smtp    MAIL_SMTP_HOST:MAIL_SMTP_PORT (Gmail over SSL by default; point it at
+#           `flask mail sink` with MAIL_SMTP_SSL=0 for local runs)
+#   memory  kept in the transport's outbox, nothing leaves the process
+# Settings are read from the app config, then the environment.
+#
+# The SMTP password has no default: set SENDER_PASSWORD (or MAIL_SMTP_PASSWORD).
+# Without it every SMTP send fails with MailNotConfigured instead of trying to
+# log in; set MAIL_SMTP_USERNAME to an empty string for servers that take mail
+# without AUTH (such as the local sink).
+SENDER_EMAIL = os.getenv('SENDER_EMAIL', 'Safezonee101@gmail.com')
+SENDER_PASSWORD = os.getenv('SENDER_PASSWORD', '')
+
+DEFAULTS = {
+    'MAIL_TRANSPORT': 'smtp',
+    'MAIL_SMTP_HOST': 'smtp.gmail.com',
+    'MAIL_SMTP_PORT': 465,
+    'MAIL_SMTP_SSL': True,
+    'MAIL_SMTP_STARTTLS': False,
+    'MAIL_SMTP_USERNAME': SENDER_EMAIL,
+    'MAIL_SMTP_PASSWORD': SENDER_PASSWORD,
+    'MAIL_SMTP_TIMEOUT': 30,
+    'MAIL_MEMORY_OUTBOX_SIZE': 10000,
+    'MAIL_POOL_SIZE': 2,                # idle connections kept open
+    'MAIL_POOL_MAX_IDLE': 60,           # seconds before an idle connection is closed
+    'MAIL_POOL_MAX_MESSAGES': 100,      # transactions before a connection is recycled
+    'MAIL_RATE_PER_SECOND': 0.0,        # recipients per second, 0 = unlimited
+    'MAIL_RATE_BURST': 0,               # bucket size, 0 = one second's worth
+    'MAIL_RATE_PER_MINUTE': None,       # recipients per minute, None = provider default, 0 = unlimited
+    'MAIL_DAILY_QUOTA': None,           # recipients per UTC day, None = provider default, 0 = unlimited
+    'WEB_CONCURRENCY': 1,               # worker processes sharing the per-second/per-minute rates
+    'MAIL_SEND_RETRIES': 2,             # extra attempts after a transient failure
+    'MAIL_RETRY_BACKOFF': 0.5,          # seconds, doubled per attempt
+}
+FALSE_VALUES = ('0', 'false', 'no', 'off', '')
+
+mail_cli = AppGroup('mail', help='Mail transport commands.')
+
+CapturedMessage = namedtuple('CapturedMessage', ['sender', 'recipients', 'data', 'sent_at'])
+
+
+def mail_setting(key):
+    if has_app_context() and key in current_app.config:
+        return current_app.config[key]
+    value = os.environ.get(key)
+    if value is None:
+        return DEFAULTS[key]
+    default = DEFAULTS[key]
+    if isinstance(default, bool):
+        return value.lower() not in FALSE_VALUES
+    if isinstance(default, int):
+        return int(value)
+    if isinstance(default, float):
+        return float(value)
+    if default is None:
+        return int(value)
+    return value
+
+
+# ----------------- Statistics -----------------
+class TransportStats:
+    """Connection and message counters, plus optional per-send timings for benchmarks"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.trace = None
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connections = 0
+            self.reused = 0
+            self.transactions = 0
+            self.messages = 0
+            self.failures = 0
+            self.retries = 0
+            self.throttled_seconds = 0.0
+            self.send_seconds = 0.0
+
+    def start_trace(self):
+        """Record (recipients, started, finished) for every transaction from now on"""
+        self.trace = []
+
+    def record_connection(self):
+        with self._lock:
+            self.connections += 1
+
+    def record_reuse(self):
+        with self._lock:
+            self.reused += 1
+
+    def record_retry(self):
+        with self._lock:
+            self.retries += 1
+
+    def record_throttle(self, seconds):
+        if seconds:
+            with self._lock:
+                self.throttled_seconds += seconds
+
+    def record_transaction(self, recipients, started, failed=False):
+        finished = time.perf_counter()
+        with self._lock:
+            self.transactions += 1
+            self.send_seconds += finished - started
+            if failed:
+                self.failures += 1
+            else:
+                self.messages += len(recipients)
+            if self.trace is not None:
+                self.trace.append((tuple(recipients), started, finished))
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'connections': self.connections,
+                'reused_connections': self.reused,
+                'transactions': self.transactions,
+                'messages': self.messages,
+                'failures': self.failures,
+                'retries': self.retries,
+                'throttled_seconds': round(self.throttled_seconds, 3),
+                'avg_send_ms': round(self.send_seconds / self.transactions * 1000, 2) if self.transactions else 0.0,
+                'messages_per_connection': round(self.messages / self.connections, 2) if self.connections else 0.0,
+            }
+
+
+class _CountingConnection:
+    """Wraps an SMTP client so each sendmail is counted and timed"""
+
+    def __init__(self, client, stats):
+        self.client = client
+        self.stats = stats
+        self.sent = 0
+
+    def sendmail(self, sender, recipients, data):
+        if isinstance(recipients, str):
+            recipients = [recipients]
+        self.sent += 1
+        started = time.perf_counter()
+        try:
+            refused = self.client.sendmail(sender, recipients, data)
+        except Exception:
+            self.stats.record_transaction(recipients, started, failed=True)
+            raise
+        self.stats.record_transaction(recipients, started)
+        return refused
+
+    def quit(self):
+        return self.client.quit()
+
+    def close(self):
+        return self.client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            self.client.quit()
+        except (smtplib.SMTPException, OSError):
+            pass
+        finally:
+            self.client.close()
+
+
+# ----------------- Transports -----------------
+class MailNotConfigured(smtplib.SMTPException):
+    """SMTP is selected but has a username and no password to log in with"""
+
+
+class SMTPTransport:
+    name = 'smtp'
+
+    def __init__(self, host, port, username=None, password=None, use_ssl=True, starttls=False, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_ssl = use_ssl
+        self.starttls = starttls
+        self.timeout = timeout
+        self.stats = TransportStats()
+
+    @property
+    def configured(self):
+        return bool(self.password) or not self.username
+
+    def connect(self):
+        """Open a logged-in SMTP session; use it as a context manager to close it"""
+        if not self.configured:
+            raise MailNotConfigured(f"No SMTP password for {self.username}; set SENDER_PASSWORD or MAIL_SMTP_PASSWORD")
+        if self.use_ssl:
+            client = smtplib.SMTP_SSL(self.host, self.port, timeout=self.timeout)
+        else:
+            client = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+            if self.starttls:
+                client.starttls()
+        if self.username and self.password:
+            client.login(self.username, self.password)
+        self.stats.record_connection()
+        return _CountingConnection(client, self.stats)
+
+
+class _MemoryConnection:
+    def __init__(self, transport):
+        self.transport = transport
+        self.sent = 0
+
+    def sendmail(self, sender, recipients, data):
+        if isinstance(recipients, str):
+            recipients = [recipients]
+        self.sent += 1
+        started = time.perf_counter()
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        self.transport.outbox.append(CapturedMessage(sender, tuple(recipients), data, time.perf_counter()))
+        self.transport.stats.record_transaction(recipients, started)
+        return {}
+
+    def quit(self):
+        pass
+
+    def close(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class MemoryTransport:
+    """Keeps sent messages in ``outbox`` (newest last, bounded) instead of delivering them"""
+    name = 'memory'
+
+    def __init__(self, max_messages=10000):
+        self.outbox = deque(maxlen=max_messages)
+        self.stats = TransportStats()
+
+    def connect(self):
+        self.stats.record_connection()
+        return _MemoryConnection(self)
+
+    def clear(self):
+        self.outbox.clear()
+        self.stats.reset()
+
+
+# ----------------- Send Governor -----------------
+# Priority classes, most urgent first. When tokens are short the most urgent
+# waiter is served first, and each class must leave a share of every bucket
+# untouched so a bulk blast can never use up what OTP emails need.
+PRIORITIES = ('auth', 'alert', 'transactional', 'digest')
+PRIORITY_RESERVE = {'auth': 0.0, 'alert': 0.05, 'transactional': 0.15, 'digest': 0.3}
+# Longest a send may wait for tokens before it is handed back as RateLimited
+# (the delivery log then defers it to the retry queue)
+PRIORITY_MAX_WAIT = {'auth': 20.0, 'alert': 2.0, 'transactional': 5.0, 'digest': 0.0}
+# Used when MAIL_RATE_PER_MINUTE/MAIL_DAILY_QUOTA are not set for a known host.
+# Limits are for the whole server. The daily quota is counted in the database
+# (MailQuotaUsage), so every worker and every recycled worker draws on the same
+# allowance. The per-second and per-minute rates are split evenly between the
+# WEB_CONCURRENCY worker processes, each of which keeps its own buckets.
+PROVIDER_LIMITS = {
+    'smtp.gmail.com': {'MAIL_RATE_PER_MINUTE': 60, 'MAIL_DAILY_QUOTA': 500},
+}
+
+
+class RateLimited(Exception):
+    """No tokens within the allowed wait; retry after ``retry_after`` seconds"""
+
+    def __init__(self, priority, retry_after):
+        super().__init__(f"Send rate limit reached for {priority} mail; retry in {retry_after:.0f}s")
+        self.priority = priority
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """``capacity`` tokens refilled continuously at ``rate`` per second"""
+
+    def __init__(self, name, rate, capacity):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay_for(self, count, reserve):
+        floor = self.capacity * reserve
+        # A batch larger than the class may ever hold waits for a full share instead
+        count = min(count, self.capacity - floor)
+        missing = count + floor - self.tokens
+        return 0.0 if missing <= 0 else missing / self.rate
+
+    def take(self, count):
+        # Always the full recipient count: an oversized batch leaves the bucket
+        # in debt, and later sends wait until the refill has paid it back
+        self.tokens -= count
+
+
+class DailyQuota:
+    """A per-UTC-day recipient quota counted in the database, shared by every worker process.
+
+    Outside an app context (or if the counter cannot be written) the send is
+    not counted rather than blocked.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+
+    def claim(self, count, reserve):
+        """Count ``count`` recipients against today; returns 0 or the seconds until the quota resets"""
+        if not has_app_context():
+            return 0.0
+        # Imported here: models needs the app's extensions, this module does not
+        from models import db, MailQuotaUsage
+        from utils import increment_counter
+        now = datetime.utcnow()
+        table = MailQuotaUsage.__table__
+        try:
+            # Its own short transaction, so the count never depends on the caller's commit
+            with db.engine.begin() as connection:
+                increment_counter(connection, table, {'day': now.date()}, count, count_column='sent')
+                sent = connection.execute(table.select().with_only_columns(table.c.sent)
+                                          .where(table.c.day == now.date())).scalar_one()
+                if sent <= self.limit * (1 - reserve):
+                    return 0.0
+                connection.rollback()
+        except Exception as e:
+            current_app.logger.warning(f"Mail quota not counted: {e}")
+            return 0.0
+        tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        return (tomorrow - now).total_seconds()
+
+    def used(self):
+        if not has_app_context():
+            return None
+        from models import db, MailQuotaUsage
+        return db.session.query(MailQuotaUsage.sent).filter_by(day=datetime.utcnow().date()).scalar() or 0
+
+
+class SendGovernor:
+    """Hands out tokens from a transport's buckets in priority order.
+
+    Waiters queue on a heap of (priority, arrival). Only the head of the queue
+    may take tokens, so an OTP that arrives in the middle of an alert blast is
+    the next message sent. A send that would wait longer than its class allows
+    raises RateLimited instead of blocking the request that made it, as does
+    one that the shared daily ``quota`` will not take until tomorrow.
+    """
+
+    def __init__(self, buckets, reserve=None, max_wait=None, quota=None):
+        self.buckets = [bucket for bucket in buckets if bucket.rate > 0 and bucket.capacity > 0]
+        self.quota = quota if quota is not None and quota.limit > 0 else None
+        self.reserve = reserve or PRIORITY_RESERVE
+        self.max_wait = max_wait or PRIORITY_MAX_WAIT
+        self.granted = {priority: 0 for priority in PRIORITIES}
+        self.limited = {priority: 0 for priority in PRIORITIES}
+        self._waiters = []
+        self._arrivals = itertools.count()
+        self._cond = threading.Condition()
+
+    def acquire(self, count=1, priority='transactional', max_wait=None):
+        """Take ``count`` tokens for a ``priority`` send; returns the seconds spent waiting"""
+        if priority not in self.reserve:
+            raise ValueError(f"Unknown mail priority: {priority}")
+        if not self.buckets and self.quota is None:
+            return 0.0
+        max_wait = self.max_wait[priority] if max_wait is None else max_wait
+        reserve = self.reserve[priority]
+        ticket = (PRIORITIES.index(priority), next(self._arrivals))
+        started = time.monotonic()
+        with self._cond:
+            heapq.heappush(self._waiters, ticket)
+            self._cond.notify_all()
+            try:
+                while True:
+                    now = time.monotonic()
+                    for bucket in self.buckets:
+                        bucket.refill(now)
+                    delay = max((bucket.delay_for(count, reserve) for bucket in self.buckets), default=0.0)
+                    waited = now - started
+                    if self._waiters[0] == ticket and delay == 0:
+                        retry_after = self.quota.claim(count, reserve) if self.quota else 0.0
+                        if retry_after:
+                            self.limited[priority] += 1
+                            raise RateLimited(priority, retry_after)
+                        for bucket in self.buckets:
+                            bucket.take(count)
+                        self.granted[priority] += 1
+                        return waited
+                    if waited + delay > max_wait:
+                        self.limited[priority] += 1
+                        raise RateLimited(priority, delay)
+                    # Woken early when the head of the queue changes
+                    self._cond.wait(timeout=min(max(delay, 0.01), max_wait - waited))
+            finally:
+                self._waiters.remove(ticket)
+                heapq.heapify(self._waiters)
+                self._cond.notify_all()
+
+    def snapshot(self):
+        with self._cond:
+            now = time.monotonic()
+            for bucket in self.buckets:
+                bucket.refill(now)
+            return {
+                'buckets': {b.name: {'tokens': round(b.tokens, 2), 'capacity': b.capacity} for b in self.buckets},
+                'daily_quota': {'limit': self.quota.limit, 'used': self.quota.used()} if self.quota else None,
+                'waiting': len(self._waiters),
+                'granted': dict(self.granted),
+                'rate_limited': dict(self.limited),
+            }
+
+
+def _provider_limit(transport, key):
+    value = mail_setting(key)
+    return PROVIDER_LIMITS.get(getattr(transport, 'host', None), {}).get(key, 0) if value is None else value
+
+
+def build_buckets(transport):
+    """This process's share of the server-wide per-second and per-minute rates"""
+    workers = max(1, mail_setting('WEB_CONCURRENCY'))
+    per_second = mail_setting('MAIL_RATE_PER_SECOND') / workers
+    per_minute = _provider_limit(transport, 'MAIL_RATE_PER_MINUTE') / workers
+    burst = mail_setting('MAIL_RATE_BURST') / workers
+    return [
+        TokenBucket('second', per_second, burst or max(1.0, per_second)),
+        TokenBucket('minute', per_minute / 60.0, per_minute),
+    ]
+
+
+def build_quota(transport):
+    return DailyQuota(_provider_limit(transport, 'MAIL_DAILY_QUOTA'))
+
+
+# ----------------- Mail Service -----------------
+def is_transient(error):
+    """Whether a send failure is worth retrying later"""
+    if isinstance(error, RateLimited):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return False
+    if isinstance(error, (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)):
+        return True
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return False
+
+
+def _close(connection):
+    try:
+        connection.__exit__(None, None, None)
+    except Exception:
+        pass
+
+
+class MailService:
+    """Sends every outgoing message over a shared pool of transport connections.
+
+    Connections are reused until they sit idle for ``max_idle`` seconds or have
+    carried ``max_messages`` transactions. Each send first takes one token per
+    recipient from the governor for its priority class, and transient failures
+    (dropped connection, 4xx replies) are retried with exponential backoff.
+    """
+
+    def __init__(self, transport, pool_size=2, max_idle=60, max_messages=100, governor=None,
+                 retries=2, backoff=0.5):
+        self.transport = transport
+        self.pool_size = pool_size
+        self.max_idle = max_idle
+        self.max_messages = max_messages
+        self.governor = governor or SendGovernor([])
+        self.retries = retries
+        self.backoff = backoff
+        self._idle = []          # (connection, last_used)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_settings(cls, transport):
+        return cls(
+            transport,
+            pool_size=mail_setting('MAIL_POOL_SIZE'),
+            max_idle=mail_setting('MAIL_POOL_MAX_IDLE'),
+            max_messages=mail_setting('MAIL_POOL_MAX_MESSAGES'),
+            governor=SendGovernor(build_buckets(transport), quota=build_quota(transport)),
+            retries=mail_setting('MAIL_SEND_RETRIES'),
+            backoff=mail_setting('MAIL_RETRY_BACKOFF'),
+        )
+
+    @property
+    def stats(self):
+        return self.transport.stats
+
+    def _checkout(self):
+        now = time.monotonic()
+        stale = []
+        connection = None
+        with self._lock:
+            while self._idle:
+                candidate, last_used = self._idle.pop()
+                if now - last_used <= self.max_idle:
+                    connection = candidate
+                    break
+                stale.append(candidate)
+        for candidate in stale:
+            _close(candidate)
+        if connection is not None:
+            self.stats.record_reuse()
+            return connection
+        return self.transport.connect()
+
+    def _checkin(self, connection):
+        if connection.sent < self.max_messages:
+            with self._lock:
+                if len(self._idle) < self.pool_size:
+                    self._idle.append((connection, time.monotonic()))
+                    return
+        _close(connection)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a pooled connection; it is discarded instead of returned if the block raises"""
+        connection = self._checkout()
+        try:
+            yield connection
+        except Exception:
+            _close(connection)
+            raise
+        self._checkin(connection)
+
+    def send(self, sender, recipients, data, priority='transactional', max_wait=None):
+        """Send one encoded message; returns the refused-recipients dict like sendmail.
+
+        Raises RateLimited when the ``priority`` class cannot get tokens within
+        ``max_wait`` seconds (default: PRIORITY_MAX_WAIT for the class).
+        """
+        if isinstance(recipients, str):
+            recipients = [recipients]
+        self.stats.record_throttle(self.governor.acquire(len(recipients), priority, max_wait))
+        for attempt in range(self.retries + 1):
+            try:
+                with self.connection() as connection:
+                    return connection.sendmail(sender, recipients, data) or {}
+            except Exception as e:
+                if attempt >= self.retries or not is_transient(e):
+                    raise
+                self.stats.record_retry()
+                time.sleep(self.backoff * (2 ** attempt))
+
+    def close(self):
+        """Close every idle pooled connection"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection, _ in idle:
+            _close(connection)
+
+
+_services = {}
+_override = None
+_services_lock = threading.Lock()
+
+
+def build_transport():
+    kind = mail_setting('MAIL_TRANSPORT')
+    if kind == 'memory':
+        return MemoryTransport(mail_setting('MAIL_MEMORY_OUTBOX_SIZE'))
+    if kind == 'smtp':
+        return SMTPTransport(
+            mail_setting('MAIL_SMTP_HOST'),
+            mail_setting('MAIL_SMTP_PORT'),
+            username=mail_setting('MAIL_SMTP_USERNAME'),
+            password=mail_setting('MAIL_SMTP_PASSWORD'),
+            use_ssl=mail_setting('MAIL_SMTP_SSL'),
+            starttls=mail_setting('MAIL_SMTP_STARTTLS'),
+            timeout=mail_setting('MAIL_SMTP_TIMEOUT'),
+        )
+    raise ValueError(f"Unknown MAIL_TRANSPORT: {kind}")
+
+
+def get_mail_service():
+    """The configured service; one per distinct configuration so the pool and stats are shared"""
+    if _override is not None:
+        return _override
+    key = tuple(mail_setting(k) for k in DEFAULTS)
+    with _services_lock:
+        if key not in _services:
+            _services[key] = MailService.from_settings(build_transport())
+        return _services[key]
+
+
+def get_transport():
+    return get_mail_service().transport
+
+
+def set_transport(transport):
+    """Route all mail through ``transport`` (None restores the configured one)"""
+    global _override
+    if _override is not None:
+        _override.close()
+    _override = MailService.from_settings(transport) if transport is not None else None
+
+
+def mail_connection():
+    """Borrow a pooled connection on the configured transport (a context manager)"""
+    return get_mail_service().connection()
+
+
+def send_message(sender, recipients, data, priority='transactional', max_wait=None):
+    """Send one already-encoded message through the shared mail service"""
+    return get_mail_service().send(sender, recipients, data, priority, max_wait)
+
+
+def send_flask_message(message):
+    """Send a Flask-Mail Message through the shared mail service"""
+    return send_message(message.sender, list(message.send_to), message.as_bytes())
+
+
+# ----------------- Local SMTP Sink -----------------
+def _envelope_address(argument):
+    """The path in a MAIL FROM/RCPT TO argument, without ESMTP parameters such as SIZE="""
+    argument = argument.strip()
+    if argument.startswith('<'):
+        return argument[1:argument.find('>')] if '>' in argument else argument[1:]
+    return argument.split(' ', 1)[0]
+
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    """Just enough ESMTP for smtplib: EHLO, AUTH, MAIL, RCPT, DATA, RSET, NOOP, QUIT"""
+
+    def reply(self, line):
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+
+    def handle(self):
+        sink = self.server.sink
+        sink.record_session()
+        self.reply('220 safezone101-sink ESMTP')
+        sender, recipients = None, []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode('utf-8', 'replace').strip()
+            verb = command[:4].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.wfile.write(b'250-safezone101-sink\r\n250-8BITMIME\r\n250-AUTH PLAIN LOGIN\r\n250 SIZE 52428800\r\n')
+            elif verb == 'AUTH':
+                parts = command.split()
+                if len(parts) >= 2 and parts[1].upper() == 'LOGIN':
+                    prompts = (b'Username:', b'Password:') if len(parts) == 2 else (b'Password:',)
+                    for prompt in prompts:
+                        self.reply('334 ' + base64.b64encode(prompt).decode('ascii'))
+                        self.rfile.readline()
+                elif len(parts) == 2:
+                    self.reply('334 ')
+                    self.rfile.readline()
+                self.reply('235 2.7.0 Authentication successful')
+            elif verb == 'MAIL':
+                sender, recipients = _envelope_address(command[10:]), []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(_envelope_address(command[8:]))
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                lines = []
+                while True:
+                    data_line = self.rfile.readline()
+                    if not data_line or data_line in (b'.\r\n', b'.\n'):
+                        break
+                    lines.append(data_line[1:] if data_line.startswith(b'..') else data_line)
+                if sink.latency:
+                    time.sleep(sink.latency)
+                sink.deliver(sender, recipients, b''.join(lines))
+                sender, recipients = None, []
+                self.reply('250 OK: queued')
+            elif verb in ('RSET', 'NOOP'):
+                if verb == 'RSET':
+                    sender, recipients = None, []
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class _SinkServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class SMTPSink:
+    """A local SMTP server that accepts everything and delivers nowhere.
+
+    Each accepted message is timestamped (time.perf_counter) so a benchmark in
+    the same process can measure delivery latency; bodies are kept only with
+    ``keep_messages``. ``latency`` adds a per-message delay to mimic a real relay.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, keep_messages=False, max_messages=10000):
+        self.latency = latency
+        self.keep_messages = keep_messages
+        self.messages = deque(maxlen=max_messages)
+        self.received = deque(maxlen=max_messages)   # (recipients, perf_counter) per message
+        self.sessions = 0
+        self.message_count = 0
+        self._lock = threading.Lock()
+        self._server = _SinkServer((host, port), _SinkHandler)
+        self._server.sink = self
+        self._thread = None
+
+    @property
+    def address(self):
+        return self._server.server_address[:2]
+
+    def record_session(self):
+        with self._lock:
+            self.sessions += 1
+
+    def deliver(self, sender, recipients, data):
+        received_at = time.perf_counter()
+        with self._lock:
+            self.message_count += 1
+            self.received.append((tuple(recipients), received_at))
+            if self.keep_messages:
+                self.messages.append(CapturedMessage(sender, tuple(recipients), data, received_at))
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name='smtp-sink', daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def stop(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread.join()
+        self._server.server_close()
+
+    def transport(self):
+        """An SMTPTransport pointed at this sink"""
+        host, port = self.address
+        return SMTPTransport(host, port, username='sink', password='sink', use_ssl=False)
+
+
+def init_mail(app):
+    app.cli.add_command(mail_cli)
+    with app.app_context():
+        transport = get_transport()
+    if not getattr(transport, 'configured', True):
+        app.logger.warning(f"SMTP is disabled: no password for {transport.username} "
+                           f"(set SENDER_PASSWORD or MAIL_SMTP_PASSWORD)")
+
+
+@mail_cli.command('sink')
+@click.option('--host', default='127.0.0.1', show_default=True)
+@click.option('--port', default=1025, show_default=True, type=int)
+@click.option('--latency', default=0.0, show_default=True, type=float, help='Seconds to wait per message.')
+def sink_command(host, port, latency):
+    """Run a local SMTP sink (set MAIL_SMTP_HOST/MAIL_SMTP_PORT to it and MAIL_SMTP_SSL=0)."""
+    sink = SMTPSink(host, port, latency=latency)
+    click.echo(f"SMTP sink listening on {host}:{port}; Ctrl+C to stop.")
+    try:
+        sink.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        click.echo(f"Accepted {sink.message_count} messages over {sink.sessions} sessions.")
+        sink.stop()
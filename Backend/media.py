@@ -0,0 +1,219 @@
+import os
+import queue
+import shutil
+import subprocess
+import threading
+import time
+from flask import current_app
+from sqlalchemy import and_, exists, or_
+from models import db, ReportMedia, ReportMediaDerivative
+
+# ----------------- Derivation Settings -----------------
+THUMBNAIL_SIZE = (320, 320)
+THUMBNAIL_QUALITY = 80
+FFMPEG_TIMEOUT = 30  # seconds
+MAX_ATTEMPTS = 3  # failed derivatives are left alone after this many tries; regenerate to retry
+
+# Pillow and ffmpeg are optional: without them derivatives are marked unsupported
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+_jobs = queue.Queue()
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_upload_dir(app=None):
+    """Return the directory uploaded media is stored in"""
+    app = app or current_app
+    return os.path.join(app.root_path, 'uploads')
+
+
+def url_to_path(url, app=None):
+    """Map a '/uploads/<file>' URL onto its path on disk"""
+    if not url or not url.startswith('/uploads/'):
+        return None
+    return os.path.join(get_upload_dir(app), os.path.basename(url))
+
+
+def derivative_filename(filename, kind):
+    """Derivatives live next to the original, e.g. abc_photo.png -> abc_photo_thumb.jpg"""
+    stem = filename.rsplit('.', 1)[0]
+    suffix = 'thumb' if kind == 'thumbnail' else kind
+    return f"{stem}_{suffix}.jpg"
+
+
+def kinds_for_media(media_type):
+    """Which derivatives a media item should get"""
+    if media_type == 'image':
+        return ['thumbnail']
+    if media_type == 'video':
+        return ['poster', 'thumbnail']
+    return []
+
+
+# ----------------- Renderers -----------------
+def make_image_thumbnail(source_path, target_path):
+    """Write a fixed-size JPEG thumbnail and return its (width, height)"""
+    if Image is None:
+        raise RuntimeError("Pillow is not installed")
+    with Image.open(source_path) as image:
+        image.thumbnail(THUMBNAIL_SIZE)
+        if image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        image.save(target_path, 'JPEG', quality=THUMBNAIL_QUALITY, optimize=True)
+        return image.size
+
+
+def make_video_poster(source_path, target_path):
+    """Grab a single frame from a video with ffmpeg"""
+    ffmpeg = shutil.which('ffmpeg')
+    if not ffmpeg:
+        raise RuntimeError("ffmpeg is not available")
+    subprocess.run(
+        [ffmpeg, '-y', '-loglevel', 'error', '-ss', '1', '-i', source_path,
+         '-frames:v', '1', '-q:v', '3', target_path],
+        check=True, timeout=FFMPEG_TIMEOUT,
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    if Image is not None:
+        with Image.open(target_path) as image:
+            return image.size
+    return (None, None)
+
+
+def tooling_available(kind, media_type):
+    if media_type == 'video' and not shutil.which('ffmpeg'):
+        return False
+    if kind == 'thumbnail' and Image is None:
+        return False
+    return True
+
+
+# ----------------- Derivation -----------------
+def derive_media(media_id):
+    """Produce all derivatives for one ReportMedia row. Must run inside an app context."""
+    media = ReportMedia.query.get(media_id)
+    if not media:
+        return []
+
+    source_path = url_to_path(media.url)
+    existing = {d.kind: d for d in media.derivatives}
+    results = []
+
+    for kind in kinds_for_media(media.type):
+        derivative = existing.get(kind)
+        if derivative and derivative.status == 'ready':
+            results.append(derivative)
+            continue
+        if not derivative:
+            derivative = ReportMediaDerivative(media_id=media.id, kind=kind, attempts=0)
+            db.session.add(derivative)
+        derivative.attempts = (derivative.attempts or 0) + 1
+
+        if not source_path or not os.path.exists(source_path):
+            derivative.status = 'failed'
+            derivative.error = 'Original file not found'
+        elif not tooling_available(kind, media.type):
+            derivative.status = 'unsupported'
+            derivative.error = 'Required tooling is not installed'
+        else:
+            filename = derivative_filename(os.path.basename(source_path), kind)
+            target_path = os.path.join(os.path.dirname(source_path), filename)
+            try:
+                if media.type == 'video' and kind == 'poster':
+                    width, height = make_video_poster(source_path, target_path)
+                elif media.type == 'video':
+                    # Video thumbnails are scaled down from the poster frame
+                    poster = existing.get('poster') or next(
+                        (r for r in results if r.kind == 'poster'), None)
+                    poster_path = url_to_path(poster.url) if poster and poster.url else None
+                    if not poster_path or not os.path.exists(poster_path):
+                        raise RuntimeError("Poster frame is missing")
+                    width, height = make_image_thumbnail(poster_path, target_path)
+                else:
+                    width, height = make_image_thumbnail(source_path, target_path)
+
+                derivative.url = f"/uploads/{filename}"
+                derivative.width = width
+                derivative.height = height
+                derivative.size = os.path.getsize(target_path)
+                derivative.status = 'ready'
+                derivative.error = None
+            except Exception as e:
+                derivative.status = 'failed'
+                derivative.error = str(e)[:500]
+        results.append(derivative)
+
+    db.session.commit()
+    return results
+
+
+def _run_worker():
+    while True:
+        app, media_id = _jobs.get()
+        with app.app_context():
+            try:
+                derive_media(media_id)
+            except Exception as e:
+                db.session.rollback()
+                app.logger.error(f"Media derivation failed for {media_id}: {str(e)}")
+            finally:
+                db.session.remove()
+                _jobs.task_done()
+
+
+def enqueue_derivatives(media_ids):
+    """Queue media ids for background thumbnail/poster generation"""
+    global _worker
+    app = current_app._get_current_object()
+    with _worker_lock:
+        if _worker is None or not _worker.is_alive():
+            _worker = threading.Thread(target=_run_worker, name='media-derivation', daemon=True)
+            _worker.start()
+    # Each job carries its app: the worker outlives the app that started it (e.g. across test apps)
+    for media_id in media_ids:
+        if media_id:
+            _jobs.put((app, media_id))
+
+
+def wait_for_derivations(timeout):
+    """Block until every queued derivation has run or ``timeout`` passes; returns the jobs left"""
+    deadline = time.monotonic() + timeout
+    with _jobs.all_tasks_done:
+        while _jobs.unfinished_tasks:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            _jobs.all_tasks_done.wait(remaining)
+        return _jobs.unfinished_tasks
+
+
+def derive_missing(limit=None):
+    """Synchronously derive every image/video missing a finished derivative of any kind it needs.
+
+    A derivative that failed MAX_ATTEMPTS times counts as finished until it is regenerated.
+    """
+    def finished(kind):
+        return exists().where(
+            ReportMediaDerivative.media_id == ReportMedia.id,
+            ReportMediaDerivative.kind == kind,
+            or_(ReportMediaDerivative.status.in_(['ready', 'unsupported']),
+                ReportMediaDerivative.attempts >= MAX_ATTEMPTS)
+        )
+
+    # A video with a ready poster but a failed thumbnail still needs deriving
+    missing = or_(*(
+        and_(ReportMedia.type == media_type, ~finished(kind))
+        for media_type in ('image', 'video') for kind in kinds_for_media(media_type)
+    ))
+    query = db.session.query(ReportMedia.id).filter(missing).order_by(ReportMedia.created_at.asc())
+    if limit:
+        query = query.limit(limit)
+
+    media_ids = [row[0] for row in query.all()]
+    for media_id in media_ids:
+        derive_media(media_id)
+    return len(media_ids)
@@ -0,0 +1,404 @@
+import atexit
+import glob
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+from flask import Response, current_app, request
+from instrumentation import on_query, on_request, register_listeners
+
+# ----------------- Metrics Settings -----------------
+# METRICS_ENABLED          register the collectors and the /metrics endpoint
+# METRICS_TOKEN            when set, scrapers must send "Authorization: Bearer <token>"
+# METRICS_PUBLIC           serve /metrics without a token. Without either setting,
+#                          /metrics answers 403 unless the app runs in debug or testing
+#                          mode, since route names and traffic are not for the public
+# METRICS_MULTIPROC_DIR    shared directory; each worker process writes its samples
+#                          there and /metrics sums every file, so any worker can
+#                          answer a scrape for the whole server. When a worker exits
+#                          the server folds its file into ARCHIVE_FILE (see
+#                          archive_process and gunicorn.conf.py's child_exit).
+#                          Empty it on deploy.
+FLUSH_SECONDS = 5
+ARCHIVE_FILE = 'archived-metrics.json'    # totals of every exited process
+COLLECT_ATTEMPTS = 3
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (.0005, .001, .0025, .005, .01, .025, .05, .1, .25, 1)
+FANOUT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+BYTES_BUCKETS = (10e3, 100e3, 500e3, 1e6, 5e6, 10e6, 25e6, 50e6)
+
+_observers_registered = False
+
+
+class Counter:
+    type = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [[list(key), value] for key, value in self._values.items()]
+
+    def reset_after_fork(self):
+        # The parent's lock may have been held by another thread mid-fork
+        self._lock = threading.Lock()
+        self._values = {}
+
+
+class Histogram(Counter):
+    """Cumulative-bucket histogram; each label set keeps [bucket counts..., sum, count]"""
+    type = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def samples(self):
+        with self._lock:
+            return [[list(key), list(state)] for key, state in self._values.items()]
+
+
+class Registry:
+    """Process-local set of metrics, snapshotted as plain JSON for cross-process merging"""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def snapshot(self):
+        return {name: metric.samples() for name, metric in self.metrics.items()}
+
+    def reset_after_fork(self):
+        for metric in self.metrics.values():
+            metric.reset_after_fork()
+
+
+registry = Registry()
+
+REQUESTS = registry.counter(
+    'http_requests_total', 'HTTP requests handled.', ('blueprint', 'route', 'method', 'status'))
+REQUEST_LATENCY = registry.histogram(
+    'http_request_duration_seconds', 'Time spent handling a request.', ('blueprint', 'route'))
+REQUEST_QUERIES = registry.counter(
+    'http_request_db_queries_total', 'SQL statements run while handling requests.', ('blueprint', 'route'))
+REQUEST_DB_TIME = registry.counter(
+    'http_request_db_seconds_total', 'Time spent in SQL while handling requests.', ('blueprint', 'route'))
+QUERY_LATENCY = registry.histogram(
+    'db_query_duration_seconds', 'SQL statement execution time, requests and background jobs alike.',
+    buckets=QUERY_BUCKETS)
+SMTP_SENDS = registry.counter(
+    'smtp_messages_total', 'Emails handed to the mail transport, per helper and outcome.', ('helper', 'outcome'))
+SMTP_LATENCY = registry.histogram(
+    'smtp_send_duration_seconds', 'Time to hand one send (message or batch) to the mail transport.', ('helper',))
+FANOUT = registry.histogram(
+    'notification_fanout_recipients', 'Recipients per notification fan-out.', ('kind', 'channel'),
+    buckets=FANOUT_BUCKETS)
+UPLOAD_BYTES = registry.histogram(
+    'upload_bytes', 'Size of uploaded media files.', ('endpoint',), buckets=BYTES_BUCKETS)
+UPLOAD_LATENCY = registry.histogram(
+    'upload_duration_seconds', 'Time to store one uploaded media file.', ('endpoint',))
+SESSION_LOOKUPS = registry.counter(
+    'session_store_lookups_total', 'Server-side session loads: hit, miss (unknown or expired id) or none (no cookie).',
+    ('result',))
+
+
+# ----------------- Recording Helpers -----------------
+def record_smtp_send(helper, outcome, seconds, messages=1):
+    SMTP_SENDS.inc(messages, helper=helper, outcome=outcome)
+    SMTP_LATENCY.observe(seconds, helper=helper)
+
+
+def record_fanout(kind, recipients, channel='in_app'):
+    FANOUT.observe(recipients, kind=kind, channel=channel)
+
+
+def record_upload(endpoint, size, seconds):
+    UPLOAD_BYTES.observe(size, endpoint=endpoint)
+    UPLOAD_LATENCY.observe(seconds, endpoint=endpoint)
+
+
+def _observe_query(statement, parameters, elapsed, conn, executemany):
+    QUERY_LATENCY.observe(elapsed)
+
+
+def _observe_request(profile, response):
+    labels = {'blueprint': request.blueprint or '',
+              'route': request.url_rule.rule if request.url_rule else '<unmatched>'}
+    REQUESTS.inc(method=request.method, status=response.status_code, **labels)
+    REQUEST_LATENCY.observe(profile.wall_ms / 1000, **labels)
+    REQUEST_QUERIES.inc(profile.query_count, **labels)
+    REQUEST_DB_TIME.inc(profile.db_ms / 1000, **labels)
+    _flusher.ensure_started()
+
+
+def instrument_sessions(app):
+    """Count session store hits and misses around the app's session interface"""
+    interface = app.session_interface
+    open_session = interface.open_session
+    cookie_name = app.config['SESSION_COOKIE_NAME']
+
+    def counted_open_session(app, request):
+        session = open_session(app, request)
+        if not request.cookies.get(cookie_name):
+            result = 'none'
+        else:
+            result = 'hit' if session else 'miss'
+        SESSION_LOOKUPS.inc(result=result)
+        return session
+
+    interface.open_session = counted_open_session
+
+
+# ----------------- Multi-process Aggregation -----------------
+class Flusher:
+    """Writes this process's snapshot to METRICS_MULTIPROC_DIR every FLUSH_SECONDS.
+
+    Files are named by pid and start time. Counters are cumulative, so an exited
+    worker's totals must still count: archive_process folds its last file into
+    ARCHIVE_FILE and deletes it. A forked child starts from zero (see the
+    register_at_fork hook below) and writes its own file.
+    """
+
+    def __init__(self):
+        self.directory = None
+        self.ident = f'{os.getpid()}-{int(time.time() * 1000)}'
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def path(self):
+        return os.path.join(self.directory, f'metrics-{self.ident}.json')
+
+    def flush(self):
+        if not self.directory:
+            return
+        _write_snapshot(self.directory, self.path(), registry.snapshot())
+
+    def _run(self):
+        while True:
+            time.sleep(FLUSH_SECONDS)
+            try:
+                self.flush()
+            except OSError:
+                pass
+
+    def ensure_started(self):
+        if not self.directory or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='metrics-flusher', daemon=True)
+                self._thread.start()
+
+    def after_fork(self):
+        self.ident = f'{os.getpid()}-{int(time.time() * 1000)}'
+        self._thread = None
+        self._lock = threading.Lock()
+        registry.reset_after_fork()
+
+
+_flusher = Flusher()
+atexit.register(_flusher.flush)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_flusher.after_fork)
+
+
+def merge(snapshots):
+    """Sum a list of snapshots sample by sample"""
+    merged = {}
+    for snapshot in snapshots:
+        for name, samples in snapshot.items():
+            if name not in registry.metrics:
+                continue
+            totals = merged.setdefault(name, {})
+            for labels, value in samples:
+                key = tuple(labels)
+                if isinstance(value, list):
+                    current = totals.get(key)
+                    totals[key] = value if current is None else [a + b for a, b in zip(current, value)]
+                else:
+                    totals[key] = totals.get(key, 0) + value
+    return merged
+
+
+def _write_snapshot(directory, path, snapshot):
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix='.metrics-')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(snapshot, f)
+    os.replace(tmp, path)
+
+
+def _load(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def _load_archive(directory):
+    try:
+        return _load(os.path.join(directory, ARCHIVE_FILE))
+    except FileNotFoundError:
+        return {}
+
+
+def _merged_snapshot(merged):
+    return {name: [[list(key), value] for key, value in samples.items()] for name, samples in merged.items()}
+
+
+def archive_process(pid, directory=None):
+    """Fold an exited process's snapshot files into ARCHIVE_FILE and delete them.
+
+    Called from one place only (the server master's child_exit hook), after the
+    process is gone. The archive is replaced before the files are deleted, so a
+    scrape never misses those totals; see collect for the other half.
+    """
+    directory = directory or _flusher.directory
+    if not directory:
+        return 0
+    paths = glob.glob(os.path.join(directory, f'metrics-{pid}-*.json'))
+    if not paths:
+        return 0
+    snapshots = [_load_archive(directory)]
+    for path in paths:
+        try:
+            snapshots.append(_load(path))
+        except (OSError, ValueError):
+            continue
+    _write_snapshot(directory, os.path.join(directory, ARCHIVE_FILE), _merged_snapshot(merge(snapshots)))
+    for path in paths:
+        os.remove(path)
+    return len(paths)
+
+
+def collect():
+    """This process's samples plus the archive and every other live process's last flushed file"""
+    if not _flusher.directory:
+        return merge([registry.snapshot()])
+    own = _flusher.path()
+    for attempt in range(COLLECT_ATTEMPTS):
+        # Listed before the archive is read: a file archived in between is then
+        # either still readable (and not yet in the archive we read) or gone,
+        # which means start over rather than drop its totals
+        paths = [path for path in glob.glob(os.path.join(_flusher.directory, 'metrics-*.json')) if path != own]
+        try:
+            snapshots = [registry.snapshot(), _load_archive(_flusher.directory)]
+        except (OSError, ValueError):
+            snapshots = [registry.snapshot()]
+        vanished = False
+        for path in paths:
+            try:
+                snapshots.append(_load(path))
+            except FileNotFoundError:
+                vanished = True
+                break
+            except (OSError, ValueError):
+                continue
+        if not vanished or attempt == COLLECT_ATTEMPTS - 1:
+            return merge(snapshots)
+
+
+# ----------------- Exposition -----------------
+INF_BUCKET = 'le="+Inf"'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render(merged):
+    """Prometheus text exposition format (0.0.4)"""
+    lines = []
+    for name, metric in registry.metrics.items():
+        lines.append(f'# HELP {name} {metric.documentation}')
+        lines.append(f'# TYPE {name} {metric.type}')
+        for key, value in sorted(merged.get(name, {}).items()):
+            if metric.type == 'counter':
+                lines.append(f'{name}{_labels(metric.labelnames, key)} {_number(value)}')
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets, value):
+                cumulative += count
+                bucket = f'le="{_number(bound)}"'
+                lines.append(f'{name}_bucket{_labels(metric.labelnames, key, bucket)} {cumulative}')
+            lines.append(f'{name}_bucket{_labels(metric.labelnames, key, INF_BUCKET)} {value[-1]}')
+            lines.append(f'{name}_sum{_labels(metric.labelnames, key)} {_number(value[-2])}')
+            lines.append(f'{name}_count{_labels(metric.labelnames, key)} {value[-1]}')
+    return '\n'.join(lines) + '\n'
+
+
+def _metrics_public():
+    value = current_app.config.get('METRICS_PUBLIC', os.getenv('METRICS_PUBLIC', ''))
+    return str(value).lower() not in ('0', 'false', 'no', 'off', '')
+
+
+def metrics_view():
+    token = current_app.config.get('METRICS_TOKEN') or os.getenv('METRICS_TOKEN')
+    if token:
+        supplied = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(supplied, f'Bearer {token}'):
+            return Response('Unauthorized\n', status=401, mimetype='text/plain')
+    elif not (current_app.debug or current_app.testing or _metrics_public()):
+        return Response('Forbidden: set METRICS_TOKEN (or METRICS_PUBLIC)\n', status=403, mimetype='text/plain')
+    return Response(render(collect()), content_type=CONTENT_TYPE)
+
+
+def init_metrics(app):
+    global _observers_registered
+    if not app.config.get('METRICS_ENABLED', True):
+        return
+    register_listeners()
+    if not _observers_registered:
+        on_query(_observe_query)
+        on_request(_observe_request)
+        _observers_registered = True
+    directory = app.config.get('METRICS_MULTIPROC_DIR') or os.getenv('METRICS_MULTIPROC_DIR')
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+        _flusher.directory = directory
+    instrument_sessions(app)
+    app.add_url_rule('/metrics', 'metrics', metrics_view, methods=['GET'])
@@ -0,0 +1,71 @@
+"""report location columns
+
+Adds the normalized location columns to reports and resolves area_id/ward_id
+for the reports that already exist, counting them into report_hotspots. The
+areas, wards and report_hotspots tables themselves are created by
+db.create_all() at startup, which runs before the upgrade.
+
+Revision ID: 3f1c8a2d9b10
+Revises: 
+Create Date: 2026-10-19 09:12:41.530211
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c8a2d9b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if 'area_id' in {column['name'] for column in sa.inspect(bind).get_columns('reports')}:
+        return  # created by db.create_all() with these columns already
+
+    with op.batch_alter_table('reports') as batch_op:
+        batch_op.add_column(sa.Column('area_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('ward_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('geo_cell', sa.String(length=32), nullable=True))
+        batch_op.create_index('ix_reports_area_id', ['area_id'])
+        batch_op.create_index('ix_reports_ward_id', ['ward_id'])
+        batch_op.create_index('ix_reports_geo_cell', ['geo_cell'])
+        batch_op.create_foreign_key('fk_reports_area_id_areas', 'areas', ['area_id'], ['id'], ondelete='SET NULL')
+        batch_op.create_foreign_key('fk_reports_ward_id_wards', 'wards', ['ward_id'], ['id'], ondelete='SET NULL')
+
+    # Existing reports have no coordinates, so only the area/ward ids need resolving
+    from locations import resolve_location_ids, hotspot_key
+    from models import ReportHotspot
+    from utils import increment_counter
+
+    reports = sa.table(
+        'reports', sa.column('id'), sa.column('area'), sa.column('ward'), sa.column('report_type'),
+        sa.column('created_at', sa.DateTime()), sa.column('area_id'), sa.column('ward_id'),
+    )
+    rows = bind.execute(sa.select(
+        reports.c.id, reports.c.area, reports.c.ward, reports.c.report_type, reports.c.created_at
+    )).all()
+    for report_id, area, ward, report_type, created_at in rows:
+        area_id, ward_id = resolve_location_ids(bind, area, ward)
+        bind.execute(reports.update().where(reports.c.id == report_id).values(area_id=area_id, ward_id=ward_id))
+        increment_counter(bind, ReportHotspot.__table__, hotspot_key(area_id, ward_id, report_type, None, created_at), 1)
+
+
+def downgrade():
+    with op.batch_alter_table('reports') as batch_op:
+        batch_op.drop_constraint('fk_reports_ward_id_wards', type_='foreignkey')
+        batch_op.drop_constraint('fk_reports_area_id_areas', type_='foreignkey')
+        batch_op.drop_index('ix_reports_geo_cell')
+        batch_op.drop_index('ix_reports_ward_id')
+        batch_op.drop_index('ix_reports_area_id')
+        batch_op.drop_column('geo_cell')
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
+        batch_op.drop_column('ward_id')
+        batch_op.drop_column('area_id')
+    op.execute('DELETE FROM report_hotspots')
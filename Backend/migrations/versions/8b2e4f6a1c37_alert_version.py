@@ -0,0 +1,51 @@
+"""alert version
+
+Adds the alert feed's change version to alerts. Existing alerts are numbered
+1..n in the order they were last changed and the 'alerts' change sequence is
+moved past them, so the first delta request after the upgrade (since=0) gets a
+full snapshot and later edits get versions above every existing alert.
+
+Revision ID: 8b2e4f6a1c37
+Revises: 3f1c8a2d9b10
+Create Date: 2026-10-19 09:27:05.118402
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8b2e4f6a1c37'
+down_revision = '3f1c8a2d9b10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if 'version' in {column['name'] for column in sa.inspect(bind).get_columns('alerts')}:
+        return  # created by db.create_all() with the column already
+
+    op.add_column('alerts', sa.Column('version', sa.BigInteger(), nullable=False, server_default='0'))
+    op.create_index('ix_alerts_version', 'alerts', ['version'])
+
+    alerts = sa.table('alerts', sa.column('id'), sa.column('created_at'), sa.column('updated_at'),
+                      sa.column('version'))
+    sequences = sa.table('change_sequences', sa.column('name'), sa.column('value'))
+    ids = bind.execute(sa.select(alerts.c.id).order_by(
+        sa.func.coalesce(alerts.c.updated_at, alerts.c.created_at), alerts.c.id
+    )).scalars().all()
+    for version, alert_id in enumerate(ids, start=1):
+        bind.execute(alerts.update().where(alerts.c.id == alert_id).values(version=version))
+
+    current = bind.execute(sa.select(sequences.c.value).where(sequences.c.name == 'alerts')).scalar()
+    if current is None:
+        bind.execute(sequences.insert().values(name='alerts', value=len(ids)))
+    elif current < len(ids):
+        bind.execute(sequences.update().where(sequences.c.name == 'alerts').values(value=len(ids)))
+
+
+def downgrade():
+    op.drop_index('ix_alerts_version', table_name='alerts')
+    with op.batch_alter_table('alerts') as batch_op:
+        batch_op.drop_column('version')
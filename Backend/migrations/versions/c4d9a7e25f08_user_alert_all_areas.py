@@ -0,0 +1,49 @@
+"""user alert_all_areas
+
+Adds the "alerts for every area" opt-in to users (off for existing users, as
+for new ones) and fills the user_locations index that alert targeting reads
+from the city/state existing users already gave.
+
+Revision ID: c4d9a7e25f08
+Revises: 8b2e4f6a1c37
+Create Date: 2026-10-19 09:41:52.904733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c4d9a7e25f08'
+down_revision = '8b2e4f6a1c37'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if 'alert_all_areas' in {column['name'] for column in sa.inspect(bind).get_columns('users')}:
+        return  # created by db.create_all() with the column already
+
+    op.add_column('users', sa.Column('alert_all_areas', sa.Boolean(), nullable=False, server_default=sa.false()))
+    op.create_index('ix_users_alert_all_areas', 'users', ['alert_all_areas'])
+
+    from alert_targeting import user_location_keys
+
+    users = sa.table('users', sa.column('id'), sa.column('city'), sa.column('state'))
+    user_locations = sa.table('user_locations', sa.column('user_id'), sa.column('location_key'),
+                              sa.column('source'))
+    rows = []
+    for user in bind.execute(sa.select(users.c.id, users.c.city, users.c.state)).all():
+        rows.extend({'user_id': user.id, 'location_key': key, 'source': source}
+                    for key, source in user_location_keys(user))
+    bind.execute(user_locations.delete())
+    if rows:
+        bind.execute(user_locations.insert(), rows)
+
+
+def downgrade():
+    op.drop_index('ix_users_alert_all_areas', table_name='users')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.drop_column('alert_all_areas')
+    op.execute('DELETE FROM user_locations')
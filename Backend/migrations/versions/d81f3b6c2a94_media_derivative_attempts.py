@@ -0,0 +1,34 @@
+"""media derivative attempts
+
+Counts derivation attempts per derivative so derive_missing stops retrying a
+derivative that keeps failing (see media.MAX_ATTEMPTS). Existing derivatives
+start at 0 attempts.
+
+Revision ID: d81f3b6c2a94
+Revises: c4d9a7e25f08
+Create Date: 2026-10-19 14:12:37.550219
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81f3b6c2a94'
+down_revision = 'c4d9a7e25f08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    bind = op.get_bind()
+    if 'attempts' in {column['name'] for column in sa.inspect(bind).get_columns('report_media_derivatives')}:
+        return  # created by db.create_all() with the column already
+
+    op.add_column('report_media_derivatives',
+                  sa.Column('attempts', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    with op.batch_alter_table('report_media_derivatives') as batch_op:
+        batch_op.drop_column('attempts')
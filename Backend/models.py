@@ -51,6 +51,9 @@ class User(db.Model):
     time_zone = db.Column(db.String(50))
     theme = db.Column(db.String(20))
 
+    # Alert targeting: receive alerts for every area, not only the user's city/state
+    alert_all_areas = db.Column(db.Boolean, nullable=False, default=False, server_default=db.false(), index=True)
+
     # Relationships
     reports = db.relationship(
         'Report', back_populates='author',
@@ -113,9 +116,25 @@ class User(db.Model):
             'country': self.country,
             'language': self.language,
             'time_zone': self.time_zone,
-            'theme': self.theme
+            'theme': self.theme,
+            'alert_all_areas': self.alert_all_areas
         }
 
+# ------------------ USER LOCATION INDEX ------------------
+class UserLocation(db.Model):
+    """Normalized location keys per user (from city/state), used to target alerts by area"""
+    __tablename__ = 'user_locations'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), nullable=False, index=True)
+    location_key = db.Column(db.String(100), nullable=False)
+    source = db.Column(db.String(20), nullable=False)  # city, state
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'location_key', name='uq_user_locations_user_key'),
+        db.Index('ix_user_locations_key_user', 'location_key', 'user_id'),
+    )
+
 # ------------------ REPORT MODEL ------------------
 class Report(db.Model):
     __tablename__ = 'reports'
@@ -139,6 +158,13 @@ class Report(db.Model):
     location_type = db.Column(db.String(50), nullable=False, default='public')
     location_details = db.Column(db.Text)
     
+    # Normalized location (resolved from area/ward names, see locations.py)
+    area_id = db.Column(db.Integer, db.ForeignKey('areas.id', ondelete="SET NULL"), index=True)
+    ward_id = db.Column(db.Integer, db.ForeignKey('wards.id', ondelete="SET NULL"), index=True)
+    latitude = db.Column(db.Float)
+    longitude = db.Column(db.Float)
+    geo_cell = db.Column(db.String(32), index=True)  # spatial grid cell, e.g. "-46:3964"
+    
     # Personal Information
     anonymous = db.Column(db.Boolean, default=False)
     full_name = db.Column(db.String(100))
@@ -190,6 +216,10 @@ class Report(db.Model):
             'landmark': self.landmark,
             'location_type': self.location_type,
             'location_details': self.location_details,
+            'area_id': self.area_id,
+            'ward_id': self.ward_id,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
             
             # Personal Information
             'anonymous': self.anonymous,
@@ -222,6 +252,86 @@ class Report(db.Model):
         }
 
 
+# ------------------ LOCATION MODELS ------------------
+class Area(db.Model):
+    __tablename__ = 'areas'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    name = db.Column(db.String(100), unique=True, nullable=False)
+    county = db.Column(db.String(100), nullable=False, default='Garissa')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    wards = db.relationship('Ward', back_populates='area', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+
+    def to_dict(self, include_wards=False):
+        data = {
+            'id': self.id,
+            'name': self.name,
+            'county': self.county
+        }
+        if include_wards:
+            data['wards'] = [w.to_dict() for w in sorted(self.wards, key=lambda w: w.name)]
+        return data
+
+class Ward(db.Model):
+    __tablename__ = 'wards'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    area_id = db.Column(db.Integer, db.ForeignKey('areas.id', ondelete="CASCADE"), nullable=False, index=True)
+    name = db.Column(db.String(100), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    area = db.relationship('Area', back_populates='wards')
+
+    __table_args__ = (
+        db.UniqueConstraint('area_id', 'name', name='uq_wards_area_name'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'area_id': self.area_id,
+            'name': self.name
+        }
+
+# ------------------ REPORT HOTSPOT AGGREGATE ------------------
+class ReportHotspot(db.Model):
+    """Pre-aggregated report counts per day x ward x report type x grid cell"""
+    __tablename__ = 'report_hotspots'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    bucket_date = db.Column(db.Date, nullable=False)
+    area_id = db.Column(db.Integer, nullable=False, default=0)
+    ward_id = db.Column(db.Integer, nullable=False, default=0)
+    report_type = db.Column(db.String(50), nullable=False)
+    geo_cell = db.Column(db.String(32), nullable=False, default='')
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('bucket_date', 'area_id', 'ward_id', 'report_type', 'geo_cell', name='uq_report_hotspots_key'),
+        db.Index('ix_report_hotspots_ward_date', 'ward_id', 'bucket_date'),
+    )
+
+# ------------------ REPORT ROLLUP AGGREGATE ------------------
+class ReportRollup(db.Model):
+    """Report counts per hour/day bucket x area x ward x report type x urgency x status"""
+    __tablename__ = 'report_rollups'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    granularity = db.Column(db.String(10), nullable=False)  # hour, day
+    bucket_start = db.Column(db.DateTime, nullable=False)
+    area_id = db.Column(db.Integer, nullable=False, default=0)
+    ward_id = db.Column(db.Integer, nullable=False, default=0)
+    report_type = db.Column(db.String(50), nullable=False)
+    urgency = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('granularity', 'bucket_start', 'area_id', 'ward_id', 'report_type', 'urgency', 'status',
+                            name='uq_report_rollups_key'),
+    )
+
 # ------------------ REPORT MEDIA MODEL ------------------
 class ReportMedia(db.Model):
     __tablename__ = 'report_media'
@@ -235,6 +345,14 @@ class ReportMedia(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     report = db.relationship('Report', back_populates='media')
+    derivatives = db.relationship('ReportMediaDerivative', back_populates='media', lazy=True, cascade='all, delete-orphan', passive_deletes=True)
+
+    def get_derivative_url(self, kind):
+        """Return the URL of a finished derivative of the given kind, if any"""
+        for derivative in self.derivatives:
+            if derivative.kind == kind and derivative.status == 'ready':
+                return derivative.url
+        return None
 
     def to_dict(self):
         return {
@@ -244,8 +362,49 @@ class ReportMedia(db.Model):
             'type': self.type,
             'name': self.name,
             'size': self.size,
+            'thumbnail_url': self.get_derivative_url('thumbnail'),
+            'poster_url': self.get_derivative_url('poster'),
             'created_at': self.created_at.isoformat()
         }
+
+# ------------------ REPORT MEDIA DERIVATIVE MODEL ------------------
+class ReportMediaDerivative(db.Model):
+    __tablename__ = 'report_media_derivatives'
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    media_id = db.Column(db.String(36), db.ForeignKey('report_media.id', ondelete="CASCADE"), nullable=False, index=True)
+    kind = db.Column(db.String(20), nullable=False)  # thumbnail, poster
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, ready, failed, unsupported
+    url = db.Column(db.String(255))
+    width = db.Column(db.Integer)
+    height = db.Column(db.Integer)
+    size = db.Column(db.Integer)
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    media = db.relationship('ReportMedia', back_populates='derivatives')
+
+    __table_args__ = (
+        db.UniqueConstraint('media_id', 'kind', name='uq_report_media_derivative_kind'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'media_id': self.media_id,
+            'kind': self.kind,
+            'status': self.status,
+            'url': self.url,
+            'width': self.width,
+            'height': self.height,
+            'size': self.size,
+            'error': self.error,
+            'attempts': self.attempts,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
 # ------------------ NOTIFICATION MODEL ------------------
 class Notification(db.Model):
     __tablename__ = 'notifications'
@@ -298,6 +457,60 @@ class Notification(db.Model):
             'chat': self.chat.to_dict() if self.chat else None
         }
 
+# ------------------ NOTIFICATION PREFERENCES & DIGESTS ------------------
+class NotificationPreference(db.Model):
+    """A user's channel choices for one notification type; missing rows mean the defaults"""
+    __tablename__ = 'notification_preferences'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
+    notification_type = db.Column(Enum(NotificationType), nullable=False)
+    in_app = db.Column(Boolean, nullable=False, default=True)
+    email = db.Column(Boolean, nullable=False, default=True)
+    frequency = db.Column(db.String(10), nullable=False, default='immediate')  # immediate, hourly, daily
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'notification_type', name='uq_notification_preferences_user_type'),
+        db.Index('ix_notification_preferences_type_user', 'notification_type', 'user_id'),
+    )
+
+    def to_dict(self):
+        return {
+            'type': self.notification_type.value,
+            'in_app': self.in_app,
+            'email': self.email,
+            'frequency': self.frequency
+        }
+
+class DigestItem(db.Model):
+    """An email-worthy event buffered until the user's next hourly/daily digest"""
+    __tablename__ = 'digest_items'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
+    notification_type = db.Column(Enum(NotificationType), nullable=False)
+    frequency = db.Column(db.String(10), nullable=False)
+    subject = db.Column(db.String(200), nullable=False)
+    summary = db.Column(db.Text, nullable=False)
+    action_url = db.Column(db.String(500))
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_digest_items_pending', 'sent_at', 'frequency', 'user_id', 'created_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.notification_type.value,
+            'subject': self.subject,
+            'summary': self.summary,
+            'action_url': self.action_url,
+            'created_at': self.created_at.isoformat()
+        }
+
 # ------------------ ALERT MODEL ------------------
 class Alert(db.Model):
     __tablename__ = 'alerts'
@@ -314,6 +527,7 @@ class Alert(db.Model):
     created_by = db.Column(db.Integer, db.ForeignKey('users.id', ondelete="CASCADE"), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    version = db.Column(db.BigInteger, nullable=False, default=0, server_default='0', index=True)  # alert feed change version
 
     creator = db.relationship('User', back_populates='alerts', foreign_keys=[created_by])
     notifications = db.relationship('Notification', back_populates='alert', lazy=True, cascade="all, delete-orphan", passive_deletes=True)
@@ -332,9 +546,45 @@ class Alert(db.Model):
             'created_by': self.created_by,
             'creator': self.creator.to_dict() if self.creator else None,
             'created_at': self.created_at.isoformat(),
-            'updated_at': self.updated_at.isoformat()
+            'updated_at': self.updated_at.isoformat(),
+            'version': self.version
+        }
+
+class AlertTombstone(db.Model):
+    """Marker left behind when an alert is deleted or expires, so delta feeds can report removals"""
+    __tablename__ = 'alert_tombstones'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    alert_id = db.Column(db.String(36), nullable=False)
+    version = db.Column(db.BigInteger, nullable=False, index=True)
+    reason = db.Column(db.String(20), nullable=False)  # deleted, expired
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def to_dict(self):
+        return {
+            'id': self.alert_id,
+            'version': self.version,
+            'reason': self.reason,
+            'removed_at': self.created_at.isoformat() if self.created_at else None
         }
 
+# ------------------ CHANGE SEQUENCES ------------------
+class ChangeSequence(db.Model):
+    """Named monotonically increasing counters used to version change feeds"""
+    __tablename__ = 'change_sequences'
+
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+# ------------------ SCHEMA MARKER ------------------
+class SchemaMarker(db.Model):
+    """Fingerprint of the models/migrations the database was last created and seeded for (see startup.py)"""
+    __tablename__ = 'schema_marker'
+
+    name = db.Column(db.String(50), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
 # ------------------ CHAT MODELS ------------------
 class Chat(db.Model):
     __tablename__ = 'chats'
@@ -414,6 +664,61 @@ class SentEmail(db.Model):
             'sent_at': self.sent_at.isoformat()
         }
 
+# ------------------ EMAIL DELIVERY MODEL ------------------
+class EmailDelivery(db.Model):
+    """One outgoing email to one recipient: queued -> sent | deferred | failed"""
+    __tablename__ = 'email_deliveries'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    category = db.Column(db.String(50), nullable=False)      # otp, registration, alert, digest, ...
+    recipient = db.Column(db.String(255), nullable=False, index=True)
+    sender = db.Column(db.String(255), nullable=False)
+    subject = db.Column(db.String(255))
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, sent, deferred, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text)
+    # Encoded message kept until it is sent; broadcast rows leave it empty and
+    # are rebuilt from related_type/related_id when retried
+    payload = db.Column(db.LargeBinary)
+    related_type = db.Column(db.String(30))
+    related_id = db.Column(db.String(64))
+    priority = db.Column(db.Integer, nullable=False, default=2)  # index into mail_transport.PRIORITIES
+    next_attempt_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+    __table_args__ = (
+        db.Index('ix_email_deliveries_retry', 'status', 'next_attempt_at'),
+        db.Index('ix_email_deliveries_related', 'related_type', 'related_id', 'status'),
+        db.Index('ix_email_deliveries_category', 'category', 'status', 'created_at'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'category': self.category,
+            'recipient': self.recipient,
+            'subject': self.subject,
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'related_type': self.related_type,
+            'related_id': self.related_id,
+            'priority': self.priority,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'created_at': self.created_at.isoformat(),
+            'sent_at': self.sent_at.isoformat() if self.sent_at else None
+        }
+
+# ------------------ MAIL QUOTA MODEL ------------------
+class MailQuotaUsage(db.Model):
+    """Recipients handed to the mail provider per UTC day, shared by every worker (see mail_transport.DailyQuota)"""
+    __tablename__ = 'mail_quota_usage'
+
+    day = db.Column(db.Date, primary_key=True)
+    sent = db.Column(db.Integer, nullable=False, default=0)
+
 # ------------------ ADMIN USER MODEL ------------------
 class AdminUser(db.Model):
     __tablename__ = 'admin_users'
@@ -535,6 +840,27 @@ class ContactMessage(db.Model):
             'assigned_admin': self.assigned_admin.to_dict() if self.assigned_admin else None,
             'response_admin': self.response_admin.to_dict() if self.response_admin else None
         }
+# ------------------ SEARCH DOCUMENT MODEL ------------------
+class SearchDocument(db.Model):
+    """Denormalized text of a searchable row (report, message or contact ticket).
+
+    On SQLite the FTS5 table ``search_fts`` indexes this table as external content;
+    on PostgreSQL a ``document`` tsvector column with a GIN index is added at startup.
+    """
+    __tablename__ = 'search_documents'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    entity_type = db.Column(db.String(20), nullable=False)  # report, message, contact
+    entity_id = db.Column(db.String(36), nullable=False)
+    title = db.Column(db.String(255))
+    body = db.Column(db.Text)
+    created_at = db.Column(db.DateTime)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('entity_type', 'entity_id', name='uq_search_documents_entity'),
+    )
+
 # ------------------ FEEDBACK MODEL ------------------
 class Feedback(db.Model):
     __tablename__ = 'feedbacks'
@@ -0,0 +1,290 @@
+import os
+import secrets
+import sys
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from datetime import datetime
+from fnmatch import fnmatchcase
+from flask import request
+from instrumentation import route_label
+
+# ----------------- Profiler Settings -----------------
+# Sampling profiler for live requests. An admin starts a session; while it runs,
+# a background thread snapshots the stacks of the request threads it covers
+# (sys._current_frames) every interval and counts identical stacks. Sessions and
+# their samples live in the process that handled the start request.
+#
+# PROFILER_CONTINUOUS_INTERVAL_MS  when set, one never-ending session samples every
+#                                  request at this (coarse) interval, e.g. 50
+DEFAULT_INTERVAL_MS = 5
+MIN_INTERVAL_MS = 1
+DEFAULT_WINDOW_SECONDS = 30
+MAX_WINDOW_SECONDS = 600
+MAX_STACK_DEPTH = 64              # innermost frames kept per sample
+MAX_DISTINCT_STACKS = 20000       # beyond this new stacks are folded into one bucket
+KEPT_SESSIONS = 10
+PROFILE_HEADER = 'X-Profile'
+TRUNCATED = '[truncated]'
+
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+_frame_labels = {}
+
+
+def frame_label(code):
+    """'to_dict (models.py:199)' for a code object; cached, code objects are long-lived"""
+    label = _frame_labels.get(code)
+    if label is None:
+        path = code.co_filename
+        if path.startswith(APP_ROOT):
+            path = os.path.relpath(path, APP_ROOT)
+        else:
+            path = os.path.join(*path.split(os.sep)[-2:]) if os.sep in path else path
+        label = _frame_labels[code] = f'{code.co_name} ({path}:{code.co_firstlineno})'
+    return label
+
+
+def collapse(frame):
+    """Root-first tuple of frame labels for one thread's current stack"""
+    stack = []
+    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+        stack.append(frame_label(frame.f_code))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+class ProfileSession:
+    """One capture: which requests it covers, for how long, and the stacks it counted"""
+
+    def __init__(self, route=None, header=False, seconds=DEFAULT_WINDOW_SECONDS,
+                 interval_ms=DEFAULT_INTERVAL_MS, max_requests=None, name=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.name = name or self.id
+        self.route = route
+        self.token = secrets.token_urlsafe(16) if header else None
+        self.interval = max(interval_ms, MIN_INTERVAL_MS) / 1000
+        self.seconds = seconds
+        self.max_requests = max_requests
+        self.started_at = datetime.utcnow()
+        self._started = time.monotonic()
+        self.ends = self._started + seconds if seconds else None
+        self.status = 'running'
+        self.next_sample = self._started
+        self.requests = 0
+        self.sample_count = 0
+        self.stacks = Counter()
+        self._lock = threading.Lock()
+
+    def matches(self, headers):
+        if self.token is not None and headers.get(PROFILE_HEADER) != self.token:
+            return False
+        if self.route:
+            names = (route_label(), request.endpoint or '', request.path)
+            return any(fnmatchcase(name, self.route) for name in names)
+        return True
+
+    def add(self, stack):
+        with self._lock:
+            self.sample_count += 1
+            if stack not in self.stacks and len(self.stacks) >= MAX_DISTINCT_STACKS:
+                stack = (TRUNCATED,)
+            self.stacks[stack] += 1
+
+    def reset(self):
+        with self._lock:
+            self.stacks.clear()
+            self.sample_count = 0
+            self.requests = 0
+
+    def top_stacks(self):
+        with self._lock:
+            return self.stacks.most_common()
+
+    def finish(self, status='finished'):
+        if self.status == 'running':
+            self.status = status
+            self.ends = time.monotonic()
+
+    def elapsed(self):
+        return (time.monotonic() if self.status == 'running' else self.ends) - self._started
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'route': self.route,
+            'header': PROFILE_HEADER if self.token else None,
+            'interval_ms': round(self.interval * 1000, 2),
+            'seconds': self.seconds,
+            'max_requests': self.max_requests,
+            'started_at': self.started_at.isoformat(),
+            'elapsed_seconds': round(self.elapsed(), 2),
+            'requests': self.requests,
+            'samples': self.sample_count,
+            'distinct_stacks': len(self.stacks),
+        }
+
+    # ----------------- Output -----------------
+    def collapsed(self):
+        """Brendan Gregg's collapsed-stack format: 'root;child;leaf count' per line"""
+        return ''.join(f"{';'.join(stack)} {count}\n" for stack, count in self.top_stacks())
+
+    def speedscope(self):
+        """speedscope.app 'sampled' profile; weights are milliseconds of wall time"""
+        frames, index = [], {}
+        samples, weights = [], []
+        for stack, count in self.top_stacks():
+            ids = []
+            for label in stack:
+                if label not in index:
+                    index[label] = len(frames)
+                    name, _, location = label.partition(' (')
+                    file, _, line = location.rstrip(')').rpartition(':')
+                    frame = {'name': name}
+                    if file:
+                        frame.update(file=file, line=int(line))
+                    frames.append(frame)
+                ids.append(index[label])
+            samples.append(ids)
+            weights.append(round(count * self.interval * 1000, 3))
+        return {
+            '$schema': 'https://www.speedscope.app/file-format-schema.json',
+            'name': f'safezone {self.name}',
+            'exporter': 'safezone-profiler',
+            'activeProfileIndex': 0,
+            'shared': {'frames': frames},
+            'profiles': [{
+                'type': 'sampled',
+                'name': self.name,
+                'unit': 'milliseconds',
+                'startValue': 0,
+                'endValue': round(sum(weights), 3),
+                'samples': samples,
+                'weights': weights,
+            }],
+        }
+
+
+class Profiler:
+    """Running and recently finished sessions plus the sampler thread that feeds them"""
+
+    def __init__(self):
+        self.sessions = OrderedDict()
+        self._threads = {}        # thread ident -> [sessions profiling its current request]
+        self._lock = threading.RLock()
+        self._sampler = None
+
+    def start(self, **options):
+        session = ProfileSession(**options)
+        with self._lock:
+            self.sessions[session.id] = session
+            finished = [s for s in self.sessions.values() if s.status != 'running']
+            for old in finished[:max(0, len(self.sessions) - KEPT_SESSIONS)]:
+                del self.sessions[old.id]
+            self._ensure_sampler()
+        return session
+
+    def stop(self, session_id):
+        session = self.get(session_id)
+        if session is not None:
+            session.finish('stopped')
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            return self.sessions.get(session_id)
+
+    def list(self):
+        with self._lock:
+            return list(self.sessions.values())
+
+    def running(self):
+        return [s for s in self.list() if s.status == 'running']
+
+    # ----------------- Request Hooks -----------------
+    def enter_request(self):
+        if self._sampler is None:      # no session running: one attribute check per request
+            return
+        matched = [s for s in self.running() if s.matches(request.headers)]
+        if matched:
+            with self._lock:
+                self._threads[threading.get_ident()] = matched
+
+    def exit_request(self):
+        if not self._threads:
+            return
+        with self._lock:
+            matched = self._threads.pop(threading.get_ident(), ())
+        for session in matched:
+            session.requests += 1
+            if session.max_requests and session.requests >= session.max_requests:
+                session.finish()
+
+    def after_fork(self):
+        """In a forked worker: only the forking thread survives, so the sampler
+        a preloaded master started (PROFILER_CONTINUOUS_INTERVAL_MS) is gone"""
+        self._lock = threading.RLock()
+        self._threads = {}
+        self._sampler = None
+        if self.running():
+            with self._lock:
+                self._ensure_sampler()
+
+    # ----------------- Sampler -----------------
+    def _ensure_sampler(self):
+        if self._sampler is None or not self._sampler.is_alive():
+            self._sampler = threading.Thread(target=self._run, name='profiler-sampler', daemon=True)
+            self._sampler.start()
+
+    def _run(self):
+        while True:
+            now = time.monotonic()
+            running = []
+            for session in self.running():
+                if session.ends is not None and now >= session.ends:
+                    session.finish()
+                else:
+                    running.append(session)
+            if not running:
+                with self._lock:
+                    if not self.running():
+                        self._sampler = None
+                        return
+                continue
+
+            with self._lock:
+                threads = list(self._threads.items())
+            if threads:
+                due = {session for session in running if now >= session.next_sample}
+                frames = sys._current_frames()
+                for ident, sessions in threads:
+                    frame = frames.get(ident)
+                    targets = [s for s in sessions if s in due]
+                    if frame is None or not targets:
+                        continue
+                    stack = collapse(frame)
+                    for session in targets:
+                        session.add(stack)
+                for session in due:
+                    session.next_sample = now + session.interval
+                del frames
+            time.sleep(min(session.interval for session in running))
+
+
+profiler = Profiler()
+
+
+def _exit_request(exception):
+    profiler.exit_request()
+
+
+def init_profiler(app):
+    app.before_request(profiler.enter_request)
+    app.teardown_request(_exit_request)
+    interval = app.config.get('PROFILER_CONTINUOUS_INTERVAL_MS')
+    if interval and not any(s.name == 'continuous' for s in profiler.running()):
+        profiler.start(name='continuous', seconds=None, interval_ms=interval)
@@ -0,0 +1,206 @@
+import logging
+import os
+import re
+import threading
+import traceback
+import warnings
+from contextlib import contextmanager
+from flask import current_app, g, has_request_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from instrumentation import on_query, on_request, preview_sql, register_listeners, route_label
+
+# ----------------- Query Audit Settings -----------------
+# QUERY_AUDIT     'off', 'warn' or 'raise'. Unset means 'warn' under app.debug or
+#                 app.testing and 'off' otherwise; read per request, so tests can
+#                 flip it after create_app().
+# QUERY_BUDGETS   {'blueprint:/rule': max statements} checked at the end of each
+#                 request, e.g. {'notifications:/api/notifications/': 6}
+N_PLUS_ONE_THRESHOLD = 3          # the same statement with this many distinct parameter sets
+CALL_SITE_DEPTH = 2               # application frames reported per statement
+MODES = ('off', 'warn', 'raise')
+
+audit_log = logging.getLogger('safezone.queries')
+
+APP_ROOT = os.path.dirname(os.path.abspath(__file__))
+_SKIP_PATHS = (os.path.abspath(__file__), os.path.join(APP_ROOT, 'instrumentation.py'))
+
+_select_list = re.compile(r'SELECT\s+(?!count\()[^()]+?\sFROM\b', re.IGNORECASE)
+_listeners_registered = False
+_captures = threading.local()
+
+
+class NPlusOneWarning(UserWarning):
+    pass
+
+
+class QueryAuditError(AssertionError):
+    """Raised in 'raise' mode for an N+1 pattern or a blown query budget"""
+
+
+class AuditedQuery:
+    __slots__ = ('statement', 'parameters', 'relationship', 'call_site')
+
+    def __init__(self, statement, parameters, relationship, call_site):
+        self.statement = statement
+        self.parameters = parameters
+        self.relationship = relationship
+        self.call_site = call_site
+
+
+class QueryAudit:
+    """Every statement one request (or one capture block) issued, with where it came from"""
+
+    def __init__(self):
+        self.queries = []
+        self._shapes = {}
+        self.reported = set()
+        self.pending_relationship = None
+
+    def __len__(self):
+        return len(self.queries)
+
+    def record(self, statement, parameters):
+        query = AuditedQuery(statement, repr(parameters), self.pending_relationship, call_site())
+        self.pending_relationship = None
+        self.queries.append(query)
+        self._shapes.setdefault(statement, []).append(query)
+        return query
+
+    def repeats(self, statement):
+        """Distinct parameter sets seen so far for one statement"""
+        return len({query.parameters for query in self._shapes.get(statement, ())})
+
+    def queries_for(self, statement):
+        return self._shapes.get(statement, [])
+
+    def n_plus_one(self, threshold=N_PLUS_ONE_THRESHOLD):
+        """[(statement, [queries])] for statements re-run with differing parameters"""
+        return [(statement, queries) for statement, queries in self._shapes.items()
+                if len({query.parameters for query in queries}) >= threshold]
+
+    def report(self, limit=10):
+        lines = [f'{len(self.queries)} queries']
+        for statement, queries in self.n_plus_one()[:limit]:
+            lines.append(describe(statement, queries))
+        return '\n'.join(lines)
+
+
+def describe(statement, queries):
+    first = queries[0]
+    origin = f'lazy load of {first.relationship}' if first.relationship else 'query'
+    # Column lists are noise; the FROM/WHERE part shows what is being looked up
+    statement = _select_list.sub('SELECT ... FROM', statement)
+    return (f'N+1: {len(queries)} x {preview_sql(statement)}\n'
+            f'    {origin} from {first.call_site or "<unknown>"}')
+
+
+def call_site(depth=CALL_SITE_DEPTH):
+    """'models.py:249 in to_dict <- blueprints/reports.py:412 in get_reports' for the current statement"""
+    frames = []
+    for frame in reversed(traceback.extract_stack()):
+        path = os.path.abspath(frame.filename)
+        if not path.startswith(APP_ROOT) or path in _SKIP_PATHS:
+            continue
+        frames.append(f'{os.path.relpath(path, APP_ROOT)}:{frame.lineno} in {frame.name}')
+        if len(frames) == depth:
+            break
+    return ' <- '.join(frames)
+
+
+def audit_mode():
+    mode = current_app.config.get('QUERY_AUDIT')
+    if mode is None:
+        return 'warn' if current_app.debug or current_app.testing else 'off'
+    if mode not in MODES:
+        raise ValueError(f"QUERY_AUDIT must be one of {', '.join(MODES)}")
+    return mode
+
+
+def complain(message, mode):
+    if mode == 'raise':
+        raise QueryAuditError(message)
+    audit_log.warning(message)
+    warnings.warn(message, NPlusOneWarning, stacklevel=3)
+
+
+# ----------------- Hooks -----------------
+def _request_audit():
+    return g.get('query_audit') if has_request_context() else None
+
+
+def _active_audits():
+    audits = list(getattr(_captures, 'stack', ()))
+    request_audit = _request_audit()
+    if request_audit is not None:
+        audits.append(request_audit)
+    return audits
+
+
+def _before_orm_execute(orm_execute_state):
+    if not orm_execute_state.is_relationship_load:
+        return
+    path = orm_execute_state.loader_strategy_path
+    relationship = str(path[-1]) if path else None
+    for audit in _active_audits():
+        audit.pending_relationship = relationship
+
+
+def _observe_query(statement, parameters, elapsed, conn, executemany):
+    for audit in _active_audits():
+        audit.record(statement, parameters)
+    # Capture blocks are judged by whoever opened them; requests are judged here
+    audit = _request_audit()
+    if audit is None or statement in audit.reported:
+        return
+    if audit.repeats(statement) >= N_PLUS_ONE_THRESHOLD:
+        audit.reported.add(statement)
+        complain(f'{route_label()}: ' + describe(statement, audit.queries_for(statement)), g.query_audit_mode)
+
+
+def _start_request():
+    mode = audit_mode()
+    if mode != 'off':
+        g.query_audit = QueryAudit()
+        g.query_audit_mode = mode
+
+
+def _check_budget(profile, response):
+    audit = g.get('query_audit')
+    if audit is None:
+        return
+    budget = current_app.config.get('QUERY_BUDGETS', {}).get(route_label())
+    if budget is not None and len(audit) > budget:
+        complain(f'{route_label()}: over its budget of {budget} queries, ran {audit.report()}', g.query_audit_mode)
+
+
+@contextmanager
+def capture_queries():
+    """Collect every statement this thread runs inside the block into a QueryAudit"""
+    audit = QueryAudit()
+    stack = getattr(_captures, 'stack', None)
+    if stack is None:
+        stack = _captures.stack = []
+    stack.append(audit)
+    try:
+        yield audit
+    finally:
+        stack.remove(audit)
+
+
+def register_audit_listeners():
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    register_listeners()
+    event.listen(Session, 'do_orm_execute', _before_orm_execute)
+    on_query(_observe_query)
+    on_request(_check_budget)
+    _listeners_registered = True
+
+
+def init_query_audit(app):
+    if app.config.get('QUERY_AUDIT') == 'off':
+        return
+    register_audit_listeners()
+    app.before_request(_start_request)
@@ -0,0 +1,249 @@
+from collections import defaultdict
+from datetime import datetime, date, timedelta
+from sqlalchemy import case
+from sqlalchemy.orm import aliased, selectinload
+from models import db, Report, ReportMedia, User
+
+# ----------------- Listing DSL -----------------
+# GET /api/reports/?status=Pending,In Progress&urgency=high&created_from=2024-01-01
+#     &sort=-urgency,created_at&fields=id,title,status&page=1&per_page=50
+#
+# Multi-value filters accept comma separated values or a repeated parameter.
+# Date range bounds are ISO dates or datetimes; a bare date in a *_to bound
+# covers the whole day.
+
+MULTI_VALUE_FILTERS = {
+    'status': Report.status,
+    'urgency': Report.urgency,
+    'report_type': Report.report_type,
+    'area': Report.area,
+    'ward': Report.ward,
+    'area_id': Report.area_id,
+    'ward_id': Report.ward_id,
+    'category': Report.category,
+    'location_type': Report.location_type,
+}
+INTEGER_FILTERS = ('area_id', 'ward_id')
+BOOLEAN_FILTERS = {
+    'anonymous': Report.anonymous,
+    'police_involved': Report.police_involved,
+    'evidence_available': Report.evidence_available,
+}
+DATE_RANGES = {
+    'created': Report.created_at,
+    'updated': Report.updated_at,
+    'date': Report.date,
+}
+
+URGENCY_RANK = {'low': 0, 'medium': 1, 'high': 2, 'urgent': 3}
+SORT_KEYS = {
+    'created_at': Report.created_at,
+    'updated_at': Report.updated_at,
+    'date': Report.date,
+    'title': Report.title,
+    'status': Report.status,
+    'report_type': Report.report_type,
+    'area': Report.area,
+    'urgency': case(URGENCY_RANK, value=Report.urgency, else_=1),
+}
+DEFAULT_SORT = '-created_at'
+MAX_PER_PAGE = 500
+
+# Column fields map straight onto Report columns; relation fields are fetched separately
+COLUMN_FIELDS = (
+    'id', 'user_id', 'admin_id', 'report_type', 'title', 'description', 'date', 'time',
+    'urgency', 'status', 'location', 'area', 'ward', 'landmark', 'location_type',
+    'location_details', 'area_id', 'ward_id', 'latitude', 'longitude',
+    'anonymous', 'full_name', 'email', 'phone', 'address',
+    'witnesses', 'witness_details', 'evidence_available', 'evidence_details',
+    'police_involved', 'police_details', 'category', 'subcategory', 'tags', 'custom_fields',
+    'admin_notes', 'created_at', 'updated_at'
+)
+RELATION_FIELDS = ('author', 'admin_user', 'media')
+USER_SUMMARY_FIELDS = ('id', 'first_name', 'last_name', 'email')
+
+
+def _values(args, name):
+    values = []
+    for raw in args.getlist(name) if hasattr(args, 'getlist') else [args.get(name)]:
+        if raw is None:
+            continue
+        values.extend(v.strip() for v in str(raw).split(',') if v.strip())
+    return [v for v in values if v != 'All']
+
+
+def _parse_bound(value, upper):
+    try:
+        if len(value) == 10:
+            day = date.fromisoformat(value)
+            moment = datetime(day.year, day.month, day.day)
+            return moment + timedelta(days=1) if upper else moment
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}'; use YYYY-MM-DD or an ISO datetime")
+
+
+def _parse_bool(name, value):
+    lowered = value.lower()
+    if lowered in ('1', 'true', 'yes'):
+        return True
+    if lowered in ('0', 'false', 'no'):
+        return False
+    raise ValueError(f"{name} must be true or false")
+
+
+def apply_filters(query, args):
+    """Apply multi-value, boolean and date range filters; raises ValueError"""
+    for name, column in MULTI_VALUE_FILTERS.items():
+        values = _values(args, name)
+        if not values:
+            continue
+        if name in INTEGER_FILTERS:
+            try:
+                values = [int(v) for v in values]
+            except ValueError:
+                raise ValueError(f"{name} must be a list of integers")
+        query = query.filter(column.in_(values)) if len(values) > 1 else query.filter(column == values[0])
+
+    for name, column in BOOLEAN_FILTERS.items():
+        value = args.get(name)
+        if value not in (None, ''):
+            query = query.filter(column.is_(_parse_bool(name, value)))
+
+    for prefix, column in DATE_RANGES.items():
+        start, end = args.get(f'{prefix}_from'), args.get(f'{prefix}_to')
+        if start:
+            query = query.filter(column >= _parse_bound(start, upper=False))
+        if end:
+            end_bound = _parse_bound(end, upper=True)
+            query = query.filter(column < end_bound if len(end) == 10 else column <= end_bound)
+    return query
+
+
+def apply_sort(query, args):
+    """Order by a comma separated list of sort keys, '-' prefix for descending"""
+    order = []
+    for key in (args.get('sort') or DEFAULT_SORT).split(','):
+        key = key.strip()
+        if not key:
+            continue
+        descending = key.startswith('-')
+        name = key.lstrip('-+')
+        if name not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key '{name}'; use one of {', '.join(SORT_KEYS)}")
+        column = SORT_KEYS[name]
+        order.append(column.desc() if descending else column.asc())
+    # Stable pagination when the requested keys tie
+    order.append(Report.id.asc())
+    return query.order_by(*order)
+
+
+def parse_fields(args):
+    """Return the requested sparse fieldset, or None for full to_dict() payloads"""
+    fields = _values(args, 'fields')
+    if not fields:
+        return None
+    unknown = [f for f in fields if f not in COLUMN_FIELDS and f not in RELATION_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    if 'id' not in fields:
+        fields.insert(0, 'id')
+    return list(dict.fromkeys(fields))
+
+
+def parse_page(args):
+    """Return (page, per_page), or (None, None) when the caller wants everything"""
+    if args.get('page') is None and args.get('per_page') is None:
+        return None, None
+    try:
+        page = max(int(args.get('page', 1)), 1)
+        per_page = min(max(int(args.get('per_page', 50)), 1), MAX_PER_PAGE)
+    except ValueError:
+        raise ValueError("page and per_page must be integers")
+    return page, per_page
+
+
+def _plain(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def _user_summary(row, offset):
+    values = row[offset:offset + len(USER_SUMMARY_FIELDS)]
+    if values[0] is None:
+        return None
+    return dict(zip(USER_SUMMARY_FIELDS, values))
+
+
+def _media_by_report(report_ids):
+    media = defaultdict(list)
+    if not report_ids:
+        return media
+    rows = ReportMedia.query.options(selectinload(ReportMedia.derivatives))\
+        .filter(ReportMedia.report_id.in_(report_ids)).order_by(ReportMedia.created_at).all()
+    for item in rows:
+        media[item.report_id].append(item.to_dict())
+    return media
+
+
+def list_reports(args, base_filter=None):
+    """Run a report listing request and return the JSON body.
+
+    Full payloads go through Report.to_dict(). With ``fields=`` only the requested
+    columns are selected, author/admin_user come from a join limited to a few user
+    columns and media is loaded in one batched query for the page.
+    """
+    fields = parse_fields(args)
+    page, per_page = parse_page(args)
+
+    if fields is None:
+        query = Report.query.options(
+            selectinload(Report.media).selectinload(ReportMedia.derivatives),
+            selectinload(Report.author), selectinload(Report.admin_user)
+        )
+    else:
+        columns = [getattr(Report, f) for f in fields if f in COLUMN_FIELDS]
+        query = db.session.query(*columns).select_from(Report)
+        if 'author' in fields:
+            author = aliased(User)
+            query = query.add_columns(*[getattr(author, f) for f in USER_SUMMARY_FIELDS])\
+                .outerjoin(author, Report.user_id == author.id)
+        if 'admin_user' in fields:
+            admin_user = aliased(User)
+            query = query.add_columns(*[getattr(admin_user, f) for f in USER_SUMMARY_FIELDS])\
+                .outerjoin(admin_user, Report.admin_id == admin_user.id)
+
+    if base_filter is not None:
+        query = query.filter(base_filter)
+    query = apply_sort(apply_filters(query, args), args)
+
+    body = {}
+    if page is not None:
+        body['pagination'] = {'page': page, 'per_page': per_page, 'total': query.order_by(None).count()}
+        query = query.limit(per_page).offset((page - 1) * per_page)
+    rows = query.all()
+
+    if fields is None:
+        body['reports'] = [report.to_dict() for report in rows]
+        return body
+
+    column_names = [f for f in fields if f in COLUMN_FIELDS]
+    reports = []
+    for row in rows:
+        item = {name: _plain(value) for name, value in zip(column_names, row)}
+        offset = len(column_names)
+        if 'author' in fields:
+            item['author'] = _user_summary(row, offset)
+            offset += len(USER_SUMMARY_FIELDS)
+        if 'admin_user' in fields:
+            item['admin_user'] = _user_summary(row, offset)
+        reports.append(item)
+
+    if 'media' in fields:
+        media = _media_by_report([item['id'] for item in reports])
+        for item in reports:
+            item['media'] = media.get(item['id'], [])
+
+    body['reports'] = reports
+    return body
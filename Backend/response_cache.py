@@ -0,0 +1,103 @@
+import hashlib
+import threading
+import time
+from functools import wraps
+from flask import request, current_app, g
+
+# ----------------- Response Cache Settings -----------------
+DEFAULT_TTL = 30          # seconds a cached body is served before the view runs again
+MAX_ENTRIES = 256         # distinct (namespace, path, query string) keys kept per process
+
+
+class ResponseCache:
+    """In-process TTL cache of rendered response bodies keyed by route and params.
+
+    Each worker process has its own copy; writes in the same process invalidate
+    immediately, other processes pick changes up once their entry expires.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry['expires'] > time.monotonic():
+                return entry
+            self._entries.pop(key, None)
+            return None
+
+    def set(self, key, body, mimetype, ttl):
+        entry = {
+            'body': body,
+            'mimetype': mimetype,
+            'etag': hashlib.sha1(body).hexdigest(),
+            'expires': time.monotonic() + ttl,
+        }
+        with self._lock:
+            if key not in self._entries and len(self._entries) >= self.max_entries:
+                # Drop the entry closest to expiry
+                oldest = min(self._entries, key=lambda k: self._entries[k]['expires'])
+                self._entries.pop(oldest, None)
+            self._entries[key] = entry
+        return entry
+
+    def invalidate(self, namespace=None):
+        """Forget every entry, or only those of one namespace"""
+        with self._lock:
+            if namespace is None:
+                self._entries.clear()
+                return
+            for key in [k for k in self._entries if k[0] == namespace]:
+                del self._entries[key]
+
+
+response_cache = ResponseCache()
+
+
+def _cache_key(namespace):
+    return (namespace, request.path, tuple(sorted(request.args.items(multi=True))))
+
+
+def _finish(response, etag):
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'public, no-cache'
+    return response.make_conditional(request)
+
+
+def cached_response(namespace, ttl=None):
+    """Serve a public GET view from the response cache with ETag/304 support.
+
+    Only 200 responses are stored. A view can shorten its own entry's lifetime
+    by setting ``g.response_cache_ttl`` (e.g. when something in it expires soon).
+    Clients are told to revalidate on every poll (``Cache-Control: no-cache``),
+    so a matching If-None-Match costs neither a query nor a serialization.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = _cache_key(namespace)
+            entry = response_cache.get(key)
+            if entry:
+                response = current_app.response_class(entry['body'], mimetype=entry['mimetype'])
+                response.headers['X-Cache'] = 'HIT'
+                return _finish(response, entry['etag'])
+
+            response = current_app.make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+            lifetime = ttl if ttl is not None else current_app.config.get('RESPONSE_CACHE_TTL', DEFAULT_TTL)
+            lifetime = min(lifetime, g.pop('response_cache_ttl', lifetime))
+            body = response.get_data()
+            if lifetime > 0:
+                entry = response_cache.set(key, body, response.mimetype, lifetime)
+                etag = entry['etag']
+            else:
+                etag = hashlib.sha1(body).hexdigest()
+            response.headers['X-Cache'] = 'MISS'
+            return _finish(response, etag)
+        return decorated_function
+    return decorator
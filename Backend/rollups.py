@@ -0,0 +1,196 @@
+import click
+from datetime import datetime, timedelta
+from flask.cli import AppGroup
+from sqlalchemy import event, func, inspect
+from models import db, Report, ReportRollup, Area, Ward
+from utils import increment_counter
+
+# ----------------- Rollup Settings -----------------
+GRANULARITIES = ('hour', 'day')
+DIMENSIONS = ('area', 'ward', 'report_type', 'urgency', 'status')
+ROLLUP_ATTRS = ('area_id', 'ward_id', 'report_type', 'urgency', 'status')
+
+rollups_cli = AppGroup('rollups', help='Report analytics rollup commands.')
+
+_listeners_registered = False
+
+
+def truncate(moment, granularity):
+    """Start of the hour/day bucket a timestamp falls into"""
+    if granularity == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def rollup_keys(created_at, area_id, ward_id, report_type, urgency, status):
+    """One counter key per granularity for a report in the given state"""
+    created_at = created_at or datetime.utcnow()
+    return [{
+        'granularity': granularity,
+        'bucket_start': truncate(created_at, granularity),
+        'area_id': area_id or 0,
+        'ward_id': ward_id or 0,
+        'report_type': report_type,
+        'urgency': urgency or 'medium',
+        'status': status or 'Pending',
+    } for granularity in GRANULARITIES]
+
+
+def _apply(connection, created_at, values, delta):
+    for key in rollup_keys(created_at, *values):
+        increment_counter(connection, ReportRollup.__table__, key, delta)
+
+
+# ----------------- Incremental Maintenance -----------------
+def _after_insert(mapper, connection, target):
+    _apply(connection, target.created_at, [getattr(target, a) for a in ROLLUP_ATTRS], 1)
+
+
+def _after_update(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[a].history.has_changes() for a in ROLLUP_ATTRS):
+        return
+    old_values = []
+    for attr in ROLLUP_ATTRS:
+        history = state.attrs[attr].history
+        old_values.append(history.deleted[0] if history.deleted else getattr(target, attr))
+    _apply(connection, target.created_at, old_values, -1)
+    _apply(connection, target.created_at, [getattr(target, a) for a in ROLLUP_ATTRS], 1)
+
+
+def _load_old_value(target, value, oldvalue, initiator):
+    pass
+
+
+def _after_delete(mapper, connection, target):
+    _apply(connection, target.created_at, [getattr(target, a) for a in ROLLUP_ATTRS], -1)
+
+
+def register_rollup_listeners():
+    """Keep report_rollups in step with every report insert/update/delete commit"""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    event.listen(Report, 'after_insert', _after_insert)
+    event.listen(Report, 'after_update', _after_update)
+    event.listen(Report, 'after_delete', _after_delete)
+    # Setting an attribute expired by a commit records no old value unless the set loads it first;
+    # without it _after_update would take -1 from the new bucket instead of the old one
+    for attr in ROLLUP_ATTRS:
+        event.listen(getattr(Report, attr), 'set', _load_old_value, active_history=True)
+    _listeners_registered = True
+
+
+def init_rollups(app):
+    register_rollup_listeners()
+    app.cli.add_command(rollups_cli)
+
+
+# ----------------- Backfill -----------------
+def bucket_expression(granularity):
+    """SQL expression truncating Report.created_at to the bucket start"""
+    if db.engine.dialect.name == 'postgresql':
+        return func.date_trunc(granularity, Report.created_at)
+    fmt = '%Y-%m-%d %H:00:00' if granularity == 'hour' else '%Y-%m-%d 00:00:00'
+    return func.strftime(fmt, Report.created_at)
+
+
+def backfill_rollups():
+    """Rebuild report_rollups from the reports table with one GROUP BY per granularity"""
+    ReportRollup.query.delete()
+    inserted = 0
+    for granularity in GRANULARITIES:
+        bucket = bucket_expression(granularity)
+        rows = db.session.query(
+            bucket, func.coalesce(Report.area_id, 0), func.coalesce(Report.ward_id, 0),
+            Report.report_type, Report.urgency, Report.status, func.count(Report.id)
+        ).group_by(
+            bucket, Report.area_id, Report.ward_id, Report.report_type, Report.urgency, Report.status
+        ).all()
+
+        mappings = []
+        for bucket_start, area_id, ward_id, report_type, urgency, status, count in rows:
+            if not isinstance(bucket_start, datetime):
+                bucket_start = datetime.fromisoformat(str(bucket_start))
+            mappings.append({
+                'granularity': granularity, 'bucket_start': bucket_start, 'area_id': area_id,
+                'ward_id': ward_id, 'report_type': report_type, 'urgency': urgency,
+                'status': status, 'count': count
+            })
+        db.session.bulk_insert_mappings(ReportRollup, mappings)
+        inserted += len(mappings)
+    db.session.commit()
+    return inserted
+
+
+@rollups_cli.command('backfill')
+def backfill_command():
+    """Rebuild the hourly/daily report rollups from scratch."""
+    click.echo(f"Wrote {backfill_rollups()} rollup rows.")
+
+
+# ----------------- Range Queries -----------------
+def query_rollups(start, end, granularity='day', group_by=(), filters=None, series=True):
+    """Sum rollup counts over [start, end).
+
+    group_by is a subset of DIMENSIONS; with series=True each group gets one point per bucket.
+    filters maps a dimension to a value or list of values.
+    """
+    filters = filters or {}
+    columns = {
+        'area': ReportRollup.area_id,
+        'ward': ReportRollup.ward_id,
+        'report_type': ReportRollup.report_type,
+        'urgency': ReportRollup.urgency,
+        'status': ReportRollup.status,
+    }
+    group_columns = [columns[g] for g in group_by]
+    if series:
+        group_columns.append(ReportRollup.bucket_start)
+
+    query = db.session.query(*group_columns, func.sum(ReportRollup.count)).filter(
+        ReportRollup.granularity == granularity,
+        ReportRollup.bucket_start >= truncate(start, granularity),
+        ReportRollup.bucket_start < end
+    )
+    for dimension, value in filters.items():
+        values = value if isinstance(value, (list, tuple)) else [value]
+        query = query.filter(columns[dimension].in_(values))
+    if group_columns:
+        query = query.group_by(*group_columns).order_by(*group_columns)
+    rows = query.all()
+
+    names = {}
+    if 'area' in group_by:
+        names['area'] = {a.id: a.name for a in Area.query.all()}
+    if 'ward' in group_by:
+        names['ward'] = {w.id: w.name for w in Ward.query.all()}
+
+    results = []
+    for row in rows:
+        count = int(row[-1] or 0)
+        if count <= 0:
+            continue
+        item = {}
+        for index, dimension in enumerate(group_by):
+            value = row[index]
+            if dimension in names:
+                item[f'{dimension}_id'] = value or None
+                item[f'{dimension}_name'] = names[dimension].get(value)
+            else:
+                item[dimension] = value
+        if series:
+            bucket_start = row[len(group_by)]
+            if not isinstance(bucket_start, datetime):
+                bucket_start = datetime.fromisoformat(str(bucket_start))
+            item['bucket_start'] = bucket_start.isoformat()
+        item['count'] = count
+        results.append(item)
+    return results
+
+
+def default_range(granularity):
+    """Last 48 hours for hourly data, last 30 days for daily data"""
+    end = datetime.utcnow()
+    span = timedelta(hours=48) if granularity == 'hour' else timedelta(days=30)
+    return end - span, end + timedelta(seconds=1)
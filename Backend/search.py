@@ -0,0 +1,351 @@
+import html
+import re
+import click
+from datetime import datetime
+from flask.cli import AppGroup
+from sqlalchemy import bindparam, event, inspect, text
+from sqlalchemy.exc import OperationalError
+from models import db, Report, Message, ContactMessage, SearchDocument
+
+# ----------------- Searchable Sources -----------------
+# entity_type -> (model, title column, body columns)
+SEARCH_SOURCES = {
+    'report': (Report, 'title', ['description', 'landmark']),
+    'message': (Message, 'title', ['message']),
+    'contact': (ContactMessage, 'subject', ['message']),
+}
+
+REBUILD_BATCH_SIZE = 500
+MAX_PER_PAGE = 100
+# The database wraps matches in these control characters; highlight() escapes
+# the snippet (it is user text) and only then turns them into <mark> tags.
+# build_document() strips them from indexed text so users cannot inject one.
+MARK_START = '\x02'
+MARK_END = '\x03'
+_strip_marks = str.maketrans('', '', MARK_START + MARK_END)
+
+search_cli = AppGroup('search', help='Full-text search index commands.')
+
+_listeners_registered = False
+_fts_available = {}
+
+
+def get_backend(bind=None):
+    """Return 'fts5', 'postgres' or 'like' for the given engine/connection"""
+    bind = bind or db.engine
+    dialect = bind.dialect.name
+    if dialect == 'postgresql':
+        return 'postgres'
+    if dialect == 'sqlite' and _fts_available.get(str(bind.engine.url), False):
+        return 'fts5'
+    return 'like'
+
+
+def build_document(entity_type, obj):
+    """Extract the (title, body) text pair for one row (a model instance or a query row)"""
+    _, title_attr, body_attrs = SEARCH_SOURCES[entity_type]
+    title = (getattr(obj, title_attr) or '').translate(_strip_marks)
+    body = '\n'.join(getattr(obj, attr) or '' for attr in body_attrs).strip().translate(_strip_marks)
+    return title, body
+
+
+# ----------------- Index Setup -----------------
+def ensure_search_index():
+    """Create the backend-specific index structures. Safe to call on every startup."""
+    engine = db.engine
+    if engine.dialect.name == 'sqlite':
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(
+                    "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+                    "title, body, content='search_documents', content_rowid='id', "
+                    "tokenize='porter unicode61')"
+                ))
+            _fts_available[str(engine.url)] = True
+        except OperationalError:
+            # SQLite built without FTS5: fall back to LIKE over search_documents
+            _fts_available[str(engine.url)] = False
+    elif engine.dialect.name == 'postgresql':
+        with engine.begin() as conn:
+            conn.execute(text("ALTER TABLE search_documents ADD COLUMN IF NOT EXISTS document tsvector"))
+            conn.execute(text(
+                "CREATE INDEX IF NOT EXISTS ix_search_documents_document "
+                "ON search_documents USING GIN (document)"
+            ))
+
+
+# ----------------- Incremental Updates -----------------
+def index_document(conn, entity_type, entity_id, title, body, created_at=None):
+    """Insert or replace one document inside the caller's transaction"""
+    backend = get_backend(conn)
+    existing = conn.execute(
+        text("SELECT id, title, body FROM search_documents WHERE entity_type = :t AND entity_id = :i"),
+        {'t': entity_type, 'i': entity_id}
+    ).first()
+    now = datetime.utcnow()
+
+    if existing:
+        doc_id = existing[0]
+        if backend == 'fts5':
+            # External-content FTS5 tables need the old values to remove stale tokens
+            conn.execute(
+                text("INSERT INTO search_fts(search_fts, rowid, title, body) VALUES('delete', :id, :title, :body)"),
+                {'id': doc_id, 'title': existing[1] or '', 'body': existing[2] or ''}
+            )
+        conn.execute(
+            text("UPDATE search_documents SET title = :title, body = :body, updated_at = :now WHERE id = :id"),
+            {'id': doc_id, 'title': title, 'body': body, 'now': now}
+        )
+    else:
+        result = conn.execute(
+            text("INSERT INTO search_documents (entity_type, entity_id, title, body, created_at, updated_at) "
+                 "VALUES (:t, :i, :title, :body, :created_at, :now)"
+                 + (" RETURNING id" if backend == 'postgres' else "")),
+            {'t': entity_type, 'i': entity_id, 'title': title, 'body': body,
+             'created_at': created_at or now, 'now': now}
+        )
+        doc_id = result.scalar() if backend == 'postgres' else result.lastrowid
+
+    if backend == 'fts5':
+        conn.execute(
+            text("INSERT INTO search_fts(rowid, title, body) VALUES (:id, :title, :body)"),
+            {'id': doc_id, 'title': title, 'body': body}
+        )
+    elif backend == 'postgres':
+        conn.execute(
+            text("UPDATE search_documents SET document = "
+                 "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+                 "setweight(to_tsvector('english', coalesce(body, '')), 'B') WHERE id = :id"),
+            {'id': doc_id}
+        )
+
+
+def remove_document(conn, entity_type, entity_id):
+    """Drop one document from the index inside the caller's transaction"""
+    existing = conn.execute(
+        text("SELECT id, title, body FROM search_documents WHERE entity_type = :t AND entity_id = :i"),
+        {'t': entity_type, 'i': entity_id}
+    ).first()
+    if not existing:
+        return
+    if get_backend(conn) == 'fts5':
+        conn.execute(
+            text("INSERT INTO search_fts(search_fts, rowid, title, body) VALUES('delete', :id, :title, :body)"),
+            {'id': existing[0], 'title': existing[1] or '', 'body': existing[2] or ''}
+        )
+    conn.execute(text("DELETE FROM search_documents WHERE id = :id"), {'id': existing[0]})
+
+
+def _make_listeners(entity_type):
+    _, title_attr, body_attrs = SEARCH_SOURCES[entity_type]
+    text_attrs = [title_attr] + body_attrs
+
+    def after_save(mapper, connection, target):
+        title, body = build_document(entity_type, target)
+        index_document(connection, entity_type, str(target.id), title, body, target.created_at)
+
+    def after_update(mapper, connection, target):
+        # Status/priority-only updates don't touch the index
+        state = inspect(target)
+        if any(state.attrs[attr].history.has_changes() for attr in text_attrs):
+            after_save(mapper, connection, target)
+
+    def after_delete(mapper, connection, target):
+        remove_document(connection, entity_type, str(target.id))
+
+    return after_save, after_update, after_delete
+
+
+def register_search_listeners():
+    """Keep the index in sync with ORM writes (runs in the same transaction)"""
+    global _listeners_registered
+    if _listeners_registered:
+        return
+    for entity_type, (model, _, _) in SEARCH_SOURCES.items():
+        after_save, after_update, after_delete = _make_listeners(entity_type)
+        event.listen(model, 'after_insert', after_save)
+        event.listen(model, 'after_update', after_update)
+        event.listen(model, 'after_delete', after_delete)
+    _listeners_registered = True
+
+
+def init_search(app):
+    """Register listeners, create index structures and the CLI group"""
+    register_search_listeners()
+    with app.app_context():
+        ensure_search_index()
+    app.cli.add_command(search_cli)
+
+
+# ----------------- Rebuild -----------------
+def rebuild_index(entity_types=None):
+    """Recreate the index from the source tables. Returns counts per entity type."""
+    entity_types = entity_types or list(SEARCH_SOURCES)
+    backend = get_backend()
+    counts = {}
+
+    with db.engine.begin() as conn:
+        conn.execute(
+            text("DELETE FROM search_documents WHERE entity_type IN :types")
+            .bindparams(bindparam('types', expanding=True)),
+            {'types': entity_types}
+        )
+
+    for entity_type in entity_types:
+        model, title_attr, body_attrs = SEARCH_SOURCES[entity_type]
+        columns = [model.id, model.created_at, getattr(model, title_attr)] + \
+            [getattr(model, attr) for attr in body_attrs]
+        rows = db.session.query(*columns).yield_per(REBUILD_BATCH_SIZE)
+
+        batch = []
+        counts[entity_type] = 0
+        now = datetime.utcnow()
+        for row in rows:
+            # Rows carry the source column names, so they go through the same cleanup as ORM writes
+            title, body = build_document(entity_type, row)
+            batch.append({
+                'entity_type': entity_type,
+                'entity_id': str(row.id),
+                'title': title,
+                'body': body,
+                'created_at': row.created_at,
+                'updated_at': now
+            })
+            if len(batch) >= REBUILD_BATCH_SIZE:
+                db.session.execute(SearchDocument.__table__.insert(), batch)
+                counts[entity_type] += len(batch)
+                batch = []
+        if batch:
+            db.session.execute(SearchDocument.__table__.insert(), batch)
+            counts[entity_type] += len(batch)
+        db.session.commit()
+
+    with db.engine.begin() as conn:
+        if backend == 'fts5':
+            conn.execute(text("INSERT INTO search_fts(search_fts) VALUES('rebuild')"))
+        elif backend == 'postgres':
+            conn.execute(text(
+                "UPDATE search_documents SET document = "
+                "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+                "setweight(to_tsvector('english', coalesce(body, '')), 'B')"
+            ))
+    return counts
+
+
+@search_cli.command('rebuild')
+@click.option('--type', 'entity_types', multiple=True, type=click.Choice(list(SEARCH_SOURCES)),
+              help='Only rebuild the given entity type (repeatable)')
+def rebuild_command(entity_types):
+    """Rebuild the full-text search index."""
+    counts = rebuild_index(list(entity_types) or None)
+    for entity_type, count in counts.items():
+        click.echo(f"Indexed {count} {entity_type} documents.")
+
+
+# ----------------- Querying -----------------
+def to_fts_query(query):
+    """Turn free text into a safe FTS5 expression; the last term is prefix-matched"""
+    terms = re.findall(r'\w+', query, flags=re.UNICODE)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def highlight(snippet):
+    """HTML-safe snippet: the text escaped, the database's match markers as <mark> tags"""
+    if snippet is None:
+        return None
+    return html.escape(snippet).replace(MARK_START, '<mark>').replace(MARK_END, '</mark>')
+
+
+def _hydrate(hits):
+    """Attach a compact summary of each matched row, loading each type in one query"""
+    by_type = {}
+    for hit in hits:
+        by_type.setdefault(hit['type'], []).append(hit['id'])
+
+    summaries = {}
+    for entity_type, ids in by_type.items():
+        model, title_attr, _ = SEARCH_SOURCES[entity_type]
+        for obj in model.query.filter(model.id.in_(ids)).all():
+            summary = {
+                'title': getattr(obj, title_attr),
+                'status': obj.status,
+                'created_at': obj.created_at.isoformat() if obj.created_at else None,
+            }
+            if entity_type == 'report':
+                summary.update({'report_type': obj.report_type, 'urgency': obj.urgency, 'area': obj.area})
+            elif entity_type == 'contact':
+                summary.update({'ticket_number': obj.ticket_number, 'email': obj.email})
+            else:
+                summary.update({'priority': obj.priority, 'email': obj.email})
+            summaries[(entity_type, str(obj.id))] = summary
+
+    results = []
+    for hit in hits:
+        summary = summaries.get((hit['type'], hit['id']))
+        if summary:
+            results.append({**hit, **summary})
+    return results
+
+
+def search(query, entity_types=None, page=1, per_page=20):
+    """Ranked, paginated search. Returns {'results', 'total', 'pages', 'current_page'}."""
+    entity_types = [t for t in (entity_types or SEARCH_SOURCES) if t in SEARCH_SOURCES]
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    page = max(1, page)
+    params = {'types': entity_types, 'limit': per_page, 'offset': (page - 1) * per_page,
+              'mark_start': MARK_START, 'mark_end': MARK_END}
+    backend = get_backend()
+
+    if backend == 'fts5':
+        match = to_fts_query(query)
+        if not match or not entity_types:
+            return {'results': [], 'total': 0, 'pages': 0, 'current_page': page}
+        params['q'] = match
+        where = "search_fts MATCH :q AND d.entity_type IN :types"
+        base = "FROM search_fts JOIN search_documents d ON d.id = search_fts.rowid"
+        select = ("SELECT d.entity_type, d.entity_id, bm25(search_fts, 10.0, 1.0) AS rank, "
+                  "snippet(search_fts, 1, :mark_start, :mark_end, '...', 12) AS snippet")
+        order = "ORDER BY rank"
+    elif backend == 'postgres':
+        if not query.strip() or not entity_types:
+            return {'results': [], 'total': 0, 'pages': 0, 'current_page': page}
+        params['q'] = query
+        params['headline'] = f'StartSel={MARK_START}, StopSel={MARK_END}, MaxFragments=1, MaxWords=24'
+        base = "FROM search_documents d, websearch_to_tsquery('english', :q) AS query"
+        where = "d.document @@ query AND d.entity_type IN :types"
+        select = ("SELECT d.entity_type, d.entity_id, ts_rank(d.document, query) AS rank, "
+                  "ts_headline('english', coalesce(d.body, ''), query, :headline) AS snippet")
+        order = "ORDER BY rank DESC"
+    else:
+        terms = re.findall(r'\w+', query, flags=re.UNICODE)
+        if not terms or not entity_types:
+            return {'results': [], 'total': 0, 'pages': 0, 'current_page': page}
+        clauses = []
+        for index, term in enumerate(terms):
+            params[f't{index}'] = f'%{term}%'
+            clauses.append(f"(d.title LIKE :t{index} OR d.body LIKE :t{index})")
+        base = "FROM search_documents d"
+        where = ' AND '.join(clauses) + " AND d.entity_type IN :types"
+        select = "SELECT d.entity_type, d.entity_id, 0 AS rank, substr(d.body, 1, 160) AS snippet"
+        order = "ORDER BY d.created_at DESC"
+
+    expanding = bindparam('types', expanding=True)
+    total = db.session.execute(
+        text(f"SELECT COUNT(*) {base} WHERE {where}").bindparams(expanding), params
+    ).scalar()
+    rows = db.session.execute(
+        text(f"{select} {base} WHERE {where} {order} LIMIT :limit OFFSET :offset").bindparams(expanding),
+        params
+    ).all()
+
+    hits = [{'type': row[0], 'id': row[1], 'rank': float(row[2] or 0), 'snippet': highlight(row[3])} for row in rows]
+    return {
+        'results': _hydrate(hits),
+        'total': total,
+        'pages': (total + per_page - 1) // per_page,
+        'current_page': page
+    }
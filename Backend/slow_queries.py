@@ -0,0 +1,211 @@
+import json
+import logging
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from flask import has_request_context, request
+from instrumentation import on_query, register_listeners, route_label
+
+# ----------------- Slow Query Settings -----------------
+# SLOW_QUERY_MS        statements slower than this are recorded (None disables)
+# SLOW_QUERY_BUFFER    entries kept in the in-memory ring buffer (per process)
+# SLOW_QUERY_EXPLAIN   capture EXPLAIN QUERY PLAN (SQLite) / EXPLAIN (PostgreSQL)
+#                      for each slow statement, on the same connection right after
+#                      it ran; plans are cached per normalized statement for
+#                      EXPLAIN_TTL_SECONDS so a hot slow query is not explained every time
+DEFAULT_THRESHOLD_MS = 100
+DEFAULT_BUFFER_SIZE = 200
+EXPLAIN_TTL_SECONDS = 60
+MAX_CACHED_PLANS = 500
+MAX_SQL_LENGTH = 2000
+EXPLAINABLE = ('select', 'with', 'insert', 'update', 'delete')
+
+slow_query_log = logging.getLogger('safezone.slow_queries')
+
+_whitespace = re.compile(r'\s+')
+_string_literal = re.compile(r"'(?:[^']|'')*'")
+_number_literal = re.compile(r'(?<![\w%])-?\d+(?:\.\d+)?\b')
+_placeholder = r'\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*'
+_placeholder_list = re.compile(r'\((?:' + _placeholder + r',)+' + _placeholder + r'\)')
+
+_observer_registered = False
+
+
+def normalize_sql(statement):
+    """One line, literals replaced by ?, IN-lists of any length folded to (...)"""
+    statement = _whitespace.sub(' ', statement).strip()
+    statement = _string_literal.sub('?', statement)
+    statement = _number_literal.sub('?', statement)
+    statement = _placeholder_list.sub('(...)', statement)
+    if len(statement) > MAX_SQL_LENGTH:
+        statement = statement[:MAX_SQL_LENGTH] + '...'
+    return statement
+
+
+def _type_name(value):
+    return 'null' if value is None else type(value).__name__
+
+
+def parameter_shape(parameters, executemany=False):
+    """Types, never values: '(int, str)', '{user_id: int}' or '250 x (int, str)'"""
+    if executemany:
+        rows = list(parameters or ())
+        return f'{len(rows)} x {parameter_shape(rows[0]) if rows else "()"}'
+    if isinstance(parameters, dict):
+        return '{' + ', '.join(f'{key}: {_type_name(value)}' for key, value in parameters.items()) + '}'
+    if isinstance(parameters, (list, tuple)):
+        return '(' + ', '.join(_type_name(value) for value in parameters) + ')'
+    return '()' if parameters is None else _type_name(parameters)
+
+
+def format_plan(rows, dialect):
+    """EXPLAIN output as text lines; SQLite query plans are indented like the sqlite3 shell"""
+    if dialect != 'sqlite':
+        return [str(row[0]) for row in rows]
+    depth, lines = {0: -1}, []
+    for node, parent, _, detail in rows:
+        depth[node] = depth.get(parent, -1) + 1
+        lines.append('  ' * depth[node] + str(detail))
+    return lines
+
+
+class SlowQueryRecorder:
+    """Ring buffer of statements over the threshold, newest last"""
+
+    def __init__(self, threshold_ms=DEFAULT_THRESHOLD_MS, size=DEFAULT_BUFFER_SIZE, explain=True):
+        self.entries = deque(maxlen=size)
+        self.threshold = threshold_ms / 1000 if threshold_ms is not None else None
+        self.explain = explain
+        self._plans = {}          # normalized sql -> (captured at, plan, error)
+        self._lock = threading.Lock()
+
+    def configure(self, threshold_ms, size, explain):
+        with self._lock:
+            self.threshold = threshold_ms / 1000 if threshold_ms is not None else None
+            self.explain = explain
+            if size != self.entries.maxlen:
+                self.entries = deque(self.entries, maxlen=size)
+
+    def record(self, conn, statement, parameters, executemany, elapsed):
+        sql = normalize_sql(statement)
+        entry = {
+            'at': datetime.utcnow().isoformat(),
+            'duration_ms': round(elapsed * 1000, 2),
+            'sql': sql,
+            'parameters': parameter_shape(parameters, executemany),
+            'route': route_label() if has_request_context() else f'<{threading.current_thread().name}>',
+            'method': request.method if has_request_context() else None,
+            'plan': None,
+        }
+        if self.explain and not executemany and statement.lstrip()[:6].lower().startswith(EXPLAINABLE):
+            plan, error = self.plan_for(conn, statement, parameters, sql)
+            entry['plan'] = plan
+            if error:
+                entry['explain_error'] = error
+        self.entries.append(entry)
+        slow_query_log.warning(json.dumps(entry))
+        return entry
+
+    def plan_for(self, conn, statement, parameters, sql):
+        now = time.monotonic()
+        cached = self._plans.get(sql)
+        if cached is not None and now - cached[0] < EXPLAIN_TTL_SECONDS:
+            return cached[1], cached[2]
+        plan, error = explain(conn, statement, parameters)
+        with self._lock:
+            if len(self._plans) >= MAX_CACHED_PLANS:
+                self._plans.clear()
+            self._plans[sql] = (now, plan, error)
+        return plan, error
+
+    def recent(self, limit=None, route=None):
+        entries = [entry for entry in reversed(self.entries) if route is None or entry['route'] == route]
+        return entries[:limit] if limit else entries
+
+    def summary(self):
+        """Buffered entries grouped by normalized statement, by total time"""
+        groups = {}
+        for entry in list(self.entries):
+            group = groups.get(entry['sql'])
+            if group is None:
+                group = groups[entry['sql']] = {
+                    'sql': entry['sql'], 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                    'routes': set(), 'plan': entry['plan'],
+                }
+            group['count'] += 1
+            group['total_ms'] += entry['duration_ms']
+            group['max_ms'] = max(group['max_ms'], entry['duration_ms'])
+            group['routes'].add(entry['route'])
+        result = sorted(groups.values(), key=lambda group: group['total_ms'], reverse=True)
+        for group in result:
+            group['total_ms'] = round(group['total_ms'], 2)
+            group['routes'] = sorted(group['routes'])
+        return result
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self._plans.clear()
+
+
+def explain(conn, statement, parameters):
+    """(plan lines, error) for a statement that just ran on ``conn``.
+
+    Goes through a raw DB-API cursor on the same connection, so it sees the same
+    transaction and does not fire the engine events (or get recorded itself). On
+    PostgreSQL a failed EXPLAIN would abort the surrounding transaction, hence the
+    savepoint.
+    """
+    dialect = conn.dialect.name
+    prefix = 'EXPLAIN QUERY PLAN ' if dialect == 'sqlite' else 'EXPLAIN '
+    savepoint = dialect == 'postgresql'
+    cursor = conn.connection.cursor()
+    try:
+        if savepoint:
+            cursor.execute('SAVEPOINT slow_query_explain')
+        try:
+            cursor.execute(prefix + statement, parameters if parameters is not None else ())
+            plan = format_plan(cursor.fetchall(), dialect)
+        except Exception as e:
+            if savepoint:
+                cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+            return None, str(e)
+        if savepoint:
+            cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+        return plan, None
+    except Exception as e:
+        return None, str(e)
+    finally:
+        cursor.close()
+
+
+recorder = SlowQueryRecorder()
+
+
+# ----------------- Query Hooks -----------------
+def _observe_query(statement, parameters, elapsed, conn, executemany):
+    threshold = recorder.threshold
+    if threshold is not None and elapsed >= threshold:
+        recorder.record(conn, statement, parameters, executemany, elapsed)
+
+
+def init_slow_queries(app):
+    global _observer_registered
+    threshold = app.config.get('SLOW_QUERY_MS', DEFAULT_THRESHOLD_MS)
+    recorder.configure(threshold, app.config.get('SLOW_QUERY_BUFFER', DEFAULT_BUFFER_SIZE),
+                       app.config.get('SLOW_QUERY_EXPLAIN', True))
+    if threshold is None:
+        return
+    if not slow_query_log.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(name)s %(message)s'))
+        slow_query_log.addHandler(handler)
+        slow_query_log.setLevel(logging.INFO)
+        slow_query_log.propagate = False
+    # Timed by instrumentation's cursor listeners, so each statement is timed once
+    register_listeners()
+    if not _observer_registered:
+        on_query(_observe_query)
+        _observer_registered = True
@@ -0,0 +1,110 @@
+import hashlib
+import os
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+
+# ----------------- Startup Settings -----------------
+# STARTUP_MODE   'full' (default) runs the schema step on every create_app() and
+#                always loads Flask-Migrate. The schema step is db.create_all()
+#                (tables new since the database was made), the migrations up to
+#                head (columns added to existing tables, with their backfills),
+#                the default admin and the location seed.
+#                'lazy' skips the schema step when the schema marker matches the
+#                current models, migrations and seed data, and then only loads
+#                Flask-Migrate (alembic) for `flask` CLI commands. Can also be set
+#                through the STARTUP_MODE environment variable.
+#
+# Either mode re-stamps the marker after the schema step, so editing a model,
+# adding or changing a migration or changing GARISSA_LOCATIONS makes the next lazy
+# boot run it again. To redo it by hand (e.g. the default admin was deleted), boot
+# once with STARTUP_MODE=full.
+#
+# BACKGROUND_JOBS_AUTOSTART  start the digest/retry scheduler threads from create_app()
+#                (default). The production server turns it off and starts them in one
+#                worker after forking instead (see lifecycle.py).
+MODES = ('full', 'lazy')
+MARKER_NAME = 'models'
+MIGRATIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+MIGRATION_VERSIONS = os.path.join(MIGRATIONS, 'versions')
+
+
+def startup_mode(app):
+    mode = app.config.get('STARTUP_MODE') or os.getenv('STARTUP_MODE') or 'full'
+    if mode not in MODES:
+        raise ValueError(f"STARTUP_MODE must be one of {', '.join(MODES)}")
+    return mode
+
+
+def background_jobs_autostart(app):
+    return not app.testing and app.config.get('BACKGROUND_JOBS_AUTOSTART', True)
+
+
+def is_cli():
+    """True inside a `flask ...` command (the CLI sets this before loading the app)"""
+    return os.environ.get('FLASK_RUN_FROM_CLI') == 'true'
+
+
+# ----------------- Schema Marker -----------------
+def schema_fingerprint(metadata, seeds=()):
+    """sha256 over every table's columns, keys and indexes, the migration scripts and the seed data"""
+    digest = hashlib.sha256()
+    for table in metadata.sorted_tables:
+        digest.update(f'table {table.name}\n'.encode())
+        for column in table.columns:
+            targets = ','.join(sorted(fk.target_fullname for fk in column.foreign_keys))
+            digest.update(f'  {column.name} {column.type!r} null={column.nullable} '
+                          f'pk={column.primary_key} fk={targets}\n'.encode())
+        for index in sorted(table.indexes, key=lambda index: index.name or ''):
+            columns = ','.join(column.name for column in index.columns)
+            digest.update(f'  index {index.name} ({columns}) unique={index.unique}\n'.encode())
+        constraints = []
+        for constraint in table.constraints:
+            columns = ','.join(sorted(column.name for column in getattr(constraint, 'columns', ())))
+            constraints.append(f'  {type(constraint).__name__} {constraint.name} ({columns})\n')
+        # table.constraints is a set; unnamed constraints have no stable order of their own
+        for line in sorted(constraints):
+            digest.update(line.encode())
+    if os.path.isdir(MIGRATION_VERSIONS):
+        for name in sorted(os.listdir(MIGRATION_VERSIONS)):
+            if name.endswith('.py'):
+                digest.update(f'migration {name}\n'.encode())
+                with open(os.path.join(MIGRATION_VERSIONS, name), 'rb') as f:
+                    digest.update(f.read())
+    for seed in seeds:
+        digest.update(f'seed {seed!r}\n'.encode())
+    return digest.hexdigest()
+
+
+def init_migrate(app, db):
+    # Imported here: alembic is the slowest import in the app (see STARTUP_MODE)
+    from flask_migrate import Migrate
+    Migrate(app, db, directory=MIGRATIONS)
+
+
+def upgrade_schema(app, db):
+    """Run the migrations up to head; they skip changes db.create_all() already made"""
+    from flask_migrate import upgrade
+    if 'migrate' not in app.extensions:
+        init_migrate(app, db)
+    upgrade(directory=MIGRATIONS)
+
+
+def schema_is_current(engine, fingerprint):
+    """Whether the database was created and seeded for this fingerprint; a missing marker table means no"""
+    try:
+        with engine.connect() as conn:
+            stored = conn.execute(
+                text("SELECT fingerprint FROM schema_marker WHERE name = :name"), {'name': MARKER_NAME}
+            ).scalar()
+    except SQLAlchemyError:
+        return False
+    return stored == fingerprint
+
+
+def stamp_schema(engine, fingerprint):
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM schema_marker WHERE name = :name"), {'name': MARKER_NAME})
+        conn.execute(
+            text("INSERT INTO schema_marker (name, fingerprint, updated_at) VALUES (:name, :fingerprint, CURRENT_TIMESTAMP)"),
+            {'name': MARKER_NAME, 'fingerprint': fingerprint}
+        )
@@ -0,0 +1,162 @@
+"""Alert change feed: versions on every write, tombstones for deletes, full resyncs."""
+from datetime import datetime, timedelta
+import time
+import pytest
+
+
+@pytest.fixture
+def author(app):
+    from models import db, User
+    with app.app_context():
+        user = User(first_name='Feed', last_name='Admin', email='feed@example.com', role='admin',
+                    password_hash='x', is_admin=True)
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def _alert(author, **fields):
+    from models import Alert
+    values = {'title': 'Road closed', 'message': 'Use the bypass', 'type': 'Traffic', 'created_by': author}
+    values.update(fields)
+    return Alert(**values)
+
+
+def _ids(entries):
+    return [entry['id'] for entry in entries]
+
+
+def test_every_write_gets_a_new_version(app, author):
+    from alert_feed import current_version, get_changes
+    from models import db
+    with app.app_context():
+        first, second = _alert(author), _alert(author, title='Power cut')
+        db.session.add_all([first, second])
+        db.session.commit()
+        assert sorted([first.version, second.version]) == [1, 2]
+        since = current_version()
+
+        first.severity = 'High'
+        db.session.commit()
+        assert first.version == since + 1
+
+        changes = get_changes(since)
+        assert (changes['full'], changes['version'], changes['since']) == (False, since + 1, since)
+        assert _ids(changes['updated']) == [first.id]
+        assert changes['removed'] == []
+
+
+def test_an_unmodified_flush_keeps_the_version(app, author):
+    from alert_feed import current_version
+    from models import db
+    with app.app_context():
+        alert = _alert(author)
+        db.session.add(alert)
+        db.session.commit()
+        alert.title = alert.title
+        db.session.commit()
+        assert alert.version == current_version() == 1
+
+
+def test_deletes_leave_tombstones(app, author):
+    from alert_feed import get_changes
+    from models import db
+    with app.app_context():
+        kept, deleted, expired = (_alert(author), _alert(author),
+                                  _alert(author, end_date=datetime.utcnow() - timedelta(hours=1)))
+        db.session.add_all([kept, deleted, expired])
+        db.session.commit()
+        since = max(kept.version, deleted.version, expired.version)
+        deleted_id, expired_id = deleted.id, expired.id
+        db.session.delete(deleted)
+        db.session.delete(expired)
+        db.session.commit()
+
+        changes = get_changes(since)
+        assert changes['updated'] == []
+        assert {(entry['id'], entry['reason']) for entry in changes['removed']} == {
+            (deleted_id, 'deleted'), (expired_id, 'expired')}
+        assert all(entry['version'] > since for entry in changes['removed'])
+
+
+def test_live_scope_reports_alerts_leaving_the_live_set_as_removals(app, author):
+    from alert_feed import current_version, get_changes
+    from models import db
+    with app.app_context():
+        alert = _alert(author)
+        db.session.add(alert)
+        db.session.commit()
+        since = current_version()
+        alert.status = 'Resolved'
+        db.session.commit()
+
+        assert _ids(get_changes(since)['updated']) == [alert.id]
+        live = get_changes(since, scope='live')
+        assert live['updated'] == []
+        assert [(entry['id'], entry['reason']) for entry in live['removed']] == [(alert.id, 'resolved')]
+
+
+@pytest.mark.parametrize('since', [0, 'ahead', 'pruned'])
+def test_full_snapshot_when_the_client_cannot_merge(app, author, since):
+    from alert_feed import current_version, get_changes, prune_tombstones
+    from models import db
+    with app.app_context():
+        alerts = [_alert(author), _alert(author)]
+        db.session.add_all(alerts)
+        db.session.commit()
+        db.session.delete(alerts[0])
+        db.session.commit()
+        if since == 'ahead':
+            # e.g. the database was restored from a backup older than the client's copy
+            since = current_version() + 5
+        elif since == 'pruned':
+            assert prune_tombstones(now=datetime.utcnow() + timedelta(days=30)) == 1
+            db.session.commit()
+            since = 1
+
+        changes = get_changes(since)
+        assert changes['full'] is True
+        assert _ids(changes['updated']) == [alerts[1].id]
+        assert changes['removed'] == []
+
+
+def test_changes_endpoint_validates_its_arguments(client):
+    assert client.get('/api/alerts/changes?since=abc').status_code == 400
+    assert client.get('/api/alerts/changes?scope=mine').status_code == 400
+    body = client.get('/api/alerts/changes?since=0').get_json()
+    assert (body['full'], body['version'], body['updated']) == (True, 0, [])
+
+
+def test_changes_endpoint_only_shows_public_alerts_by_default(app, client, author, login):
+    from models import db
+    with app.app_context():
+        alerts = [_alert(author, status=status) for status in ('Active', 'Resolved', 'Inactive')]
+        db.session.add_all(alerts)
+        db.session.commit()
+        active, resolved, inactive = (alert.id for alert in alerts)
+        since = alerts[0].version
+
+    body = client.get('/api/alerts/changes').get_json()
+    assert sorted(_ids(body['updated'])) == sorted([active, resolved])
+    delta = client.get(f'/api/alerts/changes?since={since}').get_json()
+    assert _ids(delta['updated']) == [resolved]
+    assert [(entry['id'], entry['reason']) for entry in delta['removed']] == [(inactive, 'inactive')]
+
+    assert client.get('/api/alerts/changes?scope=all').status_code == 401
+    login(author, admin=True)
+    body = client.get('/api/alerts/changes?scope=all').get_json()
+    assert sorted(_ids(body['updated'])) == sorted([active, resolved, inactive])
+    assert 'X-Cache' not in client.get('/api/alerts/changes?scope=all').headers
+
+
+def test_cached_changes_expire_with_the_first_alert(app, client, author):
+    from response_cache import response_cache
+    from models import db
+    with app.app_context():
+        db.session.add_all([_alert(author, end_date=datetime.utcnow() + timedelta(seconds=10)),
+                            _alert(author, end_date=datetime.utcnow() + timedelta(days=1))])
+        db.session.commit()
+
+    assert client.get('/api/alerts/changes?scope=live').headers['X-Cache'] == 'MISS'
+    [entry] = response_cache._entries.values()
+    assert entry['expires'] - time.monotonic() <= 10
@@ -0,0 +1,82 @@
+"""Alert targeting: who an alert reaches by affected area, all-areas opt-in and missing location."""
+import pytest
+
+PEOPLE = {
+    # name: (city, state, alert_all_areas, is_admin)
+    'dadaab': ('Dadaab', None, False, False),
+    'ifo': ('Ifo', 'Dadaab', False, False),
+    'fafi': ('  fafi ', None, False, False),
+    'everywhere': ('Fafi', None, True, False),
+    'unlocated': (None, None, False, False),
+    'admin': ('Dadaab', None, False, True),
+}
+
+
+@pytest.fixture
+def people(app):
+    """name -> user id for PEOPLE"""
+    from models import db, User
+    with app.app_context():
+        users = {name: User(first_name=name, last_name='Test', email=f'{name}@example.com',
+                            role='admin' if is_admin else 'user', password_hash='x',
+                            city=city, state=state, alert_all_areas=all_areas, is_admin=is_admin)
+                 for name, (city, state, all_areas, is_admin) in PEOPLE.items()}
+        db.session.add_all(users.values())
+        db.session.commit()
+        return {name: user.id for name, user in users.items()}
+
+
+def _recipients(people, affected_area):
+    from alert_targeting import alert_recipients_query
+    from models import Alert
+    names = {user_id: name for name, user_id in people.items()}
+    return {names[user.id] for user in alert_recipients_query(Alert(affected_area=affected_area))
+            if user.id in names}
+
+
+@pytest.mark.parametrize('affected_area, expected', [
+    # An area reaches its wards, and users who gave only a ward
+    ('Dadaab', {'dadaab', 'ifo', 'everywhere', 'unlocated'}),
+    # A ward reaches its parent area
+    ('Ifo', {'dadaab', 'ifo', 'everywhere', 'unlocated'}),
+    ('Fafi', {'fafi', 'everywhere', 'unlocated'}),
+    ('Dadaab; FAFI', {'dadaab', 'ifo', 'fafi', 'everywhere', 'unlocated'}),
+    ('Sankuri', {'everywhere', 'unlocated'}),
+    ('All Areas', {'dadaab', 'ifo', 'fafi', 'everywhere', 'unlocated'}),
+    ('', {'dadaab', 'ifo', 'fafi', 'everywhere', 'unlocated'}),
+])
+def test_recipients_by_affected_area(app, people, affected_area, expected):
+    with app.app_context():
+        assert _recipients(people, affected_area) == expected
+
+
+def test_unlocated_users_can_be_left_out(app, people):
+    app.config['ALERT_TARGET_UNLOCATED_USERS'] = False
+    with app.app_context():
+        assert _recipients(people, 'Fafi') == {'fafi', 'everywhere'}
+        assert 'unlocated' in _recipients(people, 'all')
+
+
+def test_location_index_follows_profile_changes(app, people):
+    from alert_targeting import rebuild_user_locations
+    from models import db, User, UserLocation
+    with app.app_context():
+        moved = db.session.get(User, people['fafi'])
+        moved.city = 'Ifo'
+        db.session.commit()
+        assert 'fafi' in _recipients(people, 'Dadaab')
+        assert 'fafi' not in _recipients(people, 'Fafi')
+
+        indexed = sorted((row.user_id, row.location_key, row.source) for row in UserLocation.query)
+        rebuild_user_locations()
+        assert sorted((row.user_id, row.location_key, row.source) for row in UserLocation.query) == indexed
+
+
+def test_recipient_preview_endpoint(app, client, people, login):
+    login(people['admin'], admin=True)
+    body = client.get('/api/alerts/admin/alerts/recipients?affected_area=Ifo').get_json()
+    assert (body['broadcast'], body['recipients']) == (False, 4)
+    assert {'ifo', 'dadaab'} <= set(body['location_keys'])
+
+    body = client.get('/api/alerts/admin/alerts/recipients?affected_area=countywide').get_json()
+    assert (body['broadcast'], body['location_keys']) == (True, [])
@@ -0,0 +1,74 @@
+"""Broadcast mail: one encoded body per broadcast, per-recipient fields and per-recipient failures."""
+from email import message_from_bytes, policy
+import pytest
+
+RECIPIENTS = [('amina@example.com', {'first_name': 'Amina'}), ('zoë@example.org', {'first_name': 'Zoë'}),
+              ('hassan@example.com', {'first_name': 'Hassan <3'})]
+
+
+@pytest.fixture
+def message():
+    from broadcast_mail import BroadcastMessage
+    return BroadcastMessage.from_template('notification_digest', 'safezone@example.com',
+                                          personal_fields=('user_name',), heading='Flood warning',
+                                          intro='Move to high ground', item_list='')
+
+
+class Recorder:
+    """A ``send`` for send_broadcast that keeps (recipients, data) per call"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, sender, recipients, data):
+        self.calls.append((list(recipients), data))
+        return {}
+
+
+@pytest.mark.parametrize('personalize', [True, False])
+def test_an_unencodable_address_fails_alone(message, personalize):
+    from broadcast_mail import UNENCODABLE_ADDRESS, send_broadcast
+    send = Recorder()
+    recipients = [(email, {'user_name': fields['first_name']}) for email, fields in RECIPIENTS]
+    sent, failed = send_broadcast(message, recipients, send, 'safezone@example.com', personalize=personalize,
+                                  impersonal_fields={'user_name': 'member'})
+    assert sent == ['amina@example.com', 'hassan@example.com']
+    assert failed == [('zoë@example.org', UNENCODABLE_ADDRESS, False)]
+    assert [email for recipients, _ in send.calls for email in recipients] == sent
+
+
+def test_personalized_messages_carry_their_own_fields(message):
+    from broadcast_mail import send_broadcast
+    send = Recorder()
+    send_broadcast(message, [('hassan@example.com', {'user_name': 'Hassan <3'})], send, 'safezone@example.com')
+    [(recipients, data)] = send.calls
+    parsed = message_from_bytes(data, policy=policy.default)
+    assert (parsed['To'], parsed['Subject']) == ('hassan@example.com', 'Flood warning - SafeZone101')
+    text, html = (part.get_content() for part in parsed.iter_parts())
+    assert 'Hi Hassan <3,' in text and 'Hi Hassan &lt;3,' in html
+
+
+def test_alert_email_logs_every_recipient_despite_an_unencodable_one(app):
+    from models import db, Alert, EmailDelivery, Notification, User
+    from utils import send_alert_notification_email
+    app.config['QUERY_AUDIT'] = 'off'
+    with app.app_context():
+        users = [User(first_name=fields['first_name'], last_name='Resident', email=email, role='user',
+                      password_hash='x') for email, fields in RECIPIENTS]
+        admin = User(first_name='Ada', last_name='Admin', email='ada@example.com', role='admin',
+                     password_hash='x', is_admin=True)
+        db.session.add_all(users + [admin])
+        db.session.flush()
+        alert = Alert(title='Flooding', message='Move to high ground', type='Flood', severity='High',
+                      created_by=admin.id)
+        db.session.add(alert)
+        db.session.commit()
+
+        result = send_alert_notification_email(alert, users=users)
+        assert (result['successful'], result['failed'], result['deferred']) == (2, 1, 0)
+        statuses = dict(db.session.query(EmailDelivery.recipient, EmailDelivery.status)
+                        .filter_by(related_type='alert', related_id=str(alert.id)))
+        assert statuses == {'amina@example.com': 'sent', 'zoë@example.org': 'failed',
+                            'hassan@example.com': 'sent'}
+        # Admins hear about the permanent failure
+        assert Notification.query.filter_by(user_id=admin.id, title='Alert Email Delivery Issues').count() == 1
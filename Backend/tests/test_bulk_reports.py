@@ -0,0 +1,153 @@
+"""Bulk report import and batch status updates: validation, chunk failures, notify-after-commit."""
+from datetime import datetime
+import pytest
+from sqlalchemy import event
+
+
+@pytest.fixture
+def people(app):
+    """An admin and two reporters with two pending reports each"""
+    from models import db, User, Report
+    with app.app_context():
+        admin = User(first_name='Ada', last_name='Admin', email='admin@example.com', role='admin',
+                     password_hash='x', is_admin=True)
+        reporters = [User(first_name=name, last_name='Reporter', email=f'{name.lower()}@example.com',
+                          role='user', password_hash='x') for name in ('Amina', 'Hassan')]
+        db.session.add_all([admin] + reporters)
+        db.session.flush()
+        now = datetime.utcnow()
+        reports = {user.id: [Report(user_id=user.id, report_type='Theft', title=f'Report {i}',
+                                    description='Details', date=now, time=now, area='Dadaab', ward='Ifo')
+                             for i in range(2)] for user in reporters}
+        db.session.add_all([r for rs in reports.values() for r in rs])
+        db.session.commit()
+        return {'admin': admin.id, 'reporters': [u.id for u in reporters],
+                'reports': {user_id: [r.id for r in rs] for user_id, rs in reports.items()}}
+
+
+@pytest.fixture
+def admin_client(app, client, people, login):
+    app.config['QUERY_AUDIT'] = 'off'
+    login(people['admin'], admin=True)
+    return client
+
+
+@pytest.fixture
+def failing(app):
+    """``failing(model, event_name, after=0)`` makes the flush of that model fail after ``after`` rows"""
+    listeners = []
+
+    def install(model, event_name, after=0):
+        seen = []
+
+        def fail(mapper, connection, target):
+            seen.append(target)
+            if len(seen) > after:
+                raise RuntimeError('disk full')
+        event.listen(model, event_name, fail)
+        listeners.append((model, event_name, fail))
+    yield install
+    for model, event_name, fail in listeners:
+        event.remove(model, event_name, fail)
+
+
+def _status_notifications(app):
+    from models import Notification
+    with app.app_context():
+        return {n.user_id: n.message for n in Notification.query.filter_by(title='Report Status Updated')}
+
+
+def test_status_update_notifies_each_user_once(app, admin_client, people):
+    from models import Report
+    amina, hassan = people['reporters']
+    ids = people['reports'][amina] + people['reports'][hassan][:1]
+    response = admin_client.patch('/api/reports/admin/reports/status',
+                                  json={'report_ids': ids + ['no-such-report'], 'status': 'Resolved'})
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    assert sorted(body['updated']) == sorted(ids)
+    assert (body['unchanged'], body['not_found']) == ([], ['no-such-report'])
+
+    notifications = _status_notifications(app)
+    assert set(notifications) == {amina, hassan}
+    assert notifications[amina].startswith('The status of 2 of your reports was updated')
+    with app.app_context():
+        assert {r.status for r in Report.query.filter(Report.id.in_(ids))} == {'Resolved'}
+
+
+def test_status_notifications_follow_the_commit(app, admin_client, people, monkeypatch):
+    import blueprints.reports as reports_module
+    from sqlalchemy import text
+    from models import db
+    notify = reports_module.notify_report_status_digest
+    seen = []
+
+    def check_committed(user_id, changes):
+        # A separate connection only sees what the request already committed
+        with db.engine.connect() as conn:
+            seen.extend(conn.execute(text("SELECT status FROM reports WHERE id = :id"),
+                                     {'id': change['report_id']}).scalar() for change in changes)
+        return notify(user_id, changes)
+    monkeypatch.setattr(reports_module, 'notify_report_status_digest', check_committed)
+
+    ids = people['reports'][people['reporters'][0]]
+    assert admin_client.patch('/api/reports/admin/reports/status',
+                              json={'report_ids': ids, 'status': 'Rejected'}).status_code == 200
+    assert seen == ['Rejected', 'Rejected']
+
+
+@pytest.mark.parametrize('report_ids', [[1, 2], [{'id': 'x'}], ['ok', None], ['  ']])
+def test_status_update_rejects_malformed_ids(app, admin_client, people, report_ids):
+    response = admin_client.patch('/api/reports/admin/reports/status',
+                                  json={'report_ids': report_ids, 'status': 'Resolved'})
+    assert response.status_code == 400
+    assert response.get_json()['invalid']
+    assert _status_notifications(app) == {}
+
+
+def test_failed_status_commit_notifies_nobody(app, admin_client, people, failing):
+    from models import Report
+    failing(Report, 'before_update')
+    ids = [report_id for report_ids in people['reports'].values() for report_id in report_ids]
+    response = admin_client.patch('/api/reports/admin/reports/status', json={'report_ids': ids, 'status': 'Closed'})
+    assert response.status_code == 500
+    assert _status_notifications(app) == {}
+    with app.app_context():
+        assert {r.status for r in Report.query} == {'Pending'}
+
+
+def _item(user_id, **fields):
+    item = {'user_id': user_id, 'report_type': 'Fire', 'title': 'Market fire', 'description': 'Smoke',
+            'area': 'Fafi', 'ward': 'Bura'}
+    item.update(fields)
+    return item
+
+
+def test_bulk_import_skips_invalid_items(app, admin_client, people):
+    amina = people['reporters'][0]
+    response = admin_client.post('/api/reports/admin/reports/bulk', json={'reports': [
+        _item(amina), _item(str(amina)), _item(amina, title=''), _item(999), _item(True), 'junk',
+        _item(amina, latitude='north', longitude=1),
+    ]})
+    assert response.status_code == 201, response.get_json()
+    body = response.get_json()
+    assert body['created_count'] == 2
+    assert [error['index'] for error in body['errors']] == [2, 3, 4, 5, 6]
+
+
+def test_committed_chunks_of_a_failed_import_are_announced(app, admin_client, people, failing, monkeypatch):
+    import blueprints.reports as reports_module
+    from models import Notification, Report
+    monkeypatch.setattr(reports_module, 'BULK_CHUNK_SIZE', 2)
+    failing(Report, 'before_insert', after=2)
+    amina = people['reporters'][0]
+
+    response = admin_client.post('/api/reports/admin/reports/bulk',
+                                 json={'reports': [_item(amina, title=f'Fire {i}') for i in range(5)]})
+    assert response.status_code == 500
+    created = response.get_json()['created']
+    assert len(created) == 2
+    with app.app_context():
+        assert Report.query.filter(Report.id.in_(created)).count() == 2
+        announced = Notification.query.filter_by(title='Reports Imported', user_id=people['admin']).one()
+        assert announced.message.startswith('2 reports imported')
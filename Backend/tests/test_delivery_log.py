@@ -0,0 +1,167 @@
+"""Delivery log state machine: queued -> sent | deferred | failed, and the retry queue.
+
+Mail goes through a MemoryTransport whose connections raise scripted errors
+first, with the mail service's own retries turned off so every error lands
+in the delivery log.
+"""
+import smtplib
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+import pytest
+
+
+class ScriptedTransport:
+    """A MemoryTransport whose sends raise ``errors`` (in order) before they succeed"""
+
+    def __init__(self, *errors):
+        from mail_transport import MemoryTransport
+        self.memory = MemoryTransport()
+        self.outbox = self.memory.outbox
+        self.stats = self.memory.stats
+        self.errors = list(errors)
+
+    def connect(self):
+        connection = self.memory.connect()
+        send = connection.sendmail
+
+        def sendmail(sender, recipients, data):
+            if self.errors:
+                raise self.errors.pop(0)
+            return send(sender, recipients, data)
+        connection.sendmail = sendmail
+        return connection
+
+
+@pytest.fixture
+def mail(app):
+    """``mail(*errors)`` routes mail through a ScriptedTransport and returns it"""
+    from mail_transport import MemoryTransport, set_transport
+    app.config['MAIL_SEND_RETRIES'] = 0
+
+    def scripted(*errors):
+        transport = ScriptedTransport(*errors)
+        with app.app_context():
+            set_transport(transport)
+        return transport
+    yield scripted
+    set_transport(MemoryTransport())
+
+
+def _message(recipient='user@example.com'):
+    message = MIMEText('hello', 'plain', 'utf-8')
+    message['Subject'] = 'Test'
+    message['From'] = 'safezone@example.com'
+    message['To'] = recipient
+    return message
+
+
+def _only_delivery():
+    from models import EmailDelivery
+    deliveries = EmailDelivery.query.all()
+    assert len(deliveries) == 1
+    return deliveries[0]
+
+
+def test_transition_enforces_the_state_machine(app):
+    from delivery_log import transition
+    from models import EmailDelivery
+    delivery = EmailDelivery(status='queued', attempts=1, payload=b'data')
+    transition(delivery, 'sent')
+    assert delivery.sent_at is not None and delivery.payload is None
+    with pytest.raises(ValueError):
+        transition(delivery, 'deferred')
+
+    failed = EmailDelivery(status='failed', attempts=5)
+    transition(failed, 'deferred')
+    assert failed.next_attempt_at is not None
+    with pytest.raises(ValueError):
+        transition(failed, 'sent')
+
+
+def test_delivered_email_is_logged_as_sent(app, mail):
+    from delivery_log import deliver_email
+    transport = mail()
+    with app.app_context():
+        assert deliver_email(_message(), 'user@example.com', category='registration')
+        delivery = _only_delivery()
+        assert (delivery.status, delivery.attempts, delivery.payload) == ('sent', 1, None)
+    assert len(transport.outbox) == 1
+
+
+def test_transient_failure_is_deferred_then_sent_by_the_retry_queue(app, mail):
+    from delivery_log import RETRY_DELAYS, deliver_email, process_retry_queue
+    transport = mail(smtplib.SMTPServerDisconnected('dropped'))
+    with app.app_context():
+        # Deferred counts as accepted: the retry queue owns it now
+        assert deliver_email(_message(), 'user@example.com', category='registration')
+        delivery = _only_delivery()
+        assert (delivery.status, delivery.attempts) == ('deferred', 1)
+        assert 'dropped' in delivery.last_error
+        due = delivery.next_attempt_at
+        assert due - datetime.utcnow() <= timedelta(seconds=RETRY_DELAYS[0])
+
+        assert process_retry_queue(now=due - timedelta(seconds=1)) == {'sent': 0, 'deferred': 0, 'failed': 0}
+        assert process_retry_queue(now=due) == {'sent': 1, 'deferred': 0, 'failed': 0}
+        delivery = _only_delivery()
+        assert (delivery.status, delivery.attempts, delivery.payload) == ('sent', 2, None)
+    assert len(transport.outbox) == 1
+
+
+def test_permanent_failure_is_failed_and_raised(app, mail):
+    from delivery_log import deliver_email
+    mail(smtplib.SMTPRecipientsRefused({'user@example.com': (550, b'No such user')}))
+    with app.app_context():
+        with pytest.raises(smtplib.SMTPRecipientsRefused):
+            deliver_email(_message(), 'user@example.com', category='registration')
+        delivery = _only_delivery()
+        assert (delivery.status, delivery.next_attempt_at) == ('failed', None)
+
+
+def test_retries_stop_after_max_attempts(app, mail):
+    from delivery_log import MAX_ATTEMPTS, deliver_email, process_retry_queue
+    mail(*[smtplib.SMTPServerDisconnected('dropped') for _ in range(MAX_ATTEMPTS)])
+    with app.app_context():
+        deliver_email(_message(), 'user@example.com', category='registration')
+        for _ in range(MAX_ATTEMPTS - 1):
+            assert _only_delivery().status == 'deferred'
+            process_retry_queue(now=datetime.utcnow() + timedelta(days=1))
+        delivery = _only_delivery()
+        assert (delivery.status, delivery.attempts) == ('failed', MAX_ATTEMPTS)
+
+
+def test_redrive_puts_failed_deliveries_back_and_sends_them(app, mail):
+    from delivery_log import deliver_email, redrive
+    transport = mail(smtplib.SMTPRecipientsRefused({'user@example.com': (550, b'No such user')}))
+    with app.app_context():
+        with pytest.raises(smtplib.SMTPRecipientsRefused):
+            deliver_email(_message(), 'user@example.com', category='registration')
+        result = redrive(statuses=['failed'])
+        assert (result['redriven'], result['sent']) == (1, 1)
+        assert _only_delivery().status == 'sent'
+    assert len(transport.outbox) == 1
+
+
+def test_drain_hands_this_process_queued_deliveries_to_the_retry_queue(app, monkeypatch):
+    import lifecycle
+    from delivery_log import _track, log_broadcast
+    from models import db, EmailDelivery
+    # drain() marks the process as draining; later tests get a serving process back
+    monkeypatch.setitem(lifecycle._state, 'draining', False)
+    with app.app_context():
+        # A send cut short in this process, one owned by another process, and a broadcast in flight
+        cut_short = EmailDelivery(category='otp', recipient='a@example.com', sender='s', status='queued', payload=b'x')
+        elsewhere = EmailDelivery(category='otp', recipient='b@example.com', sender='s', status='queued', payload=b'x')
+        db.session.add_all([cut_short, elsewhere])
+        db.session.commit()
+        _track(ids=[cut_short.id])
+        log_broadcast('alert', 's', 'Alert', ['c@example.com', 'd@example.com'], ('alert', 1))
+
+    assert lifecycle.drain(app, timeout=1)['email_deliveries'] == 3
+    with app.app_context():
+        statuses = {d.recipient: (d.status, d.next_attempt_at is not None) for d in EmailDelivery.query}
+    assert statuses == {
+        'a@example.com': ('deferred', True),
+        'b@example.com': ('queued', False),
+        'c@example.com': ('deferred', True),
+        'd@example.com': ('deferred', True),
+    }
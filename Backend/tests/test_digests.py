@@ -0,0 +1,127 @@
+"""Notification preferences and digests: in-app muting, opt-in email, buffering and flushing."""
+from datetime import datetime, timedelta
+from email import message_from_bytes, policy
+import pytest
+
+
+@pytest.fixture
+def member(app):
+    from models import db, User
+    with app.app_context():
+        user = User(first_name='Digest', last_name='Reader', email='reader@example.com', role='user',
+                    password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+@pytest.fixture
+def outbox(app):
+    from mail_transport import get_transport
+    with app.app_context():
+        transport = get_transport()
+    transport.clear()
+    return transport.outbox
+
+
+def _preference(client, notification_type):
+    body = client.get('/api/notifications/preferences').get_json()
+    return next(p for p in body['preferences'] if p['type'] == notification_type.value)
+
+
+def test_preferences_endpoint_updates_and_validates(app, client, member, login):
+    from models import NotificationType
+    login(member)
+    status = _preference(client, NotificationType.REPORT_STATUS_UPDATE)
+    assert (status['in_app'], status['email'], status['frequency']) == (True, False, 'hourly')
+
+    response = client.put('/api/notifications/preferences', json={'preferences': [
+        {'type': NotificationType.REPORT_STATUS_UPDATE.value, 'email': True, 'frequency': 'daily'},
+        {'type': NotificationType.EMERGENCY.value, 'in_app': False, 'email': False},
+    ]})
+    assert response.status_code == 200
+    status = _preference(client, NotificationType.REPORT_STATUS_UPDATE)
+    assert (status['email'], status['frequency']) == (True, 'daily')
+    emergency = _preference(client, NotificationType.EMERGENCY)
+    assert (emergency['in_app'], emergency['email'], emergency['locked']) == (True, True, True)
+
+    assert client.put('/api/notifications/preferences', json={'preferences': {}}).status_code == 400
+    assert client.put('/api/notifications/preferences',
+                      json={'preferences': [{'type': 'carrier_pigeon'}]}).status_code == 400
+    assert client.put('/api/notifications/preferences', json={'preferences': [
+        {'type': NotificationType.CHAT_MESSAGE.value, 'frequency': 'weekly'}]}).status_code == 400
+
+
+def test_muted_in_app_notifications_are_not_created_unless_urgent(app, member):
+    from models import db, Notification, NotificationType
+    from digests import update_preferences
+    from utils import create_notification
+    with app.app_context():
+        update_preferences(member, [{'type': NotificationType.CHAT_MESSAGE.value, 'in_app': False}])
+        assert create_notification(member, NotificationType.CHAT_MESSAGE, 'Hi', 'Hello') is None
+        assert create_notification(member, NotificationType.CHAT_MESSAGE, 'Hi', 'Hello', is_urgent=True)
+        assert create_notification(member, NotificationType.MESSAGE, 'Hi', 'Hello')
+        db.session.commit()
+        assert Notification.query.filter_by(user_id=member).count() == 2
+
+
+def test_route_email_follows_the_preference(app, member):
+    from models import db, DigestItem, NotificationType
+    from digests import route_email, update_preferences
+    status = NotificationType.REPORT_STATUS_UPDATE
+    with app.app_context():
+        # Status emails are opt-in
+        assert route_email(member, status, 'Report resolved', 'Pending -> Resolved') == 'skipped'
+        assert route_email(member, status, 'Report resolved', 'Pending -> Resolved', urgent=True) == 'send'
+
+        update_preferences(member, [{'type': status.value, 'email': True}])
+        assert route_email(member, status, 'Report resolved', 'Pending -> Resolved') == 'queued'
+        db.session.commit()
+        assert [(i.frequency, i.subject) for i in DigestItem.query] == [('hourly', 'Report resolved')]
+
+        update_preferences(member, [{'type': status.value, 'frequency': 'immediate'}])
+        assert route_email(member, status, 'Report closed', 'Resolved -> Closed') == 'send'
+        assert route_email(member, NotificationType.EMERGENCY, 'Flood', 'Move to high ground') == 'send'
+
+
+def _queue(member, *subjects, age=timedelta(0), frequency='hourly'):
+    from models import db, DigestItem, NotificationType
+    created_at = datetime.utcnow() - age
+    db.session.add_all([DigestItem(user_id=member, notification_type=NotificationType.CHAT_MESSAGE,
+                                   frequency=frequency, subject=subject, summary=f'{subject} summary',
+                                   created_at=created_at) for subject in subjects])
+    db.session.commit()
+
+
+def test_due_digests_go_out_as_one_email(app, member, outbox):
+    from models import DigestItem
+    from digests import due_batches, flush_due_digests
+    with app.app_context():
+        _queue(member, 'New message from Amina', 'New message from Hassan', age=timedelta(minutes=61))
+        _queue(member, 'Weekly summary', age=timedelta(hours=2), frequency='daily')
+        assert due_batches() == [(member, 'hourly')]
+
+        assert flush_due_digests() == 1
+        [sent] = outbox
+        assert sent.recipients == ('reader@example.com',)
+        assert message_from_bytes(sent.data, policy=policy.default)['Subject'] == '2 Updates - SafeZone101'
+        assert DigestItem.query.filter(DigestItem.sent_at.is_(None)).count() == 1
+
+        # Nothing left that is due; force sends the daily item early
+        assert flush_due_digests() == 0
+        assert flush_due_digests(force=True) == 1
+        assert DigestItem.query.filter(DigestItem.sent_at.is_(None)).count() == 0
+
+
+def test_failed_digest_releases_its_items(app, member, outbox, monkeypatch):
+    import utils
+    from models import DigestItem
+    from digests import flush_due_digests
+    monkeypatch.setattr(utils, 'send_notification_digest_email', lambda **kwargs: False)
+    with app.app_context():
+        _queue(member, 'New message from Amina', age=timedelta(hours=2))
+        assert flush_due_digests() == 0
+        assert DigestItem.query.filter(DigestItem.sent_at.is_(None)).count() == 1
+        monkeypatch.undo()
+        assert flush_due_digests() == 1
+        assert len(outbox) == 1
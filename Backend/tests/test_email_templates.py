@@ -0,0 +1,64 @@
+"""Email templates: escaping, |raw blocks, inlined CSS, the plain-text part and broadcast binding."""
+from email import message_from_bytes, policy
+import pytest
+
+
+def test_values_are_escaped_in_html_only():
+    from email_templates import render_email
+    subject, html, text = render_email('notification_digest', user_name='<Amina & co>', heading='Tom & "Jerry"',
+                                       intro='x < y', item_list='')
+    assert subject == 'Tom & "Jerry" - SafeZone101'
+    assert '&lt;Amina &amp; co&gt;' in html and '<Amina' not in html
+    assert 'Tom &amp; &quot;Jerry&quot;' in html
+    assert 'Hi <Amina & co>,' in text and 'x < y' in text
+
+
+def test_raw_lists_stay_markup_in_html_and_become_lines_in_text():
+    from html import escape
+    from email_templates import html_list, render_email
+    items = html_list(f'<strong>{escape(subject)}</strong>: seen' for subject in ('Fire', '<script>'))
+    _, html, text = render_email('notification_digest', user_name='Amina', heading='2 Updates', intro='Hi',
+                                 item_list=items)
+    assert '<li><strong>Fire</strong>: seen</li>' in html
+    assert '&lt;script&gt;' in html and '<script>' not in html
+    assert '- Fire: seen\n- <script>: seen' in text
+
+
+def test_layout_css_is_inlined_and_buttons_keep_their_link():
+    from email_templates import render_email
+    _, html, text = render_email('registration', user_name='Amina')
+    assert '<style>' not in html
+    assert 'class="button"' in html and 'background-color: #1a73e8' in html
+    assert 'Access Your Dashboard (https://safezone101.com/dashboard)' in text
+    assert text.endswith('please do not reply.')
+
+
+def test_every_template_compiles_without_leftover_slots():
+    from email_templates import TEMPLATES
+    for name, template in TEMPLATES.items():
+        subject, html, text = template.render()
+        assert '{{' not in subject + html + text, name
+
+
+def test_bind_leaves_personal_fields_open():
+    from email_templates import bind_email
+    bound = bind_email('notification_digest', ['user_name'], heading='Updates', intro='Hi', item_list='')
+    assert ('user_name', True) in bound.html and ('user_name', False) in bound.text
+    assert all(not isinstance(part, tuple) or part[0] == 'user_name' for part in bound.html)
+    with pytest.raises(ValueError):
+        bind_email('notification_digest', ['heading'], user_name='Amina', intro='Hi', item_list='')
+
+
+def test_send_template_email_sends_text_and_html_parts(app):
+    from mail_transport import get_transport
+    from utils import send_template_email
+    with app.app_context():
+        outbox = get_transport().outbox
+        outbox.clear()
+        send_template_email('registration', 'zawadi@example.com', category='registration', user_name='Zawadi')
+        [sent] = outbox
+    message = message_from_bytes(sent.data, policy=policy.default)
+    assert sent.recipients == ('zawadi@example.com',)
+    assert message['Subject'] == 'Welcome to SafeZone101!'
+    text, html = (part.get_content() for part in message.iter_parts())
+    assert 'Dear Zawadi,' in text and 'Dear Zawadi,' in html and '<html' in html
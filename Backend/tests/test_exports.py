@@ -0,0 +1,74 @@
+"""Streaming exports: CSV/NDJSON bodies, filters, and chunked output from one query."""
+import csv
+import io
+import json
+import pytest
+
+
+def _csv(response):
+    return list(csv.DictReader(io.StringIO(response.get_data(as_text=True))))
+
+
+def _ndjson(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_report_export_formats_agree(app, client, dataset, login):
+    login(dataset.admin_ids[0], admin=True)
+    as_csv = client.get('/api/reports/admin/reports/export')
+    assert as_csv.status_code == 200 and as_csv.is_streamed
+    assert as_csv.headers['Content-Type'].startswith('text/csv')
+    assert as_csv.headers['Content-Disposition'].startswith('attachment; filename="reports-')
+    rows = _csv(as_csv)
+    assert len(rows) == dataset.counts['reports']
+
+    as_ndjson = client.get('/api/reports/admin/reports/export?format=ndjson')
+    assert as_ndjson.headers['Content-Type'] == 'application/x-ndjson'
+    records = _ndjson(as_ndjson)
+    assert [r['id'] for r in records] == [r['id'] for r in rows]
+    # Typed values survive in NDJSON; CSV carries their text form
+    assert isinstance(records[0]['anonymous'], bool)
+    assert records[0]['created_at'] == rows[0]['created_at']
+    assert records[0]['author_email'] and '@' in records[0]['author_email']
+
+
+def test_report_export_applies_the_listing_filters(app, client, dataset, login):
+    from models import Report
+    login(dataset.admin_ids[0], admin=True)
+    with app.app_context():
+        pending = Report.query.filter_by(status='Pending').count()
+    assert 0 < pending < dataset.counts['reports']
+    rows = _csv(client.get('/api/reports/admin/reports/export?status=Pending'))
+    assert len(rows) == pending and {r['status'] for r in rows} == {'Pending'}
+
+    assert client.get('/api/reports/admin/reports/export?format=xlsx').status_code == 400
+    assert client.get('/api/reports/admin/reports/export?area_id=x').status_code == 400
+
+
+def test_export_streams_in_chunks_from_one_query(app, client, dataset, login, monkeypatch, query_budget):
+    import exports
+    monkeypatch.setattr(exports, 'FLUSH_EVERY', 7)
+    monkeypatch.setattr(exports, 'YIELD_PER', 10)
+    login(dataset.admin_ids[0], admin=True)
+    app.config['QUERY_AUDIT'] = 'off'
+    with query_budget(1):
+        response = client.get('/api/reports/admin/reports/export?format=ndjson')
+        chunks = list(response.response)
+    # ceil(60 rows / 7 per chunk)
+    assert len(chunks) == -(-dataset.counts['reports'] // 7)
+    assert sum(chunk.count(b'\n') for chunk in chunks) == dataset.counts['reports']
+
+
+@pytest.mark.parametrize('path, model', [
+    ('/api/contact/messages/export', 'ContactMessage'),
+    ('/api/messages/export', 'Message'),
+    ('/api/feedback/export', 'Feedback'),
+])
+def test_other_exports(app, client, dataset, login, path, model):
+    import models
+    login(dataset.admin_ids[0], admin=True)
+    with app.app_context():
+        total = getattr(models, model).query.count()
+    assert len(_csv(client.get(path))) == total
+    assert len(_ndjson(client.get(path + '?format=ndjson'))) == total
+    assert client.get(path + '?format=xml').status_code == 400
@@ -0,0 +1,91 @@
+"""Request instrumentation: Server-Timing, the JSON request log, duplicate queries and query observers."""
+import json
+import logging
+import pytest
+
+
+@pytest.fixture
+def request_log():
+    """Records written to the 'safezone.requests' logger, decoded"""
+    from instrumentation import request_log as logger
+    records = []
+
+    class Collect(logging.Handler):
+        def emit(self, record):
+            records.append((record.levelno, json.loads(record.getMessage())))
+    handler = Collect()
+    logger.addHandler(handler)
+    yield records
+    logger.removeHandler(handler)
+
+
+def test_responses_carry_server_timing_and_a_log_line(app, client, dataset, request_log, query_budget):
+    with query_budget(10) as audit:
+        response = client.get('/api/alerts/live')
+    timing = dict(part.split(';', 1) for part in response.headers['Server-Timing'].split(', '))
+    assert set(timing) == {'app', 'cpu', 'db'}
+    assert f'desc="{len(audit)} queries"' in timing['db']
+
+    [(level, record)] = request_log
+    assert level == logging.INFO
+    assert (record['method'], record['route'], record['path'], record['status']) == \
+        ('GET', 'alerts:/api/alerts/live', '/api/alerts/live', 200)
+    assert (record['queries'], record['duplicate_queries']) == (len(audit), 0)
+    assert record['wall_ms'] >= record['db_ms'] >= 0
+
+
+def test_unmatched_paths_share_one_label(client, request_log):
+    assert client.get('/api/no-such-thing').status_code == 404
+    assert request_log[-1][1]['route'] == '<unmatched>'
+
+
+def test_repeated_identical_queries_are_flagged():
+    from instrumentation import RequestProfile
+    profile = RequestProfile()
+    for user_id in (1, 1, 1, 2):
+        profile.record_query('SELECT * FROM users WHERE id = ?', (user_id,), 0.001)
+    profile.record_query('SELECT   1', (), 0.001)
+    record = profile.finish().to_dict()
+    assert (record['queries'], record['duplicate_queries']) == (5, 2)
+    assert record['duplicates'] == [{'sql': 'SELECT * FROM users WHERE id = ?', 'count': 3}]
+    assert round(record['db_ms'], 1) == 5.0
+
+
+def test_duplicate_queries_log_a_warning(app, client, request_log):
+    from sqlalchemy import text
+    from models import db
+
+    @app.route('/twice')
+    def twice():
+        for _ in range(2):
+            db.session.execute(text('SELECT 1')).scalar()
+        return 'ok'
+    client.get('/twice')
+    level, record = request_log[-1]
+    assert (level, record['duplicate_queries']) == (logging.WARNING, 1)
+    assert record['duplicates'] == [{'sql': 'SELECT 1', 'count': 2}]
+
+
+def test_headers_and_log_can_be_turned_off(app, client, request_log):
+    app.config.update(INSTRUMENTATION_SERVER_TIMING=False, INSTRUMENTATION_REQUEST_LOG=False)
+    assert 'Server-Timing' not in client.get('/api/alerts/live').headers
+    assert request_log == []
+
+
+def test_observers_see_queries_outside_requests_and_failed_ones_leave_no_timer(app, monkeypatch):
+    import instrumentation
+    from sqlalchemy import text
+    from sqlalchemy.exc import OperationalError
+    from models import db
+    seen = []
+    monkeypatch.setattr(instrumentation, '_query_observers', [])
+    instrumentation.on_query(lambda statement, parameters, elapsed, conn, executemany:
+                             seen.append((statement, elapsed >= 0)))
+    with app.app_context():
+        with db.engine.connect() as connection:
+            with pytest.raises(OperationalError):
+                connection.execute(text('SELECT * FROM no_such_table'))
+            assert connection.info['query_started'] == []
+            connection.execute(text('SELECT 2'))
+            assert connection.info['query_started'] == []
+    assert seen == [('SELECT 2', True)]
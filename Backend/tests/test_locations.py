@@ -0,0 +1,132 @@
+"""Report locations: names resolve against the Garissa vocabulary, hotspots aggregate and filter in SQL."""
+from datetime import datetime
+import pytest
+
+
+@pytest.fixture
+def reporter(app):
+    from models import db, User
+    with app.app_context():
+        user = User(first_name='Geo', last_name='Reporter', email='geo@example.com', role='user',
+                    password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def _report(reporter, area, ward, latitude=None, longitude=None, report_type='Theft'):
+    from models import Report
+    now = datetime.utcnow()
+    return Report(user_id=reporter, report_type=report_type, title='Incident', description='Details',
+                  date=now, time=now, area=area, ward=ward, latitude=latitude, longitude=longitude)
+
+
+def _location_names(report_id):
+    from models import db, Area, Ward, Report
+    report = db.session.get(Report, report_id)
+    area = db.session.get(Area, report.area_id) if report.area_id else None
+    ward = db.session.get(Ward, report.ward_id) if report.ward_id else None
+    return (area.name if area else None, ward.name if ward else None)
+
+
+def test_names_resolve_against_the_vocabulary_only(app, reporter):
+    from models import db, Area, Ward
+    with app.app_context():
+        areas, wards = Area.query.count(), Ward.query.count()
+        reports = [
+            _report(reporter, '  dadaab ', 'IFO  II'),
+            _report(reporter, 'Ijara', 'Ijara'),
+            _report(reporter, 'Garissa Town', 'Ijara'),
+            _report(reporter, 'Fafi', 'Behind the market'),
+            _report(reporter, 'Near my house', 'Ifo'),
+        ]
+        db.session.add_all(reports)
+        db.session.commit()
+
+        assert [_location_names(r.id) for r in reports] == [
+            ('Dadaab', 'Ifo II'), ('Ijara', 'Ijara'), ('Garissa Town', 'Ijara'), ('Fafi', None), (None, None)]
+        # Two wards share a name but belong to different areas
+        assert reports[1].ward_id != reports[2].ward_id
+        # Free text is kept on the report and never becomes an area or ward
+        assert (reports[4].area, Area.query.count(), Ward.query.count()) == ('Near my house', areas, wards)
+
+
+def test_known_names_missing_from_the_table_are_added_on_commit_only(app, reporter):
+    from sqlalchemy import text
+    from models import db, Area
+    with app.app_context():
+        db.session.execute(text("DELETE FROM areas WHERE name = 'Bulas'"))
+        db.session.commit()
+
+        db.session.add(_report(reporter, 'bulas', ''))
+        db.session.flush()
+        db.session.rollback()
+        assert Area.query.filter_by(name='Bulas').count() == 0
+
+        report = _report(reporter, 'Bulas', '')
+        db.session.add(report)
+        db.session.commit()
+        assert report.area_id == Area.query.filter_by(name='Bulas').one().id
+
+
+def test_backfill_prunes_areas_outside_the_vocabulary(app, reporter):
+    from sqlalchemy import text
+    from models import db, Area, Report
+    from locations import backfill_hotspots
+    with app.app_context():
+        report = _report(reporter, 'Dadaab', 'Ifo')
+        db.session.add(report)
+        db.session.commit()
+        # What free-text resolution used to leave behind
+        db.session.execute(text("INSERT INTO areas (name, county) VALUES ('Near my house', 'Garissa')"))
+        junk = db.session.execute(text("SELECT id FROM areas WHERE name = 'Near my house'")).scalar()
+        db.session.execute(text("UPDATE reports SET area = 'Near my house', area_id = :id, ward_id = NULL"),
+                           {'id': junk})
+        db.session.commit()
+
+        assert backfill_hotspots() == 1
+        db.session.expire_all()
+        assert Area.query.filter_by(name='Near my house').count() == 0
+        assert db.session.get(Report, report.id).area_id is None
+
+
+def test_report_areas_lists_only_areas_with_reports(app, client, reporter, login):
+    from models import db
+    with app.app_context():
+        db.session.add_all([_report(reporter, 'Dadaab', 'Ifo'), _report(reporter, 'Dadaab', 'Liboi'),
+                            _report(reporter, 'Near my house', '')])
+        db.session.commit()
+    login(reporter, admin=True)
+    assert client.get('/api/reports/admin/reports/areas').get_json() == {'areas': ['Dadaab', 'Near my house']}
+
+
+def test_hotspot_bbox_keeps_overlapping_cells(app, reporter, query_budget):
+    from models import db
+    from locations import get_hotspots
+    with app.app_context():
+        db.session.add_all([
+            _report(reporter, 'Garissa Town', 'Shantaba', -0.4532, 39.6461),
+            _report(reporter, 'Garissa Town', 'Shantaba', -0.4539, 39.6468),
+            _report(reporter, 'Garissa Town', 'Saka', -0.4412, 39.6580),
+            _report(reporter, 'Dadaab', 'Ifo', 0.0531, 40.3087),
+            _report(reporter, 'Dadaab', 'Ifo'),
+        ])
+        db.session.commit()
+
+        everything = get_hotspots(group_by=('cell',))
+        assert sorted(h['count'] for h in everything) == [1, 1, 2]
+
+        # One statement for the counts; the box never loads cells outside it
+        with query_budget(1):
+            town = get_hotspots(group_by=('cell',), bbox=(-0.46, 39.64, -0.45, 39.65))
+        assert [(h['cell'], h['count']) for h in town] == [('-46:3964', 2)]
+
+        wider = get_hotspots(group_by=('ward',), bbox=(-0.5, 39.6, -0.4, 39.7))
+        assert sorted((h['ward_name'], h['count']) for h in wider) == [('Saka', 1), ('Shantaba', 2)]
+
+
+def test_hotspot_endpoint_validates_bbox(app, client, reporter, login):
+    login(reporter, admin=True)
+    assert client.get('/api/reports/admin/hotspots?bbox=1,2,3').status_code == 400
+    assert client.get('/api/reports/admin/hotspots?bbox=a,b,c,d').status_code == 400
+    assert client.get('/api/reports/admin/hotspots?group_by=cell&bbox=-1,39,0,40').status_code == 200
@@ -0,0 +1,162 @@
+"""Mail transports: settings, the local SMTP sink over real sockets and the missing-password guard."""
+import smtplib
+import pytest
+
+
+@pytest.fixture
+def sink():
+    from mail_transport import SMTPSink
+    sink = SMTPSink(keep_messages=True).start()
+    yield sink
+    sink.stop()
+
+
+def test_sink_accepts_mail_from_smtplib(sink):
+    transport = sink.transport()
+    body = b'Subject: Test\r\n\r\nfirst line\r\n.leading dot\r\n'
+    with transport.connect() as connection:
+        assert connection.sendmail('safezone@example.com', ['a@example.com', 'b@example.com'], body) == {}
+        connection.sendmail('safezone@example.com', 'c@example.com', body)
+
+    first, second = sink.messages
+    assert (first.sender, first.recipients) == ('safezone@example.com', ('a@example.com', 'b@example.com'))
+    # smtplib dot-stuffs the body; the sink must undo it
+    assert first.data == body
+    assert second.recipients == ('c@example.com',)
+    assert (sink.sessions, sink.message_count) == (1, 2)
+    assert transport.stats.snapshot()['messages'] == 3
+
+
+def test_sink_latency_delays_each_message(sink):
+    import time
+    sink.latency = 0.05
+    started = time.perf_counter()
+    with sink.transport().connect() as connection:
+        connection.sendmail('safezone@example.com', ['a@example.com'], b'Subject: Slow\r\n\r\nbody\r\n')
+    [(recipients, received_at)] = sink.received
+    assert received_at - started >= 0.05
+
+
+def test_settings_come_from_config_then_environment(app, monkeypatch):
+    from mail_transport import MemoryTransport, SMTPTransport, build_transport, mail_setting
+    monkeypatch.setenv('MAIL_SMTP_SSL', '0')
+    monkeypatch.setenv('MAIL_SMTP_PORT', '1025')
+    monkeypatch.setenv('MAIL_SMTP_HOST', 'sink.internal')
+    app.config['MAIL_SMTP_HOST'] = 'relay.internal'
+    with app.app_context():
+        assert (mail_setting('MAIL_SMTP_SSL'), mail_setting('MAIL_SMTP_PORT')) == (False, 1025)
+        transport = build_transport()
+        assert isinstance(transport, SMTPTransport)
+        assert (transport.host, transport.port, transport.use_ssl) == ('relay.internal', 1025, False)
+
+        app.config['MAIL_TRANSPORT'] = 'memory'
+        assert isinstance(build_transport(), MemoryTransport)
+        app.config['MAIL_TRANSPORT'] = 'carrier-pigeon'
+        with pytest.raises(ValueError):
+            build_transport()
+
+
+def test_smtp_without_a_password_refuses_to_log_in(sink):
+    from mail_transport import MailNotConfigured, SMTPTransport
+    host, port = sink.address
+    transport = SMTPTransport(host, port, username='safezone@example.com', password='', use_ssl=False)
+    assert not transport.configured
+    with pytest.raises(MailNotConfigured):
+        transport.connect()
+    assert isinstance(MailNotConfigured(), smtplib.SMTPException)
+    assert sink.sessions == 0
+
+    # Servers that take mail without AUTH only need the username cleared
+    anonymous = SMTPTransport(host, port, username='', password='', use_ssl=False)
+    with anonymous.connect() as connection:
+        connection.sendmail('safezone@example.com', ['a@example.com'], b'Subject: Hi\r\n\r\nbody\r\n')
+    assert sink.message_count == 1
+
+
+class FlakyTransport:
+    """A MemoryTransport whose connections raise ``errors`` (in order) before they succeed"""
+
+    def __init__(self, *errors):
+        from mail_transport import MemoryTransport
+        self.memory = MemoryTransport()
+        self.stats = self.memory.stats
+        self.errors = list(errors)
+        self.opened = []
+
+    def connect(self):
+        connection = self.memory.connect()
+        send = connection.sendmail
+
+        def sendmail(sender, recipients, data):
+            if self.errors:
+                raise self.errors.pop(0)
+            return send(sender, recipients, data)
+        connection.sendmail = sendmail
+        # MailService closes connections through the context manager protocol
+        connection.closed = False
+        connection.__exit__ = lambda *exc: setattr(connection, 'closed', True)
+        self.opened.append(connection)
+        return connection
+
+
+def _service(transport, **options):
+    from mail_transport import MailService
+    options.setdefault('backoff', 0)
+    return MailService(transport, **options)
+
+
+def test_service_reuses_pooled_connections_until_recycled():
+    transport = FlakyTransport()
+    service = _service(transport, max_messages=3)
+    for i in range(7):
+        service.send('safezone@example.com', f'user{i}@example.com', b'body')
+    # 3 + 3 + 1 transactions
+    assert len(transport.opened) == 3
+    assert [c.closed for c in transport.opened] == [True, True, False]
+    snapshot = transport.stats.snapshot()
+    assert (snapshot['messages'], snapshot['reused_connections']) == (7, 4)
+
+
+def test_idle_connections_expire(monkeypatch):
+    import mail_transport
+    transport = FlakyTransport()
+    service = _service(transport, max_idle=60)
+    service.send('safezone@example.com', 'a@example.com', b'body')
+    later = mail_transport.time.monotonic() + 61
+    monkeypatch.setattr(mail_transport.time, 'monotonic', lambda: later)
+    service.send('safezone@example.com', 'b@example.com', b'body')
+    assert len(transport.opened) == 2 and transport.opened[0].closed
+
+
+def test_transient_failures_are_retried_on_a_fresh_connection():
+    transport = FlakyTransport(smtplib.SMTPServerDisconnected('gone'), smtplib.SMTPResponseException(421, b'busy'))
+    service = _service(transport, retries=2)
+    assert service.send('safezone@example.com', ['a@example.com'], b'body') == {}
+    assert len(transport.opened) == 3
+    assert [c.closed for c in transport.opened] == [True, True, False]
+    assert transport.stats.snapshot()['retries'] == 2
+
+
+def test_permanent_failures_and_exhausted_retries_raise():
+    transport = FlakyTransport(smtplib.SMTPResponseException(550, b'no such user'))
+    with pytest.raises(smtplib.SMTPResponseException):
+        _service(transport, retries=2).send('safezone@example.com', ['a@example.com'], b'body')
+    assert transport.stats.snapshot()['retries'] == 0
+
+    transport = FlakyTransport(*[smtplib.SMTPServerDisconnected('gone')] * 3)
+    with pytest.raises(smtplib.SMTPServerDisconnected):
+        _service(transport, retries=1).send('safezone@example.com', ['a@example.com'], b'body')
+    assert len(transport.memory.outbox) == 0
+
+
+def test_flask_mail_messages_go_through_the_shared_service(app):
+    from flask_mail import Message
+    from mail_transport import get_transport, send_flask_message
+    with app.app_context():
+        transport = get_transport()
+        transport.clear()
+        send_flask_message(Message('Contact form', sender='safezone@example.com',
+                                   recipients=['admin@example.com'], body='Hello'))
+    [sent] = transport.outbox
+    assert sent.recipients == ('admin@example.com',)
+    assert b'Subject: Contact form' in sent.data
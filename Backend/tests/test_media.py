@@ -0,0 +1,90 @@
+"""Media derivatives: uploads land where derivation looks, and failures stop being retried."""
+import io
+from datetime import datetime
+import pytest
+
+PIL = pytest.importorskip('PIL.Image')
+
+
+@pytest.fixture
+def report(app, tmp_path, monkeypatch):
+    """A report owned by a fresh user, with uploads going to a temporary app root"""
+    from models import db, User, Report
+    monkeypatch.setattr(app, 'root_path', str(tmp_path / 'app'))
+    with app.app_context():
+        user = User(first_name='Media', last_name='Owner', email='media@example.com', role='user',
+                    password_hash='x')
+        db.session.add(user)
+        db.session.flush()
+        now = datetime.utcnow()
+        report = Report(user_id=user.id, report_type='Theft', title='Bike stolen', description='Outside the mosque',
+                        date=now, time=now, area='Dadaab', ward='Ifo')
+        db.session.add(report)
+        db.session.commit()
+        return {'id': report.id, 'user_id': user.id}
+
+
+def _png():
+    data = io.BytesIO()
+    PIL.new('RGB', (800, 600), 'red').save(data, 'PNG')
+    data.seek(0)
+    return data
+
+
+def _media(report, url, media_type='image'):
+    from models import db, ReportMedia
+    media = ReportMedia(report_id=report['id'], url=url, type=media_type, name=url.rsplit('/', 1)[-1])
+    db.session.add(media)
+    db.session.commit()
+    return media.id
+
+
+def test_upload_is_derived_whatever_the_working_directory(app, client, report, login, tmp_path, monkeypatch):
+    from media import get_upload_dir, wait_for_derivations
+    from models import ReportMediaDerivative
+    monkeypatch.chdir(tmp_path)
+    login(report['user_id'])
+    response = client.post(f"/api/reports/{report['id']}/media",
+                           data={'file': (_png(), 'scene.png', 'image/png')},
+                           content_type='multipart/form-data')
+    assert response.status_code == 201, response.get_json()
+    assert wait_for_derivations(5) == 0
+
+    with app.app_context():
+        assert (tmp_path / 'app' / 'uploads' / 'scene.png').exists()
+        assert get_upload_dir() == str(tmp_path / 'app' / 'uploads')
+        derivative = ReportMediaDerivative.query.filter_by(media_id=response.get_json()['id']).one()
+        assert (derivative.kind, derivative.status, derivative.attempts) == ('thumbnail', 'ready', 1)
+        assert max(derivative.width, derivative.height) == 320
+    assert not (tmp_path / 'uploads').exists()
+
+
+def test_failed_derivatives_stop_being_retried(app, client, report, login):
+    from media import MAX_ATTEMPTS, derive_missing
+    from models import ReportMediaDerivative
+    with app.app_context():
+        media_id = _media(report, '/uploads/missing.png')
+        for attempt in range(1, MAX_ATTEMPTS + 1):
+            assert derive_missing() == 1
+            derivative = ReportMediaDerivative.query.filter_by(media_id=media_id).one()
+            assert (derivative.status, derivative.attempts) == ('failed', attempt)
+            assert derivative.error == 'Original file not found'
+        assert derive_missing() == 0
+
+    # Regenerating by hand starts the count again
+    login(report['user_id'], admin=True)
+    body = client.post(f'/api/reports/admin/media/{media_id}/derivatives').get_json()
+    assert [(d['status'], d['attempts']) for d in body['derivatives']] == [('failed', 1)]
+
+
+def test_video_missing_one_kind_is_still_derived(app, report):
+    from media import derive_missing
+    from models import db, ReportMediaDerivative
+    with app.app_context():
+        media_id = _media(report, '/uploads/clip.mp4', media_type='video')
+        db.session.add(ReportMediaDerivative(media_id=media_id, kind='poster', status='ready',
+                                             url='/uploads/clip_poster.jpg'))
+        db.session.commit()
+        assert derive_missing() == 1
+        statuses = {d.kind: d.status for d in ReportMediaDerivative.query.filter_by(media_id=media_id)}
+        assert statuses['poster'] == 'ready' and statuses['thumbnail'] in ('failed', 'unsupported')
@@ -0,0 +1,75 @@
+"""Prometheus metrics: who may scrape, and totals of exited workers folded into one archive."""
+import os
+import pytest
+
+LABELS = ['archive-test', '/api/archived', 'GET', '200']
+
+
+@pytest.fixture
+def metrics_dir(tmp_path, monkeypatch):
+    import metrics
+    directory = tmp_path / 'metrics'
+    directory.mkdir()
+    monkeypatch.setattr(metrics._flusher, 'directory', str(directory))
+    return directory
+
+
+def _write_worker_file(directory, pid, requests, started=1):
+    from metrics import _write_snapshot
+    _write_snapshot(str(directory), os.path.join(str(directory), f'metrics-{pid}-{started}.json'),
+                    {'http_requests_total': [[LABELS, requests]]})
+
+
+def _archived_requests():
+    from metrics import collect
+    return collect().get('http_requests_total', {}).get(tuple(LABELS), 0)
+
+
+def test_metrics_need_a_token_or_an_explicit_opt_in_outside_debug(app, client):
+    app.config['TESTING'] = False
+    assert client.get('/metrics').status_code == 403
+    app.config['METRICS_PUBLIC'] = '1'
+    assert client.get('/metrics').status_code == 200
+
+    app.config['METRICS_TOKEN'] = 's3cret'
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer s3cret'})
+    assert response.status_code == 200
+    assert '# TYPE http_requests_total counter' in response.get_data(as_text=True)
+
+
+def test_exited_workers_are_folded_into_the_archive(app, metrics_dir):
+    from metrics import ARCHIVE_FILE, archive_process
+    _write_worker_file(metrics_dir, 101, 3)
+    _write_worker_file(metrics_dir, 202, 4)
+    assert _archived_requests() == 7
+
+    assert archive_process(101) == 1
+    assert sorted(os.listdir(metrics_dir)) == [ARCHIVE_FILE, 'metrics-202-1.json']
+    assert _archived_requests() == 7
+
+    # A pid reused by a later worker adds to what is archived
+    _write_worker_file(metrics_dir, 101, 5, started=2)
+    assert archive_process(101) == 1 and archive_process(202) == 1
+    assert os.listdir(metrics_dir) == [ARCHIVE_FILE]
+    assert _archived_requests() == 12
+    assert archive_process(303) == 0
+
+
+def test_a_scrape_racing_the_archive_counts_everything_once(app, metrics_dir, monkeypatch):
+    import metrics
+    _write_worker_file(metrics_dir, 101, 3)
+    _write_worker_file(metrics_dir, 202, 4)
+    load = metrics._load
+    racing = {'done': False}
+
+    def load_while_archiving(path):
+        if path.endswith('metrics-101-1.json') and not racing['done']:
+            # The master archives worker 101 after the scrape listed its file
+            racing['done'] = True
+            metrics.archive_process(101)
+        return load(path)
+    monkeypatch.setattr(metrics, '_load', load_while_archiving)
+    assert _archived_requests() == 7
+    assert racing['done']
@@ -0,0 +1,62 @@
+"""Sampling profiler: sessions sample the requests they cover, and keep sampling in forked workers."""
+import threading
+import time
+import pytest
+
+
+@pytest.fixture
+def profiler(app):
+    from profiler import profiler
+
+    @app.route('/slow')
+    def slow_view():
+        deadline = time.monotonic() + 0.15
+        while time.monotonic() < deadline:
+            pass
+        return 'done'
+    yield profiler
+    for session in profiler.running():
+        session.finish('stopped')
+    sampler = profiler._sampler
+    if sampler is not None:
+        sampler.join(1)
+    profiler.sessions.clear()
+
+
+def _sampled_views(session):
+    return {frame.split(' (')[0] for stack, _ in session.top_stacks() for frame in stack}
+
+
+def test_a_session_samples_the_requests_it_covers(client, profiler):
+    session = profiler.start(route='/slow', interval_ms=2)
+    other = profiler.start(route='alerts:*', interval_ms=2)
+    assert client.get('/slow').data == b'done'
+    assert session.requests == 1 and session.sample_count > 0
+    assert 'slow_view' in _sampled_views(session)
+    assert (other.requests, other.sample_count) == (0, 0)
+    assert 'slow_view' in session.collapsed()
+
+
+def test_continuous_sampling_survives_a_fork(app, client, profiler, tmp_path, monkeypatch):
+    import lifecycle
+    from profiler import ProfileSession
+    # What a worker inherits from a preloaded master: the running session and
+    # the sampler's Thread object, but not the thread itself
+    session = ProfileSession(name='continuous', seconds=None, interval_ms=2)
+    profiler.sessions[session.id] = session
+    dead = threading.Thread(target=lambda: None)
+    dead.start()
+    dead.join()
+    profiler._sampler = dead
+    client.get('/slow')
+    assert session.sample_count == 0
+
+    app.config['SCHEDULER_LOCK_FILE'] = str(tmp_path / 'schedulers.lock')
+    monkeypatch.setitem(lifecycle._state, 'scheduler_lock', None)
+    lifecycle.after_fork(app)
+    if lifecycle._state['scheduler_lock'] is not None:
+        lifecycle._state['scheduler_lock'].close()
+    assert profiler._sampler.is_alive()
+    client.get('/slow')
+    assert session.requests == 2 and session.sample_count > 0
+    assert 'slow_view' in _sampled_views(session)
@@ -0,0 +1,73 @@
+"""Each route in QUERY_BUDGETS, driven against the seeded dataset.
+
+The client runs with QUERY_AUDIT='raise', so a request that goes over its
+budget or issues an N+1 fails with the statements and their call sites.
+"""
+import pytest
+from conftest import QUERY_BUDGETS
+
+
+def _busiest_user(app):
+    from models import db, Notification
+    with app.app_context():
+        return db.session.query(Notification.user_id).group_by(Notification.user_id)\
+            .order_by(db.func.count().desc()).limit(1).scalar()
+
+
+@pytest.mark.parametrize('path', ['/api/notifications/', '/api/notifications/stats', '/api/reports/'])
+def test_user_routes_stay_within_budget(app, client, dataset, login, path):
+    login(_busiest_user(app))
+    response = client.get(path)
+    assert response.status_code == 200, response.get_json()
+
+
+def test_notification_stats_counts_by_type(app, client, dataset, login):
+    user_id = _busiest_user(app)
+    login(user_id)
+    stats = client.get('/api/notifications/stats').get_json()
+    from models import Notification
+    with app.app_context():
+        total = Notification.query.filter_by(user_id=user_id).count()
+    assert stats['total'] == total
+    assert sum(stats['by_type'].values()) <= total
+    assert stats['by_type']['admin_alert'] > 0
+
+
+@pytest.mark.parametrize('path', ['/api/reports/admin/reports', '/api/alerts/admin/alerts'])
+def test_admin_routes_stay_within_budget(client, dataset, login, path):
+    login(dataset.admin_ids[0], admin=True)
+    response = client.get(path)
+    assert response.status_code == 200, response.get_json()
+
+
+def test_admin_alerts_lists_every_alert_with_its_creator(client, dataset, login):
+    login(dataset.admin_ids[0], admin=True)
+    alerts = client.get('/api/alerts/admin/alerts').get_json()['alerts']
+    assert len(alerts) == dataset.counts['alerts']
+    assert all(alert['creator']['id'] == alert['created_by'] for alert in alerts)
+
+
+def test_live_alerts_stay_within_budget(client, dataset):
+    response = client.get('/api/alerts/live')
+    assert response.status_code == 200
+
+
+def test_every_budgeted_route_is_exercised():
+    exercised = {
+        'notifications:/api/notifications/', 'notifications:/api/notifications/stats',
+        'reports:/api/reports/', 'reports:/api/reports/admin/reports',
+        'alerts:/api/alerts/live', 'alerts:/api/alerts/admin/alerts',
+    }
+    assert set(QUERY_BUDGETS) == exercised
+
+
+def test_budget_fixture_fails_a_block_over_budget(app, dataset, query_budget):
+    from models import Alert
+    with app.app_context():
+        with query_budget(1) as audit:
+            alerts = Alert.query.limit(3).all()
+        assert len(audit) == 1
+        with pytest.raises(pytest.fail.Exception):
+            with query_budget(1):
+                for alert in alerts:
+                    alert.creator
@@ -0,0 +1,88 @@
+"""Report listing DSL: filters, sort keys, sparse fieldsets and pagination on /admin/reports."""
+import pytest
+
+URL = '/api/reports/admin/reports'
+
+
+@pytest.fixture
+def admin(client, dataset, login):
+    login(dataset.admin_ids[0], admin=True)
+    return client
+
+
+def _reports(client, query):
+    response = client.get(f'{URL}?{query}')
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_multi_value_and_repeated_filters_agree(app, admin):
+    from models import Report
+    with app.app_context():
+        expected = Report.query.filter(Report.status.in_(['Pending', 'Resolved'])).count()
+    listed = _reports(admin, 'status=Pending,Resolved&fields=status')['reports']
+    assert len(listed) == expected
+    assert {r['status'] for r in listed} == {'Pending', 'Resolved'}
+    assert len(_reports(admin, 'status=Pending&status=Resolved&fields=id')['reports']) == expected
+
+
+def test_all_is_the_dashboards_no_op_choice(admin, dataset):
+    assert len(_reports(admin, 'status=All&urgency=All&fields=id')['reports']) == dataset.counts['reports']
+
+
+def test_created_range_with_a_bare_date_covers_the_whole_day(app, admin):
+    from models import db, Report
+    with app.app_context():
+        newest = Report.query.order_by(Report.created_at.desc()).first().created_at
+        same_day = Report.query.filter(db.func.date(Report.created_at) == newest.date().isoformat()).count()
+    day = newest.date().isoformat()
+    listed = _reports(admin, f'created_from={day}&created_to={day}&fields=created_at')['reports']
+    assert len(listed) == same_day
+    assert all(r['created_at'].startswith(day) for r in listed)
+
+
+def test_sort_by_urgency_rank_then_created_at(app, admin):
+    from report_query import URGENCY_RANK
+    listed = _reports(admin, 'sort=-urgency,created_at&fields=urgency,created_at')['reports']
+    ranks = [URGENCY_RANK.get(r['urgency'], 1) for r in listed]
+    assert ranks == sorted(ranks, reverse=True)
+    for previous, current in zip(listed, listed[1:]):
+        if previous['urgency'] == current['urgency']:
+            assert previous['created_at'] <= current['created_at']
+
+
+def test_sparse_fieldset_with_relations(app, admin, dataset):
+    listed = _reports(admin, 'fields=title,author,media&per_page=10')['reports']
+    assert len(listed) == 10
+    assert set(listed[0]) == {'id', 'title', 'author', 'media'}
+    assert set(listed[0]['author']) == {'id', 'first_name', 'last_name', 'email'}
+    assert any(r['media'] for r in listed)
+
+
+def test_pagination_is_stable_and_counted(admin, dataset):
+    first = _reports(admin, 'sort=status&fields=id&page=1&per_page=25')
+    second = _reports(admin, 'sort=status&fields=id&page=2&per_page=25')
+    third = _reports(admin, 'sort=status&fields=id&page=3&per_page=25')
+    assert first['pagination'] == {'page': 1, 'per_page': 25, 'total': dataset.counts['reports']}
+    ids = [r['id'] for page in (first, second, third) for r in page['reports']]
+    assert len(ids) == len(set(ids)) == dataset.counts['reports']
+
+
+@pytest.mark.parametrize('query', [
+    'sort=-password', 'fields=id,secret', 'created_from=yesterday', 'area_id=Dadaab',
+    'anonymous=maybe', 'page=two',
+])
+def test_invalid_arguments_are_rejected(admin, query):
+    response = admin.get(f'{URL}?{query}')
+    assert response.status_code == 400
+    assert response.get_json()['error']
+
+
+def test_user_listing_only_returns_their_own_reports(app, client, dataset, login):
+    from models import Report
+    with app.app_context():
+        user_id = Report.query.first().user_id
+        own = Report.query.filter_by(user_id=user_id).count()
+    login(user_id)
+    listed = client.get('/api/reports/?fields=user_id').get_json()['reports']
+    assert len(listed) == own and {r['user_id'] for r in listed} == {user_id}
@@ -0,0 +1,71 @@
+"""Cached public feeds: ETag revalidation, 304s without queries, invalidation on writes."""
+import time
+from datetime import datetime, timedelta
+
+
+def _create_alert(client, **fields):
+    payload = {'title': 'Flooding', 'message': 'Move to high ground', 'type': 'Flood',
+               'status': 'Active', 'severity': 'Low', 'affected_area': 'Township'}
+    payload.update(fields)
+    response = client.post('/api/alerts/admin/alerts', json=payload)
+    assert response.status_code == 201, response.get_json()
+    return response.get_json()
+
+
+def test_second_poll_is_served_from_the_cache(client, dataset):
+    first = client.get('/api/alerts/live')
+    assert (first.status_code, first.headers['X-Cache']) == (200, 'MISS')
+    assert first.headers['Cache-Control'] == 'public, no-cache'
+    second = client.get('/api/alerts/live')
+    assert (second.status_code, second.headers['X-Cache']) == (200, 'HIT')
+    assert second.headers['ETag'] == first.headers['ETag']
+    assert second.get_data() == first.get_data()
+
+
+def test_matching_etag_gets_a_304_without_touching_the_database(app, client, dataset, query_budget):
+    etag = client.get('/api/alerts/live').headers['ETag']
+    with app.app_context():
+        with query_budget(0):
+            response = client.get('/api/alerts/live', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    assert response.get_data() == b''
+    assert response.headers['ETag'] == etag
+
+
+def test_alert_write_invalidates_the_feeds(app, client, dataset, login):
+    app.config['QUERY_AUDIT'] = 'off'
+    before = client.get('/api/alerts/live')
+    login(dataset.admin_ids[0], admin=True)
+    created = _create_alert(client)
+
+    after = client.get('/api/alerts/live', headers={'If-None-Match': before.headers['ETag']})
+    assert (after.status_code, after.headers['X-Cache']) == (200, 'MISS')
+    assert after.headers['ETag'] != before.headers['ETag']
+    assert created['id'] in [alert['id'] for alert in after.get_json()['alerts']]
+
+
+def test_entry_does_not_outlive_the_first_alert_end_date(app, client, dataset, login):
+    app.config['QUERY_AUDIT'] = 'off'
+    login(dataset.admin_ids[0], admin=True)
+    alert = _create_alert(client, end_date=(datetime.utcnow() + timedelta(seconds=0.5)).isoformat())
+    assert alert['id'] in [a['id'] for a in client.get('/api/alerts/live').get_json()['alerts']]
+    assert client.get('/api/alerts/live').headers['X-Cache'] == 'HIT'
+    time.sleep(0.6)
+    # Well inside the 30s TTL, but the alert has ended
+    expired = client.get('/api/alerts/live')
+    assert expired.headers['X-Cache'] == 'MISS'
+    assert alert['id'] not in [a['id'] for a in expired.get_json()['alerts']]
+
+
+def test_zero_ttl_still_revalidates(app, client, dataset):
+    app.config['RESPONSE_CACHE_TTL'] = 0
+    first = client.get('/api/alerts/resolved')
+    second = client.get('/api/alerts/resolved', headers={'If-None-Match': first.headers['ETag']})
+    assert first.headers['X-Cache'] == 'MISS'
+    assert second.status_code == 304
+
+
+def test_errors_are_not_cached(client):
+    first = client.get('/api/alerts/changes?since=abc')
+    assert first.status_code == 400
+    assert 'ETag' not in first.headers and 'X-Cache' not in first.headers
@@ -0,0 +1,107 @@
+"""Report rollups: counters kept in step with report writes, and a backfill that agrees with them."""
+from datetime import datetime, timedelta
+import pytest
+
+CREATED = datetime(2024, 3, 5, 14, 25)
+
+
+@pytest.fixture
+def reporter(app):
+    from models import db, User
+    with app.app_context():
+        user = User(first_name='Roll', last_name='Up', email='rollup@example.com', role='user',
+                    password_hash='x')
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+
+def _report(reporter, created_at=CREATED, **fields):
+    from models import Report
+    values = {'user_id': reporter, 'report_type': 'Theft', 'title': 'Phone stolen', 'description': 'At the market',
+              'date': created_at, 'time': created_at, 'area': 'Garissa Town', 'ward': 'Township',
+              'urgency': 'high', 'status': 'Pending', 'created_at': created_at}
+    values.update(fields)
+    return Report(**values)
+
+
+def _rollups():
+    """{(granularity, bucket_start, report_type, urgency, status): count} for every non-zero counter"""
+    from models import ReportRollup
+    return {(r.granularity, r.bucket_start, r.report_type, r.urgency, r.status): r.count
+            for r in ReportRollup.query if r.count}
+
+
+def test_insert_counts_the_report_in_its_hour_and_day(app, reporter):
+    from models import db
+    with app.app_context():
+        db.session.add_all([_report(reporter), _report(reporter, created_at=CREATED + timedelta(minutes=50))])
+        db.session.commit()
+        assert _rollups() == {
+            ('hour', datetime(2024, 3, 5, 14), 'Theft', 'high', 'Pending'): 1,
+            ('hour', datetime(2024, 3, 5, 15), 'Theft', 'high', 'Pending'): 1,
+            ('day', datetime(2024, 3, 5), 'Theft', 'high', 'Pending'): 2,
+        }
+
+
+def test_status_change_moves_the_count_and_delete_removes_it(app, reporter):
+    from models import db
+    with app.app_context():
+        report = _report(reporter)
+        db.session.add(report)
+        db.session.commit()
+
+        report.status = 'Resolved'
+        db.session.commit()
+        assert _rollups() == {
+            ('hour', datetime(2024, 3, 5, 14), 'Theft', 'high', 'Resolved'): 1,
+            ('day', datetime(2024, 3, 5), 'Theft', 'high', 'Resolved'): 1,
+        }
+
+        # Fields outside the rollup key leave the counters alone
+        report.admin_notes = 'Called the reporter'
+        db.session.commit()
+        assert sum(_rollups().values()) == 2
+
+        db.session.delete(report)
+        db.session.commit()
+        assert _rollups() == {}
+
+
+def test_backfill_agrees_with_the_incremental_counters(app, reporter):
+    from models import db, Report
+    from rollups import backfill_rollups, query_rollups
+    with app.app_context():
+        reports = [_report(reporter, created_at=CREATED + timedelta(hours=5 * i),
+                           report_type=('Theft', 'Assault')[i % 2], urgency=('low', 'high', 'critical')[i % 3])
+                   for i in range(12)]
+        db.session.add_all(reports)
+        db.session.commit()
+        reports[0].status = 'In Progress'
+        reports[1].urgency = 'low'
+        db.session.delete(reports[2])
+        db.session.commit()
+
+        incremental = _rollups()
+        backfill_rollups()
+        assert _rollups() == incremental
+
+        totals = query_rollups(CREATED - timedelta(days=1), CREATED + timedelta(days=5),
+                               group_by=('report_type',), series=False)
+        raw = dict(db.session.query(Report.report_type, db.func.count()).group_by(Report.report_type).all())
+        assert {row['report_type']: row['count'] for row in totals} == raw == {'Theft': 5, 'Assault': 6}
+
+
+def test_analytics_endpoint_sums_over_the_range(app, client, reporter, login):
+    from models import db
+    with app.app_context():
+        db.session.add_all([_report(reporter), _report(reporter, status='Resolved'),
+                            _report(reporter, created_at=CREATED - timedelta(days=40))])
+        db.session.commit()
+    login(reporter, admin=True)
+
+    response = client.get('/api/reports/admin/analytics?group_by=status&series=false'
+                          '&start=2024-03-01T00:00:00&end=2024-03-06T00:00:00')
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()['data'] == [{'status': 'Pending', 'count': 1}, {'status': 'Resolved', 'count': 1}]
+    assert client.get('/api/reports/admin/analytics?group_by=colour').status_code == 400
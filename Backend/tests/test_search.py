@@ -0,0 +1,68 @@
+"""Full-text search: ORM writes and rebuilds index the same text, and snippets are safe HTML."""
+import pytest
+
+FORGED = 'foo \x02bar\x03 baz <b>bold</b>'
+
+
+@pytest.fixture
+def message(app):
+    """A support message whose text tries to forge highlight markers and markup"""
+    from models import db, Message
+    with app.app_context():
+        message = Message(email='user@example.com', title='Question', message=FORGED)
+        db.session.add(message)
+        db.session.commit()
+        return message.id
+
+
+def _snippet(query):
+    from search import search
+    results = search(query, ['message'])['results']
+    assert len(results) == 1
+    return results[0]['snippet']
+
+
+def test_index_strips_forged_markers_and_escapes_markup(app, message):
+    from search import get_backend
+    with app.app_context():
+        if get_backend() == 'fts5':
+            assert _snippet('foo') == '<mark>foo</mark> bar baz &lt;b&gt;bold&lt;/b&gt;'
+        else:
+            assert _snippet('foo') == 'foo bar baz &lt;b&gt;bold&lt;/b&gt;'
+
+
+def test_rebuild_indexes_the_same_text_as_orm_writes(app, message):
+    from models import SearchDocument
+    from search import rebuild_index
+    with app.app_context():
+        before = _snippet('foo')
+        indexed = SearchDocument.query.filter_by(entity_type='message').one()
+        assert '\x02' not in indexed.body and '\x03' not in indexed.body
+
+        assert rebuild_index(['message']) == {'message': 1}
+        assert _snippet('foo') == before
+        rebuilt = SearchDocument.query.filter_by(entity_type='message').one()
+        assert (rebuilt.title, rebuilt.body) == (indexed.title, indexed.body) == ('Question', 'foo bar baz <b>bold</b>')
+
+
+def test_edits_and_deletes_follow_the_source_rows(app, message):
+    from models import db, Message
+    from search import search
+    with app.app_context():
+        row = db.session.get(Message, message)
+        row.message = 'the generator is on fire'
+        db.session.commit()
+        assert search('foo', ['message'])['total'] == 0
+        assert search('generator', ['message'])['total'] == 1
+
+        db.session.delete(row)
+        db.session.commit()
+        assert search('generator', ['message'])['total'] == 0
+
+
+def test_search_endpoint_validates_its_arguments(client, message, login):
+    login(1, admin=True)
+    assert client.get('/api/admin/search').status_code == 400
+    assert client.get('/api/admin/search?q=foo&types=users').status_code == 400
+    body = client.get('/api/admin/search?q=foo&types=message').get_json()
+    assert (body['total'], body['results'][0]['id']) == (1, message)
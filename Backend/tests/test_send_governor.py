@@ -0,0 +1,139 @@
+"""Send governor: priority order among waiters, per-class reserves, and alert
+broadcasts that defer instead of waiting for tokens."""
+import threading
+import time
+import pytest
+
+
+def _governor(rate, capacity, tokens):
+    from mail_transport import SendGovernor, TokenBucket
+    bucket = TokenBucket('test', rate, capacity)
+    bucket.tokens = tokens
+    return SendGovernor([bucket]), bucket
+
+
+def _wait_for_waiters(governor, count):
+    deadline = time.monotonic() + 2
+    while governor.snapshot()['waiting'] < count:
+        assert time.monotonic() < deadline, 'waiter never queued'
+        time.sleep(0.005)
+
+
+def test_most_urgent_waiter_is_served_first(app):
+    governor, _ = _governor(rate=10, capacity=1, tokens=0)
+    granted = []
+
+    def send(priority):
+        governor.acquire(1, priority, max_wait=5)
+        granted.append(priority)
+
+    # The digest queues first, then an OTP arrives while it waits for the next token
+    threads = [threading.Thread(target=send, args=('digest',))]
+    threads[0].start()
+    _wait_for_waiters(governor, 1)
+    threads.append(threading.Thread(target=send, args=('auth',)))
+    threads[1].start()
+    for thread in threads:
+        thread.join(5)
+    assert granted == ['auth', 'digest']
+
+
+def test_lower_classes_leave_their_reserve_untouched(app):
+    from mail_transport import PRIORITY_RESERVE, RateLimited
+    governor, bucket = _governor(rate=0.001, capacity=10, tokens=2)
+    # 2 of 10 tokens left is inside the digest class's reserve, not the auth class's
+    assert 10 * PRIORITY_RESERVE['digest'] > 2
+    with pytest.raises(RateLimited) as limited:
+        governor.acquire(1, 'digest', max_wait=0)
+    assert limited.value.retry_after > 0
+    assert governor.acquire(1, 'auth', max_wait=0) < 0.1
+    assert round(bucket.tokens) == 1
+    assert governor.snapshot()['rate_limited']['digest'] == 1
+
+
+def test_zero_max_wait_never_sleeps(app):
+    from mail_transport import RateLimited
+    governor, _ = _governor(rate=1, capacity=5, tokens=0)
+    started = time.monotonic()
+    with pytest.raises(RateLimited):
+        governor.acquire(1, 'alert', max_wait=0)
+    assert time.monotonic() - started < 0.1
+
+
+def test_alert_broadcast_defers_what_the_rate_limit_will_not_take(app, client, dataset, login):
+    from mail_transport import MemoryTransport, set_transport
+    from models import db, EmailDelivery
+    app.config.update(MAIL_RATE_PER_MINUTE=5, QUERY_AUDIT='off')
+    transport = MemoryTransport()
+    with app.app_context():
+        set_transport(transport)
+    login(dataset.admin_ids[0], admin=True)
+
+    started = time.monotonic()
+    response = client.post('/api/alerts/admin/alerts', json={
+        'title': 'Flooding', 'message': 'Move to high ground', 'type': 'Flood', 'status': 'Active',
+        'severity': 'High', 'affected_area': 'all',
+    })
+    assert response.status_code == 201, response.get_json()
+    # A full minute's tokens would take a blocking sender ~12s per message
+    assert time.monotonic() - started < 2
+
+    alert_id = response.get_json()['id']
+    with app.app_context():
+        statuses = dict(db.session.query(EmailDelivery.status, db.func.count())
+                        .filter_by(related_type='alert', related_id=str(alert_id))
+                        .group_by(EmailDelivery.status).all())
+    assert statuses.get('sent', 0) == len(transport.outbox) <= 5
+    assert statuses.get('deferred', 0) > 0
+    assert set(statuses) <= {'sent', 'deferred'}
+
+
+def test_oversized_batches_are_charged_in_full(app):
+    from mail_transport import RateLimited
+    governor, bucket = _governor(rate=0.001, capacity=10, tokens=10)
+    # Bigger than the bucket: waits for a full bucket, then leaves it in debt
+    assert governor.acquire(25, 'auth', max_wait=0) < 0.1
+    assert round(bucket.tokens) == -15
+    with pytest.raises(RateLimited) as limited:
+        governor.acquire(1, 'auth', max_wait=0)
+    assert limited.value.retry_after > 15 / 0.001 - 1
+
+
+def test_daily_quota_is_shared_between_processes(app):
+    from mail_transport import DailyQuota, RateLimited, SendGovernor
+    with app.app_context():
+        # Two workers, each with its own governor, one quota row
+        first, second = SendGovernor([], quota=DailyQuota(10)), SendGovernor([], quota=DailyQuota(10))
+        first.acquire(6, 'auth', max_wait=0)
+        with pytest.raises(RateLimited) as limited:
+            second.acquire(5, 'auth', max_wait=0)
+        # Not until the next UTC day
+        assert 0 < limited.value.retry_after <= 86400
+        second.acquire(4, 'auth', max_wait=0)
+        assert second.snapshot()['daily_quota'] == {'limit': 10, 'used': 10}
+
+        # A restarted worker starts from the shared count, not a full allowance
+        with pytest.raises(RateLimited):
+            SendGovernor([], quota=DailyQuota(10)).acquire(1, 'auth', max_wait=0)
+
+
+def test_daily_quota_keeps_each_class_reserve(app):
+    from mail_transport import DailyQuota, RateLimited, SendGovernor
+    with app.app_context():
+        governor = SendGovernor([], quota=DailyQuota(10))
+        governor.acquire(7, 'digest', max_wait=0)
+        with pytest.raises(RateLimited):
+            governor.acquire(1, 'digest', max_wait=0)
+        governor.acquire(3, 'auth', max_wait=0)
+
+
+def test_rates_are_split_between_workers(app):
+    from mail_transport import MemoryTransport, build_buckets, build_quota
+    app.config.update(WEB_CONCURRENCY=4, MAIL_RATE_PER_MINUTE=60, MAIL_RATE_PER_SECOND=8.0,
+                      MAIL_DAILY_QUOTA=500)
+    with app.app_context():
+        second, minute = build_buckets(MemoryTransport())
+        assert (second.rate, second.capacity) == (2.0, 2.0)
+        assert (minute.rate, minute.capacity) == (0.25, 15)
+        # The daily quota is counted in the database, so it is not divided
+        assert build_quota(MemoryTransport()).limit == 500
@@ -0,0 +1,55 @@
+"""Slow query log: statements over the threshold are recorded with their plan, timed by instrumentation."""
+import pytest
+
+
+@pytest.fixture
+def recorder(app, monkeypatch):
+    """The app's recorder with a zero threshold, so every statement counts as slow"""
+    from slow_queries import recorder
+    recorder.clear()
+    monkeypatch.setattr(recorder, 'threshold', 0)
+    yield recorder
+    recorder.clear()
+
+
+def test_slow_statements_are_recorded_with_their_plan(app, recorder):
+    from sqlalchemy import text
+    from models import db
+    with app.app_context():
+        with db.engine.connect() as connection:
+            connection.execute(text('SELECT id FROM users WHERE email = :email'), {'email': 'a@example.com'})
+    [entry] = [e for e in recorder.recent(limit=50) if 'FROM users' in e['sql']]
+    assert entry['sql'] == 'SELECT id FROM users WHERE email = ?'
+    assert entry['parameters'] == '(str)'
+    assert entry['route'].startswith('<') and entry['method'] is None
+    assert entry['plan'] and 'users' in ' '.join(entry['plan'])
+
+
+def test_each_statement_is_timed_once(app, recorder, monkeypatch):
+    import instrumentation
+    from sqlalchemy import text
+    from models import db
+    timed = []
+    monkeypatch.setattr(instrumentation, '_query_observers', list(instrumentation._query_observers))
+    instrumentation.on_query(lambda statement, parameters, elapsed, conn, executemany:
+                             timed.append(round(elapsed * 1000, 2)))
+    with app.app_context():
+        with db.engine.connect() as connection:
+            connection.execute(text('SELECT 42'))
+            assert 'slow_query_started' not in connection.info
+    [entry] = [e for e in recorder.recent(limit=50) if e['sql'] == 'SELECT ?']
+    # The recorder sees the same measurement as every other observer
+    assert [entry['duration_ms']] == timed
+
+
+def test_executemany_records_the_batch_shape_without_a_plan(app, recorder):
+    from sqlalchemy import text
+    from models import db
+    with app.app_context():
+        with db.engine.connect() as connection:
+            connection.execute(text('CREATE TEMP TABLE readings (level INTEGER, station TEXT)'))
+            connection.execute(text('INSERT INTO readings VALUES (:level, :station)'),
+                               [{'level': 3, 'station': 'north'}, {'level': 5, 'station': 'south'}])
+    [entry] = [e for e in recorder.recent(limit=50) if e['sql'].startswith('INSERT INTO readings')]
+    assert entry['parameters'] == '2 x (int, str)'
+    assert entry['plan'] is None
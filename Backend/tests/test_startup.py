@@ -0,0 +1,121 @@
+"""Lazy startup: the schema step runs only when the schema marker does not match."""
+import shutil
+import pytest
+
+
+@pytest.fixture
+def boot(app, tmp_path, monkeypatch):
+    """``boot(mode)`` runs create_app() again on the ``app`` fixture's database.
+
+    Returns the app and how many times the schema step (migrations up to head) ran.
+    """
+    import app as app_module
+    upgrades = []
+    upgrade_schema = app_module.upgrade_schema
+
+    def counting_upgrade(flask_app, db):
+        upgrades.append(flask_app)
+        return upgrade_schema(flask_app, db)
+    monkeypatch.setattr(app_module, 'upgrade_schema', counting_upgrade)
+    booted = []
+
+    def create(mode):
+        upgrades.clear()
+        flask_app = app_module.create_app({
+            'TESTING': True, 'STARTUP_MODE': mode, 'SESSION_FILE_DIR': str(tmp_path / 'sessions'),
+            'ALERT_CLEANUP_INTERVAL': float('inf'),
+        })
+        booted.append(flask_app)
+        return flask_app, len(upgrades)
+    yield create
+    from models import db
+    for flask_app in booted:
+        with flask_app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+
+def _marker(flask_app):
+    from sqlalchemy import text
+    from models import db
+    with flask_app.app_context():
+        return db.session.execute(text("SELECT fingerprint FROM schema_marker")).scalars().all()
+
+
+def _current_fingerprint():
+    from locations import GARISSA_LOCATIONS
+    from models import db
+    from startup import schema_fingerprint
+    return schema_fingerprint(db.metadata, seeds=[GARISSA_LOCATIONS])
+
+
+def test_lazy_boot_skips_the_schema_step_when_the_marker_matches(app, boot):
+    # The app fixture booted in full mode and stamped the marker
+    assert _marker(app) == [_current_fingerprint()]
+
+    lazy_app, upgrades = boot('lazy')
+    assert upgrades == 0
+    # alembic is not even loaded outside `flask` commands
+    assert 'migrate' not in lazy_app.extensions
+    assert lazy_app.test_client().get('/api/alerts/live').status_code == 200
+
+    _, upgrades = boot('full')
+    assert upgrades == 1
+
+
+def test_lazy_boot_on_a_stale_marker_runs_the_schema_step(app, boot):
+    from models import db
+    from startup import schema_is_current, stamp_schema
+    with app.app_context():
+        stamp_schema(db.engine, 'from-an-older-release')
+        assert not schema_is_current(db.engine, _current_fingerprint())
+
+    lazy_app, upgrades = boot('lazy')
+    assert upgrades == 1
+    assert _marker(lazy_app) == [_current_fingerprint()]
+
+
+def test_missing_marker_table_counts_as_stale(app):
+    from sqlalchemy import text
+    from models import db
+    from startup import schema_is_current
+    with app.app_context():
+        db.session.execute(text("DROP TABLE schema_marker"))
+        db.session.commit()
+        assert not schema_is_current(db.engine, _current_fingerprint())
+
+
+def test_fingerprint_follows_models_migrations_and_seeds(app, tmp_path, monkeypatch):
+    import startup
+    from sqlalchemy import Column, Integer, MetaData
+    from models import db
+    fingerprint = _current_fingerprint()
+    assert _current_fingerprint() == fingerprint
+
+    versions = tmp_path / 'versions'
+    shutil.copytree(startup.MIGRATION_VERSIONS, versions)
+    monkeypatch.setattr(startup, 'MIGRATION_VERSIONS', str(versions))
+    assert _current_fingerprint() == fingerprint
+    migration = versions / 'ffff00000000_new_column.py'
+    migration.write_text('revision = "ffff00000000"\n')
+    with_migration = _current_fingerprint()
+    assert with_migration != fingerprint
+    # Editing a migration counts as well as adding one
+    migration.write_text('revision = "ffff00000000"\ndown_revision = "c4d9a7e25f08"\n')
+    assert _current_fingerprint() != with_migration
+
+    metadata = MetaData()
+    for table in db.metadata.sorted_tables:
+        table.to_metadata(metadata)
+    before = startup.schema_fingerprint(metadata)
+    metadata.tables['alerts'].append_column(Column('priority', Integer))
+    assert startup.schema_fingerprint(metadata) != before
+    assert startup.schema_fingerprint(db.metadata, seeds=[{'Bulas': ['New Ward']}]) != \
+        startup.schema_fingerprint(db.metadata, seeds=[{'Bulas': []}])
+
+
+def test_unknown_startup_mode_is_rejected(app):
+    from startup import startup_mode
+    app.config['STARTUP_MODE'] = 'eager'
+    with pytest.raises(ValueError):
+        startup_mode(app)
@@ -0,0 +1,22 @@
+"""Production WSGI app factory.
+
+    gunicorn                     (from Backend/; gunicorn.conf.py points at wsgi:create_app())
+
+With gunicorn's preload the factory runs once, in the master, so workers fork
+with the app, its mappers and its email templates already in shared memory.
+The background schedulers are started after the fork, in one worker only
+(see lifecycle.py). Startup is lazy unless STARTUP_MODE says otherwise: the
+schema step only runs when the models have changed (see startup.py).
+"""
+import os
+from app import create_app as create_flask_app
+from lifecycle import warm_up
+
+
+def create_app():
+    app = create_flask_app({
+        'STARTUP_MODE': os.getenv('STARTUP_MODE', 'lazy'),
+        'BACKGROUND_JOBS_AUTOSTART': False,
+    })
+    warm_up(app)
+    return app